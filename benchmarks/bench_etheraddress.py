@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EtherAddress microbenchmarks.
+
+Measures constructions per second from the supported representations, the
+string conversion, and the throughput of dictionary lookups keyed by
+addresses built independently from the keys (as when parsing a message).
+
+Run from the repository root:
+
+    python3 benchmarks/bench_etheraddress.py [--count N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from empower.datatypes.etheraddress import EtherAddress  # noqa: E402
+
+
+def bench(name, function, items):
+    """Call function on every item and print the rate."""
+
+    started = time.perf_counter()
+
+    for item in items:
+        function(item)
+
+    elapsed = time.perf_counter() - started
+
+    print("%-28s %12.0f ops/s" % (name, len(items) / elapsed))
+
+
+def main(argv=None):
+    """Run the benchmarks."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--count", type=int, default=200000,
+                        help="operations per benchmark, default: %(default)s")
+    args = parser.parse_args(argv)
+
+    values = [random.getrandbits(48) for _ in range(args.count)]
+    raws = [x.to_bytes(6, 'big') for x in values]
+    strings = [':'.join('%02X' % b for b in x) for x in raws]
+
+    bench("construct from str", EtherAddress, strings)
+    bench("construct from bytes", EtherAddress, raws)
+    bench("construct from bytes again", EtherAddress, raws)
+    bench("construct from int", EtherAddress, values)
+
+    addrs = [EtherAddress(x) for x in values]
+
+    bench("to_str", str, addrs)
+    bench("to_str again", str, addrs)
+    bench("hash", hash, addrs)
+
+    table = {x: None for x in addrs}
+    keys = [EtherAddress(x) for x in raws]
+
+    bench("dict lookup", table.__contains__, keys)
+
+
+if __name__ == "__main__":
+    main()
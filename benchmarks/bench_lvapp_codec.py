@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP codec benchmarks.
+
+Measures the messages per second parsed and built by the construct Structs
+and by the compiled codecs generated from them. Parsing includes reading
+every field of the message, since the compiled codecs decode lazily.
+
+Run from the repository root:
+
+    python3 benchmarks/bench_lvapp_codec.py [--count N]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from construct import Container  # noqa: E402
+
+from empower.lvapp import HELLO  # noqa: E402
+from empower.lvapp import PROBE_REQUEST  # noqa: E402
+from empower.lvapp import STATUS_LVAP  # noqa: E402
+from empower.lvapp import CAPS  # noqa: E402
+from empower.lvapp import SET_PORT  # noqa: E402
+from empower.lvapp.codec import CODECS  # noqa: E402
+from empower.lvapp.codec import select_codec  # noqa: E402
+
+WTP = b'\x00\x0d\xb9\x2f\x56\x64'
+STA = b'\x60\xf4\x45\xd0\x3b\xfc'
+BSSID = b'\x52\x0d\xb9\x2f\x56\x64'
+
+MESSAGES = [
+    (HELLO, Container(version=0, type=0x04, length=20, seq=1, wtp=WTP,
+                      period=5000)),
+    (PROBE_REQUEST, Container(version=0, type=0x05, length=38, seq=2,
+                              wtp=WTP, sta=STA, hwaddr=WTP, channel=36,
+                              band=1, supported_band=1, ssid=b'EmPOWER')),
+    (STATUS_LVAP, Container(version=0, type=0x13, length=0, seq=3,
+                            flags=Container(set_mask=1, associated=1,
+                                            authenticated=1),
+                            assoc_id=1, wtp=WTP, sta=STA, encap=STA,
+                            hwaddr=WTP, channel=36, band=1,
+                            supported_band=1, net_bssid=BSSID,
+                            lvap_bssid=BSSID,
+                            ssids=[Container(length=7, ssid=b'EmPOWER'),
+                                   Container(length=4, ssid=b'Test')])),
+    (CAPS, Container(version=0, type=0x16, length=0, seq=4, wtp=WTP,
+                     nb_resources_elements=2, nb_ports_elements=1,
+                     blocks=[[WTP, 36, 1], [WTP, 6, 0]],
+                     ports=[[WTP, 1, b'wlan0\x00\x00\x00\x00\x00']])),
+    (SET_PORT, Container(version=0, type=0x14, length=0, seq=5,
+                         flags=Container(no_ack=0), hwaddr=WTP,
+                         channel=36, band=1, sta=STA, rts_cts=2436,
+                         tx_mcast=0, ur_mcast_count=3, nb_mcses=3,
+                         nb_ht_mcses=2, mcs=[6, 12, 54], ht_mcs=[0, 7])),
+]
+
+
+def bench(name, function, count):
+    """Call function count times and print the rate."""
+
+    started = time.perf_counter()
+
+    for _ in range(count):
+        function()
+
+    elapsed = time.perf_counter() - started
+
+    print("%-32s %12.0f msg/s" % (name, count / elapsed))
+
+
+def main(argv=None):
+    """Run the benchmarks."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--count", type=int, default=50000,
+                        help="messages per benchmark, default: %(default)s")
+    args = parser.parse_args(argv)
+
+    for con, obj in MESSAGES:
+
+        data = con.build(obj)
+        fields = list(obj.keys())
+
+        for codec in CODECS:
+
+            struct = select_codec(con, codec)
+
+            def parse():
+                msg = struct.parse(data)
+                return [getattr(msg, x) for x in fields]
+
+            bench("%s parse (%s)" % (con.name, codec), parse, args.count)
+            bench("%s build (%s)" % (con.name, codec),
+                  lambda: struct.build(obj), args.count)
+
+
+if __name__ == "__main__":
+    main()
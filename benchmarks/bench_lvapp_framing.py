@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP framing benchmarks.
+
+A fake WTP connects over the loopback interface and pipelines a burst of
+STATUS_LVAP messages, as a WTP does after reconnecting. The messages are
+received by a LVAPPConnection, whose dispatch is replaced by a counter, so
+that only the socket reads and the frame extraction are measured. The
+runtime modules are loaded with an in-memory configuration database. The
+same burst is then received reading one message at a time (header first,
+then the rest of the message) for comparison. Finally extract_frames is
+measured alone on an in-memory buffer.
+
+Run from the repository root:
+
+    python3 benchmarks/bench_lvapp_framing.py [--count N]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import empower.settings  # noqa: E402
+
+empower.settings.CONFIGDB_ENGINE = "sqlite://"
+
+import tornado.gen  # noqa: E402
+import tornado.ioloop  # noqa: E402
+
+from construct import Container  # noqa: E402
+from tornado.tcpclient import TCPClient  # noqa: E402
+from tornado.tcpserver import TCPServer  # noqa: E402
+from tornado.netutil import bind_sockets  # noqa: E402
+
+from empower.lvapp import PT_STATUS_LVAP  # noqa: E402
+from empower.lvapp import STATUS_LVAP  # noqa: E402
+from empower.lvapp.framing import HEADER_CODEC  # noqa: E402
+from empower.lvapp.framing import HEADER_SIZE  # noqa: E402
+from empower.lvapp.framing import extract_frames  # noqa: E402
+from empower.lvapp.lvappconnection import LVAPPConnection  # noqa: E402
+
+
+def status_lvap(seq):
+    """Return a STATUS_LVAP message."""
+
+    ssids = [Container(length=7, ssid=b'EmPOWER')]
+
+    msg = Container(version=0, type=PT_STATUS_LVAP, length=0, seq=seq,
+                    flags=Container(set_mask=1, associated=1,
+                                    authenticated=1),
+                    assoc_id=seq % 2007, wtp=b'\x00\x0d\xb9\x2f\x56\x64',
+                    sta=seq.to_bytes(6, 'big'), encap=bytes(6),
+                    hwaddr=b'\x00\x0d\xb9\x2f\x56\x64', channel=36, band=1,
+                    supported_band=1, net_bssid=bytes(6),
+                    lvap_bssid=bytes(6), ssids=ssids)
+
+    msg.length = len(STATUS_LVAP.build(msg))
+
+    return STATUS_LVAP.build(msg)
+
+
+class Receiver(object):
+    """Counts the frames received and the socket reads needed."""
+
+    def __init__(self, count):
+
+        self.count = count
+        self.frames = 0
+        self.reads = 0
+        self.done = tornado.gen.Future()
+
+    def received(self, frames):
+        """Account a read which completed some frames."""
+
+        self.reads += 1
+        self.frames += frames
+
+        if self.frames >= self.count and not self.done.done():
+            self.done.set_result(None)
+
+
+class BatchConnection(LVAPPConnection):
+    """A LVAPPConnection counting the frames instead of dispatching them."""
+
+    def _extract_frames(self):
+        self.server.receiver.received(len(super()._extract_frames()))
+        return []
+
+
+class PerMessageConnection(object):
+    """Reads the header of a message, then the rest of it."""
+
+    def __init__(self, stream, addr, server):
+
+        self.stream = stream
+        self.server = server
+        self.stream.read_bytes(HEADER_SIZE, self._on_header)
+
+    def _on_header(self, data):
+
+        self.server.receiver.reads += 1
+
+        _, _, length = HEADER_CODEC.head.unpack(data, 0)
+        self.stream.read_bytes(length - HEADER_SIZE, self._on_body)
+
+    def _on_body(self, data):
+
+        self.server.receiver.received(1)
+        self.stream.read_bytes(HEADER_SIZE, self._on_header)
+
+
+class Server(TCPServer):
+    """Creates a connection of the given class for every client."""
+
+    def __init__(self, connection, receiver):
+
+        super().__init__()
+        self.connection = connection
+        self.receiver = receiver
+        self.streams = []
+
+    def handle_stream(self, stream, address):
+
+        self.streams.append(stream)
+        self.connection(stream, address, self)
+
+
+@tornado.gen.coroutine
+def run(name, connection, burst, count):
+    """Send burst from a fake WTP and wait until count frames are read."""
+
+    sockets = bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+
+    receiver = Receiver(count)
+    server = Server(connection, receiver)
+    server.add_sockets(sockets)
+
+    stream = yield TCPClient().connect("127.0.0.1", port)
+
+    started = time.perf_counter()
+    stream.write(burst)
+    yield receiver.done
+    elapsed = time.perf_counter() - started
+
+    print("%-28s %12.0f msg/s %8u reads" %
+          (name, count / elapsed, receiver.reads))
+
+    stream.close()
+    server.stop()
+
+    for item in server.streams:
+        item.close()
+
+
+def bench_extract(burst, count):
+    """Extract the frames of burst from memory."""
+
+    buf = bytearray(burst)
+
+    started = time.perf_counter()
+    frames, _ = extract_frames(buf)
+    elapsed = time.perf_counter() - started
+
+    assert len(frames) == count
+
+    print("%-28s %12.0f msg/s" % ("extract_frames", count / elapsed))
+
+
+@tornado.gen.coroutine
+def main(argv=None):
+    """Run the benchmarks."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--count", type=int, default=10000,
+                        help="messages in the burst, default: %(default)s")
+    args = parser.parse_args(argv)
+
+    burst = b''.join([status_lvap(x) for x in range(args.count)])
+
+    yield run("batch (LVAPPConnection)", BatchConnection, burst, args.count)
+    yield run("one message per read", PerMessageConnection, burst,
+              args.count)
+
+    bench_extract(burst, args.count)
+
+
+if __name__ == "__main__":
+    tornado.ioloop.IOLoop.current().run_sync(main)
@@ -129,6 +129,20 @@ def pa_reboot(args, cmd):
     return args, leftovers
 
 
+def pa_load(args, cmd):
+    """ Bulk load parser method. """
+
+    usage = "%s <file>" % USAGE.format(cmd)
+    desc = DESCS[cmd]
+    parser = ArgumentParser(usage=usage, description=desc)
+    parser.add_argument("-c", "--chunk", dest="chunk", type=int,
+                        default=CHUNK,
+                        help="Entries per request; default=%u" % CHUNK)
+    parser.set_defaults(cmd=cmd)
+    (args, leftovers) = parser.parse_known_args(args)
+    return args, leftovers
+
+
 def pa_help(args, cmd):
     """ Help option parser. """
 
@@ -200,7 +214,7 @@ def do_list_wtps(gargs, args, leftovers):
         connection = ""
 
         if 'connection' in entry and entry['connection']:
-            connection = "at %s" % entry['connection'][0]
+            connection = "at %s" % entry['connection']['addr'][0]
 
         line = "%s last seen %s %s" % (entry['addr'],
                                        entry['last_seen'],
@@ -372,6 +386,74 @@ def do_reboot(gargs, args, leftovers):
     print("feed on")
 
 
+def read_chunks(filename, chunk):
+    """ Read a CSV file (or a JSON array) returning chunks of entries. """
+
+    if filename.endswith(".json"):
+
+        with open(filename) as json_file:
+            entries = json.load(json_file)
+
+        for i in range(0, len(entries), chunk):
+            yield 'application/json', json.dumps(entries[i:i + chunk])
+
+        return
+
+    with open(filename) as csv_file:
+
+        lines = []
+
+        for line in csv_file:
+            lines.append(line)
+            if len(lines) >= chunk:
+                yield 'text/csv', "".join(lines)
+                lines = []
+
+        if lines:
+            yield 'text/csv', "".join(lines)
+
+
+def do_load(gargs, args, leftovers):
+    """ Bulk load entries from a file. """
+
+    if len(leftovers) != 1:
+        print("Invalid parameter, run help %s" % args.cmd)
+        print_available_cmds()
+        sys.exit()
+
+    connection, headers = get_connection(gargs)
+
+    created = 0
+    failed = 0
+    offset = 0
+
+    for content_type, body in read_chunks(leftovers[0], args.chunk):
+
+        headers['Content-type'] = content_type
+        connection.request('POST', LOADS[args.cmd], headers=headers,
+                           body=body.encode('utf-8'))
+        response = connection.getresponse()
+        str_response = response.read().decode('utf-8')
+
+        if response.code != 200:
+            print("%s %s" % (response.code, response.reason))
+            print(str_response)
+            sys.exit()
+
+        data = json.loads(str_response)
+        created += data['created']
+        failed += data['failed']
+
+        for result in data['results']:
+            if result['status'] != 201:
+                print("entry %u: %s" % (offset + result['index'],
+                                        result['message']))
+
+        offset += len(data['results'])
+
+    print("created: %u, failed: %u" % (created, failed))
+
+
 def connect(gargs, cmd, data=None):
     """ Run command. """
 
@@ -409,9 +491,29 @@ CMDS = {
     'feed-on': (pa_feed_on, do_feed_on),
     'feed-off': (pa_feed_off, do_feed_off),
     'reboot': (pa_reboot, do_reboot),
+    'load-allow': (pa_load, do_load),
+    'load-deny': (pa_load, do_load),
+    'load-imsi2mac': (pa_load, do_load),
+    'load-wtps': (pa_load, do_load),
+    'load-cpps': (pa_load, do_load),
+    'load-vbses': (pa_load, do_load),
 }
 
 
+LOADS = {
+    'load-allow': '/api/v1/allow',
+    'load-deny': '/api/v1/deny',
+    'load-imsi2mac': '/api/v1/imsi2mac',
+    'load-wtps': '/api/v1/wtps',
+    'load-cpps': '/api/v1/cpps',
+    'load-vbses': '/api/v1/vbses',
+}
+
+
+# Entries sent in each bulk request
+CHUNK = 5000
+
+
 USAGE = "%(prog)s {0}"
 
 
@@ -430,6 +532,12 @@ DESCS = {
     'feed-on': "Turn feed on.",
     'feed-off': "Turn feed on.",
     'reboot': "Reboot node.",
+    'load-allow': "Load allowed stations from a file (sta,label).",
+    'load-deny': "Load denied stations from a file (sta,label).",
+    'load-imsi2mac': "Load IMSI to MAC mappings from a file (imsi,addr).",
+    'load-wtps': "Load WTPs from a file (addr,label).",
+    'load-cpps': "Load CPPs from a file (addr,label).",
+    'load-vbses': "Load VBSes from a file (addr,label).",
 }
 
 
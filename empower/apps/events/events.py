@@ -53,72 +53,72 @@ class EventsApp(EmpowerApp):
     def vbs_down_callback(self, vbs):
         """Called when an VBS disconnects from a tennant."""
 
-        self.log.info("VBS %s disconnected" % vbs.addr)
+        self.log.info("VBS %s disconnected", vbs.addr)
 
     def vbs_up_callback(self, vbs):
         """Called when an VBS connects to a tennant."""
 
-        self.log.info("VBS %s connected" % vbs.addr)
+        self.log.info("VBS %s connected", vbs.addr)
 
     def ue_leave_callback(self, ue):
         """Called when an UE disconnects from a VBS."""
 
-        self.log.info("UE %s disconnected" % ue.rnti)
+        self.log.info("UE %s disconnected", ue.rnti)
 
     def ue_join_callback(self, ue):
         """Called when an UE connects to a VBS."""
 
-        self.log.info("UE %s connected" % ue.rnti)
+        self.log.info("UE %s connected", ue.rnti)
 
     def lvnf_join_callback(self, lvnf):
         """Called when an LVNF associates to a tennant."""
 
-        self.log.info("LVNF %s joined %s" % (lvnf.lvnf_id, lvnf.tenant_id))
+        self.log.info("LVNF %s joined %s", lvnf.lvnf_id, lvnf.tenant_id)
 
     def lvnf_leave_callback(self, lvnf):
         """Called when an LVNF associates to a tennant."""
 
-        self.log.info("LVNF %s left %s" % (lvnf.lvnf_id, lvnf.tenant_id))
+        self.log.info("LVNF %s left %s", lvnf.lvnf_id, lvnf.tenant_id)
 
     def lvap_leave_callback(self, lvap):
         """Called when an LVAP disassociates from a tennant."""
 
-        self.log.info("LVAP %s left %s" % (lvap.addr, lvap.ssid))
+        self.log.info("LVAP %s left %s", lvap.addr, lvap.ssid)
 
     def lvap_join_callback(self, lvap):
         """Called when an LVAP associates to a tennant."""
 
-        self.log.info("LVAP %s joined %s" % (lvap.addr, lvap.ssid))
+        self.log.info("LVAP %s joined %s", lvap.addr, lvap.ssid)
 
     def ue_join_callback(self, ue):
         """Called when an UE associates to a tennant."""
 
-        self.log.info("UE %s joined %u" % (ue.addr, ue.plmn_id))
+        self.log.info("UE %s joined %u", ue.addr, ue.plmn_id)
 
     def ue_leave_callback(self, ue):
         """Called when an UE leaves a tennant."""
 
-        self.log.info("UE %s left %u" % (ue.addr, ue.plmn_id))
+        self.log.info("UE %s left %u", ue.addr, ue.plmn_id)
 
     def wtp_up_callback(self, wtp):
         """Called when a new wtp connects to the controller."""
 
-        self.log.info("WTP %s connected!" % wtp.addr)
+        self.log.info("WTP %s connected!", wtp.addr)
 
     def wtp_down_callback(self, wtp):
         """Called when a wtp connectdiss from the controller."""
 
-        self.log.info("WTP %s left!" % wtp.addr)
+        self.log.info("WTP %s left!", wtp.addr)
 
     def cpp_up_callback(self, cpp):
         """Called when a new cpp connects to the controller."""
 
-        self.log.info("CPP %s connected!" % cpp.addr)
+        self.log.info("CPP %s connected!", cpp.addr)
 
     def cpp_down_callback(self, cpp):
         """Called when a cpp disconnects from the controller."""
 
-        self.log.info("CPP %s left!" % cpp.addr)
+        self.log.info("CPP %s left!", cpp.addr)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
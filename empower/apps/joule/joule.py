@@ -133,7 +133,8 @@ class Joule(EmpowerApp):
         # track packets and bytes counter for the new LVAP
         stats = self.bin_counter(lvap=lvap.addr,
                                  bins=self.bins,
-                                 every=self.every)
+                                 every=self.every,
+                                 batch=True)
 
         self.stats[lvap.addr] = stats
         self.power[lvap.addr] = 0.0
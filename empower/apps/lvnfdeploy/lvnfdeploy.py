@@ -34,7 +34,7 @@ class LvnfDeploy(EmpowerApp):
     def cpp_up_callback(self, cpp):
         """Called when a new cpp connects to the controller."""
 
-        self.log.info("CPP %s connected!" % cpp.addr)
+        self.log.info("CPP %s connected!", cpp.addr)
 
         # Create Image
         img = Image(vnf="in_0 -> Null() -> out_0")
@@ -45,7 +45,7 @@ class LvnfDeploy(EmpowerApp):
     def lvnf_join_callback(self, lvnf):
         """Called when an LVNF associates to a tenant."""
 
-        self.log.info("LVNF %s joined %s" % (lvnf.lvnf_id, lvnf.tenant_id))
+        self.log.info("LVNF %s joined %s", lvnf.lvnf_id, lvnf.tenant_id)
 
         # Stop LVNF
         lvnf.stop()
@@ -53,7 +53,7 @@ class LvnfDeploy(EmpowerApp):
     def lvnf_leave_callback(self, lvnf):
         """Called when an LVNF leaves a tennant."""
 
-        self.log.info("LVNF %s stopped" % lvnf.lvnf_id)
+        self.log.info("LVNF %s stopped", lvnf.lvnf_id)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
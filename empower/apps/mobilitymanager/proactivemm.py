@@ -51,8 +51,12 @@ class ProactiveMobilityManager(EmpowerApp):
     def loop(self):
         """ Periodic job. """
 
-        for lvap in self.lvaps():
-            lvap.blocks = self.blocks().sortByRssi(lvap.addr).first()
+        lvaps = self.lvaps()
+        best = self.blocks().best_blocks([x.addr for x in lvaps])
+
+        for lvap in lvaps:
+            if lvap.addr in best:
+                lvap.blocks = best[lvap.addr]
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
@@ -81,7 +81,7 @@ class ReactiveMobilityManager(EmpowerApp):
         if limit > 0 or limit < -100:
             raise ValueError("Invalid value for limit")
 
-        self.log.info("Setting limit %u dB" % value)
+        self.log.info("Setting limit %u dB", value)
         self.__limit = limit
 
     def low_rssi(self, trigger):
@@ -51,7 +51,7 @@ class BinCounterPoller(EmpowerApp):
     def counters_callback(self, stats):
         """ New stats available. """
 
-        self.log.info("New counters received from %s" % stats.lvap)
+        self.log.info("New counters received from %s", stats.lvap)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
@@ -50,7 +50,7 @@ class BusynessPoller(EmpowerApp):
     def busyness_callback(self, busyness):
         """ New busyness_callback available. """
 
-        self.log.info("New busyness received from %s" % busyness.block)
+        self.log.info("New busyness received from %s", busyness.block)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
@@ -49,7 +49,7 @@ class CQMLinksPoller(EmpowerApp):
     def cqm_links_callback(self, stats):
         """ New stats available. """
 
-        self.log.info("New counters received from %s" % stats.wtp)
+        self.log.info("New counters received from %s", stats.wtp)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
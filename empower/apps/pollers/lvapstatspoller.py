@@ -49,7 +49,7 @@ class LVAPStatsPoller(EmpowerApp):
     def lvap_stats_callback(self, counter):
         """ New stats available. """
 
-        self.log.info("New lvap stats received from %s" % counter.lvap)
+        self.log.info("New lvap stats received from %s", counter.lvap)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
@@ -53,12 +53,12 @@ class MapsPoller(EmpowerApp):
     def ucqm_callback(self, ucqm):
         """ New stats available. """
 
-        self.log.info("New UCQM received from %s" % ucqm.block)
+        self.log.info("New UCQM received from %s", ucqm.block)
 
     def ncqm_callback(self, ucqm):
         """ New stats available. """
 
-        self.log.info("New NCQM received from %s" % ucqm.block)
+        self.log.info("New NCQM received from %s", ucqm.block)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
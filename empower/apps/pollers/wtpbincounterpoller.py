@@ -51,7 +51,7 @@ class WTPBinCounterPoller(EmpowerApp):
     def counters_callback(self, stats):
         """ New stats available. """
 
-        self.log.info("New counters received from %s" % stats.wtp)
+        self.log.info("New counters received from %s", stats.wtp)
 
 
 def launch(tenant_id, every=DEFAULT_PERIOD):
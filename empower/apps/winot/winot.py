@@ -22,6 +22,7 @@ import random
 from empower.core.image import Image
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_PERIOD
+from empower.core.resourcepool import ResourcePool
 from empower.datatypes.etheraddress import EtherAddress
 
 DEFAULT_LVAP = "18:5E:0F:E3:B8:68"
@@ -80,8 +81,7 @@ class WiNot(EmpowerApp):
 
                 selected.append(block)
 
-        selected.sort(key=lambda x: x.ucqm[lvap.addr]['mov_rssi'],
-                      reverse=True)
+        selected = ResourcePool(selected).sortByRssi(lvap.addr, "ewma")
 
         selected = [lvap.blocks[0]] + selected[0:self.max_uplinks-1]
 
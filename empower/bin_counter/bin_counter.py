@@ -21,18 +21,23 @@ import time
 
 from construct import UBInt8
 from construct import Bytes
-from construct import Sequence
 from construct import Container
 from construct import Struct
 from construct import UBInt16
 from construct import UBInt32
-from construct import Array
 
 from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import Module
 from empower.core.app import EmpowerApp
+from empower.core.histogram import Histogram
+from empower.core.histogram import SampleArray
+from empower.core.histogram import SAMPLE
 from empower.lvapp import PT_VERSION
+from empower.wtp_bin_counter.wtp_bin_counter import PT_WTP_STATS_REQUEST
+from empower.wtp_bin_counter.wtp_bin_counter import PT_WTP_STATS_RESPONSE
+from empower.wtp_bin_counter.wtp_bin_counter import WTP_STATS_REQUEST
+from empower.wtp_bin_counter.wtp_bin_counter import WTP_STATS_RESPONSE
 
 from empower.main import RUNTIME
 
@@ -40,8 +45,6 @@ from empower.main import RUNTIME
 PT_STATS_REQUEST = 0x17
 PT_STATS_RESPONSE = 0x18
 
-STATS = Sequence("stats", UBInt16("bytes"), UBInt32("count"))
-
 STATS_REQUEST = Struct("stats_request", UBInt8("version"),
                        UBInt8("type"),
                        UBInt32("length"),
@@ -59,7 +62,7 @@ STATS_RESPONSE = \
            Bytes("sta", 6),
            UBInt16("nb_tx"),
            UBInt16("nb_rx"),
-           Array(lambda ctx: ctx.nb_tx + ctx.nb_rx, STATS))
+           SampleArray("stats", lambda ctx: ctx.nb_tx + ctx.nb_rx, SAMPLE))
 
 
 class BinCounter(Module):
@@ -93,6 +96,7 @@ class BinCounter(Module):
         # parameters
         self._lvap = None
         self._bins = [8192]
+        self.histogram = Histogram(self._bins)
 
         # data structures
         self.tx_packets = []
@@ -149,6 +153,7 @@ class BinCounter(Module):
                 raise ValueError("bins values must be positive")
 
         self._bins = bins
+        self.histogram = Histogram(bins)
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
@@ -168,26 +173,43 @@ class BinCounter(Module):
 
         return out
 
-    def run_once(self):
-        """ Send out stats request. """
+    def get_lvap(self):
+        """Return the LVAP tracked by this module.
+
+        The module is unloaded if the LVAP is not available or if the WTP
+        hosting it is not connected.
+
+        Returns:
+            The LVAP or None
+        """
 
         if self.tenant_id not in RUNTIME.tenants:
             self.log.info("Tenant %s not found", self.tenant_id)
             self.unload()
-            return
+            return None
 
         tenant = RUNTIME.tenants[self.tenant_id]
 
         if self.lvap not in tenant.lvaps:
             self.log.info("LVAP %s not found", self.lvap)
             self.unload()
-            return
+            return None
 
         lvap = tenant.lvaps[self.lvap]
 
         if not lvap.wtp.connection or lvap.wtp.connection.stream.closed():
             self.log.info("WTP %s not connected", lvap.wtp.addr)
             self.unload()
+            return None
+
+        return lvap
+
+    def run_once(self):
+        """ Send out stats request. """
+
+        lvap = self.get_lvap()
+
+        if not lvap:
             return
 
         stats_req = Container(version=PT_VERSION,
@@ -202,107 +224,59 @@ class BinCounter(Module):
                       self.module_id)
 
         msg = STATS_REQUEST.build(stats_req)
-        lvap.wtp.connection.stream.write(msg)
-
-    def fill_bytes_samples(self, data):
-        """ Compute samples.
-
-        Samples are in the following format (after ordering):
-
-        [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
-
-        Each 2-tuple has format [ size, count ] where count is the number of
-        size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
-
-        """
-
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
-
-        for entry in samples:
-            if len(entry) == 0:
-                continue
-            size = entry[0]
-            count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + size * count
-                    break
-
-        return out
-
-    def fill_packets_samples(self, data):
-        """ Compute samples.
-
-        Samples are in the following format (after ordering):
-
-        [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
-
-        Each 2-tuple has format [ size, count ] where count is the number of
-        size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
+        lvap.wtp.connection.send_message(msg)
 
+    def handle_response(self, response):
+        """Handle an incoming STATS_RESPONSE message.
+        Args:
+            stats, a STATS_RESPONSE message
+        Returns:
+            None
         """
 
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
-
-        for entry in samples:
-            if len(entry) == 0:
-                continue
-            size = entry[0]
-            count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + count
-                    break
-
-        return out
-
-    def update_stats(self, delta, last, current):
-        """Update stats."""
+        tx_samples = response.stats[0:response.nb_tx]
+        rx_samples = response.stats[response.nb_tx:]
 
-        stats = []
+        tx_bytes, tx_packets = self.histogram.fill(tx_samples)
+        rx_bytes, rx_packets = self.histogram.fill(rx_samples)
 
-        for i in range(0, len(last)):
-            diff = current[i] - last[i]
-            stats.append(diff / delta)
+        self.update(tx_bytes, tx_packets, rx_bytes, rx_packets)
 
-        return stats
+    def update(self, tx_bytes, tx_packets, rx_bytes, rx_packets):
+        """Update the counters and call the callback.
 
-    def handle_response(self, response):
-        """Handle an incoming STATS_RESPONSE message.
         Args:
-            stats, a STATS_RESPONSE message
+            tx_bytes: bytes transmitted per bin (list)
+            tx_packets: packets transmitted per bin (list)
+            rx_bytes: bytes received per bin (list)
+            rx_packets: packets received per bin (list)
         Returns:
             None
         """
 
-        # update this object
-        tx_samples = response.stats[0:response.nb_tx]
-        rx_samples = response.stats[response.nb_tx:-1]
-
         old_tx_bytes = self.tx_bytes
         old_rx_bytes = self.rx_bytes
 
         old_tx_packets = self.tx_packets
         old_rx_packets = self.rx_packets
 
-        self.tx_bytes = self.fill_bytes_samples(tx_samples)
-        self.rx_bytes = self.fill_bytes_samples(rx_samples)
+        # update this object
+        self.tx_bytes = tx_bytes
+        self.rx_bytes = rx_bytes
 
-        self.tx_packets = self.fill_packets_samples(tx_samples)
-        self.rx_packets = self.fill_packets_samples(rx_samples)
+        self.tx_packets = tx_packets
+        self.rx_packets = rx_packets
 
         if self.last:
             delta = time.time() - self.last
             self.tx_bytes_per_second = \
-                self.update_stats(delta, old_tx_bytes, self.tx_bytes)
+                Histogram.rates(delta, old_tx_bytes, self.tx_bytes)
             self.rx_bytes_per_second = \
-                self.update_stats(delta, old_rx_bytes, self.rx_bytes)
+                Histogram.rates(delta, old_rx_bytes, self.rx_bytes)
             self.tx_packets_per_second = \
-                self.update_stats(delta, old_tx_packets, self.tx_packets)
+                Histogram.rates(delta, old_tx_packets, self.tx_packets)
             self.rx_packets_per_second = \
-                self.update_stats(delta, old_rx_packets, self.rx_packets)
+                Histogram.rates(delta, old_rx_packets, self.rx_packets)
 
         self.last = time.time()
 
@@ -311,9 +285,109 @@ class BinCounter(Module):
 
 
 class BinCounterWorker(ModuleLVAPPWorker):
-    """Counter worker."""
+    """Counter worker.
+
+    Batched modules are polled with a single WTP_STATS_REQUEST per WTP
+    which returns the counters of all the LVAPs hosted by the WTP. The
+    response is then demultiplexed to the modules tracking those LVAPs.
+
+    Attributes:
+        polled: the modules polled in the last period indexed by
+          (batch id, wtp address)
+    """
+
+    def __init__(self, module, pt_type, pt_packet=None):
+
+        super().__init__(module, pt_type, pt_packet)
+
+        self.polled = {}
+
+        self.pnfp_server.register_message(PT_WTP_STATS_RESPONSE,
+                                          WTP_STATS_RESPONSE,
+                                          self.handle_batch_packet)
+
+    def remove_from_batch(self, module):
+        """Remove a module from its batch."""
+
+        batch = self.batches.get(module.every)
+
+        super().remove_from_batch(module)
+
+        if batch and not batch.modules:
+            for key in [x for x in self.polled if x[0] == batch.batch_id]:
+                del self.polled[key]
+
+    def run_batch(self, batch, modules):
+        """Send one stats request to every WTP hosting a batched LVAP."""
+
+        wtps = {}
+
+        for module in modules:
+
+            lvap = module.get_lvap()
+
+            if not lvap:
+                continue
 
-    pass
+            if lvap.wtp.addr not in wtps:
+                wtps[lvap.wtp.addr] = (lvap.wtp, [])
+
+            wtps[lvap.wtp.addr][1].append(module)
+
+        for wtp_addr, (wtp, polled) in wtps.items():
+
+            self.polled[(batch.batch_id, wtp_addr)] = polled
+
+            stats_req = Container(version=PT_VERSION,
+                                  type=PT_WTP_STATS_REQUEST,
+                                  length=14,
+                                  seq=wtp.seq,
+                                  module_id=batch.batch_id)
+
+            self.log.info("Sending batched %s request to %s for %u LVAPs "
+                          "(batch=%u)", self.module.MODULE_NAME, wtp_addr,
+                          len(polled), batch.batch_id)
+
+            msg = WTP_STATS_REQUEST.build(stats_req)
+            wtp.connection.send_message(msg)
+
+    def handle_batch_packet(self, response):
+        """Handle a WTP_STATS_RESPONSE message sent to a batch."""
+
+        key = (response.module_id, EtherAddress(response.wtp))
+
+        if key not in self.polled:
+            return
+
+        polled = [x for x in self.polled.pop(key)
+                  if x.module_id in self.modules]
+
+        self.log.info("Received batched %s response from %s (batch=%u)",
+                      self.module.MODULE_NAME, key[1], key[0])
+
+        tx_samples = response.stats[0:response.nb_tx]
+        rx_samples = response.stats[response.nb_tx:]
+
+        # modules sharing the same bins share the same classification
+        groups = {}
+
+        for module in polled:
+            groups.setdefault(tuple(module.bins), []).append(module)
+
+        for modules in groups.values():
+
+            histogram = modules[0].histogram
+            empty = [0] * len(histogram.bins)
+
+            tx_bytes, tx_packets = histogram.fill_by_lvap(tx_samples)
+            rx_bytes, rx_packets = histogram.fill_by_lvap(rx_samples)
+
+            for module in modules:
+                lvap = module.lvap
+                module.update(tx_bytes.get(lvap, empty),
+                              tx_packets.get(lvap, empty),
+                              rx_bytes.get(lvap, empty),
+                              rx_packets.get(lvap, empty))
 
 
 def bin_counter(**kwargs):
@@ -332,7 +406,10 @@ def bound_bin_counter(self, **kwargs):
 setattr(EmpowerApp, BinCounter.MODULE_NAME, bound_bin_counter)
 
 
-def launch():
+def launch(batch=False):
     """ Initialize the module. """
 
-    return BinCounterWorker(BinCounter, PT_STATS_RESPONSE, STATS_RESPONSE)
+    worker = BinCounterWorker(BinCounter, PT_STATS_RESPONSE, STATS_RESPONSE)
+    worker.batch = batch in (True, "True", "true", "1")
+
+    return worker
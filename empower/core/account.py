@@ -17,7 +17,7 @@
 
 """EmPOWER Account Class."""
 
-from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.persistence.persistence import TblAccount
 
 ROLE_ADMIN = "admin"
@@ -78,36 +78,24 @@ class Account(object):
     def name(self, name):
         """Set name."""
 
-        session = Session()
-        account = session.query(TblAccount) \
-                         .filter(TblAccount.username == self.username) \
-                         .first()
-        account.name = name
-        session.commit()
+        Writer.instance().update(TblAccount, {'name': name},
+                                 TblAccount.username == self.username)
         self._name = name
 
     @surname.setter
     def surname(self, surname):
         """Set surname."""
 
-        session = Session()
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == self.username) \
-                           .first()
-        account.surname = surname
-        session.commit()
+        Writer.instance().update(TblAccount, {'surname': surname},
+                                 TblAccount.username == self.username)
         self._surname = surname
 
     @email.setter
     def email(self, email):
         """Set email."""
 
-        session = Session()
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == self.username) \
-                           .first()
-        account.email = email
-        session.commit()
+        Writer.instance().update(TblAccount, {'email': email},
+                                 TblAccount.username == self.username)
         self._email = email
 
     def __str__(self):
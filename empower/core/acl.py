@@ -15,23 +15,120 @@
 # specific language governing permissions and limitations
 # under the License.
 
-"""EmPOWER ACL."""
+"""EmPOWER ACL.
+
+ACL rules match either a single station (exact rules) or all the stations
+whose address matches the rule address on the bits set in the rule mask
+(e.g. all the stations of a vendor with an OUI mask ff:ff:ff:00:00:00).
+
+Rules are identified by their (address, mask) pair, so an exact rule and
+an OUI rule, or a /16 and a /24 rule, with the same address coexist.
+
+Addresses are matched as 48-bit integers. Exact rules are kept in a hash
+set, masked rules are grouped by mask in one hash set per mask. Matching
+an address then takes one lookup per distinct mask, and there are only a
+handful of distinct masks in practice (typically the OUI mask).
+"""
+
+from empower.datatypes.etheraddress import EtherAddress
+
+EXACT = 0xFFFFFFFFFFFF
+EXACT_MASK = EtherAddress(EXACT)
+
+
+def parse_rule(rule, mask=None):
+    """Parse an ACL rule.
+
+    Args:
+        rule: the rule address, optionally followed by /<prefix length>
+          (e.g. 00:11:22:00:00:00/24) or by /<mask>
+          (e.g. 00:11:22:00:00:00/ff:ff:ff:00:00:00)
+        mask: the rule mask, overrides the one specified in rule
+
+    Returns:
+        An (addr, mask) tuple of EtherAddress
+
+    Raises:
+        ValueError: if the rule is not valid, a rule matching every
+          station (zero-length prefix or empty mask) is not valid either
+    """
+
+    if isinstance(rule, str) and "/" in rule:
+        rule, rule_mask = rule.split("/", 1)
+        if mask is None or isinstance(mask, str) and not mask:
+            mask = rule_mask
+
+    if isinstance(mask, str) and not mask:
+        mask = None
+
+    if isinstance(mask, str) and mask.isdigit():
+        mask = int(mask)
+
+    if isinstance(mask, int) and not isinstance(mask, EtherAddress):
+        if mask < 1 or mask > 48:
+            raise ValueError("Invalid prefix length %u" % mask)
+        mask = EtherAddress(EXACT ^ (EXACT >> mask))
+
+    if mask is None:
+        return EtherAddress(rule), None
+
+    mask = EtherAddress(mask)
+
+    if mask.to_int() == 0:
+        raise ValueError("Invalid mask %s" % mask)
+
+    return EtherAddress(rule), mask
 
 
 class ACL(object):
-    """An user ACL."""
+    """An user ACL.
+
+    Attributes:
+        addr: the rule address, only the bits set in mask are kept
+          (EtherAddress)
+        label: the rule label (str)
+        mask: the rule mask, None for exact rules (EtherAddress)
+    """
+
+    def __init__(self, addr, label="", mask=None):
+
+        if mask is not None and mask.to_int() == EXACT:
+            mask = None
 
-    def __init__(self, addr, label=""):
+        if mask is not None:
+            addr = EtherAddress(addr.to_int() & mask.to_int())
 
         self.__addr = addr
         self.__label = label
+        self.__mask = mask
 
     def to_dict(self):
         """Return JSON-serializable representation of the object."""
 
         return {'addr': self.addr,
+                'mask': self.mask,
                 'label': self.label}
 
+    @property
+    def mask(self):
+        """Get mask."""
+
+        return self.__mask
+
+    @property
+    def key(self):
+        """Get the (addr, mask) pair identifying the rule."""
+
+        return (self.__addr, self.__mask)
+
+    def match(self, addr):
+        """Return True if addr matches the rule."""
+
+        if self.mask is None:
+            return addr.to_int() == self.addr.to_int()
+
+        return addr.to_int() & self.mask.to_int() == self.addr.to_int()
+
     @property
     def addr(self):
         """Get addr."""
@@ -45,15 +142,111 @@ class ACL(object):
         return self.__label
 
     def __str__(self):
-        return str(self.addr)
+
+        if self.mask is None:
+            return str(self.addr)
+
+        return "%s/%s" % (self.addr, self.mask)
 
     def __hash__(self):
-        return hash(self.addr)
+        return hash(self.key)
 
     def __eq__(self, other):
         if isinstance(other, ACL):
-            return self.addr == other.addr
+            return self.addr == other.addr and self.mask == other.mask
         return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
+
+
+class ACLTable(dict):
+    """A set of ACL rules indexed by rule key.
+
+    Rules are added and removed as in a dictionary mapping the rule key,
+    i.e. the (addr, mask) pair returned by ACL.key, to the rule (ACL).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.__exact = set()
+        self.__masked = {}
+        self.__masks = []
+
+    def __setitem__(self, key, acl):
+
+        if key in self:
+            del self[key]
+
+        super().__setitem__(key, acl)
+
+        if acl.mask is None:
+            self.__exact.add(acl.addr.to_int())
+            return
+
+        mask = acl.mask.to_int()
+
+        if mask not in self.__masked:
+            self.__masked[mask] = set()
+            self.__index_masks()
+
+        self.__masked[mask].add(acl.addr.to_int())
+
+    def __delitem__(self, key):
+
+        acl = self[key]
+
+        super().__delitem__(key)
+
+        if acl.mask is None:
+            self.__exact.discard(acl.addr.to_int())
+            return
+
+        mask = acl.mask.to_int()
+
+        self.__masked[mask].discard(acl.addr.to_int())
+
+        if not self.__masked[mask]:
+            del self.__masked[mask]
+            self.__index_masks()
+
+    def __index_masks(self):
+        """Sort the masks from the most to the least specific one."""
+
+        self.__masks = sorted(self.__masked,
+                              key=lambda x: (-bin(x).count("1"), x))
+
+    def match(self, addr):
+        """Return True if addr matches at least one rule.
+
+        Args:
+            addr: the station address (EtherAddress)
+
+        Returns:
+            True if a rule matches the address, False otherwise
+        """
+
+        value = addr.to_int()
+
+        if value in self.__exact:
+            return True
+
+        for mask in self.__masks:
+            if value & mask in self.__masked[mask]:
+                return True
+
+        return False
+
+    def lookup(self, addr):
+        """Return the most specific rule matching addr or None."""
+
+        value = addr.to_int()
+
+        if value in self.__exact:
+            return self[(EtherAddress(value), None)]
+
+        for mask in self.__masks:
+            if value & mask in self.__masked[mask]:
+                return self[(EtherAddress(value & mask), EtherAddress(mask))]
+
+        return None
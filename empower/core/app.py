@@ -18,11 +18,11 @@
 """EmPOWER base app class."""
 
 import uuid
-import tornado.ioloop
 import empower.logger
 
 from empower.core.lvnf import LVNF
 from empower.core.resourcepool import ResourcePool
+from empower.core.timerwheel import Timer
 
 from empower.main import RUNTIME
 
@@ -73,7 +73,7 @@ class EmpowerApp(object):
     def start(self):
         """Start control loop."""
 
-        self.worker = tornado.ioloop.PeriodicCallback(self.loop, self.every)
+        self.worker = Timer(self.loop, self.every, self.app_name)
         self.worker.start()
 
     def stop(self):
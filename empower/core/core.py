@@ -31,13 +31,17 @@ from sqlalchemy.exc import IntegrityError
 
 from empower.datatypes.etheraddress import EtherAddress
 from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.persistence.persistence import TblTenant
 from empower.persistence.persistence import TblAccount
 from empower.persistence.persistence import TblBelongs
 from empower.persistence.persistence import TblPendingTenant
 from empower.core.account import Account
 from empower.core.tenant import Tenant
+from empower.core.tenant import TenantRegistry
 from empower.core.acl import ACL
+from empower.core.acl import ACLTable
+from empower.core.acl import EXACT_MASK
 from empower.persistence.persistence import TblAllow
 from empower.persistence.persistence import TblDeny
 from empower.persistence.persistence import TblIMSI2MAC
@@ -94,17 +98,20 @@ class EmpowerRuntime(object):
 
         self.components = {}
         self.accounts = {}
-        self.tenants = {}
+        self.tenants = TenantRegistry()
         self.lvaps = {}
         self.ues = {}
         self.wtps = {}
         self.cpps = {}
         self.vbses = {}
         self.feeds = {}
-        self.allowed = {}
-        self.denied = {}
+        self.allowed = ACLTable()
+        self.denied = ACLTable()
         self.imsi2mac = {}
 
+        # MAC -> IMSI, keeps the MAC addresses unique in constant time
+        self.mac2imsi = {}
+
         LOG.info("Starting EmPOWER Runtime")
 
         # generate default users if database is empty
@@ -187,137 +194,127 @@ class EmpowerRuntime(object):
 
         for entry in Session().query(TblIMSI2MAC).all():
             self.imsi2mac[entry.imsi] = entry.addr
+            self.mac2imsi[entry.addr] = entry.imsi
 
     def add_imsi2mac(self, imsi, addr):
         """Add IMSI to MAC mapped value to table."""
 
-        imsi2mac = Session().query(TblIMSI2MAC) \
-                         .filter(TblIMSI2MAC.imsi == imsi) \
-                         .first()
-        if imsi2mac:
+        if imsi in self.imsi2mac:
             raise ValueError(imsi)
 
-        try:
-
-            session = Session()
-
-            session.add(TblIMSI2MAC(imsi=imsi, addr=addr))
-            session.commit()
-
-        except IntegrityError:
-            session.rollback()
+        if addr in self.mac2imsi:
             raise ValueError("MAC address must be unique %s", addr)
 
         self.imsi2mac[imsi] = addr
+        self.mac2imsi[addr] = imsi
+
+        Writer.instance().add(TblIMSI2MAC(imsi=imsi, addr=addr))
 
     def remove_imsi2mac(self, imsi):
         """Remove IMSI to MAC mapped value from table."""
 
-        imsi2mac = Session().query(TblIMSI2MAC) \
-                         .filter(TblIMSI2MAC.imsi == imsi) \
-                         .first()
-        if not imsi2mac:
+        if imsi not in self.imsi2mac:
             raise KeyError(imsi)
 
-        session = Session()
-        session.delete(imsi2mac)
-        session.commit()
-
+        del self.mac2imsi[self.imsi2mac[imsi]]
         del self.imsi2mac[imsi]
 
+        Writer.instance().delete(TblIMSI2MAC, TblIMSI2MAC.imsi == imsi)
+
     def __load_acl(self):
         """ Load ACL list. """
 
         for allow in Session().query(TblAllow).all():
 
-            if allow.addr in self.allowed:
-                raise ValueError(allow.addr_str)
+            acl = ACL(allow.addr, allow.label, allow.mask)
+
+            if acl.key in self.allowed:
+                raise ValueError(str(acl))
 
-            acl = ACL(allow.addr, allow.label)
-            self.allowed[allow.addr] = acl
+            self.allowed[acl.key] = acl
 
         for deny in Session().query(TblDeny).all():
-            if deny.addr in self.denied:
-                raise ValueError(deny.addr_str)
 
-            acl = ACL(deny.addr, deny.label)
-            self.denied[deny.addr] = acl
+            acl = ACL(deny.addr, deny.label, deny.mask)
 
-    def add_allowed(self, sta_addr, label):
-        """ Add entry to ACL. """
+            if acl.key in self.denied:
+                raise ValueError(str(acl))
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if allow:
-            raise ValueError(sta_addr)
+            self.denied[acl.key] = acl
 
-        session = Session()
-        session.add(TblAllow(addr=sta_addr, label=label))
-        session.commit()
+    def add_allowed(self, sta_addr, label, mask=None):
+        """ Add entry to ACL.
+
+        If mask is specified all the stations whose address matches sta_addr
+        on the bits set in mask are allowed.
+        """
 
-        acl = ACL(sta_addr, label)
-        self.allowed[sta_addr] = acl
+        acl = ACL(sta_addr, label, mask)
+
+        if acl.key in self.allowed:
+            raise ValueError(str(acl))
+
+        self.allowed[acl.key] = acl
+
+        Writer.instance().add(TblAllow(addr=acl.addr, label=label,
+                                       mask=acl.mask or EXACT_MASK))
 
         return acl
 
-    def remove_allowed(self, sta_addr):
+    def remove_allowed(self, sta_addr, mask=None):
         """ Remove entry from ACL. """
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if not allow:
-            raise KeyError(sta_addr)
+        acl = ACL(sta_addr, mask=mask)
 
-        session = Session()
-        session.delete(allow)
-        session.commit()
+        if acl.key not in self.allowed:
+            raise KeyError(str(acl))
 
-        del self.allowed[sta_addr]
+        del self.allowed[acl.key]
 
-    def add_denied(self, sta_addr, label):
-        """ Add entry to ACL. """
+        Writer.instance().delete(TblAllow, TblAllow.addr == acl.addr,
+                                 TblAllow.mask == (acl.mask or EXACT_MASK))
 
-        deny = Session().query(TblDeny) \
-                        .filter(TblDeny.addr == sta_addr) \
-                        .first()
-        if deny:
-            raise ValueError(sta_addr)
+    def add_denied(self, sta_addr, label, mask=None):
+        """ Add entry to ACL.
 
-        session = Session()
-        session.add(TblDeny(addr=sta_addr, label=label))
-        session.commit()
+        If mask is specified all the stations whose address matches sta_addr
+        on the bits set in mask are denied.
+        """
+
+        acl = ACL(sta_addr, label, mask)
+
+        if acl.key in self.denied:
+            raise ValueError(str(acl))
+
+        self.denied[acl.key] = acl
 
-        acl = ACL(sta_addr, label)
-        self.denied[sta_addr] = acl
+        Writer.instance().add(TblDeny(addr=acl.addr, label=label,
+                                      mask=acl.mask or EXACT_MASK))
 
         return acl
 
-    def remove_denied(self, sta_addr):
+    def remove_denied(self, sta_addr, mask=None):
         """ Remove entry from ACL. """
 
-        deny = Session().query(TblDeny) \
-                        .filter(TblDeny.addr == sta_addr) \
-                        .first()
-        if not deny:
-            raise KeyError(sta_addr)
+        acl = ACL(sta_addr, mask=mask)
 
-        session = Session()
-        session.delete(deny)
-        session.commit()
+        if acl.key not in self.denied:
+            raise KeyError(str(acl))
 
-        del self.denied[sta_addr]
+        del self.denied[acl.key]
+
+        Writer.instance().delete(TblDeny, TblDeny.addr == acl.addr,
+                                 TblDeny.mask == (acl.mask or EXACT_MASK))
 
     def is_allowed(self, src):
         """ Check if station is allowed. """
 
-        return (self.allowed and src in self.allowed) or not self.allowed
+        return not self.allowed or self.allowed.match(src)
 
     def is_denied(self, src):
         """ Check if station is denied. """
 
-        return self.denied and src in self.denied
+        return bool(self.denied) and self.denied.match(src)
 
     def create_account(self, username, password, role, name, surname, email):
         """Create a new account."""
@@ -326,7 +323,6 @@ class EmpowerRuntime(object):
             LOG.error("'%s' already registered", username)
             raise ValueError("%s already registered" % username)
 
-        session = Session()
         account = TblAccount(username=username,
                              password=password,
                              role=role,
@@ -334,8 +330,7 @@ class EmpowerRuntime(object):
                              surname=surname,
                              email=email)
 
-        session.add(account)
-        session.commit()
+        Writer.instance().add(account)
 
         self.accounts[account.username] = Account(account.username,
                                                   account.password,
@@ -350,17 +345,14 @@ class EmpowerRuntime(object):
         if username == 'root':
             raise ValueError("Cannot removed root account")
 
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == str(username)) \
-                           .first()
-        if not account:
+        if username not in self.accounts:
             raise KeyError(username)
 
-        session = Session()
-        session.delete(account)
-        session.commit()
-
         del self.accounts[username]
+
+        Writer.instance().delete(TblAccount,
+                                 TblAccount.username == str(username))
+
         to_be_deleted = [x.tenant_id for x in self.tenants.values()
                          if x.owner == username]
 
@@ -474,29 +466,23 @@ class EmpowerRuntime(object):
         if tenant_id in self.tenants:
             raise ValueError("Tenant %s exists", tenant_id)
 
-        try:
-
-            session = Session()
-
-            if tenant_id:
-                request = TblTenant(tenant_id=tenant_id,
-                                    tenant_name=tenant_name,
-                                    owner=owner,
-                                    desc=desc,
-                                    bssid_type=bssid_type,
-                                    plmn_id=plmn_id)
-            else:
-                request = TblTenant(owner=owner,
-                                    tenant_name=tenant_name,
-                                    desc=desc,
-                                    bssid_type=bssid_type,
-                                    plmn_id=plmn_id)
-
-            session.add(request)
-            session.commit()
+        if tenant_id:
+            request = TblTenant(tenant_id=tenant_id,
+                                owner=owner,
+                                tenant_name=tenant_name,
+                                desc=desc,
+                                bssid_type=bssid_type,
+                                plmn_id=plmn_id)
+        else:
+            request = TblTenant(owner=owner,
+                                tenant_name=tenant_name,
+                                desc=desc,
+                                bssid_type=bssid_type,
+                                plmn_id=plmn_id)
 
+        try:
+            Writer.instance().execute(lambda session: session.add(request))
         except IntegrityError:
-            session.rollback()
             raise ValueError("Tenant name %s exists", tenant_name)
 
         self.tenants[request.tenant_id] = \
@@ -539,29 +525,23 @@ class EmpowerRuntime(object):
         if self.load_pending_tenant(tenant_id):
             raise ValueError("Tenant %s exists", tenant_id)
 
-        try:
-
-            session = Session()
-
-            if tenant_id:
-                request = TblPendingTenant(tenant_id=tenant_id,
-                                           owner=owner,
-                                           tenant_name=tenant_name,
-                                           desc=desc,
-                                           bssid_type=bssid_type,
-                                           plmn_id=plmn_id)
-            else:
-                request = TblPendingTenant(owner=owner,
-                                           tenant_name=tenant_name,
-                                           desc=desc,
-                                           bssid_type=bssid_type,
-                                           plmn_id=plmn_id)
-
-            session.add(request)
-            session.commit()
+        if tenant_id:
+            request = TblPendingTenant(tenant_id=tenant_id,
+                                       owner=owner,
+                                       tenant_name=tenant_name,
+                                       desc=desc,
+                                       bssid_type=bssid_type,
+                                       plmn_id=plmn_id)
+        else:
+            request = TblPendingTenant(owner=owner,
+                                       tenant_name=tenant_name,
+                                       desc=desc,
+                                       bssid_type=bssid_type,
+                                       plmn_id=plmn_id)
 
+        try:
+            Writer.instance().execute(lambda session: session.add(request))
         except IntegrityError:
-            session.rollback()
             raise ValueError("Tenant name %s exists", tenant_name)
 
         return request.tenant_id
@@ -570,44 +550,28 @@ class EmpowerRuntime(object):
     def reject_tenant(cls, tenant_id):
         """Reject previously requested Tenant."""
 
-        pending = Session().query(TblPendingTenant) \
-            .filter(TblPendingTenant.tenant_id == tenant_id) \
-            .first()
+        deleted = Writer.instance().execute(
+            lambda session: session.query(TblPendingTenant)
+            .filter(TblPendingTenant.tenant_id == tenant_id)
+            .delete(synchronize_session=False))
 
-        if not pending:
+        if not deleted:
             raise KeyError(tenant_id)
 
-        session = Session()
-        session.delete(pending)
-        session.commit()
-
     def remove_tenant(self, tenant_id):
         """Delete existing Tenant."""
 
         if tenant_id not in self.tenants:
             raise KeyError(tenant_id)
 
-        tenant = self.tenants[tenant_id]
-
         # remove pnfdev in this tenant
-        devs = Session().query(TblBelongs) \
-                        .filter(TblBelongs.tenant_id == tenant_id)
-
-        for dev in devs:
-            session = Session()
-            session.delete(dev)
-            session.commit()
+        Writer.instance().delete(TblBelongs,
+                                 TblBelongs.tenant_id == tenant_id)
 
         # remove tenant
         del self.tenants[tenant_id]
 
-        tenant = Session().query(TblTenant) \
-                          .filter(TblTenant.tenant_id == tenant_id) \
-                          .first()
-
-        session = Session()
-        session.delete(tenant)
-        session.commit()
+        Writer.instance().delete(TblTenant, TblTenant.tenant_id == tenant_id)
 
         # remove running modules
         for component in self.components.values():
@@ -627,20 +591,12 @@ class EmpowerRuntime(object):
     def load_tenant(self, tenant_name):
         """Load tenant from network name."""
 
-        for tenant in self.tenants.values():
-            if tenant.tenant_name == tenant_name:
-                return tenant
-
-        return None
+        return self.tenants.by_name(tenant_name)
 
     def load_tenant_by_plmn_id(self, plmn_id):
-        """Load tenant from network name."""
-
-        for tenant in self.tenants.values():
-            if tenant.plmn_id == plmn_id:
-                return tenant
+        """Load tenant from PLMN id."""
 
-        return None
+        return self.tenants.by_plmn_id(plmn_id)
 
     def remove_lvap(self, lvap_addr):
         """Remove LVAP from the network"""
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER message dispatch statistics.
+
+For every southbound protocol (LVAPP, VBSP, LVNFP) and every connection
+the number of messages received, their size and the time spent handling
+them are recorded for each message type.
+
+Handling times are kept in log-linear histograms (as in HdrHistogram): each
+power of two is split in SUB_BUCKETS linear buckets so that any value is
+recorded with a relative error below 1/SUB_BUCKETS, using a fixed and small
+number of buckets. Recording a value costs a few integer operations.
+"""
+
+import time
+import weakref
+
+# Linear buckets per power of two (must be a power of two)
+SUB_BUCKETS = 16
+SUB_BITS = SUB_BUCKETS.bit_length() - 1
+
+# Largest recorded value in us, larger values are clamped
+MAX_VALUE = (1 << 27) - 1
+
+NB_BUCKETS = (MAX_VALUE.bit_length() - SUB_BITS + 1) * SUB_BUCKETS
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def bucket_index(value):
+    """Return the bucket of a value (int)."""
+
+    if value < SUB_BUCKETS:
+        return value
+
+    shift = value.bit_length() - SUB_BITS - 1
+
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_value(index):
+    """Return the highest value falling in a bucket."""
+
+    if index < SUB_BUCKETS:
+        return index
+
+    shift = index // SUB_BUCKETS - 1
+    base = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+    return base + (1 << shift) - 1
+
+
+class Histogram(object):
+    """A log-linear histogram of integer values.
+
+    Attributes:
+        count: number of recorded values (int)
+        total: sum of the recorded values (int)
+        max: largest recorded value (int)
+        buckets: the bucket counters (list)
+    """
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * NB_BUCKETS
+
+    def record(self, value):
+        """Record a value."""
+
+        if value > MAX_VALUE:
+            value = MAX_VALUE
+
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+        self.buckets[bucket_index(value)] += 1
+
+    def merge(self, other):
+        """Add the values recorded by other."""
+
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [x + y for x, y in zip(self.buckets, other.buckets)]
+
+    def percentiles(self, percentiles):
+        """Return the values at the given percentiles (list)."""
+
+        out = []
+
+        if not self.count:
+            return [0] * len(percentiles)
+
+        targets = [max(1, self.count * x / 100.0) for x in percentiles]
+        seen = 0
+        index = 0
+
+        for bucket, counter in enumerate(self.buckets):
+
+            seen += counter
+
+            while index < len(targets) and seen >= targets[index]:
+                out.append(min(bucket_value(bucket), self.max))
+                index += 1
+
+            if index == len(targets):
+                break
+
+        return out
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        out = {'count': self.count,
+               'mean': self.total / self.count if self.count else 0.0,
+               'max': self.max}
+
+        for percentile, value in zip(PERCENTILES,
+                                     self.percentiles(PERCENTILES)):
+            out['p%s' % percentile] = value
+
+        return out
+
+
+class TypeStats(object):
+    """Statistics of a message type.
+
+    Attributes:
+        count: number of messages (int)
+        bytes: total size of the messages (int)
+        latency: handling time histogram in us (Histogram)
+    """
+
+    __slots__ = ('count', 'bytes', 'latency')
+
+    def __init__(self):
+
+        self.count = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'count': self.count,
+                'bytes': self.bytes,
+                'latency_us': self.latency.to_dict()}
+
+
+class DispatchStats(object):
+    """Per message type dispatch statistics.
+
+    The statistics of a connection are also accounted in the statistics of
+    its protocol, which keep track of the open connections.
+
+    Attributes:
+        name: the protocol or connection name (str)
+        types: the statistics of each message type (dict)
+        parent: the protocol statistics (DispatchStats)
+    """
+
+    __protocols = {}
+
+    def __init__(self, name, parent=None):
+
+        self.name = name
+        self.types = {}
+        self.parent = parent
+        self.connections = weakref.WeakSet()
+
+        if parent:
+            parent.connections.add(self)
+
+    @classmethod
+    def protocol(cls, name):
+        """Return the statistics of a protocol."""
+
+        if name not in cls.__protocols:
+            cls.__protocols[name] = DispatchStats(name)
+
+        return cls.__protocols[name]
+
+    @classmethod
+    def protocols(cls):
+        """Return the statistics of all the protocols."""
+
+        return cls.__protocols
+
+    @classmethod
+    def connection(cls, protocol, name):
+        """Return new statistics for a connection of a protocol."""
+
+        return DispatchStats(name, cls.protocol(protocol))
+
+    @classmethod
+    def now(cls):
+        """Return the current time, to be passed to record()."""
+
+        return time.perf_counter()
+
+    def record(self, msg_type, nbytes, started):
+        """Record the handling of a message.
+
+        Args:
+            msg_type: the message type
+            nbytes: the message size in bytes
+            started: the time (see now()) when handling started
+
+        Returns:
+            None
+        """
+
+        elapsed = int((time.perf_counter() - started) * 1000000)
+
+        self.record_elapsed(msg_type, nbytes, elapsed)
+
+        if self.parent:
+            self.parent.record_elapsed(msg_type, nbytes, elapsed)
+
+    def record_elapsed(self, msg_type, nbytes, elapsed):
+        """Record the handling of a message given the elapsed time in us."""
+
+        stats = self.types.get(msg_type)
+
+        if stats is None:
+            stats = self.types[msg_type] = TypeStats()
+
+        stats.count += 1
+        stats.bytes += nbytes
+        stats.latency.record(elapsed)
+
+    def reset(self):
+        """Clear the statistics, including the connections ones."""
+
+        self.types = {}
+
+        for connection in self.connections:
+            connection.reset()
+
+    def to_dict(self, connections=False):
+        """Return a JSON-serializable dictionary.
+
+        Args:
+            connections: include the statistics of each connection
+
+        Returns:
+            A dictionary
+        """
+
+        out = {'name': self.name,
+               'count': sum(x.count for x in self.types.values()),
+               'bytes': sum(x.bytes for x in self.types.values()),
+               'types': {str(k): v.to_dict() for k, v in self.types.items()}}
+
+        if self.parent is None:
+            out['nb_connections'] = len(self.connections)
+
+        if connections:
+            out['connections'] = [x.to_dict() for x in self.connections]
+
+        return out
@@ -20,7 +20,7 @@
 from datetime import datetime, timedelta
 from tornado.httpclient import HTTPClient
 
-from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.persistence.persistence import TblFeed
 
 FEED_STATUS_ON = "on"
@@ -52,16 +52,10 @@ class Feed(object):
 
         self.__pnfdev = pnfdev
 
-        session = Session()
-        feed = Session().query(TblFeed) \
-                        .filter(TblFeed.feed_id == self.feed_id) \
-                        .first()
-        if self.pnfdev:
-            feed.addr = self.pnfdev.addr
-        else:
-            feed.addr = None
+        addr = self.pnfdev.addr if self.pnfdev else None
 
-        session.commit()
+        Writer.instance().update(TblFeed, {'addr': addr},
+                                 TblFeed.feed_id == self.feed_id)
 
     @property
     def is_on(self):
@@ -90,22 +84,35 @@ class Feed(object):
 
         HTTPClient().fetch(url)
 
-    def to_dict(self):
-        """Return a JSON-serializable dictionary representing the Feed."""
+    @property
+    def status(self):
+        """Return 'dead' if no update has been received in the last 30s,
+        'live' otherwise."""
 
         last = datetime.strptime(self.updated, "%Y-%m-%dT%H:%M:%S.%fZ")
         now = datetime.now()
         delta = timedelta(seconds=30)
 
         if now - last > delta:
-            status = 'dead'
-        else:
-            status = 'live'
+            return 'dead'
+
+        return 'live'
+
+    @property
+    def version(self):
+        """Return the change counter (the last update and the status)."""
+
+        pnfdev = self.pnfdev.addr if self.pnfdev else None
+
+        return (self.updated, self.status, self.mngt, pnfdev)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary representing the Feed."""
 
         out = {'id': self.feed_id,
                'created': self.created,
                'updated': self.updated,
-               'status': status,
+               'status': self.status,
                'datastreams': self.datastreams.values(),
                'feed': '/api/v1/feeds/%u.json' % (self.feed_id),
                'mngt': self.mngt}
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER bin counters histogram engine.
+
+The bin counter modules receive from the WTPs arrays of [size, count]
+samples, where count is the number of size-long frames TX/RX. Samples are
+parsed straight into NumPy arrays and then classified into the bins
+requested by the user.
+"""
+
+import numpy
+
+from construct.core import Construct
+from construct.core import _read_stream
+from construct.core import _write_stream
+
+from empower.datatypes.etheraddress import EtherAddress
+
+
+# [size, count] sample
+SAMPLE = numpy.dtype([('bytes', '>u2'), ('count', '>u4')])
+
+# [lvap, size, count] sample
+LVAP_SAMPLE = numpy.dtype([('lvap', 'S6'), ('bytes', '>u2'),
+                           ('count', '>u4')])
+
+
+class SampleArray(Construct):
+    """Counted array of fixed size samples parsed into a NumPy array.
+
+    This is a replacement for Array(countfunc, Sequence(...)) where each
+    element of the sequence is a fixed size integer or byte string. The
+    array is parsed with a single numpy.frombuffer call.
+
+    Attributes:
+        countfunc: function returning the number of elements from the context
+        dtype: the NumPy dtype of each element (big endian)
+    """
+
+    def __init__(self, name, countfunc, dtype):
+        super().__init__(name)
+        self.countfunc = countfunc
+        self.dtype = numpy.dtype(dtype)
+
+    def _parse(self, stream, context):
+        length = self._sizeof(context)
+        data = _read_stream(stream, length)
+        return numpy.frombuffer(data, self.dtype)
+
+    def _build(self, obj, stream, context):
+        data = self.build_buffer(obj, context)
+        _write_stream(stream, len(data), data)
+
+    def _sizeof(self, context):
+        return self.countfunc(context) * self.dtype.itemsize
+
+    def parse_buffer(self, buf, offset, ctx):
+        """Parse the array starting at offset, return (array, offset)."""
+
+        length = self._sizeof(ctx)
+
+        if length < 0 or len(buf) - offset < length:
+            raise ValueError("expected %d bytes, found %u" %
+                             (length, len(buf) - offset))
+
+        out = numpy.frombuffer(buf, self.dtype, length // self.dtype.itemsize,
+                               offset)
+
+        return out, offset + length
+
+    def build_buffer(self, obj, ctx):
+        """Build the array from a NumPy array or a list of sequences."""
+
+        if not isinstance(obj, numpy.ndarray):
+            obj = numpy.array([tuple(x) for x in obj], dtype=self.dtype)
+
+        count = self.countfunc(ctx)
+
+        if len(obj) != count:
+            raise ValueError("expected %d, found %d" % (count, len(obj)))
+
+        return obj.astype(self.dtype, copy=False).tobytes()
+
+
+class Histogram(object):
+    """Classify [size, count] samples into size bins.
+
+    A sample goes into the first bin whose value is greater than or equal to
+    the sample size. Samples larger than the last bin are discarded. Bins
+    are resolved with a binary search over the bin edges and then counted
+    with a weighted bincount.
+
+    Attributes:
+        bins: the bins (list of monotonically increasing integers)
+    """
+
+    def __init__(self, bins):
+
+        self.bins = list(bins)
+        self.edges = numpy.array(self.bins, dtype=numpy.int64)
+
+    def __index(self, samples):
+        """Return sizes, counts and bin indexes of the samples."""
+
+        sizes = samples['bytes'].astype(numpy.int64)
+        counts = samples['count'].astype(numpy.int64)
+        indexes = numpy.searchsorted(self.edges, sizes, side='left')
+
+        return sizes, counts, indexes
+
+    def fill(self, samples):
+        """Classify the samples.
+
+        Args:
+            samples: a NumPy array with (at least) the 'bytes' and 'count'
+                fields
+
+        Returns:
+            A (bytes, packets) tuple of lists with one entry per bin
+        """
+
+        nb_bins = len(self.bins)
+        sizes, counts, indexes = self.__index(samples)
+
+        out_bytes = numpy.bincount(indexes, weights=sizes * counts,
+                                   minlength=nb_bins + 1)
+        out_packets = numpy.bincount(indexes, weights=counts,
+                                     minlength=nb_bins + 1)
+
+        return (out_bytes[:nb_bins].astype(numpy.int64).tolist(),
+                out_packets[:nb_bins].astype(numpy.int64).tolist())
+
+    def fill_by_lvap(self, samples):
+        """Classify the samples grouping them by LVAP.
+
+        Args:
+            samples: a NumPy array with the 'lvap', 'bytes' and 'count' fields
+
+        Returns:
+            A (bytes, packets) tuple of dicts mapping every LVAP address
+            (EtherAddress) found in the samples to the list of bins
+        """
+
+        if not len(samples):
+            return {}, {}
+
+        nb_bins = len(self.bins)
+        sizes, counts, indexes = self.__index(samples)
+
+        lvaps, groups = numpy.unique(samples['lvap'], return_inverse=True)
+        indexes = groups.reshape(-1) * (nb_bins + 1) + indexes
+        shape = (len(lvaps), nb_bins + 1)
+
+        out_bytes = numpy.bincount(indexes, weights=sizes * counts,
+                                   minlength=shape[0] * shape[1])
+        out_bytes = out_bytes.reshape(shape)[:, :nb_bins].astype(numpy.int64)
+
+        out_packets = numpy.bincount(indexes, weights=counts,
+                                     minlength=shape[0] * shape[1])
+        out_packets = \
+            out_packets.reshape(shape)[:, :nb_bins].astype(numpy.int64)
+
+        # NumPy strips trailing null bytes from fixed size byte strings
+        addrs = [EtherAddress(x.ljust(6, b'\x00')) for x in lvaps.tolist()]
+
+        return (dict(zip(addrs, out_bytes.tolist())),
+                dict(zip(addrs, out_packets.tolist())))
+
+    @classmethod
+    def rates(cls, delta, last, current):
+        """Return the per-second rate of each bin."""
+
+        return [(cur - old) / delta for old, cur in zip(last, current)]
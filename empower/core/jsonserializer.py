@@ -15,11 +15,28 @@
 # specific language governing permissions and limitations
 # under the License.
 
-"""EmPOWER Runtime JSON Serializer."""
+"""EmPOWER Runtime JSON Serializer.
 
+Replies are compact by default. Objects deriving from Versioned keep a
+change counter and their JSON representation is cached until the counter
+(or the counter of any Versioned object nested in the representation)
+changes. Collections can be encoded in chunks in order to be streamed.
+
+Change counters are also used to compute the ETag of a reply without
+encoding it.
+"""
+
+import re
+import os
 import json
 import uuid
 import types
+import inspect
+import hashlib
+import itertools
+
+from collections.abc import KeysView
+from collections.abc import ValuesView
 
 import empower.datatypes.etheraddress
 import empower.datatypes.ssid
@@ -57,3 +74,340 @@ class EmpowerEncoder(IterEncoder):
             return obj.to_dict()
 
         return super().default(obj)
+
+
+# Approximate size of the chunks produced by iterdumps (characters)
+CHUNK_SIZE = 65536
+
+# Collections whose items are projected and encoded one at a time
+COLLECTIONS = (list, tuple, set, frozenset, KeysView, ValuesView)
+
+# Whether the to_dict method of a class accepts the fields argument
+PROJECTIONS = {}
+
+# Change counters are drawn from a global sequence, so that the same value
+# is never used twice, not even by different objects
+STAMPS = itertools.count(1)
+
+
+class Versioned(object):
+    """Keep a change counter bumped at every attribute assignment.
+
+    The counter is used to tell when the cached JSON representation of the
+    object is stale. Objects modifying in place the containers returned by
+    to_dict must call touch() explicitly (or use a VersionedDict).
+    """
+
+    _version = 0
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_version', next(STAMPS))
+
+    def touch(self):
+        """Mark the object as changed."""
+
+        object.__setattr__(self, '_version', next(STAMPS))
+
+    @property
+    def version(self):
+        """Return the change counter."""
+
+        return self._version
+
+    def version_deps(self):
+        """Return the objects whose representation is embedded in the one
+        of this object.
+
+        Dependencies must be either Versioned objects or objects with a
+        version attribute. Objects without to_dict can be omitted."""
+
+        return []
+
+
+class VersionedDict(dict):
+    """Dictionary marking its owner as changed when modified."""
+
+    def __init__(self, owner, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner = owner
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.owner.touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.owner.touch()
+
+    def pop(self, *args):
+        out = super().pop(*args)
+        self.owner.touch()
+        return out
+
+    def popitem(self):
+        out = super().popitem()
+        self.owner.touch()
+        return out
+
+    def setdefault(self, key, default=None):
+        out = super().setdefault(key, default)
+        self.owner.touch()
+        return out
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.owner.touch()
+
+    def clear(self):
+        super().clear()
+        self.owner.touch()
+
+
+class FragmentEncoder(EmpowerEncoder):
+    """Compact encoder serving Versioned objects from a fragment cache.
+
+    Versioned objects are replaced by a placeholder string which is then
+    substituted with the (possibly cached) fragment. A fragment is cached
+    only if all the objects with a to_dict method found in it are
+    Versioned, the fragment is valid as long as the versions of those
+    objects, and of the deps returned by version_deps, do not change.
+    """
+
+    def __init__(self):
+
+        super().__init__(separators=(',', ':'))
+
+        self.nonce = os.urandom(8).hex()
+        self.marker = re.compile(r'"\\u0000%s(\d+)"' % self.nonce)
+
+        self.fragments = []
+        self.deps = None
+        self.cacheable = True
+
+    def default(self, obj):
+
+        if isinstance(obj, Versioned):
+            self.fragments.append(self.fragment(obj))
+            return '\x00%s%u' % (self.nonce, len(self.fragments) - 1)
+
+        if hasattr(obj, 'to_dict'):
+            self.cacheable = False
+
+        return super().default(obj)
+
+    def encode(self, o):
+
+        fragments = self.fragments
+        self.fragments = []
+
+        try:
+            out = super().encode(o)
+            if self.fragments:
+                out = self.marker.sub(lambda m: self.fragments[int(m[1])],
+                                      out)
+        finally:
+            self.fragments = fragments
+
+        return out
+
+    def fragment(self, obj):
+        """Return the JSON representation of a Versioned object."""
+
+        cached = obj.__dict__.get('_json_fragment')
+
+        if cached and all(dep.version == version
+                          for dep, version in cached[1]):
+            if self.deps is not None:
+                self.deps.extend(cached[1])
+            return cached[0]
+
+        deps, cacheable = self.deps, self.cacheable
+        self.deps, self.cacheable = [], True
+
+        try:
+            self.track(obj, set())
+            out = self.encode(obj.to_dict())
+            if self.cacheable:
+                object.__setattr__(obj, '_json_fragment', (out, self.deps))
+        finally:
+            if deps is not None:
+                deps.extend(self.deps)
+            self.deps, self.cacheable = deps, cacheable and self.cacheable
+
+        return out
+
+    def track(self, obj, seen):
+        """Add obj and its deps to the deps of the current fragment.
+
+        The deps listed by version_deps are tracked even if their
+        representation is inlined by to_dict instead of being encoded
+        through default()."""
+
+        if obj is None or id(obj) in seen:
+            return
+
+        seen.add(id(obj))
+
+        if not hasattr(obj, 'version'):
+            self.cacheable = False
+            return
+
+        self.deps.append((obj, obj.version))
+
+        if isinstance(obj, Versioned):
+            for dep in obj.version_deps():
+                self.track(dep, seen)
+
+
+def project(value, fields):
+    """Return the representation of value restricted to fields.
+
+    The fields are passed down to to_dict when supported, so that the
+    entries not requested are not even computed.
+
+    Args:
+        value: the object to be projected
+        fields: the entries to be kept (all of them if None)
+
+    Returns:
+        A dictionary if value has a to_dict method, value otherwise
+    """
+
+    if fields is None or not hasattr(value, 'to_dict'):
+        return value
+
+    cls = type(value)
+
+    if cls not in PROJECTIONS:
+        params = inspect.signature(value.to_dict).parameters
+        PROJECTIONS[cls] = 'fields' in params
+
+    if PROJECTIONS[cls]:
+        out = value.to_dict(fields=fields)
+    else:
+        out = value.to_dict()
+
+    return {k: v for k, v in out.items() if k in fields}
+
+
+def _stamps(value, seen, out):
+    """Append to out the change counters of value and of its deps."""
+
+    if value is None:
+        return
+
+    if isinstance(value, COLLECTIONS):
+        for item in value:
+            _stamps(item, seen, out)
+        return
+
+    if id(value) in seen:
+        return
+
+    seen.add(id(value))
+
+    if isinstance(value, Versioned):
+        out.append(value.version)
+        for dep in value.version_deps():
+            _stamps(dep, seen, out)
+        return
+
+    if not hasattr(value, 'version'):
+        raise TypeError("%s has no change counter" % type(value).__name__)
+
+    out.append(value.version)
+
+
+def etag(value, *args):
+    """Return an ETag for value computed from change counters.
+
+    Args:
+        value: a Versioned object or a collection of Versioned objects
+        args: other parameters affecting the representation (e.g. fields)
+
+    Returns:
+        A string or None if value (or one of its deps) has no change
+        counter
+    """
+
+    out = []
+
+    try:
+        _stamps(value, set(), out)
+    except TypeError:
+        return None
+
+    out.append(args)
+
+    return '"%s"' % hashlib.sha1(repr(out).encode()).hexdigest()
+
+
+def dumps(value, pretty=False, fields=None):
+    """Return the JSON representation of value.
+
+    Args:
+        value: the object to be encoded
+        pretty: if True the output is indented and keys are sorted, the
+          fragment cache is not used
+        fields: if not None the representation of value (or of the items
+          of value if it is a collection) is restricted to these entries
+
+    Returns:
+        A string
+    """
+
+    if isinstance(value, COLLECTIONS):
+        value = [project(item, fields) for item in value]
+    else:
+        value = project(value, fields)
+
+    if pretty:
+        return json.dumps(value, sort_keys=True, indent=4, cls=EmpowerEncoder)
+
+    return FragmentEncoder().encode(value)
+
+
+def iterdumps(value, chunk_size=CHUNK_SIZE, fields=None):
+    """Return the compact JSON representation of value in chunks.
+
+    Collections are encoded one item at a time, all the other objects are
+    returned in a single chunk.
+
+    Args:
+        value: the object to be encoded
+        chunk_size: the approximate size of each chunk (characters)
+        fields: if not None the representation of value (or of the items
+          of value if it is a collection) is restricted to these entries
+
+    Returns:
+        A generator of strings
+    """
+
+    encoder = FragmentEncoder()
+
+    if not isinstance(value, COLLECTIONS):
+        yield encoder.encode(project(value, fields))
+        return
+
+    chunk = []
+    size = 0
+    sep = '['
+
+    for item in value:
+
+        out = encoder.encode(project(item, fields))
+
+        chunk.append(sep)
+        chunk.append(out)
+        sep = ','
+        size += len(out) + 1
+
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+
+    chunk.append('[]' if sep == '[' else ']')
+
+    yield ''.join(chunk)
@@ -18,6 +18,8 @@
 """EmPOWER Light Virtual Access Point (LVAP) class."""
 
 from empower.core.resourcepool import ResourceBlock
+from empower.core.jsonserializer import Versioned
+from empower.core.jsonserializer import VersionedDict
 from empower.core.radioport import RadioPort
 from empower.core.radioport import DownlinkPort
 from empower.core.radioport import UplinkPort
@@ -32,7 +34,7 @@ import empower.logger
 LOG = empower.logger.get_logger()
 
 
-class LVAP(object):
+class LVAP(Versioned):
     """ The EmPOWER Light Virtual Access Point
 
     One LVAP is created for every station probing the network (unless the MAC
@@ -123,6 +125,23 @@ class LVAP(object):
         uplink: the uplink blocks (as a dictionary, cannot be set)
     """
 
+    TO_DICT = ['addr',
+               'net_bssid',
+               'lvap_bssid',
+               'ports',
+               'wtp',
+               'blocks',
+               'supported_band',
+               'ssids',
+               'assoc_id',
+               'ssid',
+               'pending',
+               'encap',
+               'tx_samples',
+               'rx_samples',
+               'authentication_state',
+               'association_state']
+
     def __init__(self, addr, net_bssid_addr, lvap_bssid_addr):
 
         # read only params
@@ -162,9 +181,9 @@ class LVAP(object):
         self.rx_samples = []
 
         # virtual ports (VNFs)
-        self.ports = {}
+        self.ports = VersionedDict(self)
 
-        # downlink intent uuid
+        # downlink intent handle
         self.poa_uuid = None
 
         # supported resource blocks
@@ -180,6 +199,11 @@ class LVAP(object):
         # pending ids
         self.pending = []
 
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        return [self.wtp] + self.blocks
+
     @property
     def module_id(self):
         """Return new sequence id."""
@@ -483,32 +507,36 @@ class LVAP(object):
         for block in list(self._uplink.keys()):
             del self._uplink[block]
 
+        self.touch()
+
         # remove intent
         if self.poa_uuid:
             intent_server = RUNTIME.components[IntentServer.__module__]
             intent_server.remove_poa(self.poa_uuid)
 
-    def to_dict(self):
-        """ Return a JSON-serializable dictionary representing the LVAP """
-
-        return {'addr': self.addr,
-                'net_bssid': self.net_bssid,
-                'lvap_bssid': self.lvap_bssid,
-                'ports': self.ports,
-                'wtp': self.wtp,
-                'blocks': self.blocks,
-                'downlink': [k for k in self._downlink.keys()],
-                'uplink': [k for k in self._uplink.keys()],
-                'supported_band': self.supported_band,
-                'ssids': self.ssids,
-                'assoc_id': self.assoc_id,
-                'ssid': self.ssid,
-                'pending': self.pending,
-                'encap': self.encap,
-                'tx_samples': self.tx_samples,
-                'rx_samples': self.rx_samples,
-                'authentication_state': self.authentication_state,
-                'association_state': self.association_state}
+    def to_dict(self, fields=None):
+        """ Return a JSON-serializable dictionary representing the LVAP
+
+        Args:
+            fields: the entries to be returned, all of them if None
+
+        Returns:
+            A dictionary
+        """
+
+        out = {}
+
+        for field in self.TO_DICT:
+            if fields is None or field in fields:
+                out[field] = getattr(self, field)
+
+        if fields is None or 'downlink' in fields:
+            out['downlink'] = [k for k in self._downlink.keys()]
+
+        if fields is None or 'uplink' in fields:
+            out['uplink'] = [k for k in self._uplink.keys()]
+
+        return out
 
     def __str__(self):
 
@@ -20,57 +20,43 @@
 import re
 import json
 import types
-import xmlrpc.client
 
+import tornado.gen
 import tornado.web
 import tornado.httpserver
-from tornado.ioloop import IOLoop
 
 from uuid import UUID
-from multiprocessing.pool import ThreadPool
 
 import empower.logger
 
 from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.jsonserializer import Versioned
+from empower.core.timerwheel import Timer
+from empower.core.xmlrpcdispatcher import XMLRPCDispatcher
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
 from empower.restserver.restserver import RESTServer
+from empower.restserver.telemetry import TelemetryHub
 
 from empower.main import RUNTIME
 
 LOG = empower.logger.get_logger()
 
 
-_WORKERS = ThreadPool(10)
-
-
 def exec_xmlrpc(callback, args=()):
-    """Execute XML-RPC call."""
-
-    LOG.info("Calling %s:%s", callback[0], callback[1])
-
-    proxy = xmlrpc.client.ServerProxy(callback[0])
-    func = getattr(proxy, callback[1])
-    run_background(func, on_complete, args)
-
-
-def run_background(func, callback, args=(), kwds={}):
-    """Run callback in background."""
-
-    def _callback(result):
-        IOLoop.instance().add_callback(lambda: callback(result))
-
-    _WORKERS.apply_async(func, args, kwds, _callback)
+    """Execute XML-RPC call.
 
+    The call is queued and delivered in background by the XMLRPCDispatcher.
+    """
 
-def on_complete(res):
-    """XML RPC Callback."""
+    LOG.debug("Calling %s:%s", callback[0], callback[1])
 
-    pass
+    XMLRPCDispatcher.instance().call(callback[0], callback[1], *args)
 
 
 class ModuleHandler(EmpowerAPIHandlerAdminUsers):
     """ModuleHandler. Used to view and manipulate modules."""
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """List all modules or just the specified one.
 
@@ -81,6 +67,8 @@ class ModuleHandler(EmpowerAPIHandlerAdminUsers):
         Example URLs:
 
             GET /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/<module>
+            GET /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/
+                <module>?fields=id,every
             GET /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/<module>/1
         """
 
@@ -95,10 +83,10 @@ class ModuleHandler(EmpowerAPIHandlerAdminUsers):
                     if v.tenant_id == tenant_id}
 
             if len(args) == 1:
-                self.write_as_json(resp.values())
+                yield self.write_collection(resp)
             else:
                 module_id = int(args[1])
-                self.write_as_json(resp[module_id])
+                yield self.write_as_json(resp[module_id])
 
         except KeyError as ex:
             self.send_error(404, message=ex)
@@ -186,7 +174,7 @@ class ModuleHandler(EmpowerAPIHandlerAdminUsers):
         self.set_status(204, None)
 
 
-class Module(object):
+class Module(Versioned):
     """Module object.
 
     Attributes:
@@ -195,6 +183,8 @@ class Module(object):
         worker: the module worker responsible for reating new module instances.
         tenant_id: The tenant's Id for convenience (UUID)
         every: loop period
+        batch: share the loop timer with the other modules of the same worker
+          having the same period (bool)
         callback: Module callback (FunctionType)
     """
 
@@ -207,6 +197,7 @@ class Module(object):
         self.worker = None
         self.__tenant_id = None
         self.__every = 5000
+        self.__batch = False
         self.__callback = None
         self.__periodic = None
         self.log = empower.logger.get_logger()
@@ -226,6 +217,9 @@ class Module(object):
             None
         """
 
+        # push to telemetry subscribers
+        TelemetryHub.instance().publish(self, serializable)
+
         # call callback if defined
         if not self.callback:
             return
@@ -234,9 +228,6 @@ class Module(object):
 
         try:
 
-            as_dict = serializable.to_dict()
-            as_json = json.dumps(as_dict, cls=EmpowerEncoder)
-
             if isinstance(callback, types.FunctionType) or \
                isinstance(callback, types.MethodType):
 
@@ -244,6 +235,9 @@ class Module(object):
 
             elif isinstance(callback, list) and len(callback) == 2:
 
+                as_dict = serializable.to_dict()
+                as_json = json.dumps(as_dict, cls=EmpowerEncoder)
+
                 exec_xmlrpc(callback, (as_json, ))
 
             else:
@@ -278,6 +272,18 @@ class Module(object):
 
         self.__every = int(value)
 
+    @property
+    def batch(self):
+        """Return batch."""
+
+        return self.__batch
+
+    @batch.setter
+    def batch(self, value):
+        """Set batch."""
+
+        self.__batch = bool(value)
+
     def to_dict(self):
         """Return JSON-serializable representation of the object."""
 
@@ -285,10 +291,17 @@ class Module(object):
                'module_type': self.module_type,
                'tenant_id': self.tenant_id,
                'every': self.every,
+               'batch': self.batch,
                'callback': self.callback}
 
         return out
 
+    def version_deps(self):
+        """Return the objects embedded in the representation, i.e. the
+        Versioned attributes (LVAPs, blocks, ...) of the module."""
+
+        return [x for x in vars(self).values() if isinstance(x, Versioned)]
+
     @property
     def callback(self):
         """ Return this triger callback. """
@@ -343,9 +356,11 @@ class Module(object):
     def start(self):
         """Start worker."""
 
-        if self.every > 0:
-            self.__periodic = \
-                tornado.ioloop.PeriodicCallback(self.run_once, self.every)
+        if self.every > 0 and self.batch:
+            self.worker.add_to_batch(self)
+        elif self.every > 0:
+            self.__periodic = Timer(self.run_once, self.every,
+                                    self.module_type)
             self.__periodic.start()
         else:
             self.run_once
@@ -353,7 +368,9 @@ class Module(object):
     def stop(self):
         """Stop worker."""
 
-        if self.every > 0:
+        if self.every > 0 and self.batch:
+            self.worker.remove_from_batch(self)
+        elif self.every > 0:
             self.__periodic.stop()
 
     def run_once(self):
@@ -404,6 +421,54 @@ class ModuleTrigger(Module):
         return False
 
 
+class ModuleBatch(object):
+    """A batch of modules sharing the same period.
+
+    All the modules in a batch are driven by a single timer. At every tick
+    the whole batch is handed to the worker, which can then merge the
+    requests directed to the same device.
+
+    Attributes:
+        batch_id: the batch id, never overlapping with a module id (int)
+        worker: the module worker owning this batch
+        every: loop period
+        modules: the modules in this batch indexed by module id
+    """
+
+    def __init__(self, batch_id, worker, every):
+
+        self.batch_id = batch_id
+        self.worker = worker
+        self.every = every
+        self.modules = {}
+        self.__periodic = None
+
+    def add(self, module):
+        """Add a module to the batch, start the timer if needed."""
+
+        self.modules[module.module_id] = module
+
+        if not self.__periodic:
+            self.__periodic = Timer(self.run_once, self.every,
+                                    self.worker.module.MODULE_NAME)
+            self.__periodic.start()
+
+    def remove(self, module):
+        """Remove a module from the batch, stop the timer if empty."""
+
+        if module.module_id in self.modules:
+            del self.modules[module.module_id]
+
+        if not self.modules and self.__periodic:
+            self.__periodic.stop()
+            self.__periodic = None
+
+    def run_once(self):
+        """Period task."""
+
+        self.worker.run_batch(self, list(self.modules.values()))
+
+
 class ModuleWorker(object):
     """Module worker.
 
@@ -412,15 +477,24 @@ class ModuleWorker(object):
     Attributes:
         module_id: Next module id
         modules: dictionary of modules currently active in this tenant
+        batch: default batch setting for the new modules (bool)
+        batches: the active module batches indexed by period
     """
 
     MODULE_NAME = None
     MODULE_TYPE = None
 
+    # Batch ids are allocated starting from here in order not to clash with
+    # the module ids used in the requests sent to the devices
+    BATCH_ID_BASE = 0x80000000
+
     def __init__(self, server, module, pt_type, pt_packet):
 
         self.__module_id = 0
+        self.__batch_id = self.BATCH_ID_BASE
         self.modules = {}
+        self.batch = False
+        self.batches = {}
         self.pt_type = pt_type
         self.pt_packet = pt_packet
         self.module = module
@@ -471,6 +545,45 @@ class ModuleWorker(object):
 
         pass
 
+    def add_to_batch(self, module):
+        """Add a module to the batch matching its period."""
+
+        if module.every not in self.batches:
+            self.__batch_id += 1
+            self.batches[module.every] = \
+                ModuleBatch(self.__batch_id, self, module.every)
+
+        self.batches[module.every].add(module)
+
+    def remove_from_batch(self, module):
+        """Remove a module from its batch."""
+
+        if module.every not in self.batches:
+            return
+
+        batch = self.batches[module.every]
+        batch.remove(module)
+
+        if not batch.modules:
+            del self.batches[module.every]
+
+    def run_batch(self, batch, modules):
+        """Run the period task of a batch of modules.
+
+        The default implementation simply calls run_once on every module,
+        workers can override this method in order to merge the requests.
+
+        Args:
+            batch: the ModuleBatch
+            modules: the list of modules in the batch
+        """
+
+        for module in modules:
+            try:
+                module.run_once()
+            except Exception as ex:
+                LOG.exception(ex)
+
     @property
     def module_id(self):
         """Return new module id."""
@@ -495,6 +608,9 @@ class ModuleWorker(object):
         kwargs['worker'] = self
         kwargs['module_type'] = self.module.MODULE_NAME
 
+        if 'batch' not in kwargs:
+            kwargs['batch'] = self.batch
+
         # check if all require parameters have been specified
         for param in self.module.REQUIRED:
             if param not in kwargs:
@@ -19,8 +19,11 @@
 
 from datetime import datetime
 
+from empower.core.jsonserializer import Versioned
+from empower.core.jsonserializer import VersionedDict
 
-class BasePNFDev(object):
+
+class BasePNFDev(Versioned):
     """A Programmable Network Fabric Device (PNFDev).
 
     Attributes:
@@ -38,6 +41,14 @@ class BasePNFDev(object):
     ALIAS = "pnfdevs"
     SOLO = "pnfdev"
 
+    TO_DICT = ['addr',
+               'last_seen',
+               'period',
+               'label',
+               'feed',
+               'ports',
+               'connection']
+
     def __init__(self, addr, label):
 
         self.addr = addr
@@ -48,7 +59,24 @@ class BasePNFDev(object):
         self.feed = None
         self.__seq = 0
         self.period = 0
-        self.ports = {}
+        self.__ports = VersionedDict(self)
+
+    @property
+    def ports(self):
+        """Return the OVS ports."""
+
+        return self.__ports
+
+    @ports.setter
+    def ports(self, ports):
+        """Set the OVS ports."""
+
+        self.__ports = VersionedDict(self, ports)
+
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        return [self.feed, self.connection]
 
     def port(self, ifname="empower0"):
         """Return OVS port."""
@@ -74,20 +102,27 @@ class BasePNFDev(object):
 
         self.__connection = connection
 
-    def to_dict(self):
-        """Return a JSON-serializable dictionary representing the PNFDev."""
+    def to_dict(self, fields=None):
+        """Return a JSON-serializable dictionary representing the PNFDev.
+
+        Args:
+            fields: the entries to be returned, all of them if None
+
+        Returns:
+            A dictionary
+        """
+
+        out = {}
+
+        for field in self.TO_DICT:
+            if fields is None or field in fields:
+                out[field] = getattr(self, field)
 
-        date = datetime.fromtimestamp(self.last_seen_ts) \
-            .strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        if fields is None or 'last_seen_ts' in fields:
+            out['last_seen_ts'] = datetime.fromtimestamp(self.last_seen_ts) \
+                .strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-        return {'addr': self.addr,
-                'last_seen': self.last_seen,
-                'last_seen_ts': date,
-                'period': self.period,
-                'label': self.label,
-                'feed': self.feed,
-                'ports': self.ports,
-                'connection': self.connection}
+        return out
 
     @property
     def seq(self):
@@ -17,6 +17,7 @@
 
 """PNF Protocol Server."""
 
+import tornado.gen
 import tornado.web
 import tornado.ioloop
 import tornado.websocket
@@ -26,6 +27,7 @@ from uuid import UUID
 import empower.logger
 
 from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.datatypes.etheraddress import EtherAddress
 from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
@@ -43,6 +45,7 @@ class BasePNFDevHandler(EmpowerAPIHandler):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List all PNFDevs or a single PNFDev if the pnfdev_addr is
         specified. Returns 404 if pnfdev not exists.
@@ -53,6 +56,7 @@ class BasePNFDevHandler(EmpowerAPIHandler):
         Example URLs:
 
             GET /api/v1/pnfdev
+            GET /api/v1/pnfdev?fields=addr,label&limit=50
             GET /api/v1/pnfdev/11:22:33:44:55:66
 
         """
@@ -63,19 +67,45 @@ class BasePNFDevHandler(EmpowerAPIHandler):
                 raise ValueError("Invalid url")
 
             if len(args) == 0:
-                self.write_as_json(self.server.pnfdevs.values())
+                yield self.write_collection(self.server.pnfdevs)
             else:
                 pnfdev = self.server.pnfdevs[EtherAddress(args[0])]
-                self.write_as_json(pnfdev)
+                yield self.write_as_json(pnfdev)
 
         except ValueError as ex:
             self.send_error(400, message=ex)
         except KeyError as ex:
             self.send_error(404, message=ex)
 
+    def add_entry(self, request):
+        """Add a PNFDev."""
+
+        if "addr" not in request:
+            raise ValueError("missing pnfdev element")
+
+        if not request.get("label"):
+            label = "Generic PNFDev"
+        else:
+            label = request['label']
+
+        addr = EtherAddress(request['addr'])
+        self.server.add_pnfdev(addr, label)
+
+        return addr
+
+    def remove_entry(self, addr):
+        """Remove a PNFDev added by add_entry."""
+
+        self.server.remove_pnfdev(addr)
+
+    @tornado.gen.coroutine
     def post(self, *args):
         """ Add a new PNFDev.
 
+        A list of PNFDevs, either as a JSON array or as CSV lines
+        (addr,label), is added in bulk and the outcome of each PNFDev is
+        returned.
+
         Args:
             None
 
@@ -94,21 +124,19 @@ class BasePNFDevHandler(EmpowerAPIHandler):
             if len(args) > 0:
                 raise ValueError("Invalid url")
 
+            entries = self.read_bulk(["addr", "label"])
+
+            if entries is not None:
+                yield self.write_bulk(entries, self.add_entry,
+                                      self.remove_entry)
+                return
+
             request = tornado.escape.json_decode(self.request.body)
 
             if "version" not in request:
                 raise ValueError("missing version element")
 
-            if "addr" not in request:
-                raise ValueError("missing pnfdev element")
-
-            if "label" not in request:
-                label = "Generic PNFDev"
-            else:
-                label = request['label']
-
-            addr = EtherAddress(request['addr'])
-            self.server.add_pnfdev(addr, label)
+            self.add_entry(request)
 
             self.set_header("Location",
                             "/api/v1/pnfdevs/%s" % request['addr'])
@@ -155,6 +183,7 @@ class BaseTenantPNFDevHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List all PNFDevs in a certain Tenant or a single ONFDev if the addr
         is specified. Returns 404 if either the tenant or the PNFDev do not
@@ -182,12 +211,12 @@ class BaseTenantPNFDevHandler(EmpowerAPIHandlerAdminUsers):
             tenant_pnfdevs = getattr(tenant, self.server.PNFDEV.ALIAS)
 
             if len(args) == 1:
-                self.write_as_json(tenant_pnfdevs.values())
+                yield self.write_as_json(tenant_pnfdevs.values())
                 self.set_status(200, None)
             else:
                 addr = EtherAddress(args[1])
                 pnfdev = tenant_pnfdevs[addr]
-                self.write_as_json(pnfdev)
+                yield self.write_as_json(pnfdev)
                 self.set_status(200, None)
 
         except ValueError as ex:
@@ -273,6 +302,7 @@ class PNFPServer():
     def __init__(self, pt_types, pt_types_handlers):
 
         self.port = None
+        self.shards = None
         self.__load_pnfdevs()
         self.__load_belongs()
         self.pt_types = pt_types
@@ -311,14 +341,18 @@ class PNFPServer():
 
             pnfdev = self.pnfdevs[belongs.addr]
             tenant = RUNTIME.tenants[belongs.tenant_id]
-            tenant_pnfdevs = getattr(tenant, self.PNFDEV.ALIAS)
 
-            tenant_pnfdevs[pnfdev.addr] = pnfdev
+            tenant.load_pnfdev(pnfdev)
 
     def to_dict(self):
         """ Return a dict representation of the object. """
 
-        return {'port': self.port}
+        out = {'port': self.port}
+
+        if self.shards:
+            out['shards'] = self.shards.to_dict()
+
+        return out
 
     def add_pnfdev(self, addr, label):
         """Add PNFDev."""
@@ -328,9 +362,7 @@ class PNFPServer():
 
         self.pnfdevs[addr] = self.PNFDEV(addr, label)
 
-        session = Session()
-        session.add(self.TBL_PNFDEV(addr=addr, label=label))
-        session.commit()
+        Writer.instance().add(self.TBL_PNFDEV(addr=addr, label=label))
 
         return self.pnfdevs[addr]
 
@@ -351,13 +383,7 @@ class PNFPServer():
 
         del self.pnfdevs[addr]
 
-        pnfdev = Session().query(self.TBL_PNFDEV) \
-            .filter(self.TBL_PNFDEV.addr == addr) \
-            .first()
-
-        session = Session()
-        session.delete(pnfdev)
-        session.commit()
+        Writer.instance().delete(self.TBL_PNFDEV, self.TBL_PNFDEV.addr == addr)
 
     def register_message(self, pt_type, parser, handler):
         """ Register new handler. This will be called after the default. """
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER southbound traffic replay.
+
+Feeds a trace captured by empower.core.trace into the running runtime, in
+place of the real devices. Every recorded connection is handed to the
+server of its protocol (which must be loaded) exactly as an accepted one,
+and its frames are dispatched through the same code path as live traffic,
+so that the handler timings reported by empower.core.dispatchstats can be
+compared across runs. The devices in the trace must be known to the
+runtime (e.g. replay with a copy of the configuration database used when
+capturing).
+
+Frames are replayed at the recorded pace multiplied by speed, or as fast as
+possible if speed is 0. Messages sent by the runtime are discarded. When the
+trace ends all the connections are closed, the report is printed on the
+standard output as JSON, and the IOLoop is stopped.
+"""
+
+import sys
+import json
+import time
+import collections
+
+import tornado.ioloop
+
+from empower.core.trace import REC_OPEN
+from empower.core.trace import REC_FRAME
+from empower.core.trace import REC_CLOSE
+from empower.core.trace import read_trace
+from empower.core.dispatchstats import DispatchStats
+from empower.lvnfp.lvnfpmainhandler import LVNFPMainHandler
+
+from empower.main import RUNTIME
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# The server of each protocol (by module name, see RUNTIME.components)
+SERVERS = {"lvapp": "empower.lvapp.lvappserver",
+           "vbsp": "empower.vbsp.vbspserver",
+           "lvnfp": "empower.lvnfp.lvnfpserver"}
+
+# Records dispatched before yielding to the IOLoop
+BATCH = 256
+
+ReplayRequest = collections.namedtuple("ReplayRequest", ["remote_ip"])
+
+
+class ReplayStream(object):
+    """A replayed connection, as seen by the runtime.
+
+    Attributes:
+        tx_messages: number of messages sent by the runtime (int)
+        tx_bytes: number of bytes sent by the runtime (int)
+    """
+
+    def __init__(self):
+
+        self.tx_messages = 0
+        self.tx_bytes = 0
+        self.__closed = False
+        self.__close_callback = None
+
+    def set_nodelay(self, value):
+        """Nothing to do."""
+
+        pass
+
+    def set_close_callback(self, callback):
+        """Call callback when the stream is closed."""
+
+        self.__close_callback = callback
+
+    def read_bytes(self, num_bytes, callback=None, partial=False):
+        """Frames are pushed by Replay."""
+
+        pass
+
+    def closed(self):
+        """Return True if the stream is closed."""
+
+        return self.__closed
+
+    def write(self, data):
+        """Discard data."""
+
+        self.tx_messages += 1
+        self.tx_bytes += len(data)
+
+    def close(self):
+        """Mark the stream as closed and run the close callback."""
+
+        if self.__closed:
+            return
+
+        self.__closed = True
+
+        if self.__close_callback:
+            self.__close_callback()
+
+
+class ReplayLVNFPHandler(LVNFPMainHandler):
+    """A replayed LVNFP websocket.
+
+    The websocket machinery is bypassed, messages are pushed by Replay.
+    """
+
+    def __init__(self, server, peer):
+
+        self.initialize(server)
+        self.request = ReplayRequest(peer)
+        self.stream = ReplayStream()
+        self.stream.set_close_callback(self.on_close)
+        self.open()
+
+    def write_message(self, message, binary=False):
+        """Discard message."""
+
+        self.stream.write(message)
+
+    def close(self, code=None, reason=None):
+        """Close the websocket."""
+
+        self.stream.close()
+
+
+def peer_address(name):
+    """Return the (host, port) tuple of a recorded peer name."""
+
+    host, _, port = name.rpartition(":")
+
+    if host and port.isdigit():
+        return (host, int(port))
+
+    return (name, 0)
+
+
+class Replay(object):
+    """Replays a trace.
+
+    Attributes:
+        filename: the trace file (str)
+        speed: the replay speed, 0 for as fast as possible (float)
+        records: number of records replayed (int)
+        frames: number of frames dispatched (int)
+        skipped: number of records of protocols not loaded (int)
+        max_lag: largest delay with respect to the recorded pace (float)
+    """
+
+    def __init__(self, filename, speed=1.0):
+
+        self.filename = filename
+        self.speed = float(speed)
+        self.records = 0
+        self.frames = 0
+        self.skipped = 0
+        self.max_lag = 0.0
+        self.started = None
+        self.duration = 0.0
+        self.__trace = None
+        self.__next = None
+        self.__connections = {}
+        self.__nb_connections = 0
+
+        if self.speed < 0:
+            raise ValueError("Invalid speed %s" % speed)
+
+    def start(self):
+        """Start the replay when the IOLoop starts.
+
+        Raises:
+            ValueError: if the trace cannot be read
+        """
+
+        self.__trace = read_trace(self.filename)
+
+        try:
+            self.__next = next(self.__trace, None)
+        except OSError as ex:
+            raise ValueError(str(ex))
+
+        for stats in DispatchStats.protocols().values():
+            stats.reset()
+
+        LOG.info("Replaying %s (speed %s)", self.filename,
+                 self.speed or "max")
+
+        tornado.ioloop.IOLoop.current().add_callback(self.__begin)
+
+    def __begin(self):
+        """Take the start time and replay the first records."""
+
+        self.started = time.time()
+        self._step()
+
+    def _step(self):
+        """Dispatch the records that are due."""
+
+        loop = tornado.ioloop.IOLoop.current()
+
+        for _ in range(BATCH):
+
+            if self.__next is None:
+                self.__next = next(self.__trace, None)
+
+            if self.__next is None:
+                self.finish()
+                return
+
+            record = self.__next
+
+            if self.speed:
+
+                delay = self.started + record.timestamp / self.speed - \
+                    time.time()
+
+                if delay > 0:
+                    loop.call_later(delay, self._step)
+                    return
+
+                self.max_lag = max(self.max_lag, -delay)
+
+            self.__next = None
+            self.duration = record.timestamp
+
+            self._dispatch(record)
+
+        loop.add_callback(self._step)
+
+    def _dispatch(self, record):
+        """Dispatch a record to its connection."""
+
+        self.records += 1
+
+        server = RUNTIME.components.get(SERVERS.get(record.protocol))
+
+        if not server:
+            self.skipped += 1
+            return
+
+        key = (record.protocol, record.conn_id)
+
+        if record.kind == REC_OPEN:
+            self._open(server, record.protocol, key, record.data.decode())
+            return
+
+        if record.kind == REC_CLOSE:
+            connection = self.__connections.pop(key, None)
+            if connection:
+                connection.stream.close()
+            return
+
+        if record.kind != REC_FRAME:
+            LOG.error("Invalid record kind %u", record.kind)
+            return
+
+        # the capture started after the connection was opened
+        if key not in self.__connections:
+            self._open(server, record.protocol, key,
+                       "replay-%u" % record.conn_id)
+
+        connection = self.__connections[key]
+
+        if connection.stream.closed():
+            self.skipped += 1
+            return
+
+        self.frames += 1
+
+        if record.protocol == "lvapp":
+            connection.on_frames([(record.data[1], record.data)])
+        elif record.protocol == "vbsp":
+            connection.on_frames([record.data])
+        else:
+            connection.on_message(record.data.decode())
+
+    def _open(self, server, protocol, key, name):
+        """Create the connection of a recorded peer."""
+
+        self.__nb_connections += 1
+
+        if protocol == "lvnfp":
+            self.__connections[key] = ReplayLVNFPHandler(server, name)
+            return
+
+        server.handle_stream(ReplayStream(), peer_address(name))
+        self.__connections[key] = server.connection
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        elapsed = time.time() - self.started if self.started else 0.0
+
+        return {'trace': self.filename,
+                'speed': self.speed,
+                'records': self.records,
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'connections': self.__nb_connections,
+                'trace_duration': self.duration,
+                'elapsed': elapsed,
+                'max_lag': self.max_lag,
+                'dispatch': {k: v.to_dict() for k, v in
+                             DispatchStats.protocols().items()}}
+
+    def finish(self):
+        """Close the connections, print the report, and stop the IOLoop."""
+
+        for connection in list(self.__connections.values()):
+            connection.stream.close()
+
+        self.__connections = {}
+
+        report = self.to_dict()
+
+        LOG.info("Replayed %u frames in %.3fs (trace duration %.3fs)",
+                 self.frames, report['elapsed'], self.duration)
+
+        print(json.dumps(report, indent=2, sort_keys=True))
+        sys.stdout.flush()
+
+        tornado.ioloop.IOLoop.current().stop()
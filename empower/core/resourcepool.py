@@ -18,6 +18,8 @@
 """EmPOWER resouce pool and resource block classes."""
 
 from empower.datatypes.etheraddress import EtherAddress
+from empower.core.jsonserializer import Versioned
+from empower.core.rssistore import RSSIStore
 
 BT_L20 = 0
 BT_HT20 = 1
@@ -61,10 +63,11 @@ class TxPolicyProp(dict):
         except KeyError:
             value = TxPolicy(key, self.block)
             dict.__setitem__(self, key, value)
+            self.block.touch()
             return dict.__getitem__(self, key)
 
 
-class TxPolicy(object):
+class TxPolicy(Versioned):
     """Transmission policy.
 
     A transmission policy is a set of rule that must be used by the rate
@@ -94,6 +97,15 @@ class TxPolicy(object):
         self._ht_mcs = block.ht_supports
         self._ur_count = 3
 
+    @property
+    def version(self):
+        """Return the change counter.
+
+        The default mcs sets are the ones of the block, so the block
+        counter is also taken into account."""
+
+        return (self._version, self.block.version)
+
     def to_dict(self):
         """Return a json-frinedly representation of the object."""
 
@@ -236,11 +248,40 @@ class ResourcePool(list):
     This extends the list in order to add a few filtering and sorting methods
     """
 
-    def sortByRssi(self, addr):
-        blocks = sorted(self, key=lambda x: x.ucqm[addr]['mov_rssi'],
-                        reverse=True)
+    def sortByRssi(self, addr, metric=None):
+        """Sort the blocks by decreasing RSSI of the station.
+
+        If metric is None the last moving average reported by the blocks
+        is used, otherwise the metric is computed over the RSSI history
+        (see RSSIStore).
+        """
+
+        if metric is None:
+            blocks = sorted(self, key=lambda x: x.ucqm[addr]['mov_rssi'],
+                            reverse=True)
+        else:
+            store = RSSIStore.instance()
+            blocks = sorted(self, key=lambda x: store.get(x, addr, metric),
+                            reverse=True)
+
         return ResourcePool(blocks)
 
+    def best_blocks(self, addrs=None, metric="ewma"):
+        """Return the block with the highest RSSI for each station.
+
+        Args:
+            addrs: the stations, all the stations heard by the blocks if None
+            metric: the RSSI history metric (see RSSIStore)
+
+        Returns:
+            A dictionary mapping each station heard by at least one block to
+            its best block
+        """
+
+        best = RSSIStore.instance().best_blocks(self, addrs, metric)
+
+        return {addr: block for addr, (block, _) in best.items()}
+
     def first(self):
         block = list.__getitem__(self, 0)
         return ResourcePool([block])
@@ -250,7 +291,124 @@ class ResourcePool(list):
         return ResourcePool([block])
 
 
-class ResourceBlock(object):
+class ResourceBlockSet(set):
+    """A set of resource blocks indexed by (hwaddr, channel, band).
+
+    Blocks are always looked up in the context of a single radio, so the
+    triple (hwaddr, channel, band) is enough to identify a block. The index
+    allows handlers to resolve the block referenced by an incoming message
+    without building a temporary ResourceBlock and scanning the set.
+    """
+
+    def __init__(self, blocks=()):
+        super().__init__()
+        self.__index = {}
+        self.update(blocks)
+
+    @classmethod
+    def key(cls, hwaddr, channel, band):
+        """Return the index key for the specified block fields."""
+
+        return (hwaddr, int(channel), int(band))
+
+    def find(self, hwaddr, channel, band):
+        """Return the block matching the specified fields or None."""
+
+        return self.__index.get(self.key(hwaddr, channel, band))
+
+    def add(self, block):
+        """Add a block, keeping the existing instance if already present."""
+
+        key = self.key(block.hwaddr, block.channel, block.band)
+
+        if key in self.__index:
+            return
+
+        super().add(block)
+        self.__index[key] = block
+
+    def update(self, *others):
+        """Add all the blocks in the specified iterables."""
+
+        for other in others:
+            for block in other:
+                self.add(block)
+
+    def discard(self, block):
+        """Remove a block if present."""
+
+        key = self.key(block.hwaddr, block.channel, block.band)
+
+        if self.__index.get(key) == block:
+            del self.__index[key]
+
+        super().discard(block)
+
+    def remove(self, block):
+        """Remove a block, raise KeyError if not present."""
+
+        if block not in self:
+            raise KeyError(block)
+
+        self.discard(block)
+
+    def pop(self):
+        """Remove and return an arbitrary block."""
+
+        block = super().pop()
+        self.__index.pop(self.key(block.hwaddr, block.channel, block.band),
+                         None)
+        return block
+
+    def clear(self):
+        """Remove all the blocks."""
+
+        super().clear()
+        self.__index.clear()
+
+    def difference_update(self, *others):
+        """Remove all the blocks in the specified iterables."""
+
+        for other in others:
+            for block in other:
+                self.discard(block)
+
+    def intersection_update(self, *others):
+        """Keep only the blocks found in all the specified iterables."""
+
+        super().intersection_update(*others)
+        self.__reindex()
+
+    def symmetric_difference_update(self, other):
+        """Keep the blocks found in either set but not in both."""
+
+        super().symmetric_difference_update(other)
+        self.__reindex()
+
+    def __reindex(self):
+        """Rebuild the index from the set content."""
+
+        self.__index = {self.key(block.hwaddr, block.channel, block.band):
+                        block for block in self}
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+class ResourceBlock(Versioned):
     """ EmPOWER resource block.
 
     A resource block is identified by a channel, a timeslot, and the
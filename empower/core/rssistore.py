@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER RSSI history store.
+
+The RSSI samples reported by the user channel quality maps are kept in a
+ring buffer for each (block, station) pair. All the ring buffers are rows
+of a single preallocated NumPy array, so appending a sample is O(1) and
+statistics over many pairs (windowed mean, percentiles, EWMA, best block
+for each station) are computed with a few vectorized operations.
+
+The number of rows is fixed. When the store is full the rows of the
+stations not heard for more than DEFAULT_TTL seconds are reclaimed first,
+then the least recently updated ones.
+"""
+
+import time
+import numpy
+
+from empower.datatypes.etheraddress import EtherAddress
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# Maximum number of (block, station) pairs
+DEFAULT_CAPACITY = 16384
+
+# Number of samples kept for each pair
+DEFAULT_WINDOW = 32
+
+# EWMA smoothing factor
+DEFAULT_ALPHA = 0.25
+
+# Pairs not updated for more than DEFAULT_TTL seconds are stale
+DEFAULT_TTL = 300.0
+
+# Fraction of the rows reclaimed when no pair is stale
+EVICT_FRACTION = 16
+
+METRICS = ["mean", "median", "ewma", "last", "min", "max"]
+
+
+class RSSIStore(object):
+    """Per (block, station) RSSI ring buffers.
+
+    Attributes:
+        capacity: the maximum number of (block, station) pairs (int)
+        window: the number of samples kept for each pair (int)
+        alpha: the EWMA smoothing factor (float)
+        ttl: pairs not updated for ttl seconds are evicted first (float)
+        evicted: number of evicted pairs (int)
+    """
+
+    __instance = None
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW,
+                 alpha=DEFAULT_ALPHA, ttl=DEFAULT_TTL):
+
+        self.capacity = capacity
+        self.window = window
+        self.alpha = alpha
+        self.ttl = ttl
+        self.evicted = 0
+
+        self.samples = numpy.full((capacity, window), numpy.nan,
+                                  dtype=numpy.float32)
+        self.heads = numpy.zeros(capacity, dtype=numpy.int32)
+        self.counts = numpy.zeros(capacity, dtype=numpy.int32)
+        self.ewmas = numpy.full(capacity, numpy.nan, dtype=numpy.float32)
+        self.last_seen = numpy.zeros(capacity, dtype=numpy.float64)
+        self.stations = numpy.zeros(capacity, dtype=numpy.int64)
+        self.block_ids = numpy.full(capacity, -1, dtype=numpy.int32)
+
+        # (block id, station) -> row
+        self.__rows = {}
+
+        # block -> block id, and back
+        self.__block_ids = {}
+        self.__blocks = {}
+
+        self.__free = list(range(capacity - 1, -1, -1))
+
+    @classmethod
+    def instance(cls):
+        """Return the global RSSIStore."""
+
+        if not cls.__instance:
+            cls.__instance = RSSIStore()
+
+        return cls.__instance
+
+    def __block_id(self, block):
+        """Return the id of a block, allocating a new one if needed."""
+
+        if block not in self.__block_ids:
+            block_id = len(self.__block_ids)
+            self.__block_ids[block] = block_id
+            self.__blocks[block_id] = block
+
+        return self.__block_ids[block]
+
+    def __alloc(self, block_id, station, now):
+        """Return a free row for a new pair."""
+
+        if not self.__free:
+            self.__evict(now)
+
+        row = self.__free.pop()
+
+        self.samples[row] = numpy.nan
+        self.heads[row] = 0
+        self.counts[row] = 0
+        self.ewmas[row] = numpy.nan
+        self.last_seen[row] = now
+        self.stations[row] = station
+        self.block_ids[row] = block_id
+
+        self.__rows[(block_id, station)] = row
+
+        return row
+
+    def __evict(self, now):
+        """Reclaim the stale rows or, if none, the least recently used."""
+
+        used = self.block_ids >= 0
+        stale = numpy.flatnonzero(used & (self.last_seen < now - self.ttl))
+
+        if not len(stale):
+            nb_rows = max(1, self.capacity // EVICT_FRACTION)
+            stale = numpy.argpartition(self.last_seen, nb_rows - 1)[:nb_rows]
+
+        for row in stale.tolist():
+            key = (int(self.block_ids[row]), int(self.stations[row]))
+            del self.__rows[key]
+            self.block_ids[row] = -1
+            self.__free.append(row)
+
+        self.evicted += len(stale)
+
+        LOG.info("RSSI store full, %u entries evicted", len(stale))
+
+    def update(self, block, addrs, values, now=None):
+        """Append one sample for each station.
+
+        Args:
+            block: the block reporting the samples (ResourceBlock)
+            addrs: the stations (list of EtherAddress)
+            values: the RSSI samples, one per station (list of numbers)
+            now: the timestamp of the samples, the current time if None
+
+        Returns:
+            None
+        """
+
+        if not len(addrs):
+            return
+
+        now = time.time() if now is None else now
+        block_id = self.__block_id(block)
+
+        rows = numpy.empty(len(addrs), dtype=numpy.int64)
+
+        for i, addr in enumerate(addrs):
+            station = addr.to_int()
+            row = self.__rows.get((block_id, station))
+            if row is None:
+                row = self.__alloc(block_id, station, now)
+            rows[i] = row
+
+        values = numpy.asarray(values, dtype=numpy.float32)
+
+        self.samples[rows, self.heads[rows]] = values
+        self.heads[rows] = (self.heads[rows] + 1) % self.window
+        self.counts[rows] = numpy.minimum(self.counts[rows] + 1, self.window)
+        self.last_seen[rows] = now
+
+        ewmas = self.ewmas[rows]
+        self.ewmas[rows] = numpy.where(numpy.isnan(ewmas), values,
+                                       self.alpha * values +
+                                       (1.0 - self.alpha) * ewmas)
+
+    def __metric(self, rows, metric, samples=None):
+        """Compute a metric for a set of rows."""
+
+        if metric == "ewma":
+            return self.ewmas[rows].astype(numpy.float64)
+
+        if metric == "last":
+            heads = (self.heads[rows] - 1) % self.window
+            return self.samples[rows, heads].astype(numpy.float64)
+
+        if samples is None:
+            samples = self.window
+
+        data = self.samples[rows]
+
+        # only the most recent samples
+        if samples < self.window:
+            offsets = numpy.arange(1, samples + 1)
+            columns = (self.heads[rows][:, None] - offsets) % self.window
+            data = numpy.take_along_axis(data, columns, axis=1)
+
+        if metric == "mean":
+            return numpy.nanmean(data, axis=1, dtype=numpy.float64)
+
+        if metric == "median":
+            return numpy.nanmedian(data, axis=1).astype(numpy.float64)
+
+        if metric == "min":
+            return numpy.nanmin(data, axis=1).astype(numpy.float64)
+
+        if metric == "max":
+            return numpy.nanmax(data, axis=1).astype(numpy.float64)
+
+        if metric.startswith("p") and metric[1:].isdigit():
+            return numpy.nanpercentile(data, int(metric[1:]),
+                                       axis=1).astype(numpy.float64)
+
+        raise ValueError("Invalid metric %s" % metric)
+
+    def get(self, block, addr, metric="ewma", samples=None):
+        """Return a statistic of the RSSI of a station at a block.
+
+        Args:
+            block: the block (ResourceBlock)
+            addr: the station (EtherAddress)
+            metric: one of METRICS or pNN for the NN-th percentile (str)
+            samples: only the most recent samples are considered (int)
+
+        Returns:
+            The statistic or -inf if no sample is available
+        """
+
+        if block not in self.__block_ids:
+            return -float("inf")
+
+        row = self.__rows.get((self.__block_ids[block], addr.to_int()))
+
+        if row is None:
+            return -float("inf")
+
+        return float(self.__metric(numpy.array([row]), metric, samples)[0])
+
+    def history(self, block, addr):
+        """Return the samples of a station at a block, oldest first."""
+
+        if block not in self.__block_ids:
+            return []
+
+        row = self.__rows.get((self.__block_ids[block], addr.to_int()))
+
+        if row is None:
+            return []
+
+        count = int(self.counts[row])
+        columns = (int(self.heads[row]) - numpy.arange(count, 0, -1)) % \
+            self.window
+
+        return self.samples[row, columns].tolist()
+
+    def best_blocks(self, blocks=None, addrs=None, metric="ewma",
+                    samples=None):
+        """Return the block with the highest RSSI for each station.
+
+        Args:
+            blocks: only these blocks are considered, all if None
+            addrs: only these stations are considered, all if None
+            metric: one of METRICS or pNN for the NN-th percentile (str)
+            samples: only the most recent samples are considered (int)
+
+        Returns:
+            A dictionary mapping each station (EtherAddress) to a
+            (block, value) tuple
+        """
+
+        used = self.block_ids >= 0
+
+        if blocks is not None:
+            ids = [self.__block_ids[x] for x in blocks
+                   if x in self.__block_ids]
+            used &= numpy.isin(self.block_ids, ids)
+
+        if addrs is not None:
+            stations = [x.to_int() for x in addrs]
+            used &= numpy.isin(self.stations, stations)
+
+        rows = numpy.flatnonzero(used & (self.counts > 0))
+
+        if not len(rows):
+            return {}
+
+        values = self.__metric(rows, metric, samples)
+
+        # sort by station and then by decreasing value, the first row of
+        # each station is the best one
+        order = numpy.lexsort((-values, self.stations[rows]))
+        rows = rows[order]
+        values = values[order]
+
+        stations = self.stations[rows]
+        first = numpy.ones(len(rows), dtype=bool)
+        first[1:] = stations[1:] != stations[:-1]
+
+        out = {}
+
+        for row, value in zip(rows[first].tolist(), values[first].tolist()):
+            addr = EtherAddress(int(self.stations[row]))
+            out[addr] = (self.__blocks[int(self.block_ids[row])], value)
+
+        return out
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'capacity': self.capacity,
+                'window': self.window,
+                'alpha': self.alpha,
+                'ttl': self.ttl,
+                'entries': len(self.__rows),
+                'evicted': self.evicted}
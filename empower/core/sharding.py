@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER southbound connection sharding.
+
+A southbound server (LVAPP, VBSP) can spread its connections over a number
+of worker processes. Every worker binds the server port with SO_REUSEPORT,
+so that the kernel balances the incoming connections among them, and takes
+care of the socket I/O: reads, reassembly of the frames, writes, and
+detection of idle peers. Complete frames are forwarded to the runtime over
+a local (unix socket) channel, while the messages sent by the runtime
+travel the reverse path. The events of each direction are batched, at most
+one IPC write per IOLoop iteration.
+
+In the runtime every remote connection is represented by a RemoteStream,
+which has the subset of the IOStream interface used by the connections, so
+that messages are still parsed and handled by the usual connection objects.
+
+Workers are started with:
+
+    python3 -m empower.core.sharding <protocol> <port> <path> <idle>
+"""
+
+import os
+import sys
+import time
+import atexit
+import logging
+import pickle
+import socket
+import struct
+import tempfile
+import subprocess
+
+import tornado.ioloop
+
+from tornado.iostream import IOStream
+from tornado.tcpserver import TCPServer
+from tornado.netutil import bind_sockets
+from tornado.netutil import bind_unix_socket
+
+from empower.lvapp.framing import extract_frames
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# Worker to runtime events
+EV_OPEN = 0
+EV_FRAMES = 1
+
+# Runtime to worker events
+EV_SEND = 2
+
+# Both directions
+EV_CLOSE = 3
+
+IPC_HEADER = struct.Struct(">I")
+
+VBSP_HEADER = struct.Struct(">I")
+
+READ_CHUNK = 65536
+
+# Connections silent for more than DEFAULT_IDLE_TIMEOUT seconds are closed
+DEFAULT_IDLE_TIMEOUT = 30
+
+# Dead workers are restarted every RESPAWN_INTERVAL ms
+RESPAWN_INTERVAL = 1000
+
+
+def vbsp_frames(buf):
+    """Extract the VBSP messages (without the size prefix) from buf.
+
+    Args:
+        buf: the received bytes (bytearray)
+
+    Returns:
+        The list of messages and the number of bytes consumed
+    """
+
+    frames = []
+    offset = 0
+
+    while len(buf) - offset >= VBSP_HEADER.size:
+
+        (length,) = VBSP_HEADER.unpack_from(buf, offset)
+        end = offset + VBSP_HEADER.size + length
+
+        if len(buf) < end:
+            break
+
+        frames.append(bytes(buf[offset + VBSP_HEADER.size:end]))
+        offset = end
+
+    return frames, offset
+
+
+FRAMERS = {"lvapp": extract_frames, "vbsp": vbsp_frames}
+
+
+class Channel(object):
+    """A local channel carrying batches of events.
+
+    Attributes:
+        stream: the unix socket stream (IOStream)
+        sent: number of events sent (int)
+        received: number of events received (int)
+    """
+
+    def __init__(self, stream, on_events, on_close):
+
+        self.stream = stream
+        self.sent = 0
+        self.received = 0
+        self.__on_events = on_events
+        self.__events = []
+
+        self.stream.set_close_callback(on_close)
+        self.__read_header()
+
+    def send(self, event):
+        """Queue an event, the queue is sent at the end of the iteration."""
+
+        self.__events.append(event)
+
+        if len(self.__events) == 1:
+            tornado.ioloop.IOLoop.current().add_callback(self.__flush)
+
+    def __flush(self):
+        """Send the queued events."""
+
+        events = self.__events
+        self.__events = []
+
+        if not events or self.stream.closed():
+            return
+
+        data = pickle.dumps(events, pickle.HIGHEST_PROTOCOL)
+        self.stream.write(IPC_HEADER.pack(len(data)) + data)
+
+        self.sent += len(events)
+
+    def __read_header(self):
+        """Wait for the next batch."""
+
+        if not self.stream.closed():
+            self.stream.read_bytes(IPC_HEADER.size, self.__on_header)
+
+    def __on_header(self, data):
+        """Read the batch."""
+
+        (length,) = IPC_HEADER.unpack(data)
+
+        if not self.stream.closed():
+            self.stream.read_bytes(length, self.__on_batch)
+
+    def __on_batch(self, data):
+        """Deliver the events."""
+
+        events = pickle.loads(data)
+        self.received += len(events)
+
+        try:
+            self.__on_events(events)
+        finally:
+            self.__read_header()
+
+
+class WorkerConnection(object):
+    """A southbound connection handled by a worker.
+
+    Attributes:
+        conn_id: the connection id, unique in the worker (int)
+        stream: the stream to the device (IOStream)
+        last_seen: time when the last bytes were received (float)
+    """
+
+    def __init__(self, worker, conn_id, stream):
+
+        self.worker = worker
+        self.conn_id = conn_id
+        self.stream = stream
+        self.last_seen = time.time()
+        self.__buffer = bytearray()
+
+        self.stream.set_nodelay(True)
+        self.stream.set_close_callback(self._on_disconnect)
+        self._wait()
+
+    def _wait(self):
+        """Wait for incoming bytes."""
+
+        if not self.stream.closed():
+            self.stream.read_bytes(READ_CHUNK, self._on_read, partial=True)
+
+    def _on_read(self, data):
+        """Extract the complete frames and forward them to the runtime."""
+
+        self.last_seen = time.time()
+        self.__buffer.extend(data)
+
+        try:
+            frames, consumed = self.worker.framer(self.__buffer)
+        except ValueError as ex:
+            LOG.error("%s, closing connection", ex)
+            self.stream.close()
+            return
+
+        del self.__buffer[:consumed]
+
+        if frames:
+            self.worker.channel.send((EV_FRAMES, self.conn_id, frames))
+
+        self._wait()
+
+    def _on_disconnect(self):
+        """Notify the runtime."""
+
+        self.worker.remove_connection(self)
+
+
+class ShardWorker(TCPServer):
+    """A worker process accepting southbound connections.
+
+    Attributes:
+        protocol: the protocol name (str)
+        port: the server port (int)
+        idle_timeout: silent connections are closed after idle_timeout
+          seconds (int)
+        connections: the open connections (dict)
+    """
+
+    def __init__(self, protocol, port, path,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+
+        TCPServer.__init__(self)
+
+        self.protocol = protocol
+        self.framer = FRAMERS[protocol]
+        self.port = int(port)
+        self.idle_timeout = idle_timeout
+        self.connections = {}
+        self.__conn_id = 0
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+
+        self.channel = Channel(IOStream(sock), self.__on_events,
+                               self.__on_channel_close)
+
+        self.add_sockets(bind_sockets(self.port, reuse_port=True))
+
+        self.__sweeper = \
+            tornado.ioloop.PeriodicCallback(self.__sweep,
+                                            idle_timeout * 1000 / 4)
+        self.__sweeper.start()
+
+    def handle_stream(self, stream, address):
+
+        self.__conn_id += 1
+
+        connection = WorkerConnection(self, self.__conn_id, stream)
+        self.connections[connection.conn_id] = connection
+
+        self.channel.send((EV_OPEN, connection.conn_id, address))
+
+    def remove_connection(self, connection):
+        """Forget a closed connection and notify the runtime."""
+
+        if self.connections.pop(connection.conn_id, None):
+            self.channel.send((EV_CLOSE, connection.conn_id))
+
+    def __sweep(self):
+        """Close the idle connections."""
+
+        deadline = time.time() - self.idle_timeout
+
+        for connection in list(self.connections.values()):
+            if connection.last_seen < deadline:
+                LOG.info("Connection %u idle, closing", connection.conn_id)
+                connection.stream.close()
+
+    def __on_events(self, events):
+        """Apply the events sent by the runtime."""
+
+        for event in events:
+
+            connection = self.connections.get(event[1])
+
+            if not connection or connection.stream.closed():
+                continue
+
+            if event[0] == EV_SEND:
+                connection.stream.write(event[2])
+            elif event[0] == EV_CLOSE:
+                connection.stream.close()
+
+    def __on_channel_close(self):
+        """The runtime is gone, exit."""
+
+        LOG.info("Channel closed, exiting")
+        tornado.ioloop.IOLoop.current().stop()
+
+
+class RemoteStream(object):
+    """A connection handled by a worker, as seen by the runtime.
+
+    Attributes:
+        shards: the shards (ShardMaster)
+        channel: the channel to the worker (Channel)
+        conn_id: the connection id in the worker (int)
+        connection: the connection handling the messages
+    """
+
+    def __init__(self, shards, channel, conn_id):
+
+        self.shards = shards
+        self.channel = channel
+        self.conn_id = conn_id
+        self.connection = None
+        self.__closed = False
+        self.__close_callback = None
+
+    def set_nodelay(self, value):
+        """Nagle is disabled by the worker."""
+
+        pass
+
+    def set_close_callback(self, callback):
+        """Call callback when the stream is closed."""
+
+        self.__close_callback = callback
+
+    def read_bytes(self, num_bytes, callback=None, partial=False):
+        """Frames are pushed by the worker, see ShardMaster."""
+
+        pass
+
+    def closed(self):
+        """Return True if the stream is closed."""
+
+        return self.__closed
+
+    def write(self, data):
+        """Send data to the device."""
+
+        if not self.__closed:
+            self.channel.send((EV_SEND, self.conn_id, data))
+
+    def close(self):
+        """Close the connection to the device."""
+
+        if not self.__closed:
+            self.channel.send((EV_CLOSE, self.conn_id))
+            self.on_close()
+
+    def on_close(self):
+        """Mark the stream as closed and run the close callback."""
+
+        if self.__closed:
+            return
+
+        self.__closed = True
+        self.shards.remove_stream(self)
+
+        if self.__close_callback:
+            tornado.ioloop.IOLoop.current().add_callback(
+                self.__close_callback)
+
+
+class ShardMaster(TCPServer):
+    """Starts the workers of a southbound server and relays their events.
+
+    The server must implement handle_stream(stream, address) setting its
+    connection attribute, and the connection an on_frames(frames) method.
+
+    Attributes:
+        server: the southbound server (PNFPServer)
+        protocol: the protocol name (str)
+        port: the server port (int)
+        workers: the number of workers (int)
+        idle_timeout: silent connections are closed after idle_timeout
+          seconds (int)
+        path: the unix socket the workers connect to (str)
+        streams: the remote streams (dict)
+    """
+
+    def __init__(self, server, protocol, port, workers,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+
+        TCPServer.__init__(self)
+
+        self.server = server
+        self.protocol = protocol
+        self.port = int(port)
+        self.workers = int(workers)
+        self.idle_timeout = int(idle_timeout)
+        self.streams = {}
+        self.spawned = 0
+        self.__channels = []
+        self.__processes = []
+
+        self.path = os.path.join(tempfile.gettempdir(), "empower-%s-%u.sock"
+                                 % (protocol, os.getpid()))
+
+        self.add_socket(bind_unix_socket(self.path))
+
+        for _ in range(self.workers):
+            self.__processes.append(self.__spawn())
+
+        atexit.register(self.stop_workers)
+
+        self.__respawner = \
+            tornado.ioloop.PeriodicCallback(self.__respawn, RESPAWN_INTERVAL)
+        self.__respawner.start()
+
+    def __spawn(self):
+        """Start a worker process."""
+
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [root] + [x for x in [env.get('PYTHONPATH')] if x])
+
+        self.spawned += 1
+
+        return subprocess.Popen([sys.executable, "-m", __name__,
+                                 self.protocol, str(self.port), self.path,
+                                 str(self.idle_timeout)], env=env)
+
+    def __respawn(self):
+        """Restart the workers that exited."""
+
+        for index, process in enumerate(self.__processes):
+            if process.poll() is not None:
+                LOG.warning("%s worker %u exited (%s), restarting",
+                            self.protocol, process.pid, process.returncode)
+                self.__processes[index] = self.__spawn()
+
+    def stop_workers(self):
+        """Terminate the workers."""
+
+        self.__respawner.stop()
+
+        for process in self.__processes:
+            if process.poll() is None:
+                process.terminate()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def handle_stream(self, stream, address):
+
+        channel = None
+
+        def on_events(events):
+            self.__on_events(channel, events)
+
+        def on_close():
+            self.__on_channel_close(channel)
+
+        channel = Channel(stream, on_events, on_close)
+        self.__channels.append(channel)
+
+    def remove_stream(self, stream):
+        """Forget a closed remote stream."""
+
+        self.streams.pop((id(stream.channel), stream.conn_id), None)
+
+    def __on_events(self, channel, events):
+        """Relay the events sent by a worker."""
+
+        for event in events:
+
+            key = (id(channel), event[1])
+
+            if event[0] == EV_FRAMES:
+
+                stream = self.streams.get(key)
+
+                if stream and not stream.closed():
+                    try:
+                        stream.connection.on_frames(event[2])
+                    except Exception as ex:
+                        LOG.exception(ex)
+                        stream.close()
+
+            elif event[0] == EV_OPEN:
+
+                stream = RemoteStream(self, channel, event[1])
+                self.streams[key] = stream
+
+                self.server.handle_stream(stream, event[2])
+                stream.connection = self.server.connection
+
+            elif event[0] == EV_CLOSE:
+
+                stream = self.streams.get(key)
+
+                if stream:
+                    stream.on_close()
+
+    def __on_channel_close(self, channel):
+        """A worker exited, close its connections."""
+
+        self.__channels.remove(channel)
+
+        for stream in list(self.streams.values()):
+            if stream.channel is channel:
+                stream.on_close()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'workers': self.workers,
+                'pids': [x.pid for x in self.__processes],
+                'spawned': self.spawned,
+                'channels': len(self.__channels),
+                'connections': len(self.streams),
+                'events_sent': sum(x.sent for x in self.__channels),
+                'events_received': sum(x.received for x in self.__channels),
+                'idle_timeout': self.idle_timeout}
+
+
+def main(argv):
+    """Run a worker."""
+
+    protocol, port, path, idle_timeout = argv
+
+    logging.basicConfig(level=logging.INFO)
+
+    ShardWorker(protocol, int(port), path, int(idle_timeout))
+
+    LOG.info("%s worker %u listening on %s", protocol, os.getpid(), port)
+
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -19,15 +19,17 @@
 """EmPOWER Runtime Tenant Class."""
 
 from empower.persistence.persistence import TblBelongs
-from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.datatypes.etheraddress import EtherAddress
+from empower.core.jsonserializer import Versioned
+from empower.core.jsonserializer import VersionedDict
 
 T_TYPE_SHARED = "shared"
 T_TYPE_UNIQUE = "unique"
 T_TYPES = [T_TYPE_SHARED, T_TYPE_UNIQUE]
 
 
-class Tenant(object):
+class Tenant(Versioned):
     """Tenant object representing a network slice.
 
     This represents basically a virtual network or slice requested and managed
@@ -63,14 +65,15 @@ class Tenant(object):
         self.owner = owner
         self.desc = desc
         self.bssid_type = bssid_type
-        self.wtps = {}
-        self.cpps = {}
-        self.vbses = {}
-        self.lvaps = {}
-        self.ues = {}
-        self.lvnfs = {}
+        self.wtps = VersionedDict(self)
+        self.cpps = VersionedDict(self)
+        self.vbses = VersionedDict(self)
+        self.lvaps = VersionedDict(self)
+        self.ues = VersionedDict(self)
+        self.lvnfs = VersionedDict(self)
         self.vaps = {}
         self.components = {}
+        self.wtp_index = None
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Poll """
@@ -79,19 +82,47 @@ class Tenant(object):
 
         for field in self.TO_DICT:
             attr = getattr(self, field)
-            if type(attr) is dict:
+            if isinstance(attr, dict):
                 out[field] = {str(k): v for k, v in attr.items()}
             else:
                 out[field] = attr
 
         return out
 
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        out = []
+
+        for field in self.TO_DICT:
+            attr = getattr(self, field)
+            if isinstance(attr, dict):
+                out.extend(attr.values())
+
+        return out
+
     def get_prefix(self):
         """Return tenant prefix."""
 
         tokens = [self.tenant_id.hex[0:12][i:i + 2] for i in range(0, 12, 2)]
         return EtherAddress(':'.join(tokens))
 
+    def load_pnfdev(self, pnfdev):
+        """Add a PNF Dev to the Tenant without saving it to the DB.
+
+        Args:
+            pnfdev, a PNFDev object
+
+        Returns:
+            None
+        """
+
+        pnfdevs = getattr(self, pnfdev.ALIAS)
+        pnfdevs[pnfdev.addr] = pnfdev
+
+        if self.wtp_index:
+            self.wtp_index.add_pnfdev(self, pnfdev)
+
     def add_pnfdev(self, pnfdev):
         """Add a new PNF Dev to the Tenant.
 
@@ -110,13 +141,11 @@ class Tenant(object):
         if pnfdev.addr in pnfdevs:
             return
 
-        pnfdevs[pnfdev.addr] = pnfdev
+        self.load_pnfdev(pnfdev)
 
         belongs = TblBelongs(tenant_id=self.tenant_id, addr=pnfdev.addr)
 
-        session = Session()
-        session.add(belongs)
-        session.commit()
+        Writer.instance().add(belongs)
 
     def remove_pnfdev(self, pnfdev):
         """Remove a PNFDev from the Tenant.
@@ -137,14 +166,45 @@ class Tenant(object):
 
         del pnfdevs[pnfdev.addr]
 
-        belongs = Session().query(TblBelongs) \
-                           .filter(TblBelongs.tenant_id == self.tenant_id,
-                                   TblBelongs.addr == pnfdev.addr) \
-                           .first()
+        if self.wtp_index:
+            self.wtp_index.remove_pnfdev(self, pnfdev)
+
+        Writer.instance().delete(TblBelongs,
+                                 TblBelongs.tenant_id == self.tenant_id,
+                                 TblBelongs.addr == pnfdev.addr)
+
+    def add_vap(self, vap):
+        """Add a VAP to the Tenant.
+
+        Args:
+            vap, a VAP object
+
+        Returns:
+            None
+        """
+
+        self.vaps[vap.net_bssid] = vap
 
-        session = Session()
-        session.delete(belongs)
-        session.commit()
+        if self.wtp_index:
+            self.wtp_index.add_vap(vap)
+
+    def remove_vap(self, vap):
+        """Remove a VAP from the Tenant.
+
+        Args:
+            vap, a VAP object
+
+        Returns:
+            None
+        """
+
+        if vap.net_bssid not in self.vaps:
+            return
+
+        del self.vaps[vap.net_bssid]
+
+        if self.wtp_index:
+            self.wtp_index.remove_vap(vap)
 
     def __str__(self):
         return str(self.tenant_id)
@@ -159,3 +219,203 @@ class Tenant(object):
 
     def __ne__(self, other):
         return not self.__eq__(other)
+
+
+class WTPIndex(object):
+    """Per-WTP view of the tenants.
+
+    Keeps, for each WTP address, the tenants including the WTP, the SSIDs of
+    the unique-BSSID tenants served by the WTP, and the VAPs hosted by the
+    WTP. Used by the LVAPP handlers in order to avoid scanning every tenant
+    and every VAP on probe/auth/assoc requests.
+    """
+
+    def __init__(self):
+
+        self.__tenants = {}
+        self.__ssids = {}
+        self.__vaps = {}
+
+    def tenants(self, wtp_addr):
+        """Return the tenants including the WTP."""
+
+        return list(self.__tenants.get(wtp_addr, {}).values())
+
+    def ssids(self, wtp_addr):
+        """Return the SSIDs of the unique tenants including the WTP."""
+
+        return set(self.__ssids.get(wtp_addr, ()))
+
+    def vaps(self, wtp_addr):
+        """Return the VAPs hosted by the WTP (a dict indexed by BSSID)."""
+
+        return dict(self.__vaps.get(wtp_addr, {}))
+
+    def vap(self, wtp_addr, net_bssid):
+        """Return the VAP with the specified BSSID hosted by the WTP."""
+
+        vaps = self.__vaps.get(wtp_addr)
+
+        if not vaps:
+            return None
+
+        return vaps.get(net_bssid)
+
+    def add_tenant(self, tenant):
+        """Index all the WTPs and VAPs of a tenant."""
+
+        for wtp in tenant.wtps.values():
+            self.add_pnfdev(tenant, wtp)
+
+        for vap in tenant.vaps.values():
+            self.add_vap(vap)
+
+    def remove_tenant(self, tenant):
+        """Remove all the WTPs and VAPs of a tenant."""
+
+        for wtp in tenant.wtps.values():
+            self.remove_pnfdev(tenant, wtp)
+
+        for vap in tenant.vaps.values():
+            self.remove_vap(vap)
+
+    def add_pnfdev(self, tenant, pnfdev):
+        """Index a PNFDev added to a tenant (only WTPs are indexed)."""
+
+        if pnfdev.ALIAS != "wtps":
+            return
+
+        tenants = self.__tenants.setdefault(pnfdev.addr, {})
+        tenants[tenant.tenant_id] = tenant
+
+        if tenant.bssid_type != T_TYPE_SHARED:
+            ssids = self.__ssids.setdefault(pnfdev.addr, set())
+            ssids.add(tenant.tenant_name)
+
+    def remove_pnfdev(self, tenant, pnfdev):
+        """Remove a PNFDev removed from a tenant."""
+
+        if pnfdev.ALIAS != "wtps":
+            return
+
+        tenants = self.__tenants.get(pnfdev.addr, {})
+
+        if tenant.tenant_id in tenants:
+            del tenants[tenant.tenant_id]
+
+        if not tenants and pnfdev.addr in self.__tenants:
+            del self.__tenants[pnfdev.addr]
+
+        ssids = self.__ssids.get(pnfdev.addr, set())
+        ssids.discard(tenant.tenant_name)
+
+        if not ssids and pnfdev.addr in self.__ssids:
+            del self.__ssids[pnfdev.addr]
+
+    def add_vap(self, vap):
+        """Index a VAP."""
+
+        vaps = self.__vaps.setdefault(vap.wtp.addr, {})
+        vaps[vap.net_bssid] = vap
+
+    def remove_vap(self, vap):
+        """Remove a VAP."""
+
+        vaps = self.__vaps.get(vap.wtp.addr, {})
+
+        if vaps.get(vap.net_bssid) is vap:
+            del vaps[vap.net_bssid]
+
+        if not vaps and vap.wtp.addr in self.__vaps:
+            del self.__vaps[vap.wtp.addr]
+
+
+class TenantRegistry(dict):
+    """The tenants currently defined in the runtime.
+
+    A dict of tenants indexed by tenant id that also keeps secondary
+    indexes by tenant name and by PLMN id, and the per-WTP index of the
+    tenants (see WTPIndex). The indexes are updated every time a tenant is
+    added to or removed from the registry.
+    """
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.__by_name = {}
+        self.__by_plmn_id = {}
+        self.wtp_index = WTPIndex()
+
+    def __setitem__(self, tenant_id, tenant):
+
+        if tenant_id in self:
+            self.__unindex(self[tenant_id])
+
+        super().__setitem__(tenant_id, tenant)
+
+        tenant.wtp_index = self.wtp_index
+        self.wtp_index.add_tenant(tenant)
+
+        self.__by_name[tenant.tenant_name] = tenant
+
+        # several tenants can share the same plmn id, the oldest one wins
+        if tenant.plmn_id not in self.__by_plmn_id:
+            self.__by_plmn_id[tenant.plmn_id] = tenant
+
+    def __delitem__(self, tenant_id):
+
+        tenant = self[tenant_id]
+
+        super().__delitem__(tenant_id)
+
+        self.__unindex(tenant)
+
+    def __unindex(self, tenant):
+        """Remove tenant from the secondary indexes."""
+
+        self.wtp_index.remove_tenant(tenant)
+        tenant.wtp_index = None
+
+        if self.__by_name.get(tenant.tenant_name) is tenant:
+            del self.__by_name[tenant.tenant_name]
+
+        if self.__by_plmn_id.get(tenant.plmn_id) is tenant:
+
+            del self.__by_plmn_id[tenant.plmn_id]
+
+            for other in self.values():
+                if other.plmn_id == tenant.plmn_id:
+                    self.__by_plmn_id[other.plmn_id] = other
+                    break
+
+    def pop(self, tenant_id, *default):
+
+        if tenant_id not in self:
+            return super().pop(tenant_id, *default)
+
+        tenant = self[tenant_id]
+        del self[tenant_id]
+
+        return tenant
+
+    def clear(self):
+
+        for tenant in self.values():
+            tenant.wtp_index = None
+
+        super().clear()
+
+        self.__by_name.clear()
+        self.__by_plmn_id.clear()
+        self.wtp_index = WTPIndex()
+
+    def by_name(self, tenant_name):
+        """Return the tenant with the specified name or None."""
+
+        return self.__by_name.get(tenant_name)
+
+    def by_plmn_id(self, plmn_id):
+        """Return the tenant with the specified PLMN id or None."""
+
+        return self.__by_plmn_id.get(plmn_id)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER hierarchical timer wheel.
+
+All the periodic tasks of modules and apps are driven by a single IOLoop
+timer ticking every DEFAULT_TICK ms. Timers are kept in a hierarchical
+wheel (256 slots at the first level, 64 slots at each of the upper levels)
+so that adding, removing and expiring a timer are O(1) operations.
+
+Timers registered at the same time are spread over their period in order to
+avoid synchronized bursts of requests towards the devices. A small random
+jitter can also be added to each expiration.
+"""
+
+import math
+import random
+
+import tornado.ioloop
+
+import empower.logger
+
+LOG = empower.logger.get_logger()
+
+# Tick resolution in ms
+DEFAULT_TICK = 10
+
+# Maximum delay added to each expiration (as a fraction of the period)
+DEFAULT_JITTER = 0.02
+
+# Golden ratio conjugate, consecutive phases are evenly spread over [0, 1)
+PHASE_STEP = 0.6180339887498949
+
+LEVEL0_BITS = 8
+LEVELN_BITS = 6
+LEVELS = 4
+
+LEVEL0_MASK = (1 << LEVEL0_BITS) - 1
+LEVELN_MASK = (1 << LEVELN_BITS) - 1
+
+# Ticks covered by the whole wheel
+MAX_DELTA = 1 << (LEVEL0_BITS + LEVELN_BITS * (LEVELS - 1))
+
+
+class Timer(object):
+    """A periodic timer driven by a TimerWheel.
+
+    Mirrors the interface of tornado's PeriodicCallback.
+
+    Attributes:
+        callback: the function to be called
+        callback_time: the period in ms
+        kind: the timer kind, scheduling lag is reported per kind (str)
+        jitter: maximum delay added to each expiration, as a fraction of
+          the period (float)
+        wheel: the TimerWheel, the global one is used if None
+    """
+
+    def __init__(self, callback, callback_time, kind=None,
+                 jitter=DEFAULT_JITTER, wheel=None):
+
+        if callback_time <= 0:
+            raise ValueError("Periodic callback must have a positive "
+                             "callback_time")
+
+        self.callback = callback
+        self.callback_time = callback_time
+        self.kind = kind if kind else \
+            getattr(callback, '__qualname__', 'timer')
+        self.jitter = jitter
+        self.wheel = wheel
+        self.deadline = 0.0
+        self.expires = 0.0
+        self.tick = 0
+        self.slot = None
+        self.__running = False
+
+    def start(self):
+        """Start the timer."""
+
+        if self.__running:
+            return
+
+        if not self.wheel:
+            self.wheel = TimerWheel.instance()
+
+        self.__running = True
+        self.wheel.add(self)
+
+    def stop(self):
+        """Stop the timer."""
+
+        if not self.__running:
+            return
+
+        self.__running = False
+        self.wheel.remove(self)
+
+    def is_running(self):
+        """Return True if the timer has been started."""
+
+        return self.__running
+
+
+class TimerWheel(object):
+    """Hierarchical timer wheel.
+
+    Attributes:
+        tick: the tick resolution in ms
+        ticks: number of ticks in which at least one timer expired
+        stats: per kind scheduling statistics
+    """
+
+    __instance = None
+
+    def __init__(self, tick=DEFAULT_TICK):
+
+        self.tick = tick
+        self.ticks = 0
+        self.stats = {}
+
+        self.__wheel = [[set() for _ in range(1 << LEVEL0_BITS)]]
+        for _ in range(1, LEVELS):
+            self.__wheel.append([set() for _ in range(1 << LEVELN_BITS)])
+
+        self.__origin = 0.0
+        self.__current = 0
+        self.__timers = 0
+        self.__phase = 0.0
+        self.__periodic = None
+
+    @classmethod
+    def instance(cls):
+        """Return the global TimerWheel."""
+
+        if not cls.__instance:
+            cls.__instance = TimerWheel()
+
+        return cls.__instance
+
+    @classmethod
+    def now(cls):
+        """Return the IOLoop time."""
+
+        return tornado.ioloop.IOLoop.current().time()
+
+    def add(self, timer):
+        """Add a timer, the first expiration is spread over the period."""
+
+        now = self.now()
+
+        if not self.__timers:
+            self.__origin = now
+            self.__current = 0
+            self.__periodic = \
+                tornado.ioloop.PeriodicCallback(self.__run, self.tick)
+            self.__periodic.start()
+
+        self.__phase = (self.__phase + PHASE_STEP) % 1.0
+
+        timer.deadline = now + \
+            timer.callback_time * (1.0 - self.__phase) / 1000.0
+
+        self.__schedule(timer)
+
+        self.__timers += 1
+
+        if timer.kind not in self.stats:
+            self.stats[timer.kind] = {'timers': 0,
+                                      'fired': 0,
+                                      'lag_total': 0.0,
+                                      'lag_max': 0.0,
+                                      'lag_last': 0.0}
+
+        self.stats[timer.kind]['timers'] += 1
+
+    def remove(self, timer):
+        """Remove a timer."""
+
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+            timer.slot = None
+
+        self.__timers -= 1
+        self.stats[timer.kind]['timers'] -= 1
+
+        if not self.__timers:
+            self.__periodic.stop()
+            self.__periodic = None
+
+    def __schedule(self, timer):
+        """Put a timer in the wheel according to its deadline."""
+
+        delay = 0.0
+
+        if timer.jitter:
+            delay = random.random() * timer.jitter * timer.callback_time
+
+        timer.expires = timer.deadline + delay / 1000.0
+
+        tick = int(math.ceil((timer.expires - self.__origin) * 1000.0 /
+                             self.tick))
+
+        timer.tick = max(tick, self.__current + 1)
+
+        self.__insert(timer)
+
+    def __insert(self, timer):
+        """Insert a timer in the slot matching its expiration tick."""
+
+        delta = timer.tick - self.__current
+
+        if delta <= LEVEL0_MASK:
+            slot = self.__wheel[0][timer.tick & LEVEL0_MASK]
+        else:
+            tick = timer.tick
+            if delta >= MAX_DELTA:
+                tick = self.__current + MAX_DELTA - 1
+            level = 1
+            while delta >= 1 << (LEVEL0_BITS + LEVELN_BITS * level) and \
+                    level < LEVELS - 1:
+                level += 1
+            shift = LEVEL0_BITS + LEVELN_BITS * (level - 1)
+            slot = self.__wheel[level][(tick >> shift) & LEVELN_MASK]
+
+        slot.add(timer)
+        timer.slot = slot
+
+    def __cascade(self, level):
+        """Move the timers in the current slot of level to lower levels."""
+
+        shift = LEVEL0_BITS + LEVELN_BITS * (level - 1)
+        index = (self.__current >> shift) & LEVELN_MASK
+        slot = self.__wheel[level][index]
+        timers = list(slot)
+        slot.clear()
+
+        for timer in timers:
+            self.__insert(timer)
+
+        return index
+
+    def __advance(self):
+        """Advance the wheel by one tick, return the expired timers."""
+
+        self.__current += 1
+
+        if not self.__current & LEVEL0_MASK:
+            level = 1
+            while level < LEVELS and not self.__cascade(level):
+                level += 1
+
+        slot = self.__wheel[0][self.__current & LEVEL0_MASK]
+
+        if not slot:
+            return []
+
+        expired = list(slot)
+        slot.clear()
+
+        for timer in expired:
+            timer.slot = None
+
+        return expired
+
+    def __run(self):
+        """Expire all the timers due up to now."""
+
+        now = self.now()
+        target = int((now - self.__origin) * 1000.0 / self.tick)
+        expired = []
+
+        while self.__current < target:
+            expired.extend(self.__advance())
+
+        if not expired:
+            return
+
+        self.ticks += 1
+
+        # timers of the same kind are run together
+        expired.sort(key=lambda x: x.kind)
+
+        for timer in expired:
+
+            if not timer.is_running() or timer.slot is not None:
+                continue
+
+            lag = max(0.0, (now - timer.expires) * 1000.0)
+
+            stats = self.stats[timer.kind]
+            stats['fired'] += 1
+            stats['lag_total'] += lag
+            stats['lag_last'] = lag
+            stats['lag_max'] = max(stats['lag_max'], lag)
+
+            try:
+                timer.callback()
+            except Exception as ex:
+                LOG.exception(ex)
+
+            # the callback may have stopped or restarted the timer
+            if not timer.is_running() or timer.slot is not None:
+                continue
+
+            period = timer.callback_time / 1000.0
+            timer.deadline += period
+
+            # skip the missed expirations
+            if timer.deadline <= now:
+                missed = math.floor((now - timer.deadline) / period) + 1
+                timer.deadline += missed * period
+
+            self.__schedule(timer)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        kinds = {}
+
+        for kind, stats in self.stats.items():
+
+            fired = stats['fired']
+            lag_avg = stats['lag_total'] / fired if fired else 0.0
+
+            kinds[kind] = {'timers': stats['timers'],
+                           'fired': fired,
+                           'lag_avg': lag_avg,
+                           'lag_max': stats['lag_max'],
+                           'lag_last': stats['lag_last']}
+
+        return {'tick': self.tick,
+                'timers': self.__timers,
+                'ticks': self.ticks,
+                'kinds': kinds}
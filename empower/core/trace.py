@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER southbound traffic capture.
+
+The frames received on the LVAPP, VBSP, and LVNFP connections are appended,
+with their arrival time, to a binary trace file which can be fed back into
+the runtime by empower.core.replay.
+
+A trace file starts with MAGIC and the format version, followed by records
+made of a RECORD header (kind, protocol, connection id, microseconds since
+the start of the capture, payload length) and of the payload:
+
+  - REC_OPEN: a new connection, the payload is the peer name
+  - REC_FRAME: a frame, as received from the device (VBSP frames are
+    stored without their size prefix, LVNFP messages are UTF-8 encoded)
+  - REC_CLOSE: the connection was closed, no payload
+
+Files whose name ends in .gz are gzip compressed. Capturing costs a dict
+lookup and a buffered write per frame; nothing is done when no capture is
+running.
+"""
+
+import os
+import gzip
+import time
+import struct
+import weakref
+import collections
+
+import tornado.ioloop
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+MAGIC = b"EMPTRACE"
+VERSION = 1
+
+FILE_HEADER = struct.Struct(">8sB")
+
+# kind, protocol, connection id, timestamp (us), payload length
+RECORD = struct.Struct(">BBIQI")
+
+REC_OPEN = 0
+REC_FRAME = 1
+REC_CLOSE = 2
+
+PROTOCOLS = {"lvapp": 0, "vbsp": 1, "lvnfp": 2}
+PROTOCOL_NAMES = {v: k for k, v in PROTOCOLS.items()}
+
+# The capture stops when the file reaches this size
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Write buffer size
+BUFFER_SIZE = 1 << 20
+
+# Buffered records are written to disk at least every FLUSH_INTERVAL ms
+FLUSH_INTERVAL = 1000
+
+TraceRecord = collections.namedtuple("TraceRecord", ["kind", "protocol",
+                                                     "conn_id", "timestamp",
+                                                     "data"])
+
+
+def trace_path(directory, name):
+    """Return the path of the trace file name in directory.
+
+    The directory is created if it does not exist.
+
+    Args:
+        directory: the trace directory
+        name: the trace file name, without any directory
+
+    Returns:
+        The path of the trace file
+
+    Raises:
+        ValueError: if name is not a plain file name
+    """
+
+    separators = [x for x in (os.sep, os.altsep) if x]
+
+    if not isinstance(name, str) or name in ("", ".", "..") or \
+       "\x00" in name or any(x in name for x in separators):
+        raise ValueError("Invalid trace name %s" % name)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as ex:
+        raise ValueError(str(ex))
+
+    return os.path.join(directory, name)
+
+
+def open_trace(filename, mode):
+    """Open a trace file, gzip compressed if its name ends in .gz."""
+
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode, compresslevel=1)
+
+    return open(filename, mode, buffering=BUFFER_SIZE)
+
+
+def read_trace(filename):
+    """Read a trace file.
+
+    Args:
+        filename: the trace file
+
+    Returns:
+        A generator of TraceRecord, the protocol is its name and the
+        timestamp is in seconds since the start of the capture
+
+    Raises:
+        ValueError: if the file is not a valid trace
+    """
+
+    with open_trace(filename, "rb") as trace:
+
+        header = trace.read(FILE_HEADER.size)
+
+        if len(header) != FILE_HEADER.size:
+            raise ValueError("Truncated trace header")
+
+        magic, version = FILE_HEADER.unpack(header)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Invalid trace %s" % filename)
+
+        while True:
+
+            header = trace.read(RECORD.size)
+
+            if not header:
+                return
+
+            if len(header) != RECORD.size:
+                LOG.warning("Truncated record at the end of %s", filename)
+                return
+
+            kind, protocol, conn_id, timestamp, length = \
+                RECORD.unpack(header)
+
+            data = trace.read(length)
+
+            if len(data) != length:
+                LOG.warning("Truncated record at the end of %s", filename)
+                return
+
+            yield TraceRecord(kind, PROTOCOL_NAMES.get(protocol), conn_id,
+                              timestamp / 1000000, data)
+
+
+class Tracer(object):
+    """Captures the southbound traffic to a trace file.
+
+    Attributes:
+        running: True if a capture is running (bool)
+        filename: the trace file (str)
+        protocols: the captured protocols (set)
+        max_bytes: the capture stops when the file reaches this size (int)
+        records: number of records written (int)
+        bytes: number of bytes written (int)
+    """
+
+    __instance = None
+
+    def __init__(self):
+
+        self.running = False
+        self.filename = None
+        self.protocols = set()
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.records = 0
+        self.bytes = 0
+        self.started = None
+        self.__file = None
+        self.__flush = None
+        self.__conn_ids = weakref.WeakKeyDictionary()
+        self.__next_conn_id = 0
+
+    @classmethod
+    def instance(cls):
+        """Return the global Tracer."""
+
+        if not cls.__instance:
+            cls.__instance = Tracer()
+
+        return cls.__instance
+
+    def start(self, filename, protocols=None, max_bytes=DEFAULT_MAX_BYTES):
+        """Start a capture.
+
+        Args:
+            filename: the trace file, overwritten if it exists
+            protocols: the protocols to capture, all if None (list)
+            max_bytes: the capture stops when the file reaches this size
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: if a protocol is not valid or a capture is running
+        """
+
+        if self.running:
+            raise ValueError("A capture is already running")
+
+        protocols = set(protocols) if protocols else set(PROTOCOLS)
+
+        for protocol in protocols:
+            if protocol not in PROTOCOLS:
+                raise ValueError("Invalid protocol %s" % protocol)
+
+        try:
+            self.__file = open_trace(filename, "wb")
+        except OSError as ex:
+            raise ValueError(str(ex))
+
+        self.__file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+        self.filename = filename
+        self.protocols = protocols
+        self.max_bytes = int(max_bytes)
+        self.records = 0
+        self.bytes = FILE_HEADER.size
+        self.started = time.time()
+        self.__conn_ids = weakref.WeakKeyDictionary()
+        self.__next_conn_id = 0
+        self.running = True
+
+        self.__flush = tornado.ioloop.PeriodicCallback(self.flush,
+                                                       FLUSH_INTERVAL)
+        self.__flush.start()
+
+        LOG.info("Capturing %s to %s", ",".join(sorted(protocols)), filename)
+
+    def stop(self):
+        """Stop the capture."""
+
+        if not self.running:
+            return
+
+        self.running = False
+        self.__flush.stop()
+        self.__file.close()
+        self.__file = None
+
+        LOG.info("Capture stopped, %u records (%u bytes) written to %s",
+                 self.records, self.bytes, self.filename)
+
+    def flush(self):
+        """Write the buffered records to disk."""
+
+        if self.running:
+            self.__file.flush()
+
+    def __write(self, kind, protocol, conn_id, data):
+        """Write a record."""
+
+        timestamp = int((time.time() - self.started) * 1000000)
+
+        self.__file.write(RECORD.pack(kind, PROTOCOLS[protocol], conn_id,
+                                      max(timestamp, 0), len(data)))
+        self.__file.write(data)
+
+        self.records += 1
+        self.bytes += RECORD.size + len(data)
+
+        if self.max_bytes and self.bytes >= self.max_bytes:
+            LOG.warning("Trace %s reached %u bytes", self.filename,
+                        self.max_bytes)
+            self.stop()
+
+    def record(self, protocol, connection, name, data):
+        """Record a frame received on a connection.
+
+        Args:
+            protocol: the protocol name (str)
+            connection: the connection receiving the frame
+            name: the connection name, stored when the connection is first
+                seen (str)
+            data: the frame (bytes)
+
+        Returns:
+            None
+        """
+
+        if protocol not in self.protocols:
+            return
+
+        conn_id = self.__conn_ids.get(connection)
+
+        if conn_id is None:
+            self.__next_conn_id += 1
+            conn_id = self.__conn_ids[connection] = self.__next_conn_id
+            self.__write(REC_OPEN, protocol, conn_id, name.encode())
+
+        if self.running:
+            self.__write(REC_FRAME, protocol, conn_id, data)
+
+    def close(self, protocol, connection):
+        """Record the closing of a connection."""
+
+        conn_id = self.__conn_ids.pop(connection, None)
+
+        if self.running and conn_id is not None:
+            self.__write(REC_CLOSE, protocol, conn_id, b'')
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'running': self.running,
+                'filename': self.filename,
+                'protocols': sorted(self.protocols),
+                'max_bytes': self.max_bytes,
+                'records': self.records,
+                'bytes': self.bytes}
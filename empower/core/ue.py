@@ -18,6 +18,7 @@
 """User Equipment class."""
 
 from empower.core.utils import hex_to_ether
+from empower.core.jsonserializer import Versioned
 
 from empower.main import RUNTIME
 
@@ -25,9 +26,19 @@ import empower.logger
 LOG = empower.logger.get_logger()
 
 
-class UE(object):
+class UE(Versioned):
     """User Equipment."""
 
+    TO_DICT = ['addr',
+               'rnti',
+               'plmn_id',
+               'imsi',
+               'vbs',
+               'rrc_state',
+               'capabilities',
+               'rrc_meas_config',
+               'rrc_meas']
+
     def __init__(self, addr, rnti, vbs):
 
         self.addr = addr
@@ -42,6 +53,11 @@ class UE(object):
         self.pcell_rsrp = None
         self.pcell_rsrq = None
 
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        return [self.vbs]
+
     @property
     def plmn_id(self):
         """Get the plmn_id."""
@@ -84,20 +100,29 @@ class UE(object):
         # Raise UE join
         self.vbs.connection.server.send_ue_join_message_to_self(self)
 
-    def to_dict(self):
-        """ Return a JSON-serializable dictionary representing the UE """
-
-        return {'addr': self.addr,
-                'rnti': self.rnti,
-                'plmn_id': self.plmn_id,
-                'imsi': self.imsi,
-                'vbs': self.vbs,
-                'rrc_state': self.rrc_state,
-                'capabilities': self.capabilities,
-                'rrc_meas_config': self.rrc_meas_config,
-                'rrc_meas': self.rrc_meas,
-                'primary_cell_rsrp': self.pcell_rsrp,
-                'primary_cell_rsrq': self.pcell_rsrq}
+    def to_dict(self, fields=None):
+        """ Return a JSON-serializable dictionary representing the UE
+
+        Args:
+            fields: the entries to be returned, all of them if None
+
+        Returns:
+            A dictionary
+        """
+
+        out = {}
+
+        for field in self.TO_DICT:
+            if fields is None or field in fields:
+                out[field] = getattr(self, field)
+
+        if fields is None or 'primary_cell_rsrp' in fields:
+            out['primary_cell_rsrp'] = self.pcell_rsrp
+
+        if fields is None or 'primary_cell_rsrq' in fields:
+            out['primary_cell_rsrq'] = self.pcell_rsrq
+
+        return out
 
     def __hash__(self):
         return hash(self.addr)
@@ -28,37 +28,29 @@ def rnti_to_ue_id(rnti, enb_id):
     two bytes are the rnti
     """
 
-    rnti_tuple = hex_to_ether(rnti).to_str().split(":")
-    enb_id_tuple = hex_to_ether(enb_id).to_str().split(":")
-    x = ("0", "0", rnti_tuple[4], rnti_tuple[5],
-         enb_id_tuple[4], enb_id_tuple[5])
-
-    return EtherAddress(":".join(x))
+    return EtherAddress(((rnti & 0xFFFF) << 16) | (enb_id & 0xFFFF))
 
 
 def hex_to_ether(in_hex):
     """Convert Int to EtherAddress."""
 
-    str_hex_value = format(in_hex, 'x')
-    padding = '0' * (12 - len(str_hex_value))
-    mac_string = padding + str_hex_value
-    mac_string_array = \
-        [mac_string[i:i+2] for i in range(0, len(mac_string), 2)]
-
-    return EtherAddress(":".join(mac_string_array))
+    return EtherAddress(in_hex)
 
 
 def ether_to_hex(ether):
     """Convert EtherAddress to Int."""
 
-    return int.from_bytes(ether.to_raw(), byteorder='big')
+    return ether.to_int()
 
 
 def generate_bssid(base_mac, sta_mac):
-    """ Generate a new BSSID address. """
+    """ Generate a new BSSID address.
+
+    The BSSID is made of the first three bytes of the base address (with the
+    multicast bit cleared) and of the last three bytes of the station address.
+    """
+
+    base = EtherAddress(base_mac).to_int() & 0xFEFFFF000000
+    sta = EtherAddress(sta_mac).to_int() & 0x000000FFFFFF
 
-    base = str(base_mac).split(":")[0:3]
-    unicast_addr_mask = int(base[0], 16) & 0xFE
-    base[0] = str(format(unicast_addr_mask, 'X'))
-    sta = str(sta_mac).split(":")[3:6]
-    return EtherAddress(":".join(base + sta))
+    return EtherAddress(base | sta)
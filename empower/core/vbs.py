@@ -38,15 +38,10 @@ class VBS(BasePNFDev):
     ALIAS = "vbses"
     SOLO = "vbs"
 
+    TO_DICT = BasePNFDev.TO_DICT + ['enb_id']
+
     @property
     def enb_id(self):
         """Return tenant id."""
 
         return ether_to_hex(self.addr)
-
-    def to_dict(self):
-        """Return a JSON-serializable dictionary representing the CPP."""
-
-        out = super().to_dict()
-        out['enb_id'] = self.enb_id
-        return out
@@ -18,6 +18,7 @@
 """Wireless Termination Point."""
 
 from empower.core.pnfdev import BasePNFDev
+from empower.core.resourcepool import ResourceBlockSet
 
 
 class WTP(BasePNFDev):
@@ -39,13 +40,39 @@ class WTP(BasePNFDev):
     ALIAS = "wtps"
     SOLO = "wtp"
 
+    TO_DICT = BasePNFDev.TO_DICT + ['supports']
+
     def __init__(self, addr, label):
         super().__init__(addr, label)
-        self.supports = set()
+        self.__supports = ResourceBlockSet()
+
+    @property
+    def supports(self):
+        """Return the set of resource blocks supported by the WTP."""
+
+        return self.__supports
+
+    @supports.setter
+    def supports(self, supports):
+        """Set the resource blocks supported by the WTP."""
+
+        self.__supports = ResourceBlockSet(supports)
+
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        return super().version_deps() + list(self.supports)
+
+    def get_block(self, hwaddr, channel, band):
+        """Return the supported block matching the specified fields.
+
+        Args:
+            hwaddr: the mac address of the wireless interface (EtherAddress)
+            channel: the channel id (int)
+            band: the band type (int)
 
-    def to_dict(self):
-        """Return a JSON-serializable dictionary representing the CPP."""
+        Returns:
+            The matching ResourceBlock or None if the WTP does not support it
+        """
 
-        out = super().to_dict()
-        out['supports'] = self.supports
-        return out
+        return self.__supports.find(hwaddr, channel, band)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER XML-RPC callbacks dispatcher.
+
+Remote callbacks are delivered by a pool of threads. Each remote endpoint
+(i.e. URL) has its own bounded queue and a persistent connection, and at
+most one batch of calls in flight, so that a slow endpoint can neither
+exhaust the pool nor grow its queue indefinitely. Calls queued while a
+batch is in flight are delivered together using system.multicall (if the
+remote server supports it). Failed deliveries are retried with an
+exponential backoff.
+"""
+
+import http.client
+import xmlrpc.client
+
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+import tornado.ioloop
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# Number of delivery threads
+DEFAULT_WORKERS = 10
+
+# Maximum number of calls queued for each endpoint
+DEFAULT_QUEUE = 1000
+
+# Maximum number of calls in a multicall
+DEFAULT_BATCH = 50
+
+# Retry delay bounds (in s)
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 30.0
+
+# Errors after which a delivery is retried
+TRANSIENT_ERRORS = (OSError, http.client.HTTPException,
+                    xmlrpc.client.ProtocolError)
+
+
+class Endpoint(object):
+    """A remote XML-RPC endpoint.
+
+    Attributes:
+        url: the endpoint URL (str)
+        size: maximum number of queued calls (int)
+        batch: maximum number of calls delivered at once (int)
+        multicall: whether the endpoint supports system.multicall (bool)
+        delivered: number of calls delivered (int)
+        failed: number of calls that returned a fault (int)
+        dropped: number of calls dropped because the queue was full (int)
+        retries: number of failed deliveries (int)
+        last_error: the last delivery error (str)
+    """
+
+    def __init__(self, url, pool, size=DEFAULT_QUEUE, batch=DEFAULT_BATCH):
+
+        self.url = url
+        self.pool = pool
+        self.size = size
+        self.batch = batch
+        self.multicall = True
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.last_error = None
+        self.__queue = deque()
+        self.__busy = False
+        self.__backoff = 0.0
+        self.__retry = None
+        self.__proxy = xmlrpc.client.ServerProxy(url, allow_none=True)
+
+    def push(self, method, args):
+        """Queue a call, the oldest call is dropped if the queue is full."""
+
+        if len(self.__queue) >= self.size:
+
+            self.__queue.popleft()
+            self.dropped += 1
+
+            if self.dropped % self.size == 1:
+                LOG.warning("Callback queue for %s full, %u calls dropped",
+                            self.url, self.dropped)
+
+        self.__queue.append((method, args))
+        self.pump()
+
+    def pump(self):
+        """Deliver the queued calls unless a delivery is in progress."""
+
+        if self.__busy or self.__retry or not self.__queue:
+            return
+
+        nb_calls = min(len(self.__queue), self.batch)
+        calls = [self.__queue.popleft() for _ in range(nb_calls)]
+
+        ioloop = tornado.ioloop.IOLoop.instance()
+
+        def on_success(results):
+            ioloop.add_callback(self.__done, calls, results, None)
+
+        def on_error(error):
+            ioloop.add_callback(self.__done, calls, None, error)
+
+        self.__busy = True
+        self.pool.apply_async(self.__deliver, (calls, ),
+                              callback=on_success, error_callback=on_error)
+
+    def __deliver(self, calls):
+        """Execute the calls (runs in a worker thread).
+
+        Returns:
+            The list of results, a result is a Fault if the call failed
+        """
+
+        if len(calls) > 1 and self.multicall:
+
+            multicall = xmlrpc.client.MultiCall(self.__proxy)
+
+            for method, args in calls:
+                getattr(multicall, method)(*args)
+
+            try:
+                return list(self.__unpack(multicall(), len(calls)))
+            except xmlrpc.client.Fault:
+                LOG.info("%s does not support multicall", self.url)
+                self.multicall = False
+
+        results = []
+
+        for method, args in calls:
+            try:
+                results.append(getattr(self.__proxy, method)(*args))
+            except xmlrpc.client.Fault as fault:
+                results.append(fault)
+
+        return results
+
+    @classmethod
+    def __unpack(cls, results, nb_calls):
+        """Return the multicall results turning errors into Faults."""
+
+        for i in range(nb_calls):
+            try:
+                yield results[i]
+            except xmlrpc.client.Fault as fault:
+                yield fault
+
+    def __done(self, calls, results, error):
+        """Account for a completed delivery (runs in the IOLoop)."""
+
+        self.__busy = False
+
+        if error is None:
+
+            self.__backoff = 0.0
+
+            for (method, _), result in zip(calls, results):
+                if isinstance(result, xmlrpc.client.Fault):
+                    self.failed += 1
+                    LOG.error("Callback %s:%s failed: %s", self.url, method,
+                              result.faultString)
+                else:
+                    self.delivered += 1
+
+            self.pump()
+            return
+
+        self.last_error = str(error)
+
+        if not isinstance(error, TRANSIENT_ERRORS):
+            self.failed += len(calls)
+            LOG.error("Callback %s failed: %s", self.url, error)
+            self.pump()
+            return
+
+        self.retries += 1
+
+        # put the calls back in the queue, dropping the oldest ones if there
+        # is not enough room
+        room = max(self.size - len(self.__queue), 0)
+
+        if room < len(calls):
+            self.dropped += len(calls) - room
+            calls = calls[len(calls) - room:]
+
+        self.__queue.extendleft(reversed(calls))
+
+        # the connection is reset at the next attempt
+        self.__proxy = xmlrpc.client.ServerProxy(self.url, allow_none=True)
+
+        self.__backoff = min(max(self.__backoff * 2, BACKOFF_MIN),
+                             BACKOFF_MAX)
+
+        LOG.warning("Callback %s failed: %s, retrying in %.1fs", self.url,
+                    error, self.__backoff)
+
+        ioloop = tornado.ioloop.IOLoop.instance()
+        self.__retry = ioloop.call_later(self.__backoff, self.__resume)
+
+    def __resume(self):
+        """Resume delivery after a backoff."""
+
+        self.__retry = None
+        self.pump()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'url': self.url,
+                'queued': len(self.__queue),
+                'busy': self.__busy,
+                'backoff': self.__backoff,
+                'multicall': self.multicall,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'last_error': self.last_error}
+
+
+class XMLRPCDispatcher(object):
+    """Deliver XML-RPC calls to remote endpoints.
+
+    Attributes:
+        endpoints: the known endpoints (dict)
+    """
+
+    __instance = None
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+
+        self.endpoints = {}
+        self.__pool = ThreadPool(workers)
+
+    @classmethod
+    def instance(cls):
+        """Return the global XMLRPCDispatcher."""
+
+        if not cls.__instance:
+            cls.__instance = XMLRPCDispatcher()
+
+        return cls.__instance
+
+    def call(self, url, method, *args):
+        """Queue a remote call.
+
+        Args:
+            url: the endpoint URL
+            method: the remote method
+            args: the method arguments
+
+        Returns:
+            None
+        """
+
+        if url not in self.endpoints:
+            self.endpoints[url] = Endpoint(url, self.__pool)
+
+        self.endpoints[url].push(method, args)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'endpoints': list(self.endpoints.values())}
@@ -150,7 +150,7 @@ class CQMLinks(Module):
                               module_id=self.module_id)
 
         msg = CQM_LINKS_REQUEST.build(stats_req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
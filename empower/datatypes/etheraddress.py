@@ -17,49 +17,132 @@
 
 """EmPOWER EtherAddress Class."""
 
+# Maximum number of raw addresses kept in the intern cache
+INTERN_MAX = 65536
+
+HEX_BYTES = tuple('%02X' % x for x in range(256))
+
 
 class EtherAddress(object):
-    """An Ethernet (MAC) address type."""
+    """An Ethernet (MAC) address type.
+
+    The address is stored as a 48-bit integer together with its raw 6 bytes
+    representation. Instances are immutable, addresses built from raw bytes
+    (i.e. the ones parsed from the wire) are interned so that the same
+    object is returned every time the same raw address is seen.
+    """
+
+    __slots__ = ('_value', '_raw', '_str')
+
+    __interned = {}
 
-    def __init__(self, addr):
+    def __new__(cls, addr=None):
         """
         Understands Ethernet address is various forms. Hex strings, raw bytes
-        strings, etc.
-        """
-        # Always stores as a 6 character string
-        if isinstance(addr, bytes) and len(addr) == 6:
-            # raw
-            self._value = addr
-        elif isinstance(addr, str):
-            if len(addr) == 17 or addr.count(':') == 5:
-                # hex
-                if len(addr) == 17:
-                    if addr[2::3] != ':::::' and addr[2::3] != '-----':
-                        raise RuntimeError("Bad format for ethernet address")
-                    # Address of form xx:xx:xx:xx:xx:xx
-                    # Pick out the hex digits only
-                    addr = ''.join(
-                        (addr[x * 3:x * 3 + 2] for x in range(0, 6)))
-                else:
-                    # Assume it's hex digits but they may not all be in
-                    # two-digit groupings (e.g., xx:x:x:xx:x:x). This actually
-                    # comes up.
-                    addr = ''.join(["%02x" % (int(x, 16),)
-                                    for x in addr.split(":")])
-
-                # We should now have 12 hex digits (xxxxxxxxxxxx).
-                # Convert to 6 raw bytes.
-                addr = b''.join(bytes((int(addr[x * 2:x * 2 + 2], 16),))
-                                for x in range(0, 6))
-            else:
+        strings, 48-bit integers, etc.
+        """
+
+        if type(addr) is bytes:
+
+            try:
+                return cls.__interned[addr]
+            except KeyError:
+                pass
+
+            if len(addr) != 6:
                 raise ValueError("Expected 6 raw bytes or some hex")
-            self._value = addr
-        elif isinstance(addr, EtherAddress):
-            self._value = addr.to_raw()
-        elif addr is None:
-            self._value = '\x00' * 6
+
+            if len(cls.__interned) >= INTERN_MAX:
+                cls.__interned.clear()
+
+            self = cls.__build(int.from_bytes(addr, 'big'), addr)
+            cls.__interned[addr] = self
+
+            return self
+
+        if isinstance(addr, EtherAddress):
+            return addr
+
+        if isinstance(addr, str):
+            return cls.__build_from_str(addr)
+
+        if isinstance(addr, int) and not isinstance(addr, bool):
+
+            if addr < 0 or addr > 0xFFFFFFFFFFFF:
+                raise ValueError("Expected a 48-bit integer")
+
+            return cls.__build(addr, addr.to_bytes(6, 'big'))
+
+        if addr is None:
+            return cls.__build(0, bytes(6))
+
+        raise ValueError("EtherAddress must be a string of 6 raw bytes")
+
+    @classmethod
+    def __build(cls, value, raw):
+        """Create a new instance from its integer and raw representations."""
+
+        self = object.__new__(cls)
+        object.__setattr__(self, '_value', value)
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_str', None)
+
+        return self
+
+    @classmethod
+    def __build_from_str(cls, addr):
+        """Parse an hex string."""
+
+        if len(addr) == 17:
+
+            # Address of form xx:xx:xx:xx:xx:xx or xx-xx-xx-xx-xx-xx
+            separators = addr[2::3]
+
+            if separators != ':::::' and separators != '-----':
+                raise RuntimeError("Bad format for ethernet address")
+
+            raw = bytes.fromhex(addr.replace(separators[0], ''))
+
+        elif addr.count(':') == 5:
+
+            # Assume it's hex digits but they may not all be in two-digit
+            # groupings (e.g., xx:x:x:xx:x:x). This actually comes up.
+            raw = bytes([int(x, 16) for x in addr.split(":")])
+
         else:
-            raise ValueError("EtherAddress must be a string of 6 raw bytes")
+            raise ValueError("Expected 6 raw bytes or some hex")
+
+        if len(raw) != 6:
+            raise ValueError("Expected 6 raw bytes or some hex")
+
+        return cls.__build(int.from_bytes(raw, 'big'), raw)
+
+    @classmethod
+    def from_raw_list(cls, raws):
+        """Return a list of EtherAddress from a list of 6-bytes objects."""
+
+        interned = cls.__interned.get
+
+        return [interned(raw) or cls(raw) for raw in raws]
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """Return a list of EtherAddress from a buffer of packed addresses.
+
+        Args:
+            buf: a bytes-like object whose length is a multiple of 6
+
+        Returns:
+            A list of EtherAddress, one every 6 bytes
+        """
+
+        if len(buf) % 6:
+            raise ValueError("Buffer length must be a multiple of 6")
+
+        buf = bytes(buf)
+
+        return cls.from_raw_list([buf[x:x + 6]
+                                  for x in range(0, len(buf), 6)])
 
     def is_global(self):
         """
@@ -71,84 +154,94 @@ class EtherAddress(object):
         """
         Returns True if this is a locally-administered (non-global) address.
         """
-        return True if (self._value[0] & 2) else False
+        return True if (self._value & 0x020000000000) else False
 
     def is_multicast(self):
         """
         Returns True if this is a multicast address.
         """
-        return True if (self._value[0] & 1) else False
+        return True if (self._value & 0x010000000000) else False
 
     def to_raw(self):
         """
         Returns the address as a 6-long bytes object.
         """
-        return self._value
+        return self._raw
 
     def to_tuple(self):
         """
         Returns a 6-entry long tuple where each entry is the numeric value
         of the corresponding byte of the address.
         """
-        return tuple((x for x in self._value))
+        return tuple(self._raw)
 
     def to_str(self, separator=':'):
         """
         Returns the address as string consisting of 12 hex chars separated
         by separator.
         """
-        return separator.join(('%02x' % (x,) for x in self._value)).upper()
 
-    def to_int(self, separator=':'):
+        if separator == ':':
+
+            if self._str is None:
+                value = ':'.join([HEX_BYTES[x] for x in self._raw])
+                object.__setattr__(self, '_str', value)
+
+            return self._str
+
+        return separator.join([HEX_BYTES[x] for x in self._raw])
+
+    def to_int(self):
         """
-        Returns the address as string consisting of 12 hex chars separated
-        by separator.
+        Returns the address as a 48-bit integer.
         """
-        return int(self.to_str().replace(":", ""), 16)
+        return self._value
 
     def match(self, other):
         """ Bitwise match. """
-        if type(other) == EtherAddress:
-            other = other.to_raw()
-        elif type(other) == bytes:
-            pass
-        else:
+
+        if type(other) is not EtherAddress:
             try:
-                other = EtherAddress(other).to_raw()
-            except RuntimeError:
-                return False
-        for cnt in range(0, 6):
-            if (self._value[cnt] & other[cnt]) != self._value[cnt]:
+                other = EtherAddress(other)
+            except (RuntimeError, ValueError):
                 return False
-        return True
+
+        return (self._value & other._value) == self._value
 
     def __str__(self):
         return self.to_str()
 
     def __eq__(self, other):
-        if type(other) == EtherAddress:
-            other = other.to_raw()
-        elif type(other) == bytes:
-            pass
-        else:
+
+        if type(other) is EtherAddress:
+            return self._value == other._value
+
+        if isinstance(other, (bytes, str)):
             try:
-                other = EtherAddress(other).to_raw()
-            except RuntimeError:
+                other = EtherAddress(other)
+            except (RuntimeError, ValueError):
                 return False
-        if self._value == other:
-            return True
-        return False
+            return self._value == other._value
+
+        if isinstance(other, EtherAddress):
+            return self._value == other._value
+
+        return NotImplemented
 
     def __hash__(self):
-        return self._value.__hash__()
+        return hash(self._value)
 
     def __repr__(self):
         return self.__class__.__name__ + "('" + self.to_str() + "')"
 
+    def __reduce__(self):
+        return (self.__class__, (self._raw,))
+
     def __setattr__(self, a, v):
-        if hasattr(self, '_value'):
-            raise TypeError("This object is immutable")
-        object.__setattr__(self, a, v)
+        raise TypeError("This object is immutable")
+
+    def __delattr__(self, a):
+        raise TypeError("This object is immutable")
 
     @classmethod
     def bcast(cls):
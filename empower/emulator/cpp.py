@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Emulated CPPs (LVNFP).
+
+Every CPP opens an LVNFP websocket, sends periodic hello messages and its
+capabilities, and answers the LVNF deployment requests of the controller:
+LVNFs are reported as running as soon as they are added and as stopped as
+soon as they are removed.
+"""
+
+import json
+
+import tornado.ioloop
+import tornado.websocket
+
+from empower.lvnfp import PT_VERSION
+from empower.lvnfp import PT_HELLO
+from empower.lvnfp import PT_ADD_LVNF
+from empower.lvnfp import PT_DEL_LVNF
+from empower.lvnfp import PT_STATUS_LVNF
+from empower.datatypes.etheraddress import EtherAddress
+from empower.emulator.recorder import Recorder
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# Message type handled by LVNFPMainHandler._handle_caps
+PT_CAPS = "caps"
+
+# Return code of an LVNF stopped by the controller (SIGTERM)
+RETURNCODE_STOPPED = -15
+
+
+class EmulatedCPP(object):
+    """An emulated CPP.
+
+    Attributes:
+        addr: the CPP address (EtherAddress)
+        lvnfs: the running LVNFs (dict of status messages indexed by id)
+        connected: True if the LVNFP websocket is up (bool)
+    """
+
+    def __init__(self, emulator, addr):
+
+        self.emulator = emulator
+        self.addr = addr
+        self.lvnfs = {}
+        self.ws = None
+        self.connected = False
+        self.seq = 0
+        self.__hello = None
+
+    def connect(self):
+        """Open the LVNFP websocket."""
+
+        options = self.emulator.options
+        url = "ws://%s:%u/" % (options.host, options.lvnfp_port)
+
+        future = tornado.websocket.websocket_connect(
+            url, on_message_callback=self._on_message)
+
+        tornado.ioloop.IOLoop.current().add_future(future, self._on_connect)
+
+    def _on_connect(self, future):
+        """Send hello and capabilities."""
+
+        try:
+            self.ws = future.result()
+        except Exception as ex:
+            Recorder.instance().count("lvnfp.connect_errors")
+            LOG.error("CPP %s unable to connect: %s", self.addr, ex)
+            self._reconnect()
+            return
+
+        self.connected = True
+
+        Recorder.instance().gauge("lvnfp.connected", 1)
+
+        self.send_hello()
+        self.send_caps()
+
+        period = self.emulator.options.hello_period
+        self.__hello = tornado.ioloop.PeriodicCallback(self.send_hello,
+                                                       period)
+        self.__hello.start()
+
+    def _reconnect(self):
+        """Connect again later."""
+
+        tornado.ioloop.IOLoop.current().call_later(
+            self.emulator.options.retry, self.connect)
+
+    def _on_disconnect(self):
+        """The controller closed the websocket."""
+
+        Recorder.instance().gauge("lvnfp.connected", -1)
+        Recorder.instance().count("lvnfp.disconnections")
+
+        self.connected = False
+        self.lvnfs = {}
+
+        if self.__hello:
+            self.__hello.stop()
+
+        self._reconnect()
+
+    def send_message(self, message_type, message):
+        """Add the header fields and send a message."""
+
+        if not self.connected:
+            return
+
+        self.seq += 1
+
+        message['version'] = PT_VERSION
+        message['type'] = message_type
+        message['seq'] = self.seq
+        message['addr'] = str(self.addr)
+
+        self.ws.write_message(json.dumps(message))
+
+        Recorder.instance().count("lvnfp.tx")
+
+    def send_hello(self):
+        """Send a hello message."""
+
+        self.send_message(PT_HELLO,
+                          {'every': self.emulator.options.hello_period})
+
+    def send_caps(self):
+        """Send the capabilities."""
+
+        hwaddr = EtherAddress(self.addr.to_int() ^ (1 << 40))
+        ports = {1: {'port_id': 1, 'iface': 'eth0', 'hwaddr': str(hwaddr)}}
+
+        self.send_message(PT_CAPS, {'ports': ports})
+
+    def _on_message(self, message):
+        """Handle a message from the controller."""
+
+        if message is None:
+            self._on_disconnect()
+            return
+
+        Recorder.instance().count("lvnfp.rx")
+
+        try:
+            msg = json.loads(message)
+        except ValueError:
+            LOG.error("CPP %s invalid input: %s", self.addr, message)
+            return
+
+        if msg.get('type') == PT_ADD_LVNF:
+            self._handle_add_lvnf(msg)
+        elif msg.get('type') == PT_DEL_LVNF:
+            self._handle_del_lvnf(msg)
+        else:
+            Recorder.instance().count("lvnfp.ignored")
+
+    def _handle_add_lvnf(self, add_lvnf):
+        """Report the LVNF as running."""
+
+        image = add_lvnf['image']
+        ports = {}
+
+        for port_id in range(image.get('nb_ports', 0)):
+            ports[port_id] = {'virtual_port_id': port_id,
+                              'hwaddr': None,
+                              'ovs_port_id': None,
+                              'iface': 'vnf%u' % port_id}
+
+        status = {'tenant_id': add_lvnf['tenant_id'],
+                  'lvnf_id': add_lvnf['lvnf_id'],
+                  'image': image,
+                  'returncode': None,
+                  'context': add_lvnf.get('context'),
+                  'ports': ports}
+
+        self.lvnfs[add_lvnf['lvnf_id']] = status
+
+        Recorder.instance().gauge("lvnfp.lvnfs", 1)
+
+        self.send_message(PT_STATUS_LVNF, dict(status))
+
+    def _handle_del_lvnf(self, del_lvnf):
+        """Report the LVNF as stopped."""
+
+        status = self.lvnfs.pop(del_lvnf['lvnf_id'], None)
+
+        if not status:
+            return
+
+        Recorder.instance().gauge("lvnfp.lvnfs", -1)
+
+        status['returncode'] = RETURNCODE_STOPPED
+        status['ports'] = {}
+
+        self.send_message(PT_STATUS_LVNF, status)
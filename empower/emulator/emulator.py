@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER agents emulator.
+
+Example, 100 WTPs with 10 stations each, moving every 30 seconds:
+
+    ./empower-emulator.py --wtps 100 --dump wtps > wtps.csv
+    ./empower-emulator.py --wtps 100 --stations 1000 --dump stations \
+        > stations.csv
+    ./empower-manager.py load-wtps wtps.csv
+    ./empower-manager.py load-allow stations.csv
+    ./empower-emulator.py --wtps 100 --stations 1000 --ssid EmPOWER \
+        --move-interval 30 --duration 600
+
+The emulated devices must be registered with the controller (and added to a
+tenant) beforehand: --dump prints their addresses in the CSV format accepted
+by empower-manager.py. Latencies (in microseconds) and counters are printed
+as JSON every --report-interval seconds and when the run ends.
+"""
+
+import sys
+import json
+import random
+import argparse
+
+import tornado.ioloop
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.emulator.recorder import Recorder
+from empower.emulator.wtp import EmulatedWTP
+from empower.emulator.wtp import Station
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_WTP_BASE = "02:00:00:00:00:00"
+DEFAULT_STA_BASE = "06:00:00:00:00:00"
+DEFAULT_ENB_BASE = "00:00:00:00:00:01"
+DEFAULT_CPP_BASE = "0A:00:00:00:00:00"
+
+DUMPS = ["wtps", "stations", "vbses", "cpps"]
+
+
+class Emulator(object):
+    """The emulated network.
+
+    Attributes:
+        options: the emulator options (argparse.Namespace)
+        wtps: the WTPs, in line order (list of EmulatedWTP)
+        stations: the stations (list of Station)
+        stations_by_addr: the stations indexed by address (dict)
+        enbs: the eNBs (list of EmulatedENB)
+        cpps: the CPPs (list of EmulatedCPP)
+    """
+
+    def __init__(self, options):
+
+        self.options = options
+        self.wtps = []
+        self.stations = []
+        self.stations_by_addr = {}
+        self.enbs = []
+        self.cpps = []
+
+        channels = [int(x) for x in options.channels.split(",")]
+
+        wtp_base = EtherAddress(options.wtp_base).to_int()
+        sta_base = EtherAddress(options.sta_base).to_int()
+        enb_base = EtherAddress(options.enb_base).to_int()
+        cpp_base = EtherAddress(options.cpp_base).to_int()
+
+        for i in range(options.wtps):
+            wtp = EmulatedWTP(self, i, EtherAddress(wtp_base + i), channels)
+            self.wtps.append(wtp)
+
+        if self.wtps:
+
+            for i in range(options.stations):
+                station = Station(self, EtherAddress(sta_base + i),
+                                  i % len(self.wtps))
+                station.location.stations.add(station)
+                self.stations.append(station)
+                self.stations_by_addr[station.addr] = station
+
+        if options.enbs:
+
+            # protobuf is only needed when emulating eNBs
+            from empower.emulator.enb import EmulatedENB
+
+            for i in range(options.enbs):
+                enb = EmulatedENB(self, EtherAddress(enb_base + i),
+                                  options.ues)
+                self.enbs.append(enb)
+
+        if options.cpps:
+
+            from empower.emulator.cpp import EmulatedCPP
+
+            for i in range(options.cpps):
+                self.cpps.append(EmulatedCPP(self, EtherAddress(cpp_base + i)))
+
+    def dump(self, kind):
+        """Return the addresses of a kind of device as CSV lines."""
+
+        if kind == "wtps":
+            devices = [(x.addr, "Emulated WTP %u" % x.index)
+                       for x in self.wtps]
+        elif kind == "stations":
+            devices = [(x.addr, "Emulated station") for x in self.stations]
+        elif kind == "vbses":
+            devices = [(x.addr, "Emulated eNB") for x in self.enbs]
+        elif kind == "cpps":
+            devices = [(x.addr, "Emulated CPP") for x in self.cpps]
+        else:
+            raise ValueError("Invalid kind %s" % kind)
+
+        return "".join("%s,%s\n" % (addr, label) for addr, label in devices)
+
+    def start(self):
+        """Connect the devices and start the stations.
+
+        Devices connect at options.connect_rate per second, stations start
+        joining at random times within options.ramp_up seconds.
+        """
+
+        loop = tornado.ioloop.IOLoop.current()
+        devices = self.wtps + self.enbs + self.cpps
+
+        for i, device in enumerate(devices):
+            loop.call_later(i / self.options.connect_rate, device.connect)
+
+        ramp_up = max(self.options.ramp_up,
+                      len(devices) / self.options.connect_rate)
+
+        for station in self.stations:
+            station.start(random.uniform(0, ramp_up))
+
+        tornado.ioloop.PeriodicCallback(self.check_timeouts, 1000).start()
+
+        if self.options.move_interval and self.stations:
+            tornado.ioloop.PeriodicCallback(
+                self.move, self.options.move_interval * 1000).start()
+
+        if self.options.report_interval:
+            tornado.ioloop.PeriodicCallback(
+                self.report, self.options.report_interval * 1000).start()
+
+        if self.options.duration:
+            loop.call_later(self.options.duration, self.stop)
+
+    def stop(self):
+        """Print the final report and stop."""
+
+        self.report()
+        tornado.ioloop.IOLoop.current().stop()
+
+    def check_timeouts(self):
+        """Restart the stations whose requests were not answered."""
+
+        for station in self.stations:
+            station.check_timeout(self.options.timeout)
+
+    def move(self):
+        """Move a fraction of the stations."""
+
+        count = max(1, int(len(self.stations) * self.options.move_fraction))
+
+        for station in random.sample(self.stations, count):
+            station.move()
+
+    def report(self):
+        """Print the measurements."""
+
+        out = Recorder.instance().to_dict()
+
+        if self.options.output:
+            with open(self.options.output, "w") as output:
+                json.dump(out, output, indent=2, sort_keys=True)
+
+        print(json.dumps(out, indent=2, sort_keys=True))
+        sys.stdout.flush()
+
+
+def parse_args(argv):
+    """Parse the command line."""
+
+    parser = argparse.ArgumentParser(description="EmPOWER agents emulator")
+
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="controller address, default: %(default)s")
+    parser.add_argument("--lvapp-port", type=int, default=4433,
+                        help="LVAPP port, default: %(default)s")
+    parser.add_argument("--vbsp-port", type=int, default=2210,
+                        help="VBSP port, default: %(default)s")
+    parser.add_argument("--lvnfp-port", type=int, default=4422,
+                        help="LVNFP port, default: %(default)s")
+
+    parser.add_argument("--wtps", type=int, default=1,
+                        help="number of WTPs, default: %(default)s")
+    parser.add_argument("--stations", type=int, default=0,
+                        help="number of stations, default: %(default)s")
+    parser.add_argument("--enbs", type=int, default=0,
+                        help="number of eNBs, default: %(default)s")
+    parser.add_argument("--ues", type=int, default=0,
+                        help="UEs per eNB, default: %(default)s")
+    parser.add_argument("--cpps", type=int, default=0,
+                        help="number of CPPs, default: %(default)s")
+
+    parser.add_argument("--wtp-base", default=DEFAULT_WTP_BASE,
+                        help="first WTP address, default: %(default)s")
+    parser.add_argument("--sta-base", default=DEFAULT_STA_BASE,
+                        help="first station address, default: %(default)s")
+    parser.add_argument("--enb-base", default=DEFAULT_ENB_BASE,
+                        help="first eNB address, default: %(default)s")
+    parser.add_argument("--cpp-base", default=DEFAULT_CPP_BASE,
+                        help="first CPP address, default: %(default)s")
+
+    parser.add_argument("--ssid", default="EmPOWER",
+                        help="SSID joined by the stations, "
+                        "default: %(default)s")
+    parser.add_argument("--channels", default="36",
+                        help="WTP channels, comma separated, "
+                        "default: %(default)s")
+    parser.add_argument("--plmn-id", type=int, default=0x222f93,
+                        help="UEs PLMN id, default: %(default)s")
+    parser.add_argument("--imsi-base", type=int, default=222930000000000,
+                        help="first UE IMSI, default: %(default)s")
+
+    parser.add_argument("--hello-period", type=int, default=2000,
+                        help="hello period in ms, default: %(default)s")
+    parser.add_argument("--connect-rate", type=float, default=50.0,
+                        help="connections per second, default: %(default)s")
+    parser.add_argument("--ramp-up", type=float, default=10.0,
+                        help="stations join within this many seconds, "
+                        "default: %(default)s")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="request timeout in seconds, "
+                        "default: %(default)s")
+    parser.add_argument("--retry", type=float, default=2.0,
+                        help="seconds before retrying, default: %(default)s")
+    parser.add_argument("--move-interval", type=float, default=0.0,
+                        help="seconds between moves, 0 to disable, "
+                        "default: %(default)s")
+    parser.add_argument("--move-fraction", type=float, default=0.1,
+                        help="fraction of the stations moving each time, "
+                        "default: %(default)s")
+    parser.add_argument("--ue-interval", type=float, default=0.0,
+                        help="seconds between UE attach/detach, "
+                        "0 to disable, default: %(default)s")
+
+    parser.add_argument("--duration", type=float, default=0.0,
+                        help="run for this many seconds, 0 to run forever, "
+                        "default: %(default)s")
+    parser.add_argument("--report-interval", type=float, default=10.0,
+                        help="seconds between reports, 0 to disable, "
+                        "default: %(default)s")
+    parser.add_argument("--output", default=None,
+                        help="also write the last report to this file")
+    parser.add_argument("--dump", choices=DUMPS, default=None,
+                        help="print the addresses of the emulated devices "
+                        "as CSV (addr,label) and exit")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the emulator."""
+
+    options = parse_args(argv)
+    emulator = Emulator(options)
+
+    if options.dump:
+        sys.stdout.write(emulator.dump(options.dump))
+        return
+
+    LOG.info("Emulating %u WTPs, %u stations, %u eNBs, %u CPPs",
+             len(emulator.wtps), len(emulator.stations), len(emulator.enbs),
+             len(emulator.cpps))
+
+    emulator.start()
+
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    except KeyboardInterrupt:
+        emulator.report()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Emulated eNBs (VBSP).
+
+Every eNB opens a VBSP connection, sends periodic hello messages, and
+answers the UEs id requests of the controller with its active UEs. UEs
+optionally attach and detach at random, in which case an updated UEs id
+reply is sent.
+
+The following latencies are measured (from the emulator point of view):
+
+  - vbsp.ues_id: first hello -> UEs id request
+"""
+
+import time
+import random
+import struct
+
+import tornado.ioloop
+
+from tornado.tcpclient import TCPClient
+
+from empower.core.sharding import vbsp_frames
+from empower.vbsp import EMAGE_VERSION
+from empower.vbsp import PRT_VBSP_TRIGGER_EVENT
+from empower.vbsp import PRT_VBSP_UES_ID
+from empower.vbsp.messages import main_pb2
+from empower.vbsp.messages import configs_pb2
+from empower.emulator.recorder import Recorder
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+READ_CHUNK = 65536
+
+SIZE = struct.Struct(">I")
+
+
+class EmulatedUE(object):
+    """An emulated UE.
+
+    Attributes:
+        rnti: the UE RNTI (int)
+        imsi: the UE IMSI (int)
+        plmn_id: the UE PLMN id (int)
+    """
+
+    def __init__(self, rnti, imsi, plmn_id):
+
+        self.rnti = rnti
+        self.imsi = imsi
+        self.plmn_id = plmn_id
+
+
+class EmulatedENB(object):
+    """An emulated eNB.
+
+    Attributes:
+        addr: the eNB address, the lower 32 bits are the eNB id (EtherAddress)
+        ues: the active UEs (dict of EmulatedUE indexed by RNTI)
+        connected: True if the VBSP connection is up (bool)
+    """
+
+    def __init__(self, emulator, addr, nb_ues):
+
+        self.emulator = emulator
+        self.addr = addr
+        self.enb_id = addr.to_int() & 0xFFFFFFFF
+        self.ues = {}
+        self.stream = None
+        self.connected = False
+        self.seq = 0
+        self.next_rnti = 1
+        self.__buffer = bytearray()
+        self.__hello = None
+        self.__churn = None
+        self.__connected_at = None
+        self.__ues_id_requested = False
+
+        for _ in range(nb_ues):
+            self.attach()
+
+    def attach(self):
+        """Attach a new UE."""
+
+        rnti = self.next_rnti
+        self.next_rnti = self.next_rnti % 0xFFFF + 1
+
+        imsi = self.emulator.options.imsi_base + (self.enb_id << 16) + rnti
+        self.ues[rnti] = EmulatedUE(rnti, imsi, self.emulator.options.plmn_id)
+
+    def detach(self):
+        """Detach a random UE."""
+
+        if self.ues:
+            del self.ues[random.choice(list(self.ues.keys()))]
+
+    def connect(self):
+        """Open the VBSP connection."""
+
+        options = self.emulator.options
+        future = TCPClient().connect(options.host, options.vbsp_port)
+
+        tornado.ioloop.IOLoop.current().add_future(future, self._on_connect)
+
+    def _on_connect(self, future):
+        """Send the first hello and start reading."""
+
+        try:
+            self.stream = future.result()
+        except Exception as ex:
+            Recorder.instance().count("vbsp.connect_errors")
+            LOG.error("eNB %s unable to connect: %s", self.addr, ex)
+            self._reconnect()
+            return
+
+        self.stream.set_nodelay(True)
+        self.stream.set_close_callback(self._on_disconnect)
+        self.connected = True
+        self.__connected_at = time.perf_counter()
+        self.__ues_id_requested = False
+
+        Recorder.instance().gauge("vbsp.connected", 1)
+
+        self.send_hello()
+
+        options = self.emulator.options
+
+        self.__hello = tornado.ioloop.PeriodicCallback(self.send_hello,
+                                                       options.hello_period)
+        self.__hello.start()
+
+        if options.ue_interval:
+            self.__churn = \
+                tornado.ioloop.PeriodicCallback(self.churn,
+                                                options.ue_interval * 1000)
+            self.__churn.start()
+
+        self._wait()
+
+    def _reconnect(self):
+        """Connect again later."""
+
+        tornado.ioloop.IOLoop.current().call_later(
+            self.emulator.options.retry, self.connect)
+
+    def _on_disconnect(self):
+        """The controller closed the connection."""
+
+        Recorder.instance().gauge("vbsp.connected", -1)
+        Recorder.instance().count("vbsp.disconnections")
+
+        self.connected = False
+        self.__buffer = bytearray()
+
+        for timer in (self.__hello, self.__churn):
+            if timer:
+                timer.stop()
+
+        self._reconnect()
+
+    def new_message(self, t_id=0):
+        """Return a new message with its header set."""
+
+        self.seq += 1
+
+        message = main_pb2.emage_msg()
+        message.head.vers = EMAGE_VERSION
+        message.head.b_id = self.enb_id
+        message.head.seq = self.seq
+        message.head.t_id = t_id
+
+        return message
+
+    def send(self, message):
+        """Send a message to the controller."""
+
+        if not self.connected:
+            return
+
+        data = message.SerializeToString()
+        self.stream.write(SIZE.pack(len(data)) + data)
+
+        Recorder.instance().count("vbsp.tx")
+
+    def send_hello(self):
+        """Send a hello message."""
+
+        message = self.new_message()
+        message.se.mHello.repl.period = self.emulator.options.hello_period
+
+        self.send(message)
+
+    def send_ues_id(self, t_id=1):
+        """Send the list of active UEs."""
+
+        message = self.new_message(t_id)
+        message.te.action = main_pb2.EA_ADD
+
+        repl = message.te.mUEs_id.repl
+        repl.status = configs_pb2.CREQS_SUCCESS
+
+        for ue in self.ues.values():
+            entry = repl.active_ue_id.add()
+            entry.rnti = ue.rnti
+            entry.imsi = ue.imsi
+            entry.plmn_id = ue.plmn_id
+
+        self.send(message)
+
+    def churn(self):
+        """Attach or detach a UE and report the active UEs."""
+
+        if self.ues and random.random() < 0.5:
+            self.detach()
+            Recorder.instance().count("vbsp.ue_leave")
+        else:
+            self.attach()
+            Recorder.instance().count("vbsp.ue_join")
+
+        if self.__ues_id_requested:
+            self.send_ues_id()
+
+    def _wait(self):
+        """Wait for messages from the controller."""
+
+        if not self.stream.closed():
+            self.stream.read_bytes(READ_CHUNK, self._on_read, partial=True)
+
+    def _on_read(self, data):
+        """Dispatch the complete messages."""
+
+        self.__buffer.extend(data)
+
+        frames, consumed = vbsp_frames(self.__buffer)
+        del self.__buffer[:consumed]
+
+        for frame in frames:
+
+            Recorder.instance().count("vbsp.rx")
+
+            message = main_pb2.emage_msg()
+
+            try:
+                message.ParseFromString(frame)
+            except Exception as ex:
+                LOG.error("eNB %s: %s", self.addr, ex)
+                continue
+
+            self._handle_message(message)
+
+        self._wait()
+
+    def _handle_message(self, message):
+        """Handle a message from the controller."""
+
+        if message.WhichOneof("event_types") != PRT_VBSP_TRIGGER_EVENT or \
+                message.te.WhichOneof("events") != PRT_VBSP_UES_ID:
+            Recorder.instance().count("vbsp.ignored")
+            return
+
+        if not self.__ues_id_requested:
+            Recorder.instance().latency("vbsp.ues_id", self.__connected_at)
+            self.__ues_id_requested = True
+
+        self.send_ues_id(message.head.t_id)
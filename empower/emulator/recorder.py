@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Emulator measurements.
+
+Latencies are kept in the same log-linear histograms used for the dispatch
+statistics of the runtime (see empower.core.dispatchstats) and are reported
+in microseconds.
+"""
+
+import time
+
+from empower.core.dispatchstats import Histogram
+
+
+class Recorder(object):
+    """Latencies and counters of an emulation run.
+
+    Attributes:
+        started: time when the run started (float)
+        latencies: a histogram for each measured latency (dict)
+        counters: a counter for each event (dict)
+        gauges: the current value of each gauge (dict)
+    """
+
+    __instance = None
+
+    def __init__(self):
+
+        self.started = time.time()
+        self.latencies = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @classmethod
+    def instance(cls):
+        """Return the global Recorder."""
+
+        if not cls.__instance:
+            cls.__instance = Recorder()
+
+        return cls.__instance
+
+    def latency(self, name, started):
+        """Record the time elapsed since started (see time.perf_counter)."""
+
+        if name not in self.latencies:
+            self.latencies[name] = Histogram()
+
+        elapsed = int((time.perf_counter() - started) * 1000000)
+        self.latencies[name].record(elapsed)
+
+    def count(self, name, value=1):
+        """Increment a counter."""
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Add value to a gauge (e.g. +1 on connect, -1 on disconnect)."""
+
+        self.gauges[name] = self.gauges.get(name, 0) + value
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'elapsed': time.time() - self.started,
+                'latencies_us': {k: v.to_dict()
+                                 for k, v in sorted(self.latencies.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'gauges': dict(sorted(self.gauges.items()))}
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Emulated WTPs and wireless stations (LVAPP).
+
+Every WTP opens an LVAPP connection, sends its HELLO and CAPS messages, and
+answers the LVAP management (ADD_LVAP, DEL_LVAP) and polling (UCQM, NCQM,
+rates) requests of the controller.
+
+Stations join through the WTP they are closest to: PROBE_REQUEST,
+AUTH_REQUEST, and ASSOC_REQUEST are sent in turn as soon as the previous
+response is received. WTPs are placed on a line, one unit apart, and
+stations optionally move along it with a random walk: the RSSI reported in
+the UCQM responses decreases with the distance, so that the mobility
+managers running in the controller can hand stations over.
+
+The following latencies are measured (from the emulator point of view):
+
+  - lvapp.probe: PROBE_REQUEST -> PROBE_RESPONSE
+  - lvapp.auth: AUTH_REQUEST -> AUTH_RESPONSE
+  - lvapp.assoc: ASSOC_REQUEST -> ASSOC_RESPONSE
+  - lvapp.join: first PROBE_REQUEST -> ASSOC_RESPONSE
+  - lvapp.handover: station move -> ADD_LVAP from the new WTP
+  - lvapp.handover_gap: DEL_LVAP at the old WTP -> ADD_LVAP at the new one
+"""
+
+import time
+import random
+import struct
+
+import tornado.ioloop
+
+from construct import Container
+from construct import Struct
+from construct import Sequence
+from construct import Array
+from construct import BitStruct
+from construct import Bit
+from construct import Padding
+from construct import UBInt8
+from construct import SBInt8
+from construct import UBInt16
+from construct import UBInt32
+from construct import Bytes
+from tornado.tcpclient import TCPClient
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.lvapp.framing import extract_frames
+from empower.lvapp import PT_VERSION
+from empower.lvapp import PT_HELLO
+from empower.lvapp import PT_CAPS
+from empower.lvapp import PT_PROBE_REQUEST
+from empower.lvapp import PT_PROBE_RESPONSE
+from empower.lvapp import PT_AUTH_REQUEST
+from empower.lvapp import PT_AUTH_RESPONSE
+from empower.lvapp import PT_ASSOC_REQUEST
+from empower.lvapp import PT_ASSOC_RESPONSE
+from empower.lvapp import PT_ADD_LVAP
+from empower.lvapp import PT_DEL_LVAP
+from empower.lvapp import PT_STATUS_LVAP
+from empower.lvapp import PT_ADD_LVAP_RESPONSE
+from empower.lvapp import PT_DEL_LVAP_RESPONSE
+from empower.lvapp import HELLO
+from empower.lvapp import CAPS
+from empower.lvapp import PROBE_REQUEST
+from empower.lvapp import PROBE_RESPONSE
+from empower.lvapp import AUTH_REQUEST
+from empower.lvapp import AUTH_RESPONSE
+from empower.lvapp import ASSOC_REQUEST
+from empower.lvapp import ASSOC_RESPONSE
+from empower.lvapp import ADD_LVAP
+from empower.lvapp import DEL_LVAP
+from empower.lvapp import STATUS_LVAP
+from empower.lvapp import ADD_DEL_LVAP_RESPONSE
+from empower.lvapp.codec import CODEC_COMPILED
+from empower.lvapp.codec import select_codec
+from empower.emulator.recorder import Recorder
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# The polling messages below mirror the definitions of empower.maps.maps and
+# empower.lvap_stats.lvap_stats, which cannot be imported without setting up
+# the runtime (and its configuration database).
+PT_UCQM_REQUEST = 0x25
+PT_UCQM_RESPONSE = 0x26
+PT_NCQM_REQUEST = 0x27
+PT_NCQM_RESPONSE = 0x28
+PT_RATES_REQUEST = 0x29
+PT_RATES_RESPONSE = 0x30
+
+POLLER_ENTRY = Sequence("img_entries",
+                        Bytes("addr", 6),
+                        UBInt8("last_rssi_std"),
+                        SBInt8("last_rssi_avg"),
+                        UBInt32("last_packets"),
+                        UBInt32("hist_packets"),
+                        SBInt8("mov_rssi"))
+
+POLLER_REQUEST = Struct("poller_request", UBInt8("version"),
+                        UBInt8("type"),
+                        UBInt32("length"),
+                        UBInt32("seq"),
+                        UBInt32("module_id"),
+                        Bytes("hwaddr", 6),
+                        UBInt8("channel"),
+                        UBInt8("band"))
+
+POLLER_RESPONSE = Struct("poller_response", UBInt8("version"),
+                         UBInt8("type"),
+                         UBInt32("length"),
+                         UBInt32("seq"),
+                         UBInt32("module_id"),
+                         Bytes("wtp", 6),
+                         UBInt16("nb_entries"),
+                         Array(lambda ctx: ctx.nb_entries, POLLER_ENTRY))
+
+RATES_ENTRY = Sequence("rates",
+                       UBInt8("rate"),
+                       BitStruct("flags",
+                                 Padding(6),
+                                 Bit("mcs"),
+                                 Padding(9)),
+                       UBInt32("prob"),
+                       UBInt32("cur_prob"))
+
+RATES_REQUEST = Struct("rates_request", UBInt8("version"),
+                       UBInt8("type"),
+                       UBInt32("length"),
+                       UBInt32("seq"),
+                       UBInt32("module_id"),
+                       Bytes("sta", 6))
+
+RATES_RESPONSE = Struct("rates_response", UBInt8("version"),
+                        UBInt8("type"),
+                        UBInt32("length"),
+                        UBInt32("seq"),
+                        UBInt32("module_id"),
+                        Bytes("wtp", 6),
+                        UBInt16("nb_entries"),
+                        Array(lambda ctx: ctx.nb_entries, RATES_ENTRY))
+
+PARSERS = {PT_PROBE_RESPONSE: PROBE_RESPONSE,
+           PT_AUTH_RESPONSE: AUTH_RESPONSE,
+           PT_ASSOC_RESPONSE: ASSOC_RESPONSE,
+           PT_ADD_LVAP: ADD_LVAP,
+           PT_DEL_LVAP: DEL_LVAP,
+           PT_UCQM_REQUEST: POLLER_REQUEST,
+           PT_NCQM_REQUEST: POLLER_REQUEST,
+           PT_RATES_REQUEST: RATES_REQUEST}
+
+PARSERS = {k: select_codec(v, CODEC_COMPILED) for k, v in PARSERS.items()}
+
+HELLO_CODEC = select_codec(HELLO, CODEC_COMPILED)
+CAPS_CODEC = select_codec(CAPS, CODEC_COMPILED)
+PROBE_REQUEST_CODEC = select_codec(PROBE_REQUEST, CODEC_COMPILED)
+AUTH_REQUEST_CODEC = select_codec(AUTH_REQUEST, CODEC_COMPILED)
+ASSOC_REQUEST_CODEC = select_codec(ASSOC_REQUEST, CODEC_COMPILED)
+STATUS_LVAP_CODEC = select_codec(STATUS_LVAP, CODEC_COMPILED)
+ADD_DEL_LVAP_RESPONSE_CODEC = select_codec(ADD_DEL_LVAP_RESPONSE,
+                                           CODEC_COMPILED)
+POLLER_RESPONSE_CODEC = select_codec(POLLER_RESPONSE, CODEC_COMPILED)
+RATES_RESPONSE_CODEC = select_codec(RATES_RESPONSE, CODEC_COMPILED)
+
+READ_CHUNK = 65536
+
+# Station states
+STA_IDLE = "idle"
+STA_PROBE = "probe"
+STA_AUTH = "auth"
+STA_ASSOC = "assoc"
+STA_ASSOCIATED = "associated"
+
+# RSSI at distance 0 and attenuation per unit of distance (dB)
+RSSI_MAX = -40
+RSSI_STEP = 20
+
+# Stations below this RSSI are not reported
+RSSI_MIN = -90
+
+BANDS = {1: 0, 6: 0, 11: 0, 36: 1, 40: 1, 44: 1, 48: 1}
+
+
+def build(codec, msg_type, seq, **fields):
+    """Build an LVAPP message, the length field is set automatically."""
+
+    msg = Container(version=PT_VERSION, type=msg_type, seq=seq, **fields)
+
+    if 'length' not in fields:
+        msg.length = 0
+
+    data = bytearray(codec.build(msg))
+    struct.pack_into(">I", data, 2, len(data))
+
+    return bytes(data)
+
+
+class Block(object):
+    """A radio interface of an emulated WTP.
+
+    Attributes:
+        hwaddr: the interface address (EtherAddress)
+        channel: the channel (int)
+        band: the band (int)
+    """
+
+    def __init__(self, hwaddr, channel, band):
+
+        self.hwaddr = hwaddr
+        self.channel = channel
+        self.band = band
+
+
+class Station(object):
+    """An emulated wireless station.
+
+    Attributes:
+        addr: the station address (EtherAddress)
+        position: the position on the WTPs line (float)
+        state: the join state (str)
+        serving: the WTP currently hosting the LVAP (EmulatedWTP)
+        net_bssid: the LVAP net BSSID, from ADD_LVAP (EtherAddress)
+        lvap_bssid: the LVAP BSSID, from ADD_LVAP (EtherAddress)
+    """
+
+    def __init__(self, emulator, addr, position):
+
+        self.emulator = emulator
+        self.addr = addr
+        self.position = position
+        self.state = STA_IDLE
+        self.serving = None
+        self.net_bssid = None
+        self.lvap_bssid = None
+        self.sent = None
+        self.join_started = None
+        self.moved = None
+        self.deleted = None
+
+    @property
+    def location(self):
+        """Return the WTP closest to the station."""
+
+        return self.emulator.wtps[int(round(self.position))]
+
+    def rssi(self, wtp):
+        """Return the RSSI of the station at a WTP."""
+
+        distance = abs(self.position - wtp.index)
+        return int(max(RSSI_MAX - RSSI_STEP * distance, -127))
+
+    def start(self, delay=0.0):
+        """Start joining after delay seconds."""
+
+        self.state = STA_IDLE
+        tornado.ioloop.IOLoop.current().call_later(delay, self.probe)
+
+    def probe(self):
+        """Send a PROBE_REQUEST through the closest WTP."""
+
+        wtp = self.location
+
+        if not wtp.connected:
+            self.start(self.emulator.options.retry)
+            return
+
+        block = wtp.blocks[0]
+        ssid = self.emulator.options.ssid.encode()
+
+        msg = build(PROBE_REQUEST_CODEC, PT_PROBE_REQUEST, wtp.next_seq(),
+                    length=31 + len(ssid),
+                    wtp=wtp.addr.to_raw(),
+                    sta=self.addr.to_raw(),
+                    hwaddr=block.hwaddr.to_raw(),
+                    channel=block.channel,
+                    band=block.band,
+                    supported_band=block.band,
+                    ssid=ssid)
+
+        self.state = STA_PROBE
+        self.sent = time.perf_counter()
+        self.join_started = self.sent
+
+        wtp.send(msg)
+
+    def on_probe_response(self, wtp):
+        """Authenticate with the LVAP BSSID."""
+
+        Recorder.instance().latency("lvapp.probe", self.sent)
+
+        if not self.net_bssid:
+            Recorder.instance().count("lvapp.probe_without_lvap")
+            self.start(self.emulator.options.retry)
+            return
+
+        msg = build(AUTH_REQUEST_CODEC, PT_AUTH_REQUEST, wtp.next_seq(),
+                    wtp=wtp.addr.to_raw(),
+                    sta=self.addr.to_raw(),
+                    bssid=self.net_bssid.to_raw())
+
+        self.state = STA_AUTH
+        self.sent = time.perf_counter()
+
+        wtp.send(msg)
+
+    def on_auth_response(self, wtp):
+        """Associate with the configured SSID."""
+
+        Recorder.instance().latency("lvapp.auth", self.sent)
+
+        block = wtp.blocks[0]
+        ssid = self.emulator.options.ssid.encode()
+
+        msg = build(ASSOC_REQUEST_CODEC, PT_ASSOC_REQUEST, wtp.next_seq(),
+                    length=37 + len(ssid),
+                    wtp=wtp.addr.to_raw(),
+                    sta=self.addr.to_raw(),
+                    bssid=self.lvap_bssid.to_raw(),
+                    hwaddr=block.hwaddr.to_raw(),
+                    channel=block.channel,
+                    band=block.band,
+                    supported_band=block.band,
+                    ssid=ssid)
+
+        self.state = STA_ASSOC
+        self.sent = time.perf_counter()
+
+        wtp.send(msg)
+
+    def on_assoc_response(self):
+        """The station is associated."""
+
+        Recorder.instance().latency("lvapp.assoc", self.sent)
+        Recorder.instance().latency("lvapp.join", self.join_started)
+        Recorder.instance().gauge("lvapp.associated", 1)
+
+        self.state = STA_ASSOCIATED
+        self.sent = None
+
+    def on_add_lvap(self, wtp, add_lvap):
+        """The LVAP has been added (or updated) at wtp."""
+
+        self.net_bssid = EtherAddress(add_lvap.net_bssid)
+        self.lvap_bssid = EtherAddress(add_lvap.lvap_bssid)
+
+        if self.serving is wtp:
+            return
+
+        if self.serving or self.deleted:
+            Recorder.instance().count("lvapp.handovers")
+
+        if self.moved:
+            Recorder.instance().latency("lvapp.handover", self.moved)
+            self.moved = None
+
+        if self.deleted:
+            Recorder.instance().latency("lvapp.handover_gap", self.deleted)
+            self.deleted = None
+
+        self.serving = wtp
+
+    def on_del_lvap(self, wtp):
+        """The LVAP has been removed from wtp."""
+
+        if self.serving is wtp:
+            self.serving = None
+            self.deleted = time.perf_counter()
+
+    def move(self):
+        """Move by one unit along the WTPs line (random walk)."""
+
+        last = len(self.emulator.wtps) - 1
+
+        if last < 1:
+            return
+
+        old = self.location
+        step = random.choice([-1, 1])
+        self.position = min(max(self.position + step, 0), last)
+
+        if self.location is not old:
+            old.stations.discard(self)
+            self.location.stations.add(self)
+            if self.location is self.serving:
+                self.moved = None
+            elif self.state == STA_ASSOCIATED and not self.moved:
+                self.moved = time.perf_counter()
+
+    def check_timeout(self, timeout):
+        """Start over if the last request has not been answered."""
+
+        if self.sent is None or self.state == STA_IDLE:
+            return
+
+        if time.perf_counter() - self.sent > timeout:
+            Recorder.instance().count("lvapp.%s_timeouts" % self.state)
+            self.sent = None
+            self.start(self.emulator.options.retry)
+
+
+class EmulatedWTP(object):
+    """An emulated WTP.
+
+    Attributes:
+        index: the WTP position on the line (int)
+        addr: the WTP address (EtherAddress)
+        blocks: the radio interfaces (list of Block)
+        stations: the stations closest to this WTP (set)
+        connected: True if the LVAPP connection is up (bool)
+    """
+
+    def __init__(self, emulator, index, addr, channels):
+
+        self.emulator = emulator
+        self.index = index
+        self.addr = addr
+        self.blocks = []
+        self.stations = set()
+        self.stream = None
+        self.connected = False
+        self.seq = 0
+        self.__buffer = bytearray()
+        self.__hello = None
+
+        for i, channel in enumerate(channels):
+            hwaddr = EtherAddress(addr.to_int() ^ ((i + 1) << 40))
+            self.blocks.append(Block(hwaddr, channel, BANDS.get(channel, 0)))
+
+    def next_seq(self):
+        """Return the next sequence number."""
+
+        self.seq += 1
+        return self.seq
+
+    def connect(self):
+        """Open the LVAPP connection."""
+
+        options = self.emulator.options
+        future = TCPClient().connect(options.host, options.lvapp_port)
+
+        tornado.ioloop.IOLoop.current().add_future(future, self._on_connect)
+
+    def _on_connect(self, future):
+        """Send HELLO and CAPS and start reading."""
+
+        try:
+            self.stream = future.result()
+        except Exception as ex:
+            Recorder.instance().count("lvapp.connect_errors")
+            LOG.error("WTP %s unable to connect: %s", self.addr, ex)
+            self._reconnect()
+            return
+
+        self.stream.set_nodelay(True)
+        self.stream.set_close_callback(self._on_disconnect)
+        self.connected = True
+
+        Recorder.instance().gauge("lvapp.connected", 1)
+
+        self.send_hello()
+        self.send_caps()
+
+        period = self.emulator.options.hello_period
+        self.__hello = tornado.ioloop.PeriodicCallback(self.send_hello,
+                                                       period)
+        self.__hello.start()
+
+        self._wait()
+
+    def _reconnect(self):
+        """Connect again later."""
+
+        tornado.ioloop.IOLoop.current().call_later(
+            self.emulator.options.retry, self.connect)
+
+    def _on_disconnect(self):
+        """The controller closed the connection."""
+
+        Recorder.instance().gauge("lvapp.connected", -1)
+        Recorder.instance().count("lvapp.disconnections")
+
+        self.connected = False
+        self.__buffer = bytearray()
+
+        if self.__hello:
+            self.__hello.stop()
+
+        for station in self.emulator.stations:
+            if station.serving is self:
+                if station.state == STA_ASSOCIATED:
+                    Recorder.instance().gauge("lvapp.associated", -1)
+                station.serving = None
+                station.start(self.emulator.options.retry)
+
+        self._reconnect()
+
+    def send(self, msg):
+        """Send a message to the controller."""
+
+        if self.connected:
+            self.stream.write(msg)
+            Recorder.instance().count("lvapp.tx")
+
+    def send_hello(self):
+        """Send a HELLO message."""
+
+        self.send(build(HELLO_CODEC, PT_HELLO, self.next_seq(),
+                        wtp=self.addr.to_raw(),
+                        period=self.emulator.options.hello_period))
+
+    def send_caps(self):
+        """Send a CAPS message."""
+
+        blocks = [[x.hwaddr.to_raw(), x.channel, x.band]
+                  for x in self.blocks]
+
+        ports = [[self.addr.to_raw(), 1, b'empower0'.ljust(10, b'\0')]]
+
+        self.send(build(CAPS_CODEC, PT_CAPS, self.next_seq(),
+                        wtp=self.addr.to_raw(),
+                        nb_resources_elements=len(blocks),
+                        nb_ports_elements=len(ports),
+                        blocks=blocks,
+                        ports=ports))
+
+    def _wait(self):
+        """Wait for messages from the controller."""
+
+        if not self.stream.closed():
+            self.stream.read_bytes(READ_CHUNK, self._on_read, partial=True)
+
+    def _on_read(self, data):
+        """Dispatch the complete frames."""
+
+        self.__buffer.extend(data)
+
+        try:
+            frames, consumed = extract_frames(self.__buffer)
+        except ValueError as ex:
+            LOG.error("WTP %s: %s", self.addr, ex)
+            self.stream.close()
+            return
+
+        del self.__buffer[:consumed]
+
+        for msg_type, frame in frames:
+
+            Recorder.instance().count("lvapp.rx")
+
+            if msg_type not in PARSERS:
+                Recorder.instance().count("lvapp.ignored")
+                continue
+
+            try:
+                self._handle_message(msg_type, PARSERS[msg_type].parse(frame))
+            except Exception as ex:
+                LOG.exception(ex)
+
+        self._wait()
+
+    def _handle_message(self, msg_type, msg):
+        """Handle a message from the controller."""
+
+        if msg_type == PT_ADD_LVAP:
+            self._handle_add_lvap(msg)
+        elif msg_type == PT_DEL_LVAP:
+            self._handle_del_lvap(msg)
+        elif msg_type in (PT_UCQM_REQUEST, PT_NCQM_REQUEST):
+            self._handle_poller_request(msg)
+        elif msg_type == PT_RATES_REQUEST:
+            self._handle_rates_request(msg)
+        else:
+            station = self.emulator.stations_by_addr.get(EtherAddress(msg.sta))
+            if not station:
+                return
+            if msg_type == PT_PROBE_RESPONSE and station.state == STA_PROBE:
+                station.on_probe_response(self)
+            elif msg_type == PT_AUTH_RESPONSE and station.state == STA_AUTH:
+                station.on_auth_response(self)
+            elif msg_type == PT_ASSOC_RESPONSE and station.state == STA_ASSOC:
+                station.on_assoc_response()
+
+    def _handle_add_lvap(self, add_lvap):
+        """Confirm the LVAP and report its status."""
+
+        self.send(build(ADD_DEL_LVAP_RESPONSE_CODEC, PT_ADD_LVAP_RESPONSE,
+                        self.next_seq(),
+                        wtp=self.addr.to_raw(),
+                        sta=add_lvap.sta,
+                        module_id=add_lvap.module_id,
+                        status=0))
+
+        ssids = [Container(length=len(x.ssid), ssid=x.ssid)
+                 for x in add_lvap.ssids]
+
+        self.send(build(STATUS_LVAP_CODEC, PT_STATUS_LVAP, self.next_seq(),
+                        flags=add_lvap.flags,
+                        assoc_id=add_lvap.assoc_id,
+                        wtp=self.addr.to_raw(),
+                        sta=add_lvap.sta,
+                        encap=add_lvap.encap,
+                        hwaddr=add_lvap.hwaddr,
+                        channel=add_lvap.channel,
+                        band=add_lvap.band,
+                        supported_band=add_lvap.supported_band,
+                        net_bssid=add_lvap.net_bssid,
+                        lvap_bssid=add_lvap.lvap_bssid,
+                        ssids=ssids))
+
+        station = self.emulator.stations_by_addr.get(
+            EtherAddress(add_lvap.sta))
+
+        if station:
+            station.on_add_lvap(self, add_lvap)
+
+    def _handle_del_lvap(self, del_lvap):
+        """Confirm the LVAP removal."""
+
+        self.send(build(ADD_DEL_LVAP_RESPONSE_CODEC, PT_DEL_LVAP_RESPONSE,
+                        self.next_seq(),
+                        wtp=self.addr.to_raw(),
+                        sta=del_lvap.sta,
+                        module_id=del_lvap.module_id,
+                        status=0))
+
+        station = self.emulator.stations_by_addr.get(
+            EtherAddress(del_lvap.sta))
+
+        if station:
+            station.on_del_lvap(self)
+
+    def _handle_poller_request(self, request):
+        """Report the RSSI of the stations in range (UCQM), or no
+        neighbour (NCQM)."""
+
+        entries = []
+
+        if request.type == PT_UCQM_REQUEST:
+
+            for wtp in self.emulator.wtps[max(0, self.index - 1):
+                                          self.index + 2]:
+                for station in wtp.stations:
+                    rssi = station.rssi(self)
+                    if rssi < RSSI_MIN:
+                        continue
+                    entries.append([station.addr.to_raw(), 1, rssi, 10, 100,
+                                    rssi])
+
+            response_type = PT_UCQM_RESPONSE
+
+        else:
+
+            response_type = PT_NCQM_RESPONSE
+
+        self.send(build(POLLER_RESPONSE_CODEC, response_type,
+                        self.next_seq(),
+                        module_id=request.module_id,
+                        wtp=self.addr.to_raw(),
+                        nb_entries=len(entries),
+                        img_entries=entries))
+
+    def _handle_rates_request(self, request):
+        """Report a fixed rate table."""
+
+        entries = [[rate, Container(mcs=0), 9000, 9000]
+                   for rate in (12, 24, 48, 108)]
+
+        self.send(build(RATES_RESPONSE_CODEC, PT_RATES_RESPONSE,
+                        self.next_seq(),
+                        module_id=request.module_id,
+                        wtp=self.addr.to_raw(),
+                        nb_entries=len(entries),
+                        rates=entries))
@@ -28,6 +28,7 @@ from tornado.httpclient import AsyncHTTPClient
 from empower.persistence.persistence import TblFeed
 from empower.persistence.persistence import TblPNFDev
 from empower.persistence import Session
+from empower.persistence.writer import Writer
 from empower.core.feed import Feed
 from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.datatypes.etheraddress import EtherAddress
@@ -49,6 +50,7 @@ class FeedHandler(EmpowerAPIHandler):
                 r"/api/v1/feeds/([0-9]*)/?"]
 
     @exceptions
+    @gen.coroutine
     def get(self, *args, **kwargs):
         """List all Feeds or just the specified one.
 
@@ -65,10 +67,10 @@ class FeedHandler(EmpowerAPIHandler):
             raise ValueError("Invalid URL")
 
         if len(args) == 0:
-            self.write_as_json(RUNTIME.feeds.values())
+            yield self.write_as_json(RUNTIME.feeds.values())
         else:
             feed_id = int(args[0])
-            self.write_as_json(RUNTIME.feeds[feed_id])
+            yield self.write_as_json(RUNTIME.feeds[feed_id])
 
     @asynchronous
     @gen.engine
@@ -131,7 +133,7 @@ class FeedHandler(EmpowerAPIHandler):
                     self.send_error(ex.code)
                     return
                 feed.update([{'id': 'switch', 'current_value': value}])
-                self.write_as_json(feed)
+                yield self.write_as_json(feed)
                 self.set_status(204, None)
                 self.finish()
 
@@ -273,6 +275,9 @@ class EnerginoServer(tornado.web.Application):
 
         feed = RUNTIME.feeds[feed_id]
 
+        # the PNFDevs table is read below
+        Writer.instance().flush()
+
         # if the feed is pointing to a dev, then reset the feed attribute of
         # that dev to None
         if feed.pnfdev:
@@ -348,11 +353,10 @@ class EnerginoServer(tornado.web.Application):
 
         feed_id = self.feed_id
         RUNTIME.feeds[feed_id] = Feed(feed_id)
-        session = Session()
-        session.add(TblFeed(feed_id=feed_id,
-                            created=RUNTIME.feeds[feed_id].created,
-                            updated=RUNTIME.feeds[feed_id].updated))
-        session.commit()
+
+        Writer.instance().add(TblFeed(feed_id=feed_id,
+                                      created=RUNTIME.feeds[feed_id].created,
+                                      updated=RUNTIME.feeds[feed_id].updated))
 
         return RUNTIME.feeds[feed_id]
 
@@ -365,13 +369,7 @@ class EnerginoServer(tornado.web.Application):
         self.bind_feed(feed_id)
         del RUNTIME.feeds[feed_id]
 
-        feed = Session().query(TblFeed) \
-                        .filter(TblFeed.feed_id == feed_id) \
-                        .first()
-
-        session = Session()
-        session.delete(feed)
-        session.commit()
+        Writer.instance().delete(TblFeed, TblFeed.feed_id == feed_id)
 
     def to_dict(self):
         """ Return a dict representation of the object. """
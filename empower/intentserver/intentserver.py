@@ -15,15 +15,34 @@
 # specific language governing permissions and limitations
 # under the License.
 
-"""Intent server module."""
+"""Intent server module.
+
+Intents are pushed to the SDN controller with non-blocking requests. The
+add_* methods return immediately a local handle (UUID) which is then used
+to update or remove the intent. The handle is mapped to the UUID assigned
+by the SDN controller as soon as the intent is created.
+
+Pending requests are kept in a coalescing queue which is flushed at the
+next IOLoop iteration: repeated updates of the same intent collapse into a
+single request, an intent removed before being created never reaches the
+SDN controller, and at most one request per intent is in flight. If a bulk
+URL is configured, all the requests ready to be sent are delivered with a
+single POST.
+"""
 
-import tornado
 import json
-import http.client
+import importlib.util
 
+from collections import OrderedDict
 from uuid import UUID
+from uuid import uuid4
 from urllib.parse import urlparse
 
+import tornado.web
+import tornado.ioloop
+import tornado.httpserver
+import tornado.httpclient
+
 from empower.core.jsonserializer import EmpowerEncoder
 
 import empower.logger
@@ -31,6 +50,53 @@ LOG = empower.logger.get_logger()
 
 DEFAULT_PORT = 4444
 
+# Maximum number of concurrent requests to the SDN controller
+DEFAULT_MAX_CLIENTS = 10
+
+# Maximum number of requests in a bulk POST
+DEFAULT_BATCH = 100
+
+# Request timeout (in s)
+REQUEST_TIMEOUT = 10.0
+
+# libcurl keeps the connections to the SDN controller alive
+if importlib.util.find_spec("pycurl"):
+    HTTP_CLIENT = "tornado.curl_httpclient.CurlAsyncHTTPClient"
+else:
+    HTTP_CLIENT = None
+
+
+class Intent(object):
+    """An intent.
+
+    Attributes:
+        handle: the local handle of the intent (UUID)
+        url: the intent collection url, e.g. /intent/poa (str)
+        uuid: the UUID assigned by the SDN controller, None if the intent
+          has not been created yet (UUID)
+        body: the intent to be sent (dict)
+        method: the pending request, None if there is nothing to send (str)
+        busy: True if a request is in flight (bool)
+    """
+
+    def __init__(self, handle, url, uuid=None):
+
+        self.handle = handle
+        self.url = url
+        self.uuid = uuid
+        self.body = None
+        self.method = None
+        self.busy = False
+
+    @property
+    def path(self):
+        """Return the path of the pending request."""
+
+        if self.uuid:
+            return "%s/%s" % (self.url, self.uuid)
+
+        return self.url
+
 
 class IntentHandler(tornado.web.RequestHandler):
     """Datastreams handler."""
@@ -39,17 +105,54 @@ class IntentHandler(tornado.web.RequestHandler):
 
 
 class IntentServer(tornado.web.Application):
-    """Intent Server."""
+    """Intent Server.
+
+    Attributes:
+        port: the port of the intent server (int)
+        intent_host: the SDN controller address (str)
+        intent_port: the SDN controller port (int)
+        intent_url_bulk: the bulk requests url, bulk requests are not used
+          if None (str)
+    """
 
     handlers = [IntentHandler]
 
-    def __init__(self, port):
+    def __init__(self, port, intent_host="localhost", intent_port=8080,
+                 intent_url_bulk=None, max_clients=DEFAULT_MAX_CLIENTS):
 
         self.port = int(port)
-        self.intent_host = "localhost"
-        self.intent_port = 8080
+        self.intent_host = intent_host
+        self.intent_port = int(intent_port)
         self.intent_url_rules = "/intent/rules"
         self.intent_url_poa = "/intent/poa"
+        self.intent_url_bulk = intent_url_bulk
+
+        # intents indexed by handle
+        self.__intents = {}
+
+        # intents with a pending request indexed by handle, in order
+        self.__queue = OrderedDict()
+
+        # pending collection-wide requests, nothing else is sent until
+        # they are completed
+        self.__barriers = []
+        self.__in_flight = 0
+        self.__scheduled = False
+
+        self.stats = {'sent': 0,
+                      'coalesced': 0,
+                      'failed': 0,
+                      'bulk': 0,
+                      'max_queue': 0,
+                      'latency_total': 0.0,
+                      'latency_max': 0.0,
+                      'latency_last': 0.0}
+
+        if HTTP_CLIENT:
+            tornado.httpclient.AsyncHTTPClient.configure(HTTP_CLIENT)
+
+        self.__client = tornado.httpclient.AsyncHTTPClient(
+            force_instance=True, max_clients=max_clients)
 
         handlers = []
         for handler in self.handlers:
@@ -66,39 +169,200 @@ class IntentServer(tornado.web.Application):
         self.remove_rule()
         self.remove_poa()
 
-    def __get_response(self, method, url, uuid=None, body=None):
-        """Generic get intent."""
+    def __fetch(self, method, path, body, callback):
+        """Send a request to the SDN controller.
 
-        conn = http.client.HTTPConnection(self.intent_host, self.intent_port)
-        url = url + "/%s" % uuid if uuid else url
+        The callback is called with the response once the request is
+        completed. Network errors are returned as 599 responses.
+        """
+
+        url = "http://%s:%u%s" % (self.intent_host, self.intent_port, path)
         headers = {}
 
-        if body:
-            body = json.dumps(body, indent=4, cls=EmpowerEncoder)
+        if body is not None:
+            body = json.dumps(body, cls=EmpowerEncoder)
             headers = {
                 'Content-type': 'application/json',
                 'Accept': 'application/json',
             }
-            LOG.info("Intent %s %s:\n%s", method, url, body)
+            LOG.info("Intent %s %s: %s", method, path, body)
+        else:
+            LOG.info("Intent %s %s", method, path)
+
+        request = tornado.httpclient.HTTPRequest(
+            url, method=method, headers=headers, body=body,
+            request_timeout=REQUEST_TIMEOUT)
+
+        self.__in_flight += 1
+        self.stats['sent'] += 1
+        started = tornado.ioloop.IOLoop.current().time()
+
+        def on_response(response):
+
+            self.__in_flight -= 1
+
+            latency = \
+                (tornado.ioloop.IOLoop.current().time() - started) * 1000.0
+            self.stats['latency_total'] += latency
+            self.stats['latency_last'] = latency
+            self.stats['latency_max'] = max(self.stats['latency_max'],
+                                            latency)
+
+            if response.code == 599:
+                self.stats['failed'] += 1
+                LOG.warning("Intent interface not found: %s",
+                            response.error)
+            else:
+                LOG.info("Result: %u %s", response.code, response.reason)
+
+            try:
+                callback(response)
+            except Exception as ex:
+                LOG.exception(ex)
+
+            self.__schedule()
+
+        self.__client.fetch(request, callback=on_response, raise_error=False)
+
+    def __schedule(self):
+        """Flush the queue at the next IOLoop iteration."""
+
+        if self.__scheduled:
+            return
+
+        self.__scheduled = True
+        tornado.ioloop.IOLoop.current().add_callback(self.__flush)
+
+    def __flush(self):
+        """Send the pending requests."""
+
+        self.__scheduled = False
+
+        while self.__barriers:
+
+            if self.__in_flight:
+                return
+
+            method, url = self.__barriers.pop(0)
+            self.__fetch(method, url, None, lambda response: None)
+
+            # the next barrier (or the queue) waits for this one
+            return
+
+        ready = [x for x in self.__queue.values() if not x.busy]
+
+        if not ready:
+            return
+
+        for intent in ready:
+            del self.__queue[intent.handle]
+
+        if self.intent_url_bulk and len(ready) > 1:
+            for i in range(0, len(ready), DEFAULT_BATCH):
+                self.__send_bulk(ready[i:i + DEFAULT_BATCH])
+            return
+
+        for intent in ready:
+            self.__send(intent)
+
+    def __send(self, intent):
+        """Send the pending request of an intent."""
+
+        method, body = intent.method, intent.body
+        intent.method = None
+        intent.busy = True
+
+        def on_response(response):
+            self.__done(intent, method, response.code,
+                        response.headers.get("Location", None))
+
+        self.__fetch(method, intent.path, body, on_response)
+
+    def __send_bulk(self, intents):
+        """Send the pending requests of a list of intents with one POST.
+
+        The body is a list of {"method", "url", "body"} objects and the SDN
+        controller is expected to reply with a list of {"status",
+        "location"} objects in the same order.
+        """
+
+        requests = []
+
+        for intent in intents:
+            requests.append({'method': intent.method,
+                             'url': intent.path,
+                             'body': intent.body})
+            intent.method = None
+            intent.busy = True
+
+        self.stats['bulk'] += 1
+
+        def on_response(response):
+
+            try:
+                results = json.loads(response.body.decode('utf-8'))
+            except (AttributeError, ValueError):
+                results = []
+
+            if len(results) != len(intents):
+                LOG.error("Invalid bulk response: %u %s", response.code,
+                          response.reason)
+                results = [{}] * len(intents)
+
+            for intent, request, result in zip(intents, requests, results):
+                self.__done(intent, request['method'],
+                            result.get('status', 599),
+                            result.get('location', None))
+
+        self.__fetch("POST", self.intent_url_bulk, requests, on_response)
+
+    def __done(self, intent, method, status, location):
+        """Account for a completed request."""
+
+        intent.busy = False
+
+        if status not in (200, 201, 204):
+            LOG.error("Intent %s %s failed: %u", method, intent.url, status)
+
+        if method == "POST" and status == 201 and location:
+            intent.uuid = UUID(urlparse(location).path.split("/")[-1])
+            # updated while the POST was in flight
+            if intent.method == "POST":
+                intent.method = "PUT"
+        elif method == "DELETE":
+            intent.uuid = None
+
+        # an intent removed while the POST was in flight
+        if method == "POST" and intent.handle not in self.__intents:
+            if intent.uuid:
+                intent.method = "DELETE"
+                intent.busy = True
+                self.__fetch("DELETE", intent.path, None,
+                             lambda response: self.__done(intent, "DELETE",
+                                                          response.code,
+                                                          None))
+            return
+
+        if intent.method:
+            self.__enqueue(intent)
+
+    def __enqueue(self, intent):
+        """Add an intent to the queue."""
+
+        if intent.handle in self.__queue:
+            self.stats['coalesced'] += 1
         else:
-            LOG.info("Intent %s %s", method, url)
+            self.__queue[intent.handle] = intent
 
-        conn.request(method, url, body, headers)
-        response = conn.getresponse()
-        location = response.getheader("Location", None)
-        ret = (response.status, response.reason, location)
-        LOG.info("Result: %u %s", ret[0], ret[1])
-        conn.close()
+        self.stats['max_queue'] = max(self.stats['max_queue'],
+                                      len(self.__queue))
 
-        return ret
+        self.__schedule()
 
     def __get_intent(self, url, uuid=None):
-        try:
-            self.__get_response("GET", url, uuid)
-        except ConnectionRefusedError:
-            LOG.error("Intent interface not found")
-        except Exception as ex:
-            LOG.exception(ex)
+
+        path = url + "/%s" % uuid if uuid else url
+        self.__fetch("GET", path, None, lambda response: None)
 
     def get_rule(self, uuid=None):
         self.__get_intent(self.intent_url_rules, uuid)
@@ -106,55 +370,79 @@ class IntentServer(tornado.web.Application):
     def get_poa(self, uuid=None):
         self.__get_intent(self.intent_url_poa, uuid)
 
-    def __send_intent(self, method, url, intent, uuid=None):
-        """Create new intent."""
+    def __add_intent(self, url, intent):
+        """Create new intent, return its handle."""
+
+        handle = uuid4()
+
+        self.__intents[handle] = Intent(handle, url)
+        self.__update_intent(intent, handle)
 
-        try:
-            ret = self.__get_response(method, url, uuid, intent)
-            if ret[0] == 201:
-                url = urlparse(ret[2])
-                uuid = UUID(url.path.split("/")[-1])
-                return uuid
-            if ret[0] == 204:
-                return uuid
-        except ConnectionRefusedError:
-            LOG.warning("Intent interface not found")
-        except Exception as ex:
-            LOG.exception(ex)
+        return handle
 
-        return None
+    def __update_intent(self, intent, handle):
+        """Update an intent."""
+
+        if handle not in self.__intents:
+            LOG.error("Intent %s not found", handle)
+            return
+
+        entry = self.__intents[handle]
+        entry.body = intent
+
+        # the intent is created if the previous POST failed
+        entry.method = "PUT" if entry.uuid else "POST"
+
+        self.__enqueue(entry)
 
     def add_rule(self, intent):
-        return self.__send_intent(method="POST",
-                                  url=self.intent_url_rules,
-                                  intent=intent)
+        return self.__add_intent(self.intent_url_rules, intent)
 
     def add_poa(self, intent):
-        return self.__send_intent(method="POST",
-                                  url=self.intent_url_poa,
-                                  intent=intent)
+        return self.__add_intent(self.intent_url_poa, intent)
 
     def update_rule(self, intent, uuid):
-        self.__send_intent(method="PUT",
-                           url=self.intent_url_rules,
-                           intent=intent,
-                           uuid=uuid)
+        self.__update_intent(intent, uuid)
 
     def update_poa(self, intent, uuid):
-        self.__send_intent(method="PUT",
-                           url=self.intent_url_poa,
-                           intent=intent,
-                           uuid=uuid)
+        self.__update_intent(intent, uuid)
 
     def __remove_intent(self, url, uuid=None):
-        """Remove intent."""
+        """Remove intent, all the intents of url if uuid is None."""
+
+        if not uuid:
 
-        try:
-            self.__get_response("DELETE", url, uuid)
-        except ConnectionRefusedError:
-            LOG.error("Intent interface not found")
-        except Exception as ex:
-            LOG.exception(ex)
+            for handle in [x for x in self.__intents
+                           if self.__intents[x].url == url]:
+                del self.__intents[handle]
+                self.__queue.pop(handle, None)
+
+            self.__barriers.append(("DELETE", url))
+            self.__schedule()
+
+            return
+
+        if uuid not in self.__intents:
+            return
+
+        intent = self.__intents.pop(uuid)
+
+        # a POST in flight, the intent is removed once created
+        if intent.busy and not intent.uuid:
+            self.__queue.pop(uuid, None)
+            return
+
+        if not intent.uuid:
+            if uuid in self.__queue:
+                del self.__queue[uuid]
+                self.stats['coalesced'] += 1
+            return
+
+        intent.method = "DELETE"
+        intent.body = None
+
+        if not intent.busy:
+            self.__enqueue(intent)
 
     def remove_rule(self, uuid=None):
         self.__remove_intent(self.intent_url_rules, uuid)
@@ -165,14 +453,30 @@ class IntentServer(tornado.web.Application):
     def to_dict(self):
         """ Return a dict representation of the object. """
 
+        sent = self.stats['sent']
+        latency_avg = self.stats['latency_total'] / sent if sent else 0.0
+
         return {'port': self.port,
                 'intent_host': self.intent_host,
-                'intent_port': self.intent_port}
-
-
-def launch(port=DEFAULT_PORT):
+                'intent_port': self.intent_port,
+                'intent_url_bulk': self.intent_url_bulk,
+                'intents': len(self.__intents),
+                'queue': len(self.__queue),
+                'in_flight': self.__in_flight,
+                'sent': sent,
+                'coalesced': self.stats['coalesced'],
+                'failed': self.stats['failed'],
+                'bulk': self.stats['bulk'],
+                'max_queue': self.stats['max_queue'],
+                'latency_avg': latency_avg,
+                'latency_max': self.stats['latency_max'],
+                'latency_last': self.stats['latency_last']}
+
+
+def launch(port=DEFAULT_PORT, intent_host="localhost", intent_port=8080,
+           intent_url_bulk=None):
     """Start the Intent Server Module."""
 
-    server = IntentServer(port)
+    server = IntentServer(port, intent_host, intent_port, intent_url_bulk)
     LOG.info("Intent Server available at %u", server.port)
     return server
@@ -15,46 +15,396 @@
 # specific language governing permissions and limitations
 # under the License.
 
-"""EmPOWER logging package."""
+"""EmPOWER logging package.
+
+Loggers are named after the module requesting them. The name is resolved
+once per source file and then cached.
+
+Once start() is called the records are put on a queue and formatted and
+written by a background thread, so the IOLoop never blocks on the log
+output. Records are formatted only by the background thread, hence the
+arguments of a log call are converted to string lazily (and only if the
+record is not dropped). Expensive messages can be wrapped in Lazy.
+
+Records can be rate limited and sampled per key. While a southbound message
+is being dispatched the key is the protocol and the message type (e.g.
+lvapp.status_lvap, see set_context()), otherwise it is the logger name.
+"""
 
 import inspect
 import os
+import sys
+import time
+import queue
+import atexit
 import logging
+import threading
+
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 
 PATH = inspect.stack()[0][1]
 EXT_PATH = PATH[0:PATH.rindex(os.sep)]
 EXT_PATH = os.path.dirname(EXT_PATH) + os.sep
 PATH = os.path.dirname(PATH) + os.sep
 
+# Key matching all the records without a more specific limit
+DEFAULT_KEY = "*"
+
+# Maximum number of records waiting to be written, newer ones are dropped
+DEFAULT_QUEUE_SIZE = 100000
+
+# Source file -> logger name
+NAMES = {}
+
+CONTEXT = threading.local()
+
+
+def logger_name(filename):
+    """Return the logger name for a source file."""
+
+    name = filename
+
+    if name.endswith('.py'):
+        name = name[0:-3]
+    elif name.endswith('.pyc'):
+        name = name[0:-4]
+    if name.startswith(PATH):
+        name = name[len(PATH):]
+    elif name.startswith(EXT_PATH):
+        name = name[len(EXT_PATH):]
+    name = name.replace('/', '.').replace('\\', '.')
+
+    # Remove double names ("topology.topology" -> "topology")
+    if name.find('.') != -1:
+        toks = name.split('.')
+        if len(toks) >= 2:
+            if toks[-1] == toks[-2]:
+                del toks[-1]
+                name = '.'.join(toks)
+
+    if name.startswith("ext."):
+        name = name.split("ext.", 1)[1]
+
+    if name.endswith(".__init__"):
+        name = name.rsplit(".__init__", 1)[0]
+
+    return name
+
 
 def get_logger(name=None, more_frames=0):
     """Logger factory."""
 
     if name is None:
-        stack = inspect.stack()[1+more_frames]
-        name = stack[1]
-        if name.endswith('.py'):
-            name = name[0:-3]
-        elif name.endswith('.pyc'):
-            name = name[0:-4]
-        if name.startswith(PATH):
-            name = name[len(PATH):]
-        elif name.startswith(EXT_PATH):
-            name = name[len(EXT_PATH):]
-        name = name.replace('/', '.').replace('\\', '.')
-
-        # Remove double names ("topology.topology" -> "topology")
-        if name.find('.') != -1:
-            toks = name.split('.')
-            if len(toks) >= 2:
-                if toks[-1] == toks[-2]:
-                    del toks[-1]
-                    name = '.'.join(toks)
-
-        if name.startswith("ext."):
-            name = name.split("ext.", 1)[1]
-
-        if name.endswith(".__init__"):
-            name = name.rsplit(".__init__", 1)[0]
+        filename = sys._getframe(1 + more_frames).f_code.co_filename
+        name = NAMES.get(filename)
+        if name is None:
+            name = NAMES[filename] = logger_name(filename)
 
     return logging.getLogger(name)
+
+
+def set_context(key):
+    """Set the rate limiting key of the records logged by this thread.
+
+    Args:
+        key: the key (str), None to use the logger name
+
+    Returns:
+        None
+    """
+
+    CONTEXT.key = key
+
+
+class Lazy(object):
+    """A log argument computed only if the record is written.
+
+    Example:
+
+        LOG.info("LVAP status %s", Lazy(format_status, status))
+    """
+
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, *args):
+
+        self.function = function
+        self.args = args
+
+    def __str__(self):
+        return str(self.function(*self.args))
+
+
+class Limit(object):
+    """A rate limit.
+
+    Attributes:
+        rate: maximum number of records per second, None for no limit
+        burst: maximum number of records in a burst (int)
+        sample: only one record every sample is kept (int)
+        passed: number of records kept (int)
+        dropped: number of records dropped (int)
+    """
+
+    __slots__ = ('rate', 'burst', 'sample', 'passed', 'dropped',
+                 'tokens', 'last', 'seen')
+
+    def __init__(self, rate=None, burst=None, sample=1):
+
+        if rate is not None and rate < 0:
+            raise ValueError("Invalid rate %s" % rate)
+
+        if sample < 1:
+            raise ValueError("Invalid sample %s" % sample)
+
+        self.rate = rate
+        self.burst = max(1, int(rate)) if burst is None and rate else burst
+        self.sample = sample
+        self.passed = 0
+        self.dropped = 0
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.seen = 0
+
+    def allow(self):
+        """Return True if a record must be kept."""
+
+        self.seen += 1
+
+        if self.seen % self.sample:
+            self.dropped += 1
+            return False
+
+        if self.rate is not None:
+
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+            if self.tokens < 1:
+                self.dropped += 1
+                return False
+
+            self.tokens -= 1
+
+        self.passed += 1
+
+        return True
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'rate': self.rate,
+                'burst': self.burst,
+                'sample': self.sample,
+                'passed': self.passed,
+                'dropped': self.dropped}
+
+
+class RateLimitFilter(logging.Filter):
+    """Per key rate limiting and sampling of log records.
+
+    Warnings and errors are never dropped. A limit set for the default key
+    applies separately to every key without a limit of its own.
+    """
+
+    __instance = None
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.limits = {}
+        self.__defaults = {}
+
+    @classmethod
+    def instance(cls):
+        """Return the global RateLimitFilter."""
+
+        if not cls.__instance:
+            cls.__instance = RateLimitFilter()
+
+        return cls.__instance
+
+    def set_limit(self, key, rate=None, burst=None, sample=1):
+        """Set the limit of a key, replacing the previous one."""
+
+        self.limits[key] = Limit(rate, burst, sample)
+
+        if key == DEFAULT_KEY:
+            self.__defaults = {}
+
+    def remove_limit(self, key):
+        """Remove the limit of a key."""
+
+        del self.limits[key]
+
+        if key == DEFAULT_KEY:
+            self.__defaults = {}
+
+    def filter(self, record):
+
+        if not self.limits or record.levelno >= logging.WARNING:
+            return True
+
+        key = getattr(CONTEXT, 'key', None) or record.name
+        limit = self.limits.get(key)
+
+        if limit is None:
+
+            default = self.limits.get(DEFAULT_KEY)
+
+            if default is None:
+                return True
+
+            limit = self.__defaults.get(key)
+
+            if limit is None:
+                limit = self.__defaults[key] = \
+                    Limit(default.rate, default.burst, default.sample)
+
+        return limit.allow()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        out = {k: v.to_dict() for k, v in self.limits.items()}
+
+        if self.__defaults:
+            out[DEFAULT_KEY]['keys'] = \
+                {k: v.to_dict() for k, v in self.__defaults.items()}
+
+        return out
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Queue handler deferring the record formatting to the listener.
+
+    Records are put on the queue as they are, only the exception (if any)
+    is rendered here since the traceback does not survive the stack frame.
+    Arguments are converted to string by the listener thread: mutable
+    objects are logged as they are at that time. If the queue is full the
+    record is dropped.
+    """
+
+    def __init__(self, records):
+
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record):
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging(object):
+    """Moves the root handlers behind a queue drained by a thread.
+
+    Attributes:
+        handler: the handler queueing the records (AsyncQueueHandler)
+        listener: the listener writing the records (QueueListener)
+        running: True until stop() is called (bool)
+    """
+
+    __instance = None
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+
+        root = logging.getLogger()
+
+        records = queue.Queue(queue_size)
+        handlers = root.handlers[:]
+
+        self.handler = AsyncQueueHandler(records)
+        self.handler.addFilter(RateLimitFilter.instance())
+        self.listener = QueueListener(records, *handlers,
+                                      respect_handler_level=True)
+
+        for handler in handlers:
+            root.removeHandler(handler)
+
+        root.addHandler(self.handler)
+
+        self.listener.start()
+        self.running = True
+
+        atexit.register(self.stop)
+
+    @classmethod
+    def instance(cls):
+        """Return the global AsyncLogging, None if not started."""
+
+        return cls.__instance
+
+    @classmethod
+    def start(cls, queue_size=DEFAULT_QUEUE_SIZE):
+        """Start asynchronous logging."""
+
+        if not cls.__instance:
+            cls.__instance = AsyncLogging(queue_size)
+
+        return cls.__instance
+
+    def stop(self):
+        """Write the queued records and stop the listener thread."""
+
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'queued': self.handler.queue.qsize(),
+                'dropped': self.handler.dropped}
+
+
+def start(queue_size=DEFAULT_QUEUE_SIZE):
+    """Start asynchronous logging."""
+
+    return AsyncLogging.start(queue_size)
+
+
+def parse_limits(limits):
+    """Set the limits from a string.
+
+    Args:
+        limits: comma separated key=rate[:burst][/sample] items, e.g.
+          "lvapp.status_lvap=10:50,*=100,vbsp.mac_prb_utilization=/10"
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: if the string is malformed
+    """
+
+    for item in limits.split(","):
+
+        if not item.strip():
+            continue
+
+        key, value = item.split("=", 1)
+
+        value, _, sample = value.partition("/")
+        rate, _, burst = value.partition(":")
+
+        RateLimitFilter.instance().set_limit(
+            key.strip(),
+            float(rate) if rate else None,
+            int(burst) if burst else None,
+            int(sample) if sample else 1)
@@ -143,7 +143,7 @@ class LVAPStats(Module):
                       lvap.addr, lvap.wtp.addr, self.module_id)
 
         msg = RATES_REQUEST.build(rates_req)
-        lvap.wtp.connection.stream.write(msg)
+        lvap.wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming RATES_RESPONSE message.
@@ -192,7 +192,10 @@ def bound_lvap_stats(self, **kwargs):
 setattr(EmpowerApp, LVAPStats.MODULE_NAME, bound_lvap_stats)
 
 
-def launch():
+def launch(batch=False):
     """ Initialize the module. """
 
-    return LVAPStatsWorker(LVAPStats, PT_RATES_RESPONSE, RATES_RESPONSE)
+    worker = LVAPStatsWorker(LVAPStats, PT_RATES_RESPONSE, RATES_RESPONSE)
+    worker.batch = batch in (True, "True", "true", "1")
+
+    return worker
@@ -100,7 +100,8 @@ AUTH_RESPONSE = Struct("auth_response", UBInt8("version"),
                        UBInt8("type"),
                        UBInt32("length"),
                        UBInt32("seq"),
-                       Bytes("sta", 6))
+                       Bytes("sta", 6),
+                       Bytes("bssid", 6))
 
 ASSOC_REQUEST = \
     Struct("assoc_request", UBInt8("version"),
@@ -0,0 +1,796 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP precompiled codec.
+
+The LVAP protocol messages are defined using construct Structs. Construct
+interprets the definition every time a message is parsed or built which is
+expensive on the controller hot path (hellos, probe requests, status
+updates). This module walks the very same definitions once and compiles them
+into struct.Struct based codecs:
+
+  - the leading fixed-size fields of a message are folded into a single
+    struct.Struct and decoded with one unpack_from call;
+  - the variable-size tail (SSIDs, arrays, ranges) is decoded separately;
+  - both parts are decoded lazily, i.e. only when one of their fields is
+    accessed for the first time.
+
+Compiled codecs expose the same name, parse() and build() interface of the
+construct Structs they are generated from and can be used as a drop-in
+replacement for them, e.g.:
+
+    HELLO_CODEC = compile_struct(HELLO)
+    hello = HELLO_CODEC.parse(data)
+    print(hello.wtp, hello.period)
+"""
+
+import struct
+
+from construct import Container
+from construct import Struct
+from construct import Sequence
+from construct import FormatField
+from construct import StaticField
+from construct import MetaField
+from construct import MetaArray
+from construct import Range
+from construct import Buffered
+from construct import BitIntegerAdapter
+from construct import PaddingAdapter
+
+CODEC_CONSTRUCT = "construct"
+CODEC_COMPILED = "compiled"
+CODECS = [CODEC_CONSTRUCT, CODEC_COMPILED]
+
+BITS_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+class _Context(dict):
+    """Parsing context handed to the construct length/count functions."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _Fixed(object):
+    """A fixed-size field that can be folded into a struct format.
+
+    Attributes:
+        name: the field name (None for paddings)
+        fmt: the struct format (without byte order)
+        nvals: the number of values produced by fmt
+        decode: function turning the raw values into the field value or None
+            if the field maps to exactly one raw value
+        encode: function turning the field value into a tuple of raw values
+            or None if the field maps to exactly one raw value
+    """
+
+    __slots__ = ('name', 'fmt', 'nvals', 'decode', 'encode')
+
+    def __init__(self, name, fmt, nvals=1, decode=None, encode=None):
+
+        self.name = name
+        self.fmt = fmt
+        self.nvals = nvals
+        self.decode = decode
+        self.encode = encode
+
+
+class _FixedRun(object):
+    """A run of consecutive fixed-size fields packed in one struct.Struct."""
+
+    def __init__(self, fields):
+
+        self.fields = [x for x in fields if x.name is not None]
+        self.packer = struct.Struct('>' + ''.join([x.fmt for x in fields]))
+        self.size = self.packer.size
+        self.names = [x.name for x in self.fields]
+        self.plain = not [x for x in self.fields
+                          if x.nvals != 1 or x.decode or x.encode]
+
+    def unpack(self, buf, offset):
+        """Return the list of field values starting at offset."""
+
+        if len(buf) - offset < self.size:
+            raise ValueError("expected %u bytes, found %u" %
+                             (self.size, len(buf) - offset))
+
+        vals = self.packer.unpack_from(buf, offset)
+
+        if self.plain:
+            return vals
+
+        out = []
+        idx = 0
+
+        for field in self.fields:
+            if field.decode:
+                out.append(field.decode(vals[idx:idx + field.nvals]))
+            else:
+                out.append(vals[idx])
+            idx += field.nvals
+
+        return out
+
+    def pack(self, obj):
+        """Pack the fields of obj."""
+
+        if self.plain:
+            return self.packer.pack(*[getattr(obj, x) for x in self.names])
+
+        vals = []
+
+        for field in self.fields:
+            if field.encode:
+                vals.extend(field.encode(getattr(obj, field.name)))
+            else:
+                vals.append(getattr(obj, field.name))
+
+        return self.packer.pack(*vals)
+
+
+class _Bytes(object):
+    """Variable length bytes field (construct MetaField)."""
+
+    def __init__(self, name, lengthfunc):
+
+        self.name = name
+        self.lengthfunc = lengthfunc
+
+    def parse(self, buf, offset, ctx):
+        """Parse field starting at offset."""
+
+        length = self.lengthfunc(ctx)
+
+        if length < 0 or len(buf) - offset < length:
+            raise ValueError("expected %d bytes, found %u" %
+                             (length, len(buf) - offset))
+
+        return bytes(buf[offset:offset + length]), offset + length
+
+    def build(self, value, ctx):
+        """Build field."""
+
+        length = self.lengthfunc(ctx)
+
+        if len(value) != length:
+            raise ValueError("expected %d bytes, found %u" %
+                             (length, len(value)))
+
+        return bytes(value)
+
+
+class _Element(object):
+    """Single element of an array or a range (fixed or variable size)."""
+
+    def __init__(self, node):
+
+        self.node = node
+
+        if isinstance(node, _Fixed):
+            self.packer = struct.Struct('>' + node.fmt)
+            self.size = self.packer.size
+        else:
+            self.packer = None
+            self.size = None
+
+    def parse(self, buf, offset, ctx):
+        """Parse one element starting at offset."""
+
+        if not self.packer:
+            return self.node.parse(buf, offset, ctx)
+
+        if len(buf) - offset < self.size:
+            raise ValueError("expected %u bytes, found %u" %
+                             (self.size, len(buf) - offset))
+
+        vals = self.packer.unpack_from(buf, offset)
+
+        if self.node.decode:
+            return self.node.decode(vals), offset + self.size
+
+        return vals[0], offset + self.size
+
+    def build(self, value, ctx):
+        """Build one element."""
+
+        if not self.packer:
+            return self.node.build(value, ctx)
+
+        if self.node.encode:
+            return self.packer.pack(*self.node.encode(value))
+
+        return self.packer.pack(value)
+
+
+class _Array(object):
+    """Counted array (construct MetaArray)."""
+
+    def __init__(self, name, countfunc, element):
+
+        self.name = name
+        self.countfunc = countfunc
+        self.element = element
+
+    def parse(self, buf, offset, ctx):
+        """Parse array starting at offset."""
+
+        count = self.countfunc(ctx)
+        element = self.element
+
+        if element.packer:
+
+            length = element.size * count
+
+            if len(buf) - offset < length:
+                raise ValueError("expected %u bytes, found %u" %
+                                 (length, len(buf) - offset))
+
+            chunk = memoryview(buf)[offset:offset + length]
+            decode = element.node.decode
+
+            if decode:
+                out = [decode(x) for x in element.packer.iter_unpack(chunk)]
+            else:
+                out = [x[0] for x in element.packer.iter_unpack(chunk)]
+
+            return out, offset + length
+
+        out = []
+
+        for _ in range(count):
+            value, offset = element.parse(buf, offset, ctx)
+            out.append(value)
+
+        return out, offset
+
+    def build(self, value, ctx):
+        """Build array."""
+
+        count = self.countfunc(ctx)
+
+        if len(value) != count:
+            raise ValueError("expected %d, found %d" % (count, len(value)))
+
+        return b''.join([self.element.build(x, ctx) for x in value])
+
+
+class _Native(object):
+    """A construct providing its own buffer codec (parse_buffer and
+    build_buffer methods)."""
+
+    def __init__(self, con):
+
+        self.name = con.name
+        self.con = con
+
+    def parse(self, buf, offset, ctx):
+        """Parse field starting at offset."""
+
+        return self.con.parse_buffer(buf, offset, ctx)
+
+    def build(self, value, ctx):
+        """Build field."""
+
+        return self.con.build_buffer(value, ctx)
+
+
+class _Range(object):
+    """Greedy repeater (construct Range)."""
+
+    def __init__(self, name, mincount, maxcount, element):
+
+        self.name = name
+        self.mincount = mincount
+        self.maxcount = maxcount
+        self.element = element
+
+    def parse(self, buf, offset, ctx):
+        """Parse as many elements as possible starting at offset."""
+
+        out = []
+
+        while len(out) < self.maxcount:
+            try:
+                value, offset = self.element.parse(buf, offset, ctx)
+            except (ValueError, struct.error):
+                break
+            out.append(value)
+
+        if len(out) < self.mincount:
+            raise ValueError("expected %d to %d, found %d" %
+                             (self.mincount, self.maxcount, len(out)))
+
+        return out, offset
+
+    def build(self, value, ctx):
+        """Build range."""
+
+        if len(value) < self.mincount or len(value) > self.maxcount:
+            raise ValueError("expected %d to %d, found %d" %
+                             (self.mincount, self.maxcount, len(value)))
+
+        return b''.join([self.element.build(x, ctx) for x in value])
+
+
+class _Record(object):
+    """Nested variable size Struct/Sequence."""
+
+    def __init__(self, segments, as_list):
+
+        self.segments = segments
+        self.as_list = as_list
+
+    def parse(self, buf, offset, parent):
+        """Parse record starting at offset."""
+
+        ctx = _Context(_=parent)
+        values = []
+
+        for segment in self.segments:
+            if isinstance(segment, _FixedRun):
+                vals = segment.unpack(buf, offset)
+                offset += segment.size
+                for name, value in zip(segment.names, vals):
+                    ctx[name] = value
+                    values.append((name, value))
+            else:
+                value, offset = segment.parse(buf, offset, ctx)
+                ctx[segment.name] = value
+                values.append((segment.name, value))
+
+        if self.as_list:
+            return [x[1] for x in values], offset
+
+        out = Container()
+
+        for name, value in values:
+            out[name] = value
+
+        return out, offset
+
+    def build(self, value, ctx):
+        """Build record."""
+
+        if self.as_list:
+            raise TypeError("Variable size sequences are not supported")
+
+        out = []
+
+        for segment in self.segments:
+            if isinstance(segment, _FixedRun):
+                out.append(segment.pack(value))
+            else:
+                out.append(segment.build(getattr(value, segment.name), value))
+
+        return b''.join(out)
+
+
+def _bits_field(con):
+    """Compile a BitStruct into a single fixed field."""
+
+    bits = []
+    width = 0
+
+    for subcon in con.subcon.subcons:
+
+        if isinstance(subcon, PaddingAdapter):
+            width += subcon.subcon.length
+            continue
+
+        if isinstance(subcon, BitIntegerAdapter) and \
+           not subcon.signed and not subcon.swapped:
+            bits.append((subcon.name, width, subcon.width))
+            width += subcon.width
+            continue
+
+        raise TypeError("Unsupported bit field %s" % subcon)
+
+    if width % 8 or width // 8 not in BITS_FORMATS:
+        raise TypeError("Unsupported bit struct width %u" % width)
+
+    # (name, shift, mask), first bit is the most significant one
+    bits = [(name, width - offset - size, (1 << size) - 1)
+            for name, offset, size in bits]
+
+    def decode(vals):
+        value = vals[0]
+        out = Container()
+        for name, shift, mask in bits:
+            out[name] = (value >> shift) & mask
+        return out
+
+    def encode(flags):
+        value = 0
+        for name, shift, mask in bits:
+            value |= (int(getattr(flags, name)) & mask) << shift
+        return (value, )
+
+    return _Fixed(con.name, BITS_FORMATS[width // 8], 1, decode, encode)
+
+
+def _group_field(con, fields, as_list):
+    """Fold a fixed size Struct/Sequence into a single fixed field."""
+
+    named = [x for x in fields if x.name is not None]
+    fmt = ''.join([x.fmt for x in fields])
+    nvals = sum([x.nvals for x in named])
+
+    def values(vals):
+        idx = 0
+        for field in named:
+            if field.decode:
+                yield field.name, field.decode(vals[idx:idx + field.nvals])
+            else:
+                yield field.name, vals[idx]
+            idx += field.nvals
+
+    if as_list:
+
+        def decode(vals):
+            return [x[1] for x in values(vals)]
+
+        def encode(value):
+            out = []
+            for field, item in zip(named, value):
+                if field.encode:
+                    out.extend(field.encode(item))
+                else:
+                    out.append(item)
+            return out
+
+    else:
+
+        def decode(vals):
+            out = Container()
+            for name, value in values(vals):
+                out[name] = value
+            return out
+
+        def encode(value):
+            out = []
+            for field in named:
+                if field.encode:
+                    out.extend(field.encode(getattr(value, field.name)))
+                else:
+                    out.append(getattr(value, field.name))
+            return out
+
+    return _Fixed(con.name, fmt, nvals, decode, encode)
+
+
+def _compile_fixed(con):
+    """Compile a fixed size construct, return None if not fixed size."""
+
+    if isinstance(con, FormatField):
+
+        fmt = con.packer.format
+
+        if isinstance(fmt, bytes):
+            fmt = fmt.decode()
+
+        if fmt[0] != '>':
+            raise TypeError("Unsupported byte order %s" % fmt)
+
+        return _Fixed(con.name, fmt[1:])
+
+    if isinstance(con, StaticField) and con.name is not None:
+        return _Fixed(con.name, "%us" % con.length)
+
+    if isinstance(con, PaddingAdapter) and \
+       isinstance(con.subcon, StaticField):
+        return _Fixed(None, "%ux" % con.subcon.length, 0)
+
+    if isinstance(con, Buffered) and isinstance(con.subcon, Struct):
+        return _bits_field(con)
+
+    if isinstance(con, (Struct, Sequence)):
+
+        fields = [_compile_fixed(x) for x in con.subcons]
+
+        if None in fields:
+            return None
+
+        return _group_field(con, fields, isinstance(con, Sequence))
+
+    return None
+
+
+def _compile_segments(subcons):
+    """Compile a list of subcons into fixed runs and variable nodes."""
+
+    segments = []
+    run = []
+
+    for subcon in subcons:
+
+        fixed = _compile_fixed(subcon)
+
+        if fixed:
+            run.append(fixed)
+            continue
+
+        if run:
+            segments.append(_FixedRun(run))
+            run = []
+
+        segments.append(_compile_variable(subcon))
+
+    if run:
+        segments.append(_FixedRun(run))
+
+    return segments
+
+
+def _compile_element(con):
+    """Compile the repeated element of an array or a range."""
+
+    fixed = _compile_fixed(con)
+
+    if fixed:
+        return _Element(fixed)
+
+    if isinstance(con, (Struct, Sequence)):
+        record = _Record(_compile_segments(con.subcons),
+                         isinstance(con, Sequence))
+        return _Element(record)
+
+    raise TypeError("Unsupported element %s" % con)
+
+
+def _compile_variable(con):
+    """Compile a variable size construct."""
+
+    if isinstance(con, MetaField):
+        return _Bytes(con.name, con.lengthfunc)
+
+    if isinstance(con, MetaArray):
+        return _Array(con.name, con.countfunc, _compile_element(con.subcon))
+
+    if hasattr(con, 'parse_buffer') and hasattr(con, 'build_buffer'):
+        return _Native(con)
+
+    if isinstance(con, Range):
+        return _Range(con.name, con.mincount, con.maxcout,
+                      _compile_element(con.subcon))
+
+    raise TypeError("Unsupported construct %s" % con)
+
+
+class CompiledMessage(object):
+    """Base class for the lazily decoded messages.
+
+    A subclass with one property per field is generated for every compiled
+    Struct. The underlying buffer is kept as is and each segment (fixed head
+    and variable tail) is decoded the first time one of its fields is read.
+    """
+
+    __slots__ = ('_buf', '_head', '_tail')
+
+    CODEC = None
+
+    def __init__(self, buf):
+
+        self._buf = buf
+        self._head = None
+        self._tail = None
+
+    def _decode_head(self):
+        """Decode the fixed size head."""
+
+        self._head = self.CODEC.head.unpack(self._buf, 0)
+        return self._head
+
+    def _decode_tail(self):
+        """Decode the variable size tail."""
+
+        head = self._head
+
+        if head is None:
+            head = self._decode_head()
+
+        self._tail = self.CODEC.parse_tail(self._buf, head)
+        return self._tail
+
+    def __getitem__(self, name):
+
+        if name not in self.CODEC.names:
+            raise KeyError(name)
+
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.CODEC.names
+
+    def keys(self):
+        """Return the field names."""
+
+        return list(self.CODEC.names)
+
+    def to_container(self):
+        """Return a construct Container with all the fields decoded."""
+
+        out = Container()
+
+        for name in self.CODEC.names:
+            out[name] = getattr(self, name)
+
+        return out
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__,
+                           ", ".join(["%s=%r" % (x, getattr(self, x))
+                                      for x in self.CODEC.names]))
+
+
+def _head_property(idx):
+    """Generate a property reading from the fixed head."""
+
+    def getter(self):
+        head = self._head
+        if head is None:
+            head = self._decode_head()
+        return head[idx]
+
+    return property(getter)
+
+
+def _tail_property(name):
+    """Generate a property reading from the variable tail."""
+
+    def getter(self):
+        tail = self._tail
+        if tail is None:
+            tail = self._decode_tail()
+        return tail[name]
+
+    return property(getter)
+
+
+class CompiledStruct(object):
+    """A construct Struct compiled to struct.Struct packers.
+
+    Attributes:
+        name: the name of the original Struct
+        struct: the original construct Struct
+        head: the run of leading fixed size fields
+        tail: the remaining segments
+        names: the field names in wire order
+    """
+
+    def __init__(self, con):
+
+        if not isinstance(con, Struct):
+            raise TypeError("Expected Struct, got %s" % type(con).__name__)
+
+        self.name = con.name
+        self.struct = con
+
+        segments = _compile_segments(con.subcons)
+
+        if segments and isinstance(segments[0], _FixedRun):
+            self.head = segments[0]
+            self.tail = segments[1:]
+        else:
+            self.head = _FixedRun([])
+            self.tail = segments
+
+        self.names = list(self.head.names)
+
+        attrs = {'__slots__': (), 'CODEC': self}
+
+        for idx, name in enumerate(self.head.names):
+            attrs[name] = _head_property(idx)
+
+        for segment in self.tail:
+            names = segment.names if isinstance(segment, _FixedRun) \
+                else [segment.name]
+            for name in names:
+                self.names.append(name)
+                attrs[name] = _tail_property(name)
+
+        self.message = type(self.name, (CompiledMessage, ), attrs)
+
+    def parse(self, data):
+        """Parse data, return a lazily decoded message."""
+
+        return self.message(data)
+
+    def parse_tail(self, buf, head):
+        """Decode the variable size tail of a message."""
+
+        ctx = _Context(zip(self.head.names, head))
+        offset = self.head.size
+
+        for segment in self.tail:
+            if isinstance(segment, _FixedRun):
+                vals = segment.unpack(buf, offset)
+                offset += segment.size
+                ctx.update(zip(segment.names, vals))
+            else:
+                value, offset = segment.parse(buf, offset, ctx)
+                ctx[segment.name] = value
+
+        return ctx
+
+    def build(self, obj):
+        """Build a message from a Container (or any object with attributes
+        named after the fields)."""
+
+        out = [self.head.pack(obj)]
+
+        for segment in self.tail:
+            if isinstance(segment, _FixedRun):
+                out.append(segment.pack(obj))
+            else:
+                out.append(segment.build(getattr(obj, segment.name), obj))
+
+        return b''.join(out)
+
+    def sizeof(self):
+        """Return the size of the fixed head."""
+
+        return self.head.size
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.name)
+
+
+_COMPILED = {}
+
+
+def compile_struct(con):
+    """Compile a construct Struct.
+
+    Compiled codecs are cached, the same object is returned if a Struct is
+    compiled twice.
+
+    Raises:
+        TypeError: if the Struct uses unsupported constructs
+    """
+
+    if isinstance(con, CompiledStruct):
+        return con
+
+    if id(con) not in _COMPILED:
+        _COMPILED[id(con)] = (con, CompiledStruct(con))
+
+    return _COMPILED[id(con)][1]
+
+
+def select_codec(con, codec):
+    """Return the parser/builder to be used for con.
+
+    Returns the compiled codec if codec is CODEC_COMPILED and con can be
+    compiled, the original construct otherwise.
+    """
+
+    if codec not in CODECS:
+        raise ValueError("Invalid codec %s" % codec)
+
+    if not con or codec == CODEC_CONSTRUCT:
+        return con
+
+    try:
+        return compile_struct(con)
+    except TypeError:
+        return con
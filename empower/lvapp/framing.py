@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP framing.
+
+LVAPP messages are sent back to back on the TCP stream, every message
+starts with the common header whose length field covers the whole message.
+The frames are extracted here both by the LVAPP connections and by the
+sharding workers reading the stream on their behalf.
+"""
+
+from empower.lvapp import HEADER
+from empower.lvapp.codec import compile_struct
+
+HEADER_CODEC = compile_struct(HEADER)
+HEADER_SIZE = HEADER_CODEC.sizeof()
+
+
+def extract_frames(buf):
+    """Extract the complete LVAPP frames from buf.
+
+    Partial frames at the end of buf are left for the next call, buf is not
+    modified.
+
+    Args:
+        buf: the received bytes (bytearray)
+
+    Returns:
+        The list of (type, frame) tuples and the number of bytes consumed
+
+    Raises:
+        ValueError: if a frame length is invalid
+    """
+
+    frames = []
+    offset = 0
+
+    while len(buf) - offset >= HEADER_SIZE:
+
+        _, msg_type, length = HEADER_CODEC.head.unpack(buf, offset)
+
+        if length < HEADER_SIZE:
+            raise ValueError("Invalid frame length %u" % length)
+
+        if len(buf) - offset < length:
+            break
+
+        frames.append((msg_type, bytes(buf[offset:offset + length])))
+        offset += length
+
+    return frames, offset
@@ -17,10 +17,12 @@
 
 """LVAPs Handerler."""
 
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 
 from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.ssid import SSID
 from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.core.resourcepool import ResourceBlock
 
@@ -29,6 +31,11 @@ from empower.main import RUNTIME
 import empower.logger
 LOG = empower.logger.get_logger()
 
+# LVAP collection filters (e.g. ?wtp=00:0D:B9:2F:56:64&ssid=EmPOWER)
+LVAP_FILTERS = {'wtp': (lambda x: x.wtp.addr if x.wtp else None,
+                        EtherAddress),
+                'ssid': (lambda x: x.ssid, SSID)}
+
 
 class LVAPHandler(EmpowerAPIHandler):
     """LVAP handler. Used to view LVAPs (controller-wide)."""
@@ -36,6 +43,9 @@ class LVAPHandler(EmpowerAPIHandler):
     HANDLERS = [r"/api/v1/lvaps/?",
                 r"/api/v1/lvaps/([a-zA-Z0-9:]*)/?"]
 
+    FILTERS = LVAP_FILTERS
+
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Get all LVAPs or just the specified one.
 
@@ -44,6 +54,8 @@ class LVAPHandler(EmpowerAPIHandler):
 
         Example URLs:
             GET /api/v1/lvaps
+            GET /api/v1/lvaps?wtp=00:0D:B9:2F:56:64&fields=addr,ssid
+            GET /api/v1/lvaps?limit=100&cursor=11:22:33:44:55:66
             GET /api/v1/lvaps/11:22:33:44:55:66
         """
 
@@ -51,10 +63,10 @@ class LVAPHandler(EmpowerAPIHandler):
             if len(args) > 1:
                 raise ValueError("Invalid URL")
             if len(args) == 0:
-                self.write_as_json(RUNTIME.lvaps.values())
+                yield self.write_collection(RUNTIME.lvaps)
             else:
                 lvap = EtherAddress(args[0])
-                self.write_as_json(RUNTIME.lvaps[lvap])
+                yield self.write_as_json(RUNTIME.lvaps[lvap])
         except KeyError as ex:
             self.send_error(404, message=ex)
         except ValueError as ex:
@@ -27,7 +27,6 @@ from empower.datatypes.ssid import SSID
 from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import BT_L20
 from empower.core.radioport import RadioPort
-from empower.lvapp import HEADER
 from empower.lvapp import PT_VERSION
 from empower.lvapp import PT_BYE
 from empower.lvapp import PT_REGISTER
@@ -46,6 +45,7 @@ from empower.lvapp import PT_PROBE_RESPONSE
 from empower.lvapp import PROBE_RESPONSE
 from empower.lvapp import PT_ADD_LVAP_RESPONSE
 from empower.lvapp import PT_DEL_LVAP_RESPONSE
+from empower.lvapp.framing import extract_frames
 from empower.core.lvap import LVAP
 from empower.core.networkport import NetworkPort
 from empower.core.vap import VAP
@@ -55,6 +55,8 @@ from empower.core.tenant import T_TYPE_SHARED
 from empower.core.tenant import T_TYPE_UNIQUE
 from empower.core.utils import generate_bssid
 from empower.core.virtualport import VirtualPortLvap
+from empower.core.dispatchstats import DispatchStats
+from empower.core.trace import Tracer
 
 from empower.main import RUNTIME
 
@@ -63,6 +65,49 @@ LOG = empower.logger.get_logger()
 
 BASE_MAC = EtherAddress("02:ca:fe:00:00:00")
 
+# Maximum number of bytes consumed from the socket with a single read
+READ_CHUNK = 65536
+
+
+def status_lvap_to_str(status):
+    """Return a string representation of a STATUS_LVAP message."""
+
+    accum = []
+    incoming_ssids = [SSID(x.ssid) for x in status.ssids]
+
+    accum.append("addr ")
+    accum.append(EtherAddress(status.sta).to_str())
+    accum.append(" net_bssid ")
+    accum.append(EtherAddress(status.net_bssid).to_str())
+    accum.append(" lvap_bssid ")
+    accum.append(EtherAddress(status.lvap_bssid).to_str())
+
+    accum.append(" ssid ")
+
+    if incoming_ssids[0]:
+        accum.append(incoming_ssids[0].to_str())
+    else:
+        accum.append("None")
+
+    accum.append(" ssids [")
+
+    for ssid in incoming_ssids[1:]:
+        accum.append(" ")
+        accum.append(ssid.to_str())
+
+    accum.append(" ]")
+
+    accum.append(" assoc_id ")
+    accum.append(str(status.assoc_id))
+
+    if bool(status.flags.authenticated):
+        accum.append(" AUTH")
+
+    if bool(status.flags.associated):
+        accum.append(" ASSOC")
+
+    return ''.join(accum)
+
 
 class LVAPPConnection(object):
     """LVAPP Connection.
@@ -100,11 +145,23 @@ class LVAPPConnection(object):
       hosting that LVAP. Other WTPs will report probe requests to the AC
       where they will be silently ignored.
 
+    Outgoing messages are not written to the stream right away. They are
+    queued and coalesced into a single write at the end of the current
+    IOLoop iteration.
+
     Attributes:
         stream: The stream object used to talk with the WTP.
         address: The connection source address, i.e. the WTP IP address.
         server: Pointer to the server object.
         wtp: Pointer to a WTP object.
+        tx_queued: Bytes waiting in the outbound queue.
+        tx_high_water: Maximum number of bytes pending transmission.
+        tx_messages: Number of messages sent.
+        tx_writes: Number of writes to the stream.
+        tx_bytes: Number of bytes sent.
+        tx_dropped: Number of messages dropped because the stream was
+          closed.
+        stats: Per message type dispatch statistics.
     """
 
     def __init__(self, stream, addr, server):
@@ -114,7 +171,15 @@ class LVAPPConnection(object):
         self.server = server
         self.wtp = None
         self.stream.set_close_callback(self._on_disconnect)
-        self.__buffer = b''
+        self.__buffer = bytearray()
+        self.__tx_queue = []
+        self.tx_queued = 0
+        self.tx_high_water = 0
+        self.tx_messages = 0
+        self.tx_writes = 0
+        self.tx_bytes = 0
+        self.tx_dropped = 0
+        self.stats = DispatchStats.connection("lvapp", "%s:%u" % addr[:2])
         self._hb_interval_ms = 500
         self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
                                                           self._hb_interval_ms)
@@ -124,7 +189,90 @@ class LVAPPConnection(object):
     def to_dict(self):
         """Return dict representation of object."""
 
-        return self.addr
+        return {'addr': self.addr,
+                'tx_queued': self.tx_queued,
+                'tx_pending': self.tx_pending,
+                'tx_high_water': self.tx_high_water,
+                'tx_messages': self.tx_messages,
+                'tx_writes': self.tx_writes,
+                'tx_bytes': self.tx_bytes,
+                'tx_dropped': self.tx_dropped}
+
+    @property
+    def version(self):
+        """Return the change counter, i.e. the connection counters."""
+
+        return (self.tx_queued, self.tx_pending, self.tx_high_water,
+                self.tx_messages, self.tx_writes, self.tx_bytes,
+                self.tx_dropped)
+
+    @property
+    def tx_pending(self):
+        """Return the bytes queued here plus the ones buffered by the stream
+        and not yet accepted by the kernel.
+
+        This is a best-effort figure. The stream buffer size is read from
+        the private _write_buffer_size attribute of the tornado IOStream,
+        only the bytes queued here are counted if it is missing."""
+
+        buffered = getattr(self.stream, '_write_buffer_size', 0)
+
+        return self.tx_queued + buffered
+
+    def send_message(self, msg):
+        """Queue a message for transmission.
+
+        All the messages queued during the same IOLoop iteration are sent
+        to the WTP with a single write.
+        """
+
+        if self.stream.closed():
+            self._drop(1)
+            return
+
+        self.__tx_queue.append(msg)
+        self.tx_queued += len(msg)
+
+        pending = self.tx_pending
+
+        if pending > self.tx_high_water:
+            self.tx_high_water = pending
+
+        if len(self.__tx_queue) == 1:
+            tornado.ioloop.IOLoop.current().add_callback(self._flush)
+
+    def _flush(self):
+        """Write all the queued messages to the stream."""
+
+        queue = self.__tx_queue
+
+        self.__tx_queue = []
+        self.tx_queued = 0
+
+        if not queue:
+            return
+
+        if self.stream.closed():
+            self._drop(len(queue))
+            return
+
+        data = b''.join(queue)
+
+        self.stream.write(data)
+
+        self.tx_messages += len(queue)
+        self.tx_writes += 1
+        self.tx_bytes += len(data)
+
+    def _drop(self, messages):
+        """Count the messages dropped because the stream is closed, the
+        first drop is logged."""
+
+        if not self.tx_dropped:
+            LOG.warning("Connection %r closed, dropping outgoing messages",
+                        self.addr)
+
+        self.tx_dropped += messages
 
     def _heartbeat_cb(self):
         """ Check if wtp connection is still active. Disconnect if no hellos
@@ -135,30 +283,64 @@ class LVAPPConnection(object):
                 LOG.info('Client inactive %s at %r', self.wtp.addr, self.addr)
                 self.stream.close()
 
-    def _on_read(self, line):
-        """ Appends bytes read from socket to a buffer. Once the full packet
-        has been read the parser is invoked and the buffers is cleared. The
-        parsed packet is then passed to the suitable method or dropped if the
-        packet type in unknown. """
+    def _on_read(self, data):
+        """ Appends the bytes read from socket to the buffer and extracts all
+        the complete frames found in it. Frames are then dispatched in a
+        batch and the consumed bytes are removed from the buffer. Partial
+        frames are kept in the buffer until the next read. """
 
-        self.__buffer = self.__buffer + line
-        hdr = HEADER.parse(self.__buffer)
+        self.__buffer.extend(data)
 
-        if len(self.__buffer) < hdr.length:
-            remaining = hdr.length - len(self.__buffer)
-            self.stream.read_bytes(remaining, self._on_read)
-            return
+        self.on_frames(self._extract_frames())
+
+        if not self.stream.closed():
+            self._wait()
+
+    def on_frames(self, frames):
+        """ Dispatch a batch of (type, frame) tuples. Frames are either
+        extracted from the buffer or forwarded by a sharding worker. """
+
+        tracer = Tracer.instance()
+
+        for msg_type, frame in frames:
+
+            if tracer.running:
+                tracer.record("lvapp", self, self.stats.name, frame)
+
+            parser = self.server.pt_types.get(msg_type)
+            msg_name = parser.name if parser else msg_type
+
+            started = DispatchStats.now()
+            empower.logger.set_context("lvapp.%s" % msg_name)
+
+            try:
+                self._trigger_message(msg_type, frame)
+            except Exception as ex:
+                LOG.exception(ex)
+                self.stream.close()
+
+            empower.logger.set_context(None)
+            self.stats.record(msg_name, len(frame), started)
+
+            if self.stream.closed():
+                return
+
+    def _extract_frames(self):
+        """ Return the list of (type, frame) tuples for every complete frame
+        in the buffer and remove them from the buffer. """
 
         try:
-            self._trigger_message(hdr.type)
-        except Exception as ex:
-            LOG.exception(ex)
+            frames, consumed = extract_frames(self.__buffer)
+        except ValueError as ex:
+            LOG.error("%s from %r, closing connection", ex, self.addr)
             self.stream.close()
+            return []
 
-        if not self.stream.closed():
-            self._wait()
+        del self.__buffer[:consumed]
+
+        return frames
 
-    def _trigger_message(self, msg_type):
+    def _trigger_message(self, msg_type, frame):
 
         if msg_type not in self.server.pt_types:
             LOG.error("Unknown message type %u", msg_type)
@@ -169,7 +351,7 @@ class LVAPPConnection(object):
             LOG.info("Got message type %u (%s)", msg_type,
                      self.server.pt_types[msg_type].name)
 
-            msg = self.server.pt_types[msg_type].parse(self.__buffer)
+            msg = self.server.pt_types[msg_type].parse(frame)
             addr = EtherAddress(msg.wtp)
 
             try:
@@ -223,6 +405,7 @@ class LVAPPConnection(object):
                      lvap.addr, status.module_id)
             idx = lvap.pending.index(status.module_id)
             del lvap.pending[idx]
+            lvap.touch()
         else:
             LOG.info("LVAP %s, pending module id %s not found. Ignoring.",
                      lvap.addr, status.module_id)
@@ -254,16 +437,12 @@ class LVAPPConnection(object):
 
         # Upon connection to the controller, the WTP must be provided
         # with the list of shared VAP
-        for tenant in RUNTIME.tenants.values():
+        for tenant in RUNTIME.tenants.wtp_index.tenants(wtp.addr):
 
             # tenant does not use shared VAPs
             if tenant.bssid_type == T_TYPE_UNIQUE:
                 continue
 
-            # wtp not in this tenant
-            if wtp.addr not in tenant.wtps:
-                continue
-
             tenant_id = tenant.tenant_id
             tokens = [tenant_id.hex[0:12][i:i + 2] for i in range(0, 12, 2)]
             base_bssid = EtherAddress(':'.join(tokens))
@@ -273,13 +452,13 @@ class LVAPPConnection(object):
                 net_bssid = generate_bssid(base_bssid, block.hwaddr)
 
                 # vap has already been created
-                if net_bssid in RUNTIME.tenants[tenant_id].vaps:
+                if net_bssid in tenant.vaps:
                     continue
 
                 vap = VAP(net_bssid, block, wtp, tenant)
 
                 self.send_add_vap(vap)
-                RUNTIME.tenants[tenant_id].vaps[net_bssid] = vap
+                tenant.add_vap(vap)
 
     def _handle_probe_request(self, wtp, request):
         """Handle an incoming PROBE_REQUEST message.
@@ -317,14 +496,7 @@ class LVAPPConnection(object):
             LOG.info("Probe request from %s ssid %s", sta, ssid)
 
         # generate list of available SSIDs
-        ssids = set()
-
-        for tenant in RUNTIME.tenants.values():
-            if tenant.bssid_type == T_TYPE_SHARED:
-                continue
-            for wtp_in_tenant in tenant.wtps.values():
-                if wtp.addr == wtp_in_tenant.addr:
-                    ssids.add(tenant.tenant_name)
+        ssids = RUNTIME.tenants.wtp_index.ssids(wtp.addr)
 
         if not ssids:
             LOG.info("No SSIDs available at this WTP")
@@ -340,17 +512,15 @@ class LVAPPConnection(object):
         lvap.supported_band = request.supported_band
 
         # Check if block is valid
-        incoming = ResourceBlock(wtp, EtherAddress(request.hwaddr),
-                                 request.channel, request.band)
-
-        valid = [block for block in wtp.supports if block == incoming]
+        block = wtp.get_block(EtherAddress(request.hwaddr),
+                              request.channel, request.band)
 
-        if not valid:
+        if block is None:
             LOG.warning("No valid intersection found. Ignoring request.")
             return
 
         # This will trigger an LVAP ADD message (and REMOVE if necessary)
-        lvap.blocks = valid[0]
+        lvap.blocks = block
 
         # save LVAP in the runtime
         RUNTIME.lvaps[sta] = lvap
@@ -397,16 +567,11 @@ class LVAPPConnection(object):
         # else if is a shared bssid
         else:
 
-            shared_tenants = [x for x in RUNTIME.tenants.values()
-                              if x.bssid_type == T_TYPE_SHARED]
-
-            wtp = RUNTIME.wtps[wtp.addr]
+            # look for bssid in the shared VAPs hosted by this wtp
+            vap = RUNTIME.tenants.wtp_index.vap(wtp.addr, bssid)
 
-            # look for bssid in shared tenants
-            for tenant in shared_tenants:
-                if bssid in tenant.vaps and tenant.vaps[bssid].wtp == wtp:
-                    lvap_bssid = bssid
-                    break
+            if vap and vap.tenant.bssid_type == T_TYPE_SHARED:
+                lvap_bssid = bssid
 
         # invalid bssid, ignore request
         if not lvap_bssid:
@@ -453,15 +618,11 @@ class LVAPPConnection(object):
         tenant_name = None
 
         # look for ssid in shared tenants
-        for tenant_id in RUNTIME.tenants:
-
-            tenant = RUNTIME.tenants[tenant_id]
-
-            if tenant.bssid_type == T_TYPE_UNIQUE:
-                continue
+        tenant = RUNTIME.load_tenant(ssid)
 
-            if bssid in tenant.vaps and ssid == tenant.tenant_name:
-                tenant_name = tenant.tenant_name
+        if tenant and tenant.bssid_type == T_TYPE_SHARED and \
+           bssid in tenant.vaps:
+            tenant_name = tenant.tenant_name
 
         # otherwise this must be the lvap unique bssid
         if lvap.net_bssid == bssid and ssid in lvap.ssids:
@@ -488,12 +649,16 @@ class LVAPPConnection(object):
 
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
-        self.__buffer = b''
-        self.stream.read_bytes(6, self._on_read)
+        self.stream.read_bytes(READ_CHUNK, self._on_read, partial=True)
 
     def _on_disconnect(self):
         """ Handle WTP disconnection """
 
+        tracer = Tracer.instance()
+
+        if tracer.running:
+            tracer.close("lvapp", self)
+
         if not self.wtp:
             return
 
@@ -512,12 +677,9 @@ class LVAPPConnection(object):
                 lvap.clear_uplink()
 
         # remove hosted vaps
-        for tenant_id in RUNTIME.tenants.keys():
-            for vap_id in list(RUNTIME.tenants[tenant_id].vaps.keys()):
-                vap = RUNTIME.tenants[tenant_id].vaps[vap_id]
-                if vap.wtp == self.wtp:
-                    LOG.info("Deleting VAP: %s", vap.net_bssid)
-                    del RUNTIME.tenants[tenant_id].vaps[vap.net_bssid]
+        for vap in RUNTIME.tenants.wtp_index.vaps(self.wtp.addr).values():
+            LOG.info("Deleting VAP: %s", vap.net_bssid)
+            vap.tenant.remove_vap(vap)
 
         # reset state
         self.wtp.last_seen = 0
@@ -555,41 +717,8 @@ class LVAPPConnection(object):
 
         lvap = None
 
-        accum = []
-        incoming_ssids = [SSID(x.ssid) for x in status.ssids]
-
-        accum.append("addr ")
-        accum.append(EtherAddress(status.sta).to_str())
-        accum.append(" net_bssid ")
-        accum.append(EtherAddress(status.net_bssid).to_str())
-        accum.append(" lvap_bssid ")
-        accum.append(EtherAddress(status.lvap_bssid).to_str())
-
-        accum.append(" ssid ")
-
-        if incoming_ssids[0]:
-            accum.append(incoming_ssids[0].to_str())
-        else:
-            accum.append("None")
-
-        accum.append(" ssids [")
-
-        for ssid in incoming_ssids[1:]:
-            accum.append(" ")
-            accum.append(ssid.to_str())
-
-        accum.append(" ]")
-
-        accum.append(" assoc_id ")
-        accum.append(str(status.assoc_id))
-
-        if bool(status.flags.authenticated):
-            accum.append(" AUTH")
-
-        if bool(status.flags.associated):
-            accum.append(" ASSOC")
-
-        LOG.info("LVAP status %s", ''.join(accum))
+        LOG.info("LVAP status %s", empower.logger.Lazy(status_lvap_to_str,
+                                                       status))
 
         # If the LVAP does not exists, then create a new one
         if sta not in RUNTIME.lvaps:
@@ -603,12 +732,10 @@ class LVAPPConnection(object):
         lvap = RUNTIME.lvaps[sta]
 
         # Check if block is valid
-        incoming = ResourceBlock(wtp, EtherAddress(status.hwaddr),
-                                 status.channel, status.band)
+        block = wtp.get_block(EtherAddress(status.hwaddr),
+                              status.channel, status.band)
 
-        valid = [block for block in wtp.supports if block == incoming]
-
-        if not valid:
+        if block is None:
             LOG.warning("No valid intersection found. Removing block.")
             wtp.connection.send_del_lvap(lvap)
             return
@@ -618,13 +745,13 @@ class LVAPPConnection(object):
         try:
             if set_mask:
                 # set downlink+uplink block
-                lvap._downlink.setitem(valid[0], RadioPort(lvap, valid[0]))
+                lvap._downlink.setitem(block, RadioPort(lvap, block))
             else:
                 # set uplink only blocks
-                lvap._uplink.setitem(valid[0], RadioPort(lvap, valid[0]))
+                lvap._uplink.setitem(block, RadioPort(lvap, block))
         except Exception as e:
             LOG.exception(e)
-            LOG.error("Error while importing block %s, removing.", valid[0])
+            LOG.error("Error while importing block %s, removing.", block)
             wtp.connection.send_del_lvap(lvap)
             return
 
@@ -695,17 +822,14 @@ class LVAPPConnection(object):
         sta_addr = EtherAddress(status.sta)
 
         # incoming block
-        incoming = ResourceBlock(wtp, EtherAddress(status.hwaddr),
-                                 status.channel, status.band)
-
-        valid = [block for block in wtp.supports if block == incoming]
+        hwaddr = EtherAddress(status.hwaddr)
+        block = wtp.get_block(hwaddr, status.channel, status.band)
 
-        if not valid:
-            LOG.error("Incoming block %s is invalid", incoming)
+        if block is None:
+            LOG.error("Incoming block (%s, %s, %u, %u) is invalid", wtp.addr,
+                      hwaddr, status.channel, status.band)
             return
 
-        block = valid[0]
-
         LOG.info("Port status from %s, station %s", wtp.addr, sta_addr)
 
         tx_policy = block.tx_policies[sta_addr]
@@ -734,6 +858,8 @@ class LVAPPConnection(object):
             r_block = ResourceBlock(wtp, hwaddr, block[1], block[2])
             wtp.supports.add(r_block)
 
+        wtp.touch()
+
         for port in caps.ports:
 
             iface = port[2].decode("utf-8").strip('\0')
@@ -768,11 +894,14 @@ class LVAPPConnection(object):
         for block in wtp.supports:
             block.rssi_to = {}
 
+        stas = EtherAddress.from_raw_list([entry[0] for entry in
+                                           interference_map.map_entries])
+        entries = [(sta, entry[1]) for sta, entry in
+                   zip(stas, interference_map.map_entries)
+                   if sta in RUNTIME.lvaps or sta in RUNTIME.wtps]
+
         for block in wtp.supports:
-            for entry in interference_map.map_entries:
-                sta = EtherAddress(entry[0])
-                if sta in RUNTIME.lvaps or sta in RUNTIME.wtps:
-                    block.rssi_to[sta] = entry[1]
+            block.rssi_to.update(entries)
 
     @classmethod
     def _handle_status_vap(cls, wtp, status):
@@ -795,15 +924,20 @@ class LVAPPConnection(object):
             LOG.info("VAP %s from unknown tenant %s", net_bssid_addr, ssid)
             return
 
-        incoming = ResourceBlock(wtp, EtherAddress(status.hwaddr),
-                                 status.channel, status.band)
-
         LOG.info("VAP status update from %s", net_bssid_addr)
 
         # If the VAP does not exists, then create a new one
         if net_bssid_addr not in tenant.vaps:
-            vap = VAP(net_bssid_addr, incoming, wtp, tenant)
-            tenant.vaps[net_bssid_addr] = vap
+
+            hwaddr = EtherAddress(status.hwaddr)
+            block = wtp.get_block(hwaddr, status.channel, status.band)
+
+            if block is None:
+                block = ResourceBlock(wtp, hwaddr, status.channel,
+                                      status.band)
+
+            vap = VAP(net_bssid_addr, block, wtp, tenant)
+            tenant.add_vap(vap)
 
         vap = tenant.vaps[net_bssid_addr]
 
@@ -833,7 +967,7 @@ class LVAPPConnection(object):
         LOG.info("Add vap %s", vap)
 
         msg = ADD_VAP.build(add_vap)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_del_vap(self, vap):
         """Send a DEL_VAP message.
@@ -854,7 +988,7 @@ class LVAPPConnection(object):
         LOG.info("Del vap %s", vap)
 
         msg = DEL_VAP.build(del_vap)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_assoc_response(self, lvap):
         """Send a ASSOC_RESPONSE message.
@@ -873,7 +1007,7 @@ class LVAPPConnection(object):
                              sta=lvap.addr.to_raw())
 
         msg = ASSOC_RESPONSE.build(response)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_auth_response(self, lvap):
         """Send a AUTH_RESPONSE message.
@@ -893,7 +1027,7 @@ class LVAPPConnection(object):
                              bssid=lvap.lvap_bssid.to_raw())
 
         msg = AUTH_RESPONSE.build(response)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_probe_response(self, lvap, ssid):
         """Send a PROBE_RESPONSE message.
@@ -913,7 +1047,7 @@ class LVAPPConnection(object):
                              ssid=ssid.to_raw())
 
         msg = PROBE_RESPONSE.build(response)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_del_lvap(self, lvap):
         """Send a DEL_LVAP message.
@@ -951,7 +1085,7 @@ class LVAPPConnection(object):
         LOG.info("Del lvap %s", lvap)
 
         msg = DEL_LVAP.build(del_lvap)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_set_port(self, tx_policy):
         """Send a SET_PORT message.
@@ -987,7 +1121,7 @@ class LVAPPConnection(object):
         LOG.info("Set tx policy %s", tx_policy)
 
         msg = SET_PORT.build(set_port)
-        self.stream.write(msg)
+        self.send_message(msg)
 
     def send_add_lvap(self, lvap, block, set_mask):
         """Send a ADD_LVAP message.
@@ -1043,4 +1177,4 @@ class LVAPPConnection(object):
         LOG.info("Add lvap %s", lvap)
 
         msg = ADD_LVAP.build(add_lvap)
-        self.stream.write(msg)
+        self.send_message(msg)
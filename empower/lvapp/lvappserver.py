@@ -23,6 +23,7 @@ from empower.core.pnfpserver import BaseTenantPNFDevHandler
 from empower.core.pnfpserver import BasePNFDevHandler
 from empower.restserver.restserver import RESTServer
 from empower.core.pnfpserver import PNFPServer
+from empower.core.sharding import ShardMaster
 from empower.core.module import ModuleWorker
 from empower.core.module import ModuleEventWorker
 from empower.lvapp.lvappconnection import LVAPPConnection
@@ -33,6 +34,8 @@ from empower.lvapp import PT_LVAP_LEAVE
 from empower.lvapp import PT_LVAP_JOIN
 from empower.lvapp import PT_TYPES
 from empower.lvapp import PT_TYPES_HANDLERS
+from empower.lvapp.codec import CODEC_CONSTRUCT
+from empower.lvapp.codec import select_codec
 from empower.lvapp.lvaphandler import LVAPHandler
 from empower.lvapp.tenantlvaphandler import TenantLVAPHandler
 from empower.lvapp.tenantvaphandler import TenantVAPHandler
@@ -107,19 +110,42 @@ class LVAPPServer(PNFPServer, TCPServer):
     PNFDEV = WTP
     TBL_PNFDEV = TblWTP
 
-    def __init__(self, port, pt_types, pt_types_handlers):
+    def __init__(self, port, pt_types, pt_types_handlers,
+                 codec=CODEC_CONSTRUCT, workers=0):
+
+        pt_types = {k: select_codec(v, codec) for k, v in pt_types.items()}
 
         PNFPServer.__init__(self, pt_types, pt_types_handlers)
         TCPServer.__init__(self)
 
         self.port = int(port)
+        self.codec = codec
         self.connection = None
 
-        self.listen(self.port)
+        # connections are accepted either here or by the worker processes
+        if workers:
+            self.shards = ShardMaster(self, "lvapp", self.port, workers)
+        else:
+            self.listen(self.port)
 
         self.lvaps = {}
         self.__assoc_id = 0
 
+    def to_dict(self):
+        """ Return a dict representation of the object. """
+
+        out = super().to_dict()
+        out['codec'] = self.codec
+
+        return out
+
+    def register_message(self, pt_type, parser, handler):
+        """ Register new handler. The parser is compiled if the compiled
+        codec has been selected. """
+
+        parser = select_codec(parser, self.codec)
+        super().register_message(pt_type, parser, handler)
+
     def handle_stream(self, stream, address):
         self.log.info('Incoming connection from %r', address)
         self.connection = LVAPPConnection(stream, address, server=self)
@@ -146,10 +172,15 @@ class LVAPPServer(PNFPServer, TCPServer):
             handler(lvap)
 
 
-def launch(port=DEFAULT_PORT):
-    """Start LVAPP Server Module."""
+def launch(port=DEFAULT_PORT, codec=CODEC_CONSTRUCT, workers=0):
+    """Start LVAPP Server Module.
+
+    If workers is not zero, the WTP connections are accepted and served by
+    the given number of worker processes (see empower.core.sharding).
+    """
 
-    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS)
+    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS, codec,
+                         int(workers))
 
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantWTPHandler, server)
@@ -160,5 +191,6 @@ def launch(port=DEFAULT_PORT):
     rest_server.add_handler_class(TenantLVAPPortHandler, server)
     rest_server.add_handler_class(TenantLVAPNextHandler, server)
 
-    server.log.info("LVAP Server available at %u", server.port)
+    server.log.info("LVAP Server available at %u (codec %s, workers %u)",
+                    server.port, server.codec, int(workers))
     return server
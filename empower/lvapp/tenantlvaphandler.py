@@ -17,12 +17,14 @@
 
 """LVAPs Handerler."""
 
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 import uuid
 
 from empower.datatypes.etheraddress import EtherAddress
 from empower.restserver.apihandlers import EmpowerAPIHandlerUsers
+from empower.lvapp.lvaphandler import LVAP_FILTERS
 from empower.core.resourcepool import ResourceBlock
 
 from empower.main import RUNTIME
@@ -37,6 +39,9 @@ class TenantLVAPHandler(EmpowerAPIHandlerUsers):
     HANDLERS = [r"/api/v1/tenants/([a-zA-Z0-9-]*)/lvaps/?",
                 r"/api/v1/tenants/([a-zA-Z0-9-]*)/lvaps/([a-zA-Z0-9:]*)/?"]
 
+    FILTERS = LVAP_FILTERS
+
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Get all LVAPs in a Pool or just the specified one.
 
@@ -46,6 +51,8 @@ class TenantLVAPHandler(EmpowerAPIHandlerUsers):
 
         Example URLs:
             GET /api/v1/pools/52313ecb-9d00-4b7d-b873-b55d3d9ada26/lvaps
+            GET /api/v1/pools/52313ecb-9d00-4b7d-b873-b55d3d9ada26/
+                lvaps?limit=10
             GET /api/v1/pools/52313ecb-9d00-4b7d-b873-b55d3d9ada26/lvaps/11:22:33:44:55:66
         """
 
@@ -59,10 +66,10 @@ class TenantLVAPHandler(EmpowerAPIHandlerUsers):
             lvaps = tenant.lvaps
 
             if len(args) == 1:
-                self.write_as_json(lvaps.values())
+                yield self.write_collection(lvaps)
             else:
                 lvap = EtherAddress(args[1])
-                self.write_as_json(lvaps[lvap])
+                yield self.write_as_json(lvaps[lvap])
 
         except KeyError as ex:
             self.send_error(404, message=ex)
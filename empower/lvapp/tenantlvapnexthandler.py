@@ -18,6 +18,7 @@
 """Tenant/LVAP/Port/Next Handler."""
 
 import uuid
+import tornado.gen
 import tornado.web
 
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
@@ -37,6 +38,7 @@ class TenantLVAPNextHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """List next associations.
 
@@ -66,10 +68,10 @@ class TenantLVAPNextHandler(EmpowerAPIHandlerAdminUsers):
             port = lvap.ports[port_id]
 
             if len(args) == 3:
-                self.write_as_json(port.next)
+                yield self.write_as_json(port.next)
             else:
                 match = args[3]
-                self.write_as_json(port.next[match])
+                yield self.write_as_json(port.next[match])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
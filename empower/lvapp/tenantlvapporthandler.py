@@ -18,6 +18,7 @@
 """LVAP Port Handler."""
 
 import uuid
+import tornado.gen
 
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
 from empower.datatypes.etheraddress import EtherAddress
@@ -39,6 +40,7 @@ class TenantLVAPPortHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List all ports.
 
@@ -68,12 +70,12 @@ class TenantLVAPPortHandler(EmpowerAPIHandlerAdminUsers):
             lvap = tenant.lvaps[lvap_id]
 
             if len(args) == 2:
-                self.write_as_json(lvap.ports.values())
+                yield self.write_as_json(lvap.ports.values())
                 self.set_status(200, None)
             else:
                 port_id = int(args[2])
                 port = lvap.ports[port_id]
-                self.write_as_json(port)
+                yield self.write_as_json(port)
                 self.set_status(200, None)
 
         except ValueError as ex:
@@ -18,6 +18,7 @@
 """VAPs Handerler."""
 
 import uuid
+import tornado.gen
 
 from empower.datatypes.etheraddress import EtherAddress
 from empower.restserver.apihandlers import EmpowerAPIHandlerUsers
@@ -34,6 +35,7 @@ class TenantVAPHandler(EmpowerAPIHandlerUsers):
     HANDLERS = [r"/api/v1/tenants/([a-zA-Z0-9-]*)/vaps/?",
                 r"/api/v1/tenants/([a-zA-Z0-9-]*)/vaps/([a-zA-Z0-9:]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Get all VAPs in a Pool or just the specified one.
 
@@ -56,10 +58,10 @@ class TenantVAPHandler(EmpowerAPIHandlerUsers):
             vaps = tenant.vaps
 
             if len(args) == 1:
-                self.write_as_json(vaps.values())
+                yield self.write_as_json(vaps.values())
             else:
                 vap = EtherAddress(args[1])
-                self.write_as_json(vaps[vap])
+                yield self.write_as_json(vaps[vap])
 
         except KeyError as ex:
             self.send_error(404, message=ex)
@@ -43,6 +43,8 @@ from empower.lvnfp import PT_REGISTER
 from empower.lvnfp import PT_VERSION
 from empower.core.lvnf import LVNF
 from empower.core.image import Image
+from empower.core.dispatchstats import DispatchStats
+from empower.core.trace import Tracer
 
 from empower.main import RUNTIME
 
@@ -58,16 +60,25 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
         self.cpp = None
         self.addr = None
         self.server = server
+        self.stats = None
 
     def to_dict(self):
         """Return dict representation of object."""
 
         return self.addr
 
+    @property
+    def version(self):
+        """Return the change counter, the connection address never
+        changes."""
+
+        return self.addr
+
     def open(self):
         """On socket opened."""
 
-        pass
+        self.stats = DispatchStats.connection("lvnfp",
+                                              self.request.remote_ip)
 
     def encode_message(self, message):
         """Encode JSON message."""
@@ -77,11 +88,26 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def on_message(self, message):
         """Handle incoming message."""
 
+        started = DispatchStats.now()
+        msg = None
+
+        tracer = Tracer.instance()
+
+        if tracer.running:
+            data = message.encode() if isinstance(message, str) else message
+            tracer.record("lvnfp", self, self.stats.name, data)
+
         try:
             msg = json.loads(message)
             self.handle_message(msg)
         except ValueError:
             LOG.error("Invalid input: %s", message)
+        finally:
+            empower.logger.set_context(None)
+
+        if self.stats:
+            msg_type = msg.get('type') if isinstance(msg, dict) else None
+            self.stats.record(msg_type, len(message), started)
 
     def handle_message(self, msg):
         """Handle incoming message."""
@@ -93,6 +119,8 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
             self.close()
             return
 
+        empower.logger.set_context("lvnfp.%s" % msg['type'])
+
         LOG.info("Received %s seq %u from %s", msg['type'], msg['seq'],
                  self.request.remote_ip)
 
@@ -133,6 +161,11 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def on_close(self):
         """ Handle PNFDev disconnection """
 
+        tracer = Tracer.instance()
+
+        if tracer.running:
+            tracer.close("lvnfp", self)
+
         if not self.cpp:
             return
 
@@ -18,6 +18,7 @@
 """LVNFP Protocol Server."""
 
 import uuid
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 
@@ -38,6 +39,7 @@ class TenantLVNFHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List all Functions.
 
@@ -62,12 +64,12 @@ class TenantLVNFHandler(EmpowerAPIHandlerAdminUsers):
             tenant = RUNTIME.tenants[tenant_id]
 
             if len(args) == 1:
-                self.write_as_json(tenant.lvnfs.values())
+                yield self.write_as_json(tenant.lvnfs.values())
                 self.set_status(200, None)
             else:
                 lvnf_id = uuid.UUID(args[1])
                 lvnf = tenant.lvnfs[lvnf_id]
-                self.write_as_json(lvnf)
+                yield self.write_as_json(lvnf)
                 self.set_status(200, None)
 
         except ValueError as ex:
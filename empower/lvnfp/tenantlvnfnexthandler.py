@@ -18,6 +18,7 @@
 """Tenant/LVNF/Port/Next Handler."""
 
 import uuid
+import tornado.gen
 import tornado.web
 
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
@@ -36,6 +37,7 @@ class TenantLVNFNextHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """List next associations.
 
@@ -68,10 +70,10 @@ class TenantLVNFNextHandler(EmpowerAPIHandlerAdminUsers):
             port = lvnf.ports[port_id]
 
             if len(args) == 3:
-                self.write_as_json(port.next)
+                yield self.write_as_json(port.next)
             else:
                 match = args[3]
-                self.write_as_json(port.next[match])
+                yield self.write_as_json(port.next[match])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
@@ -18,6 +18,7 @@
 """LVNF Port Handler."""
 
 import uuid
+import tornado.gen
 
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
 
@@ -35,6 +36,7 @@ class TenantLVNFPortHandler(EmpowerAPIHandlerAdminUsers):
     def initialize(self, server):
         self.server = server
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List all ports.
 
@@ -64,12 +66,12 @@ class TenantLVNFPortHandler(EmpowerAPIHandlerAdminUsers):
             lvnf = tenant.lvnfs[lvnf_id]
 
             if len(args) == 2:
-                self.write_as_json(lvnf.ports.values())
+                yield self.write_as_json(lvnf.ports.values())
                 self.set_status(200, None)
             else:
                 port_id = int(args[2])
                 port = lvnf.ports[port_id]
-                self.write_as_json(port)
+                yield self.write_as_json(port)
                 self.set_status(200, None)
 
         except ValueError as ex:
@@ -28,8 +28,11 @@ import tornado.ioloop
 from uuid import UUID
 from ipaddress import ip_address
 
+from empower import settings
 from empower.core.core import EmpowerRuntime
 
+import empower.logger
+
 RUNTIME = None
 
 
@@ -72,6 +75,11 @@ class EmpowerOptions(Options):
 
     def __init__(self):
         self.log_config = None
+        self.log_limits = None
+        self.trace = None
+        self.trace_dir = settings.TRACE_PATH
+        self.replay = None
+        self.replay_speed = 1.0
         self.ctrl_adv = False
         self.ctrl_ip = ip_address("192.168.100.158")
         self.ctrl_port = 5533
@@ -86,6 +94,9 @@ class EmpowerOptions(Options):
     def _set_ctrl_adv(self, given_name, name, value):
         self.ctrl_adv = value
 
+    def _set_replay_speed(self, given_name, name, value):
+        self.replay_speed = float(value)
+
     def _set_log_config(self, given_name, name, value):
         if value is True:
             log_p = os.path.dirname(os.path.realpath(__file__))
@@ -115,6 +126,18 @@ _HELP_TEXT = """Start the controller with:
 Notable options include:
   --help                Print this help message
   --log-config=<file>   Use log config file (default is ./logging.cfg)
+  --log-limits=<limits> Rate limit log records, as comma separated
+                        key=rate[:burst][/sample] items, where key is a
+                        message type (e.g. lvapp.status_lvap), a logger
+                        name, or * for every key
+  --trace=<file>        Capture the southbound traffic to file (.gz files
+                        are compressed)
+  --trace-dir=<dir>     Directory of the captures started from the REST API
+                        (default is deploy/traces)
+  --replay=<file>       Replay a southbound traffic capture, print the
+                        handler timings, and exit
+  --replay-speed=<x>    Replay speed multiplier, 0 for as fast as possible
+                        (float, default is 1.0)
   --ctrl-adv            Advertise controller (bool, default is false)
   --ctrl-ip=<ip>        Controller address (ip, default is 192.168.100.158)
   --ctrl-port=<port>    Controller port (int, default is 5533)
@@ -268,6 +291,16 @@ def _setup_logging():
         logging.config.fileConfig(_OPTIONS.log_config,
                                   disable_existing_loggers=False)
 
+    if _OPTIONS.log_limits:
+
+        try:
+            empower.logger.parse_limits(_OPTIONS.log_limits)
+        except ValueError:
+            print("Invalid log limits:", _OPTIONS.log_limits)
+            sys.exit(2)
+
+    empower.logger.start()
+
 
 def _pre_startup():
     """Perform pre-startup operation.
@@ -286,7 +319,25 @@ def _post_startup():
     smoothly in this method then the tornado loop is started.
     """
 
-    pass
+    if _OPTIONS.trace:
+
+        from empower.core.trace import Tracer
+
+        try:
+            Tracer.instance().start(_OPTIONS.trace)
+        except ValueError as ex:
+            print("Unable to start the capture:", ex)
+            sys.exit(2)
+
+    if _OPTIONS.replay:
+
+        from empower.core.replay import Replay
+
+        try:
+            Replay(_OPTIONS.replay, _OPTIONS.replay_speed).start()
+        except ValueError as ex:
+            print("Unable to replay:", ex)
+            sys.exit(2)
 
 
 def main(argv=None):
@@ -105,19 +105,14 @@ class Busyness(Module):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
-                                     int(value['channel']),
-                                     int(value['band']))
+            block = wtp.get_block(EtherAddress(value['hwaddr']),
+                                  int(value['channel']),
+                                  int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if block is None:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
@@ -163,7 +158,7 @@ class Busyness(Module):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = BUSYNESS_REQUEST.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming poller response message.
@@ -31,6 +31,7 @@ from empower.datatypes.etheraddress import EtherAddress
 from empower.core.module import Module
 from empower.core.resourcepool import CQM
 from empower.core.resourcepool import ResourceBlock
+from empower.core.rssistore import RSSIStore
 from empower.lvapp import PT_VERSION
 
 from empower.main import RUNTIME
@@ -70,6 +71,9 @@ class Maps(Module):
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'block']
     PT_REQUEST = None
 
+    # Whether the RSSI samples are kept in the RSSIStore
+    HISTORY = False
+
     def __init__(self):
 
         Module.__init__(self)
@@ -111,19 +115,14 @@ class Maps(Module):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
-                                     int(value['channel']),
-                                     int(value['band']))
-
-            match = [block for block in wtp.supports if block == incoming]
+            block = wtp.get_block(EtherAddress(value['hwaddr']),
+                                  int(value['channel']),
+                                  int(value['band']))
 
-            if not match:
+            if block is None:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
@@ -170,7 +169,7 @@ class Maps(Module):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = POLLER_REQUEST.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming poller response message.
@@ -187,6 +186,9 @@ class Maps(Module):
         # update this object
         self.maps = CQM()
 
+        addrs = []
+        samples = []
+
         for entry in response.img_entries:
 
             addr = EtherAddress(entry[0])
@@ -201,5 +203,13 @@ class Maps(Module):
             map_entry_block[addr] = value
             self.maps[addr] = value
 
+            # only the stations heard since the last poll
+            if entry[3]:
+                addrs.append(addr)
+                samples.append(entry[2])
+
+        if self.HISTORY:
+            RSSIStore.instance().update(self.block, addrs, samples)
+
         # call callback
         self.handle_callback(self)
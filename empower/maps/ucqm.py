@@ -33,6 +33,7 @@ class UCQM(Maps):
 
     MODULE_NAME = "ucqm"
     PT_REQUEST = PT_POLLER_REQUEST
+    HISTORY = True
 
 
 class UCQMWorker(ModuleLVAPPWorker):
@@ -25,8 +25,23 @@ from empower.settings import CONFIGDB_ENGINE
 ENGINE = create_engine(CONFIGDB_ENGINE, pool_recycle=6000)
 
 
+# SQLite tuning, WAL lets readers proceed while the writer thread commits
+# and synchronous=NORMAL avoids an fsync at every commit
+SQLITE_PRAGMAS = ['foreign_keys=ON',
+                  'journal_mode=WAL',
+                  'synchronous=NORMAL',
+                  'temp_store=MEMORY',
+                  'cache_size=-16000',
+                  'busy_timeout=5000']
+
+
 def on_connect(conn, record):
-    conn.execute('pragma foreign_keys=ON')
+
+    if ENGINE.dialect.name != 'sqlite':
+        return
+
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute('pragma %s' % pragma)
 
 event.listen(ENGINE, 'connect', on_connect)
 
@@ -23,6 +23,7 @@ import empower.datatypes.ssid as ssid
 
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import inspect
 from sqlalchemy.types import TypeDecorator, Unicode
 
 from empower.persistence import ENGINE
@@ -255,6 +256,12 @@ class TblAllow(Base):
 
     label = Column(String)
 
+    # ff:ff:ff:ff:ff:ff for exact rules
+    mask = Column("mask",
+                  EtherAddress(),
+                  primary_key=True,
+                  default=etheraddress.EtherAddress("ff:ff:ff:ff:ff:ff"))
+
 
 class TblDeny(Base):
     """ Deny table. """
@@ -267,6 +274,12 @@ class TblDeny(Base):
 
     label = Column(String)
 
+    # ff:ff:ff:ff:ff:ff for exact rules
+    mask = Column("mask",
+                  EtherAddress(),
+                  primary_key=True,
+                  default=etheraddress.EtherAddress("ff:ff:ff:ff:ff:ff"))
+
 
 class TblIMSI2MAC(Base):
     """ IMSI to MAC address mapping table. """
@@ -281,4 +294,57 @@ class TblIMSI2MAC(Base):
                   EtherAddress(),
                   unique=True)
 
+
+def add_missing_columns():
+    """Add to the existing tables the columns defined after their
+    creation (e.g. the ACL masks)."""
+
+    inspector = inspect(ENGINE)
+    preparer = ENGINE.dialect.identifier_preparer
+
+    for table in Base.metadata.sorted_tables:
+
+        existing = [x['name'] for x in inspector.get_columns(table.name)]
+
+        for column in table.columns:
+
+            if column.name in existing:
+                continue
+
+            ENGINE.execute("ALTER TABLE %s ADD COLUMN %s %s" %
+                           (preparer.quote(table.name),
+                            preparer.quote(column.name),
+                            column.type.compile(ENGINE.dialect)))
+
+
+def update_primary_keys():
+    """Rebuild the existing tables whose primary key changed after their
+    creation (e.g. the ACL rules, keyed by address and mask). The primary
+    key columns added since are set to their default value."""
+
+    inspector = inspect(ENGINE)
+
+    for table in Base.metadata.sorted_tables:
+
+        pkey = inspector.get_pk_constraint(table.name)['constrained_columns']
+
+        if pkey == [x.name for x in table.primary_key]:
+            continue
+
+        rows = [dict(x) for x in ENGINE.execute(table.select())]
+
+        for row in rows:
+            for column in table.primary_key:
+                if row[column.name] is None and column.default is not None:
+                    row[column.name] = column.default.arg
+
+        table.drop(ENGINE)
+        table.create(ENGINE)
+
+        if rows:
+            ENGINE.execute(table.insert(), rows)
+
+
 Base.metadata.create_all(ENGINE)
+add_missing_columns()
+update_primary_keys()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Empower write-behind persistence.
+
+The runtime keeps its configuration (tenants, ACLs, PNFDevs, ...) in memory
+and applies every change there immediately. The corresponding database
+mutations are queued and applied by a background thread, which commits all
+the mutations queued meanwhile in a single transaction. The IOLoop is then
+never blocked on the database.
+
+Mutations are applied in the order in which they are queued. If a batch
+fails, its mutations are applied again one by one so that a single bad
+mutation is only logged and does not affect the others. Mutations whose
+outcome must be known by the caller (e.g. a unique constraint) can be
+executed synchronously, while flush() waits for all the queued mutations
+to be committed. Bulk operations can group their mutations so that they
+are committed (or rejected) together and be told about the outcome.
+"""
+
+import atexit
+import queue
+import threading
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from empower.persistence import SESSION_FACTORY
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+# Maximum number of mutations committed in a single transaction
+DEFAULT_BATCH = 1000
+
+
+class Mutation(object):
+    """A database mutation.
+
+    Attributes:
+        function: the function applying the mutation, it receives the
+          session as its only argument
+        future: a Future set with the result of the function once the
+          mutation is committed, None if nobody is waiting for it
+    """
+
+    def __init__(self, function, future=None):
+
+        self.function = function
+        self.future = future
+
+
+class Writer(object):
+    """Background database writer.
+
+    Attributes:
+        batch: maximum number of mutations per transaction (int)
+        committed: number of mutations committed (int)
+        failed: number of mutations that could not be committed (int)
+        transactions: number of transactions (int)
+    """
+
+    __instance = None
+
+    def __init__(self, batch=DEFAULT_BATCH):
+
+        self.batch = batch
+        self.committed = 0
+        self.failed = 0
+        self.transactions = 0
+        self.__queue = queue.Queue()
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__deferred = None
+        self.__transaction = None
+
+    @classmethod
+    def instance(cls):
+        """Return the global Writer."""
+
+        if not cls.__instance:
+            cls.__instance = Writer()
+            atexit.register(cls.__instance.flush)
+
+        return cls.__instance
+
+    def submit(self, function, future=None):
+        """Queue a mutation.
+
+        Args:
+            function: the function applying the mutation, it receives the
+              session as its only argument
+            future: an optional Future set with the result of function
+
+        Returns:
+            None
+        """
+
+        if self.__deferred is not None and not future:
+            self.__deferred.append(function)
+            return
+
+        with self.__lock:
+            if not self.__thread:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name="persistence",
+                                                 daemon=True)
+                self.__thread.start()
+
+        self.__queue.put(Mutation(function, future))
+
+    @contextmanager
+    def transaction(self):
+        """Group the mutations queued in the block in a single transaction.
+
+        The block receives a Future which is set once the transaction is
+        committed or with the exception that made it fail, in which case
+        none of the grouped mutations is stored. The mutations are submitted
+        only if the block completes, if it raises they are discarded and the
+        Future is set with the exception. Nested blocks are part of the
+        outermost transaction and receive its Future.
+
+        Example:
+
+            with Writer.instance().transaction() as stored:
+                for addr in addrs:
+                    RUNTIME.add_allowed(addr, "")
+
+            stored.result()
+        """
+
+        if self.__deferred is not None:
+            yield self.__transaction
+            return
+
+        self.__deferred = []
+        self.__transaction = Future()
+
+        try:
+            yield self.__transaction
+        except BaseException as ex:
+            self.__deferred = None
+            future, self.__transaction = self.__transaction, None
+            future.set_exception(ex)
+            raise
+
+        functions, self.__deferred = self.__deferred, None
+        future, self.__transaction = self.__transaction, None
+
+        if functions:
+            self.submit(lambda session: [x(session) for x in functions],
+                        future)
+        else:
+            future.set_result(None)
+
+    def add(self, row):
+        """Queue the insertion of a row."""
+
+        self.submit(lambda session: session.add(row))
+
+    def delete(self, table, *criteria):
+        """Queue the deletion of the rows of table matching criteria."""
+
+        self.submit(lambda session: session.query(table)
+                    .filter(*criteria)
+                    .delete(synchronize_session=False))
+
+    def update(self, table, values, *criteria):
+        """Queue the update of the rows of table matching criteria."""
+
+        self.submit(lambda session: session.query(table)
+                    .filter(*criteria)
+                    .update(values, synchronize_session=False))
+
+    def execute(self, function):
+        """Apply a mutation and wait for it to be committed.
+
+        All the mutations queued before are committed first.
+
+        Args:
+            function: the function applying the mutation, it receives the
+              session as its only argument
+
+        Returns:
+            The value returned by function
+
+        Raises:
+            The exception raised by function or by the commit
+        """
+
+        future = Future()
+        self.submit(function, future)
+
+        return future.result()
+
+    def flush(self, timeout=None):
+        """Wait for all the queued mutations to be committed.
+
+        Args:
+            timeout: maximum time to wait in seconds, None waits forever
+
+        Returns:
+            None
+
+        Raises:
+            concurrent.futures.TimeoutError: if the timeout expires
+        """
+
+        if not self.__thread:
+            return
+
+        future = Future()
+        self.submit(lambda session: None, future)
+        future.result(timeout)
+
+    def __run(self):
+        """Apply the queued mutations (runs in the writer thread)."""
+
+        session = SESSION_FACTORY()
+
+        while True:
+
+            mutations = [self.__queue.get()]
+
+            while len(mutations) < self.batch:
+                try:
+                    mutations.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if len(mutations) == 1:
+                self.__commit_one(session, mutations[0])
+                continue
+
+            try:
+                self.__commit(session, mutations)
+            except Exception as ex:
+                session.rollback()
+                LOG.warning("Batch of %u mutations failed (%s), retrying "
+                            "one by one", len(mutations), ex)
+                for mutation in mutations:
+                    self.__commit_one(session, mutation)
+
+    def __commit(self, session, mutations):
+        """Apply a list of mutations in a single transaction."""
+
+        results = [x.function(session) for x in mutations]
+        session.commit()
+
+        self.transactions += 1
+        self.committed += len(mutations)
+
+        for mutation, result in zip(mutations, results):
+            if mutation.future:
+                mutation.future.set_result(result)
+
+    def __commit_one(self, session, mutation):
+        """Apply a single mutation in its own transaction."""
+
+        try:
+            self.__commit(session, [mutation])
+        except Exception as ex:
+            session.rollback()
+            self.failed += 1
+            if mutation.future:
+                mutation.future.set_exception(ex)
+            else:
+                LOG.error("Unable to persist mutation: %s", ex)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'queued': self.__queue.qsize(),
+                'batch': self.batch,
+                'committed': self.committed,
+                'failed': self.failed,
+                'transactions': self.transactions}
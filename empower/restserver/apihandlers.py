@@ -17,16 +17,25 @@
 
 """Empower common API Handlers."""
 
+import csv
+import io
 import json
 import base64
+import bisect
 import re
+import tornado.escape
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 
 from uuid import UUID
+from tornado.iostream import StreamClosedError
 
 from empower.core.account import ROLE_ADMIN, ROLE_USER
-from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.jsonserializer import etag
+from empower.core.jsonserializer import dumps
+from empower.core.jsonserializer import iterdumps
+from empower.persistence.writer import Writer
 from empower.main import RUNTIME
 
 import empower.logger
@@ -41,11 +50,224 @@ class EmpowerAPIHandler(tornado.web.RequestHandler):
               'PUT': [ROLE_ADMIN],
               'DELETE': [ROLE_ADMIN]}
 
+    # Collection filters, query argument -> (getter, parser). An item is
+    # returned if getter(item) == parser(argument)
+    FILTERS = {}
+
+    # ETag computed from the change counters of the reply
+    etag = None
+
     def initialize(self, server=None):
         """Set pointer to actual rest server."""
 
         self.server = server
 
+    def get_fields(self):
+        """Return the set of fields requested with ?fields= or None."""
+
+        fields = self.get_argument("fields", None)
+
+        if not fields:
+            return None
+
+        return set(x.strip() for x in fields.split(",") if x.strip())
+
+    def get_filters(self):
+        """Return the (getter, value) filters requested by the client."""
+
+        filters = []
+
+        for name, (getter, parser) in self.FILTERS.items():
+
+            arg = self.get_argument(name, None)
+
+            if arg is None:
+                continue
+
+            try:
+                value = parser(arg)
+            except (TypeError, ValueError, RuntimeError):
+                raise ValueError("Invalid %s filter: %s" % (name, arg))
+
+            filters.append((getter, value))
+
+        return filters
+
+    @tornado.gen.coroutine
+    def write_collection(self, items):
+        """Filter, paginate, and return a collection as a json document.
+
+        Items are filtered according to FILTERS. If limit or cursor are
+        specified, items are sorted by key and at most limit items whose key
+        follows cursor are returned. The cursor is parsed as a key of the
+        collection (e.g. as an EtherAddress). The cursor of the next page is
+        returned in the X-Next-Cursor header.
+
+        Args:
+            items: a dictionary of objects
+
+        Example URLs:
+            GET /api/v1/lvaps?wtp=00:0D:B9:2F:56:64&fields=addr,ssid
+            GET /api/v1/lvaps?limit=100
+            GET /api/v1/lvaps?limit=100&cursor=18:5E:0F:E3:B8:45
+        """
+
+        limit = self.get_argument("limit", None)
+        cursor = self.get_argument("cursor", None)
+        filters = self.get_filters()
+
+        if limit is not None:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError("Invalid limit: %u" % limit)
+
+        if filters:
+            items = {k: v for k, v in items.items()
+                     if all(getter(v) == value for getter, value in filters)}
+
+        if limit is None and cursor is None:
+            yield self.write_as_json(items.values())
+            return
+
+        keys = sorted(str(k) for k in items)
+        values = {str(k): v for k, v in items.items()}
+
+        if cursor is not None and items:
+
+            # parse the cursor as a key, e.g. 18:5e:0f:e3:b8:45 is a valid
+            # cursor for a collection indexed by EtherAddress
+            key_type = type(next(iter(items)))
+
+            try:
+                cursor = str(key_type(cursor))
+            except (TypeError, ValueError, RuntimeError):
+                raise ValueError("Invalid cursor: %s" % cursor)
+
+        start = 0 if cursor is None else bisect.bisect_right(keys, cursor)
+        end = len(keys) if limit is None else start + limit
+
+        if end < len(keys):
+            self.set_header("X-Next-Cursor", keys[end - 1])
+
+        yield self.write_as_json([values[k] for k in keys[start:end]])
+
+    def read_bulk(self, columns):
+        """Return the entries of a bulk request or None.
+
+        A bulk request is either a JSON array of objects or a CSV document
+        (Content-Type: text/csv) with one entry per line, whose values are
+        the columns in the given order. A header line matching the columns
+        and lines starting with # are skipped.
+
+        Args:
+            columns: the names of the entry values (list)
+
+        Returns:
+            A list of dictionaries or None if the request has a single entry
+
+        Raises:
+            ValueError: if the request is not valid
+        """
+
+        content_type = self.request.headers.get("Content-Type", "")
+
+        if not content_type.startswith("text/csv"):
+
+            request = tornado.escape.json_decode(self.request.body)
+
+            if not isinstance(request, list):
+                return None
+
+            if not all(isinstance(x, dict) for x in request):
+                raise ValueError("expected a list of objects")
+
+            return request
+
+        entries = []
+        body = io.StringIO(self.request.body.decode('utf-8'))
+
+        for row in csv.reader(body):
+
+            row = [x.strip() for x in row]
+
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+
+            if not entries and row == columns[:len(row)]:
+                continue
+
+            entries.append(dict(zip(columns, row)))
+
+        return entries
+
+    @tornado.gen.coroutine
+    def write_bulk(self, entries, add_entry, remove_entry=None):
+        """Add the entries of a bulk request and return the outcomes.
+
+        Entries are validated and added one by one, all the accepted
+        entries are then persisted in a single transaction. The reply is
+        written once the transaction is committed. If it fails, the
+        accepted entries are removed again and reported as failed.
+
+        Args:
+            entries: the entries (list of dict)
+            add_entry: function adding an entry, raises KeyError or
+              ValueError if the entry is not valid
+            remove_entry: function removing an entry, it receives the value
+              returned by add_entry
+
+        Example reply:
+            {"created": 2, "failed": 1,
+             "results": [{"index": 0, "status": 201},
+                         {"index": 1, "status": 400, "message": "..."},
+                         {"index": 2, "status": 201}]}
+        """
+
+        results = []
+        added = []
+
+        try:
+
+            with Writer.instance().transaction() as stored:
+
+                for index, entry in enumerate(entries):
+
+                    try:
+                        value = add_entry(entry)
+                    except (KeyError, ValueError, TypeError) as ex:
+                        results.append({'index': index,
+                                        'status': 400,
+                                        'message': str(ex)})
+                        continue
+
+                    result = {'index': index, 'status': 201}
+                    results.append(result)
+                    added.append((result, value))
+
+            yield stored
+
+        except Exception as ex:
+            LOG.error("Bulk request failed, %u entries not stored: %s",
+                      len(added), ex)
+            for result, value in added:
+                LOG.error("Entry %u not stored: %s", result['index'],
+                          entries[result['index']])
+                result['status'] = 500
+                result['message'] = "not stored (%s)" % type(ex).__name__
+                if not remove_entry:
+                    continue
+                try:
+                    remove_entry(value)
+                except (KeyError, ValueError) as remove_ex:
+                    LOG.warning("Entry %u not removed: %s", result['index'],
+                                remove_ex)
+            added = []
+            self.set_status(500, None)
+
+        yield self.write_as_json({'created': len(added),
+                                  'failed': len(entries) - len(added),
+                                  'results': results})
+
     def write_error(self, code, message=None, **kwargs):
         self.set_header('Content-Type', 'application/json')
         if message:
@@ -57,11 +279,61 @@ class EmpowerAPIHandler(tornado.web.RequestHandler):
             out = {"message": "%d: %s" % (code, self._reason)}
             self.finish(json.dumps(out))
 
+    @tornado.gen.coroutine
     def write_as_json(self, value):
-        """Return reply as a json document."""
+        """Return reply as a json document.
+
+        The reply is compact unless the pretty argument is set (e.g.
+        ?pretty=1). Large collections are flushed in chunks as they are
+        encoded, each chunk is written once the previous one has been sent.
+        If the fields argument is set (e.g. ?fields=addr,ssid) only the
+        specified entries are returned.
+
+        If the ETag of the reply can be computed from the change counters of
+        the objects and matches If-None-Match, nothing is encoded and the
+        request is answered with 304 by finish().
+
+        Returns a Future, handlers must wait for it before returning."""
+
+        pretty = self.get_argument("pretty", "0")
+        fields = self.get_fields()
+
+        self.etag = etag(value, sorted(fields) if fields else None, pretty)
+
+        if self.etag:
+
+            self.set_header("Etag", self.etag)
+
+            # finish() will reply with 304
+            if self.check_etag_header():
+                self.clear_header("Etag")
+                return
+
+        if pretty.lower() not in ("0", "false", ""):
+            self.write(dumps(value, pretty=True, fields=fields))
+            return
+
+        chunks = iterdumps(value, fields=fields)
+        last = next(chunks)
+
+        for chunk in chunks:
+            self.write(last)
+            try:
+                yield self.flush()
+            except StreamClosedError:
+                return
+            last = chunk
+
+        self.write(last)
+
+    def compute_etag(self):
+        """Return the ETag computed by write_as_json, if any, or the hash of
+        the reply."""
+
+        if self.etag:
+            return self.etag
 
-        self.write(json.dumps(value, sort_keys=True, indent=4,
-                              cls=EmpowerEncoder))
+        return super().compute_etag()
 
     def prepare(self):
         """Prepare to handler reply."""
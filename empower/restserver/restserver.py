@@ -17,6 +17,7 @@
 
 """Exposes a RESTful interface for EmPOWER."""
 
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 
@@ -29,8 +30,22 @@ from empower.restserver.apihandlers import EmpowerAPIHandlerUsers
 from empower.main import _do_launch
 from empower.main import _parse_args
 from empower.main import RUNTIME
+from empower.main import _OPTIONS
+from empower.core.acl import ACL
+from empower.core.acl import parse_rule
 from empower.core.tenant import T_TYPES
 from empower.core.tenant import T_TYPE_UNIQUE
+from empower.core.timerwheel import TimerWheel
+from empower.core.dispatchstats import DispatchStats
+from empower.core.trace import Tracer
+from empower.core.trace import DEFAULT_MAX_BYTES
+from empower.core.trace import trace_path
+from empower.logger import AsyncLogging
+from empower.logger import RateLimitFilter
+from empower.core.xmlrpcdispatcher import XMLRPCDispatcher
+from empower.restserver.telemetry import TelemetryHandler
+from empower.restserver.telemetry import TelemetryWSHandler
+from empower.restserver.telemetry import TelemetrySSEHandler
 from empower.datatypes.ssid import SSID
 from empower.datatypes.etheraddress import EtherAddress
 
@@ -44,11 +59,12 @@ DEFAULT_PORT = 8888
 def exceptions(method):
     """Decorator catching the most common exceptions."""
 
+    @tornado.gen.coroutine
     def magic(self, *args, **kwargs):
         """Perform basic exception catching in rest calls."""
 
         try:
-            method(self, *args, **kwargs)
+            yield tornado.gen.maybe_future(method(self, *args, **kwargs))
         except KeyError as ex:
             self.send_error(404, message=ex)
         except ValueError as ex:
@@ -210,18 +226,22 @@ class ACLHandler(EmpowerAPIHandler):
     """ACL handler. Used to view and manipulate the ACL."""
 
     STRUCT = None
+    URL = None
     HANDLERS = []
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List the entire ACL or just the specified entry.
 
         Args:
-            addr: the station address
+            addr: the rule address, optionally followed by its prefix length
+              or mask
 
         Example URLs:
 
             GET /api/v1/[allow|deny]
-            GET /api/v1/[allow|deny/11:22:33:44:55:66
+            GET /api/v1/[allow|deny]/11:22:33:44:55:66
+            GET /api/v1/[allow|deny]/11:22:33:00:00:00/24
         """
 
         try:
@@ -229,30 +249,67 @@ class ACLHandler(EmpowerAPIHandler):
             if len(args) > 1:
                 raise ValueError("Invalid URL")
 
-            acl = getattr(RUNTIME, self.STRUCT)
+            table = getattr(RUNTIME, self.STRUCT)
 
             if len(args) == 0:
-                self.write_as_json(acl.values())
-            else:
-                if EtherAddress(args[0]) in acl:
-                    self.write_as_json(EtherAddress(args[0]))
-                else:
-                    raise KeyError(EtherAddress(args[0]))
+                yield self.write_as_json(table.values())
+                return
+
+            addr, mask = parse_rule(args[0])
+            acl = ACL(addr, mask=mask)
+
+            if acl.key not in table:
+                raise KeyError(str(acl))
+
+            yield self.write_as_json(table[acl.key])
 
         except KeyError as ex:
             self.send_error(404, message=ex)
         except ValueError as ex:
             self.send_error(400, message=ex)
 
+    def add_entry(self, request):
+        """Add an entry to the ACL."""
+
+        if "sta" not in request:
+            raise ValueError("missing sta element")
+
+        label = ""
+
+        if "label" in request:
+            label = request['label']
+
+        addr, mask = parse_rule(request['sta'], request.get('mask'))
+
+        func = getattr(RUNTIME, 'add_%s' % self.STRUCT)
+
+        return func(addr, label, mask)
+
+    def remove_entry(self, acl):
+        """Remove an entry added by add_entry from the ACL."""
+
+        func = getattr(RUNTIME, 'remove_%s' % self.STRUCT)
+
+        func(acl.addr, acl.mask)
+
+    @tornado.gen.coroutine
     def post(self, *args, **kwargs):
         """ Add new entry to ACL.
 
+        A list of entries, either as a JSON array or as CSV lines
+        (sta,label,mask), is added in bulk and the outcome of each entry is
+        returned.
+
         Args:
             None
 
         Request:
             version: protocol version (1.0)
-            sta: the station address
+            sta: the station address, a prefix length or a mask can be
+              appended to match multiple stations, e.g.
+              00:11:22:00:00:00/24 matches all the stations whose OUI is
+              00:11:22
+            mask: the mask, optional
 
         Example URLs:
 
@@ -263,23 +320,21 @@ class ACLHandler(EmpowerAPIHandler):
             if len(args) != 0:
                 raise ValueError("Invalid URL")
 
+            entries = self.read_bulk(["sta", "label", "mask"])
+
+            if entries is not None:
+                yield self.write_bulk(entries, self.add_entry,
+                                      self.remove_entry)
+                return
+
             request = tornado.escape.json_decode(self.request.body)
 
             if "version" not in request:
                 raise ValueError("missing version element")
 
-            if "sta" not in request:
-                raise ValueError("missing sta element")
-
-            label = ""
+            acl = self.add_entry(request)
 
-            if "label" in request:
-                label = request['label']
-
-            func = getattr(RUNTIME, 'add_%s' % self.STRUCT)
-            func(EtherAddress(request['sta']), label)
-
-            self.set_header("Location", "/api/v1/allow/%s" % request['sta'])
+            self.set_header("Location", "/api/v1/%s/%s" % (self.URL, acl))
 
         except KeyError as ex:
             self.send_error(404, message=ex)
@@ -292,18 +347,20 @@ class ACLHandler(EmpowerAPIHandler):
         """ Delete entry from ACL.
 
         Args:
-            addr: the station address
+            addr: the rule address, optionally followed by its prefix length
+              or mask
 
         Example URLs:
 
             DELETE /api/v1/[allow|deny]/11:22:33:44:55:66
+            DELETE /api/v1/[allow|deny]/11:22:33:00:00:00/24
         """
 
         try:
             if len(args) != 1:
                 raise ValueError("Invalid URL")
             func = getattr(RUNTIME, 'remove_%s' % self.STRUCT)
-            func(EtherAddress(args[0]))
+            func(*parse_rule(args[0]))
         except KeyError as ex:
             self.send_error(404, message=ex)
         except ValueError as ex:
@@ -315,16 +372,18 @@ class AllowHandler(ACLHandler):
     """ Allow handler. """
 
     STRUCT = "allowed"
+    URL = "allow"
     HANDLERS = [r"/api/v1/allow/?",
-                r"/api/v1/allow/([a-zA-Z0-9:]*)/?"]
+                r"/api/v1/allow/([a-zA-Z0-9:]*(?:/[a-zA-Z0-9:]+)?)/?"]
 
 
 class DenyHandler(ACLHandler):
     """ Deny handler. """
 
     STRUCT = "denied"
+    URL = "deny"
     HANDLERS = [r"/api/v1/deny/?",
-                r"/api/v1/deny/([a-zA-Z0-9:]*)/?"]
+                r"/api/v1/deny/([a-zA-Z0-9:]*(?:/[a-zA-Z0-9:]+)?)/?"]
 
 
 class IMSI2MACHandler(EmpowerAPIHandler):
@@ -336,6 +395,7 @@ class IMSI2MACHandler(EmpowerAPIHandler):
     HANDLERS = [r"/api/v1/imsi2mac/?",
                 r"/api/v1/imsi2mac/([0-9]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ List the entire IMSI to MAC mapped entries or just the specified entry.
 
@@ -362,11 +422,11 @@ class IMSI2MACHandler(EmpowerAPIHandler):
                     })
 
             if len(args) == 0:
-                self.write_as_json(imsi2mac)
+                yield self.write_as_json(imsi2mac)
             else:
                 imsi = int(args[0])
                 if imsi in RUNTIME.imsi2mac:
-                    self.write_as_json({
+                    yield self.write_as_json({
                             "imsi": imsi,
                             "addr": RUNTIME.imsi2mac[imsi]
                         })
@@ -378,9 +438,40 @@ class IMSI2MACHandler(EmpowerAPIHandler):
         except ValueError as ex:
             self.send_error(400, message=ex)
 
+    @classmethod
+    def add_entry(cls, request):
+        """Add an IMSI to MAC entry."""
+
+        if "imsi" not in request:
+            raise ValueError("missing imsi element")
+
+        if "addr" not in request:
+            raise ValueError("missing mac address element")
+
+        if len(str(request['imsi'])) != 15:
+            raise ValueError("invalid imsi element")
+
+        imsi = int(request['imsi'])
+
+        func = getattr(RUNTIME, 'add_imsi2mac')
+        func(imsi, EtherAddress(request['addr']))
+
+        return imsi
+
+    @classmethod
+    def remove_entry(cls, imsi):
+        """Remove an IMSI to MAC entry added by add_entry."""
+
+        RUNTIME.remove_imsi2mac(imsi)
+
+    @tornado.gen.coroutine
     def post(self, *args, **kwargs):
         """ Add new entry to IMSI to MAC entries.
 
+        A list of entries, either as a JSON array or as CSV lines
+        (imsi,addr), is added in bulk and the outcome of each entry is
+        returned.
+
         Args:
             None
 
@@ -398,22 +489,19 @@ class IMSI2MACHandler(EmpowerAPIHandler):
             if len(args) != 0:
                 raise ValueError("Invalid URL")
 
+            entries = self.read_bulk(["imsi", "addr"])
+
+            if entries is not None:
+                yield self.write_bulk(entries, self.add_entry,
+                                      self.remove_entry)
+                return
+
             request = tornado.escape.json_decode(self.request.body)
 
             if "version" not in request:
                 raise ValueError("missing version element")
 
-            if "imsi" not in request:
-                raise ValueError("missing imsi element")
-
-            if "addr" not in request:
-                raise ValueError("missing mac address element")
-
-            if len(request['imsi']) != 15:
-                raise ValueError("invalid imsi element")
-
-            func = getattr(RUNTIME, 'add_imsi2mac')
-            func(int(request['imsi']), EtherAddress(request['addr']))
+            self.add_entry(request)
 
             self.set_header("Location",
                             "/api/v1/imsi2mac/%s" % request['imsi'])
@@ -463,6 +551,7 @@ class AccountsHandler(EmpowerAPIHandler):
     HANDLERS = [r"/api/v1/accounts/?",
                 r"/api/v1/accounts/([a-zA-Z0-9:.]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args):
         """ Lists either all the accounts running in controller or just
         the one requested. Returns 404 if the requested account does not
@@ -485,9 +574,9 @@ class AccountsHandler(EmpowerAPIHandler):
             for account in RUNTIME.accounts:
                 accounts[account] = RUNTIME.accounts[account].to_dict()
             if len(args) == 0:
-                self.write_as_json(accounts)
+                yield self.write_as_json(accounts)
             else:
-                self.write_as_json(accounts[args[0]])
+                yield self.write_as_json(accounts[args[0]])
         except ValueError as ex:
             self.send_error(400, message=ex)
         except KeyError as ex:
@@ -645,12 +734,332 @@ class AccountsHandler(EmpowerAPIHandler):
         self.set_status(204, None)
 
 
+class TimersHandler(EmpowerAPIHandler):
+    """Timers handler. Used to view the timer wheel statistics."""
+
+    HANDLERS = [r"/api/v1/timers/?",
+                r"/api/v1/timers/([a-zA-Z0-9:_\-.]*)/?"]
+
+    @tornado.gen.coroutine
+    def get(self, *args):
+        """ Returns the number of active timers and the scheduling lag (ms)
+        of each timer kind, or just of the requested kind. Returns 404 if the
+        requested kind does not exists.
+
+        Args:
+            kind: a timer kind (e.g. a module type or an app name)
+
+        Example URLs:
+
+            GET /api/v1/timers
+            GET /api/v1/timers/bin_counter
+
+        """
+
+        try:
+
+            if len(args) > 1:
+                raise ValueError("Invalid url")
+
+            timers = TimerWheel.instance().to_dict()
+
+            if len(args) == 0:
+                yield self.write_as_json(timers)
+            else:
+                yield self.write_as_json(timers['kinds'][args[0]])
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+        except KeyError as ex:
+            self.send_error(404, message=ex)
+
+
+class CallbacksHandler(EmpowerAPIHandler):
+    """Callbacks handler. Used to view the XML-RPC callback endpoints."""
+
+    HANDLERS = [r"/api/v1/callbacks/?"]
+
+    @tornado.gen.coroutine
+    def get(self, *args):
+        """ Returns the delivery statistics of each XML-RPC callback endpoint
+        (queued, delivered, failed, and dropped calls).
+
+        Example URLs:
+
+            GET /api/v1/callbacks
+
+        """
+
+        yield self.write_as_json(XMLRPCDispatcher.instance())
+
+
+class DispatchHandler(EmpowerAPIHandler):
+    """Dispatch handler. Used to view the message dispatch statistics."""
+
+    HANDLERS = [r"/api/v1/dispatch/?",
+                r"/api/v1/dispatch/([a-zA-Z0-9]*)/?"]
+
+    @tornado.gen.coroutine
+    def get(self, *args):
+        """ Returns the number of messages received, their size, and the
+        handling time percentiles (in us) for each message type of either
+        all the southbound protocols or just the one requested. The
+        statistics of each connection are included if connections is set.
+        Returns 404 if the requested protocol does not exists.
+
+        Args:
+            protocol: the protocol (lvapp, vbsp, lvnfp)
+
+        Example URLs:
+
+            GET /api/v1/dispatch
+            GET /api/v1/dispatch/lvapp
+            GET /api/v1/dispatch/lvapp?connections=1
+
+        """
+
+        try:
+
+            if len(args) > 1:
+                raise ValueError("Invalid url")
+
+            connections = self.get_argument("connections", "0") not in \
+                ("0", "false")
+
+            protocols = DispatchStats.protocols()
+
+            if len(args) == 0:
+                yield self.write_as_json({k: v.to_dict(connections)
+                                          for k, v in protocols.items()})
+            else:
+                protocol = protocols[args[0]]
+                yield self.write_as_json(protocol.to_dict(connections))
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+        except KeyError as ex:
+            self.send_error(404, message=ex)
+
+    def delete(self, *args):
+        """ Reset the statistics of either all the southbound protocols or
+        just the one requested.
+
+        Args:
+            protocol: the protocol (lvapp, vbsp, lvnfp)
+
+        Example URLs:
+
+            DELETE /api/v1/dispatch
+            DELETE /api/v1/dispatch/lvapp
+
+        """
+
+        try:
+
+            if len(args) > 1:
+                raise ValueError("Invalid url")
+
+            protocols = DispatchStats.protocols()
+
+            if len(args) == 0:
+                for protocol in protocols.values():
+                    protocol.reset()
+            else:
+                protocols[args[0]].reset()
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+        except KeyError as ex:
+            self.send_error(404, message=ex)
+
+        self.set_status(204, None)
+
+
+class LoggingHandler(EmpowerAPIHandler):
+    """Logging handler. Used to view and set the log rate limits."""
+
+    HANDLERS = [r"/api/v1/logging/?",
+                r"/api/v1/logging/([a-zA-Z0-9_.*]*)/?"]
+
+    @tornado.gen.coroutine
+    def get(self, *args):
+        """ Returns the log queue statistics and the rate limits, with the
+        number of records kept and dropped by each limit.
+
+        Example URLs:
+
+            GET /api/v1/logging
+
+        """
+
+        if len(args) > 0:
+            self.send_error(400, message="Invalid url")
+            return
+
+        async_logging = AsyncLogging.instance()
+
+        yield self.write_as_json({
+            'queue': async_logging.to_dict() if async_logging else None,
+            'limits': RateLimitFilter.instance().to_dict()})
+
+    def put(self, *args):
+        """ Set the rate limit of a key. The key is either a message type
+        (e.g. lvapp.status_lvap), a logger name, or * for every key
+        without a limit of its own. Warnings and errors are never dropped.
+
+        Args:
+            key: the key
+
+        Request:
+            version: protocol version (1.0)
+            rate: maximum number of records per second (optional)
+            burst: maximum number of records in a burst (optional)
+            sample: keep one record every sample records (optional)
+
+        Example URLs:
+
+            PUT /api/v1/logging/lvapp.status_lvap
+            {
+              "version" : 1.0,
+              "rate" : 10,
+              "sample" : 5
+            }
+
+        """
+
+        try:
+
+            if len(args) != 1:
+                raise ValueError("Invalid url")
+
+            request = tornado.escape.json_decode(self.request.body)
+
+            if "version" not in request:
+                raise ValueError("missing version element")
+
+            rate = request.get("rate")
+            burst = request.get("burst")
+
+            RateLimitFilter.instance().set_limit(
+                args[0],
+                float(rate) if rate is not None else None,
+                int(burst) if burst is not None else None,
+                int(request.get("sample", 1)))
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+
+        self.set_status(204, None)
+
+    def delete(self, *args):
+        """ Remove the rate limit of a key.
+
+        Args:
+            key: the key
+
+        Example URLs:
+
+            DELETE /api/v1/logging/lvapp.status_lvap
+
+        """
+
+        try:
+
+            if len(args) != 1:
+                raise ValueError("Invalid url")
+
+            RateLimitFilter.instance().remove_limit(args[0])
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+        except KeyError as ex:
+            self.send_error(404, message=ex)
+
+        self.set_status(204, None)
+
+
+class TraceHandler(EmpowerAPIHandler):
+    """Trace handler. Used to capture the southbound traffic."""
+
+    HANDLERS = [r"/api/v1/trace/?"]
+
+    @tornado.gen.coroutine
+    def get(self):
+        """ Returns the status of the capture.
+
+        Example URLs:
+
+            GET /api/v1/trace
+
+        """
+
+        yield self.write_as_json(Tracer.instance().to_dict())
+
+    def put(self):
+        """ Start a capture. The trace can be replayed by starting the
+        runtime with --replay=<file>.
+
+        Request:
+            version: protocol version (1.0)
+            filename: the trace file name, gzip compressed if it ends in
+              .gz, the file is created in the trace directory (--trace-dir)
+            protocols: the protocols to capture, all if missing (optional)
+            max_bytes: the capture stops at this size (optional)
+
+        Example URLs:
+
+            PUT /api/v1/trace
+            {
+              "version" : 1.0,
+              "filename" : "storm.trace.gz",
+              "protocols" : ["lvapp"]
+            }
+
+        """
+
+        try:
+
+            request = tornado.escape.json_decode(self.request.body)
+
+            if "version" not in request:
+                raise ValueError("missing version element")
+
+            if "filename" not in request:
+                raise ValueError("missing filename element")
+
+            filename = trace_path(_OPTIONS.trace_dir, request['filename'])
+            max_bytes = request.get("max_bytes", DEFAULT_MAX_BYTES)
+
+            Tracer.instance().start(filename,
+                                    request.get("protocols"),
+                                    int(max_bytes))
+
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+
+        self.set_status(204, None)
+
+    def delete(self):
+        """ Stop the capture.
+
+        Example URLs:
+
+            DELETE /api/v1/trace
+
+        """
+
+        Tracer.instance().stop()
+
+        self.set_status(204, None)
+
+
 class ComponentsHandler(EmpowerAPIHandler):
     """Components handler. Used to load/unload components."""
 
     HANDLERS = [r"/api/v1/components/?",
                 r"/api/v1/components/([a-zA-Z0-9:\-.]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args):
         """ Lists either all the components running in this controller or just
         the one requested. Returns 404 if the requested component does not
@@ -682,9 +1091,9 @@ class ComponentsHandler(EmpowerAPIHandler):
                     componets[component] = {}
 
             if len(args) == 0:
-                self.write_as_json(componets)
+                yield self.write_as_json(componets)
             else:
-                self.write_as_json(componets[args[0]])
+                yield self.write_as_json(componets[args[0]])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
@@ -823,6 +1232,7 @@ class PendingTenantHandler(EmpowerAPIHandler):
     HANDLERS = [r"/api/v1/pending/?",
                 r"/api/v1/pending/([a-zA-Z0-9-]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Lists all the tenants requested. Returns 404 if the requested
         tenant does not exists.
@@ -846,11 +1256,11 @@ class PendingTenantHandler(EmpowerAPIHandler):
                     pendings = RUNTIME.load_pending_tenants(user)
                 else:
                     pendings = RUNTIME.load_pending_tenants()
-                self.write_as_json(pendings)
+                yield self.write_as_json(pendings)
             else:
                 tenant_id = UUID(args[0])
                 pending = RUNTIME.load_pending_tenant(tenant_id)
-                self.write_as_json(pending)
+                yield self.write_as_json(pending)
         except ValueError as ex:
             self.send_error(400, message=ex)
         except KeyError as ex:
@@ -969,6 +1379,7 @@ class TenantHandler(EmpowerAPIHandler):
     HANDLERS = [r"/api/v1/tenants/?",
                 r"/api/v1/tenants/([a-zA-Z0-9-]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Lists either all the tenants managed by this controller or just the
         one requested. Returns 404 if the requested tenant does not exists.
@@ -991,13 +1402,13 @@ class TenantHandler(EmpowerAPIHandler):
                 user = self.get_argument("user", default=None)
                 if user:
                     filtered = [x for x in tenants if x.owner == user]
-                    self.write_as_json(filtered)
+                    yield self.write_as_json(filtered)
                 else:
-                    self.write_as_json(tenants)
+                    yield self.write_as_json(tenants)
             else:
                 tenant_id = UUID(args[0])
                 tenant = RUNTIME.tenants[tenant_id]
-                self.write_as_json(tenant)
+                yield self.write_as_json(tenant)
         except ValueError as ex:
             self.send_error(400, message=ex)
         except KeyError as ex:
@@ -1118,6 +1529,7 @@ class TenantComponentsHandler(EmpowerAPIHandlerUsers):
         [r"/api/v1/tenants/([a-zA-Z0-9-]*)/components/?",
          r"/api/v1/tenants/([a-zA-Z0-9-]*)/components/([a-zA-Z0-9:\-.]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args):
         """ Lists either all the components running in this controller or just
         the one requested. Returns 404 if the requested component does not
@@ -1143,10 +1555,10 @@ class TenantComponentsHandler(EmpowerAPIHandlerUsers):
             tenant = RUNTIME.tenants[tenant_id]
 
             if len(args) == 1:
-                self.write_as_json(tenant.components)
+                yield self.write_as_json(tenant.components)
             else:
                 componet_id = args[1]
-                self.write_as_json(tenant.components[componet_id])
+                yield self.write_as_json(tenant.components[componet_id])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
@@ -1323,6 +1735,10 @@ class RESTServer(tornado.web.Application):
                            AuthLoginHandler, AuthLogoutHandler,
                            ManageTenantHandler, AccountsHandler,
                            ComponentsHandler, TenantComponentsHandler,
+                           TimersHandler, CallbacksHandler,
+                           DispatchHandler, LoggingHandler, TraceHandler,
+                           TelemetryHandler,
+                           TelemetryWSHandler, TelemetrySSEHandler,
                            PendingTenantHandler, TenantHandler,
                            AllowHandler, DenyHandler, IMSI2MACHandler]
 
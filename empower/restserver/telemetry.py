@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER telemetry stream.
+
+Module results (including events such as lvapjoin or wtpup) are pushed to
+the subscribed clients over WebSocket or Server-Sent Events as soon as the
+module invokes its callback. Each update is serialized once, no matter how
+many clients are subscribed.
+
+Every subscriber has a bounded queue. When the client cannot keep up,
+either the oldest updates are dropped (drop policy) or only the latest
+update of each module is kept (coalesce policy). The number of discarded
+updates is reported to the client.
+"""
+
+import json
+
+from collections import deque
+from collections import OrderedDict
+from uuid import UUID
+
+import tornado.gen
+import tornado.web
+import tornado.ioloop
+import tornado.websocket
+
+from empower.core.jsonserializer import dumps
+from empower.restserver.apihandlers import EmpowerAPIHandler
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+POLICY_DROP = "drop"
+POLICY_COALESCE = "coalesce"
+
+POLICIES = [POLICY_DROP, POLICY_COALESCE]
+
+DEFAULT_QUEUE = 100
+MAX_QUEUE = 10000
+
+
+class Update(object):
+    """A module update.
+
+    Attributes:
+        seq: the update sequence number (int)
+        module_id: the id of the module (int)
+        module_type: the type of the module (str)
+        tenant_id: the tenant of the module (UUID)
+        json: the JSON representation of the update (str)
+    """
+
+    def __init__(self, seq, module, serializable):
+
+        self.seq = seq
+        self.module_id = module.module_id
+        self.module_type = module.module_type
+        self.tenant_id = module.tenant_id
+
+        self.json = dumps({'seq': self.seq,
+                           'module_id': self.module_id,
+                           'module_type': self.module_type,
+                           'tenant_id': self.tenant_id,
+                           'data': serializable})
+
+    @property
+    def key(self):
+        """Return the coalescing key."""
+
+        return (self.module_type, self.module_id)
+
+
+class Subscriber(object):
+    """A telemetry subscriber.
+
+    Modules can be specified either as plain ids (matching modules of any
+    type) or as <module_type>:<id>. If neither modules nor types are
+    specified all the updates (of the tenant, if any) are delivered.
+
+    Attributes:
+        send: function delivering a list of updates and the number of
+          updates dropped since the last call. It can return a Future, no
+          further updates are delivered until the Future is done
+        modules: the modules the client is subscribed to (set)
+        types: the module types the client is subscribed to (set)
+        tenant_id: only updates of this tenant are delivered (UUID)
+        policy: the queue policy, either drop or coalesce (str)
+        size: the queue size (int)
+    """
+
+    def __init__(self, send, modules=None, types=None, tenant_id=None,
+                 policy=POLICY_COALESCE, size=DEFAULT_QUEUE):
+
+        if policy not in POLICIES:
+            raise ValueError("Invalid policy %s" % policy)
+
+        if size < 1 or size > MAX_QUEUE:
+            raise ValueError("Invalid queue size %u" % size)
+
+        self.send = send
+        self.modules = set()
+        self.types = set()
+        self.tenant_id = tenant_id
+        self.policy = policy
+        self.size = size
+        self.sent = 0
+        self.dropped = 0
+        self.total_dropped = 0
+        self.__busy = False
+
+        if policy == POLICY_COALESCE:
+            self.__queue = OrderedDict()
+        else:
+            self.__queue = deque()
+
+        self.subscribe(modules, types)
+
+    def subscribe(self, modules=None, types=None):
+        """Replace the subscribed modules and module types."""
+
+        self.modules = set()
+        self.types = set(types) if types else set()
+
+        for module in modules or []:
+
+            module = str(module)
+
+            if ':' in module:
+                module_type, module_id = module.rsplit(':', 1)
+                self.modules.add((module_type, int(module_id)))
+            else:
+                self.modules.add(int(module))
+
+    def matches(self, module):
+        """Return True if the updates of module must be delivered."""
+
+        if self.tenant_id and module.tenant_id != self.tenant_id:
+            return False
+
+        if not self.modules and not self.types:
+            return True
+
+        return module.module_type in self.types or \
+            module.module_id in self.modules or \
+            (module.module_type, module.module_id) in self.modules
+
+    def push(self, update):
+        """Enqueue an update."""
+
+        if self.policy == POLICY_COALESCE:
+
+            if update.key in self.__queue:
+                del self.__queue[update.key]
+                self.dropped += 1
+
+            self.__queue[update.key] = update
+
+            if len(self.__queue) > self.size:
+                self.__queue.popitem(last=False)
+                self.dropped += 1
+
+        else:
+
+            if len(self.__queue) == self.size:
+                self.__queue.popleft()
+                self.dropped += 1
+
+            self.__queue.append(update)
+
+        self.pump()
+
+    def pump(self):
+        """Deliver the queued updates unless a delivery is in progress."""
+
+        if self.__busy or not self.__queue:
+            return
+
+        if self.policy == POLICY_COALESCE:
+            updates = list(self.__queue.values())
+        else:
+            updates = list(self.__queue)
+
+        self.__queue.clear()
+
+        dropped = self.dropped
+        self.total_dropped += dropped
+        self.dropped = 0
+        self.sent += len(updates)
+
+        try:
+            future = self.send(updates, dropped)
+        except Exception as ex:
+            LOG.exception(ex)
+            return
+
+        if future is None:
+            return
+
+        self.__busy = True
+        future.add_done_callback(self.__done)
+
+    def __done(self, _):
+        """Called when a delivery is completed."""
+
+        self.__busy = False
+        tornado.ioloop.IOLoop.current().add_callback(self.pump)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'modules': sorted(str(x) if isinstance(x, int) else
+                                  "%s:%u" % x for x in self.modules),
+                'types': sorted(self.types),
+                'tenant_id': self.tenant_id,
+                'policy': self.policy,
+                'size': self.size,
+                'queued': len(self.__queue),
+                'sent': self.sent,
+                'dropped': self.total_dropped + self.dropped}
+
+
+class TelemetryHub(object):
+    """Dispatch module updates to the subscribers.
+
+    Attributes:
+        subscribers: the active subscribers (set)
+        seq: the sequence number of the last update (int)
+    """
+
+    __instance = None
+
+    def __init__(self):
+
+        self.subscribers = set()
+        self.seq = 0
+
+    @classmethod
+    def instance(cls):
+        """Return the global TelemetryHub."""
+
+        if not cls.__instance:
+            cls.__instance = TelemetryHub()
+
+        return cls.__instance
+
+    def subscribe(self, subscriber):
+        """Add a subscriber."""
+
+        self.subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber."""
+
+        self.subscribers.discard(subscriber)
+
+    def publish(self, module, serializable):
+        """Publish a module update.
+
+        The update is serialized only if at least one subscriber is
+        interested in it.
+
+        Args:
+            module: the Module generating the update
+            serializable: the update, an object implementing to_dict()
+
+        Returns:
+            None
+        """
+
+        if not self.subscribers:
+            return
+
+        targets = [x for x in self.subscribers if x.matches(module)]
+
+        if not targets:
+            return
+
+        self.seq += 1
+        update = Update(self.seq, module, serializable)
+
+        for subscriber in targets:
+            subscriber.push(update)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'seq': self.seq,
+                'subscribers': [x.to_dict() for x in self.subscribers]}
+
+
+def parse_subscription(get_argument):
+    """Parse the subscription parameters from the query arguments.
+
+    Args:
+        get_argument: the RequestHandler get_argument method
+
+    Returns:
+        A dictionary with the Subscriber arguments
+
+    Raises:
+        ValueError: if the arguments are not valid
+    """
+
+    out = {}
+
+    modules = get_argument("modules", None)
+    types = get_argument("types", None)
+    tenant_id = get_argument("tenant_id", None)
+
+    out['modules'] = [x for x in modules.split(",") if x] if modules else []
+    out['types'] = [x for x in types.split(",") if x] if types else []
+    out['tenant_id'] = UUID(tenant_id) if tenant_id else None
+    out['policy'] = get_argument("policy", POLICY_COALESCE)
+    out['size'] = int(get_argument("queue", DEFAULT_QUEUE))
+
+    return out
+
+
+class TelemetryHandler(EmpowerAPIHandler):
+    """Telemetry handler. Used to view the telemetry subscribers."""
+
+    HANDLERS = [r"/api/v1/telemetry/?"]
+
+    @tornado.gen.coroutine
+    def get(self, *args, **kwargs):
+        """List the telemetry subscribers.
+
+        Example URLs:
+
+            GET /api/v1/telemetry
+        """
+
+        yield self.write_as_json(TelemetryHub.instance())
+
+
+class TelemetryWSHandler(tornado.websocket.WebSocketHandler):
+    """Telemetry stream over WebSocket.
+
+    Each update is sent as a JSON message. Dropped updates are notified
+    with a {"dropped": <n>} message. The subscription can be replaced by
+    sending a {"modules": [...], "types": [...]} message.
+    """
+
+    HANDLERS = [r"/api/v1/telemetry/ws/?"]
+
+    def initialize(self, server=None):
+        """Set pointer to actual rest server."""
+
+        self.server = server
+        self.subscriber = None
+
+    def open(self, *args, **kwargs):
+        """Subscribe the client.
+
+        Example URLs:
+
+            ws://127.0.0.1:8888/api/v1/telemetry/ws?types=ucqm,lvapjoin
+            ws://127.0.0.1:8888/api/v1/telemetry/ws?modules=bin_counter:12
+        """
+
+        try:
+            params = parse_subscription(self.get_argument)
+            self.subscriber = Subscriber(self.send_updates, **params)
+        except ValueError as ex:
+            LOG.error("Invalid subscription: %s", ex)
+            self.close(1003, str(ex))
+            return
+
+        TelemetryHub.instance().subscribe(self.subscriber)
+
+    def on_message(self, message):
+        """Replace the subscription."""
+
+        try:
+            request = json.loads(message)
+            self.subscriber.subscribe(request.get('modules'),
+                                      request.get('types'))
+        except (ValueError, TypeError, AttributeError) as ex:
+            LOG.error("Invalid subscription: %s", ex)
+
+    def on_close(self):
+        """Unsubscribe the client."""
+
+        if self.subscriber:
+            TelemetryHub.instance().unsubscribe(self.subscriber)
+            self.subscriber = None
+
+    def send_updates(self, updates, dropped):
+        """Send the updates, return the Future of the last write."""
+
+        future = None
+
+        try:
+
+            if dropped:
+                future = self.write_message('{"dropped":%u}' % dropped)
+
+            for update in updates:
+                future = self.write_message(update.json)
+
+        except tornado.websocket.WebSocketClosedError:
+            self.on_close()
+            return None
+
+        return future
+
+
+class TelemetrySSEHandler(EmpowerAPIHandler):
+    """Telemetry stream over Server-Sent Events.
+
+    Each update is sent as an event whose type is the module type. Dropped
+    updates are notified with a "dropped" event.
+    """
+
+    HANDLERS = [r"/api/v1/telemetry/sse/?"]
+
+    subscriber = None
+
+    @tornado.web.asynchronous
+    def get(self, *args, **kwargs):
+        """Subscribe the client.
+
+        Example URLs:
+
+            GET /api/v1/telemetry/sse?types=wtpup,wtpdown
+            GET /api/v1/telemetry/sse?modules=ucqm:3,ncqm:4&policy=drop
+        """
+
+        try:
+            params = parse_subscription(self.get_argument)
+            self.subscriber = Subscriber(self.send_updates, **params)
+        except ValueError as ex:
+            self.send_error(400, message=ex)
+            return
+
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+        self.flush()
+
+        TelemetryHub.instance().subscribe(self.subscriber)
+
+    def on_connection_close(self):
+        """Unsubscribe the client."""
+
+        if self.subscriber:
+            TelemetryHub.instance().unsubscribe(self.subscriber)
+            self.subscriber = None
+
+    def send_updates(self, updates, dropped):
+        """Send the updates, return the Future of the flush."""
+
+        if self.request.connection.stream.closed():
+            self.on_connection_close()
+            return None
+
+        if dropped:
+            self.write("event: dropped\ndata: %u\n\n" % dropped)
+
+        for update in updates:
+            self.write("id: %u\nevent: %s\ndata: %s\n\n" %
+                       (update.seq, update.module_type, update.json))
+
+        return self.flush()
@@ -139,19 +139,14 @@ class BusynessTrigger(ModuleTrigger):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
-                                     int(value['channel']),
-                                     int(value['band']))
+            block = wtp.get_block(EtherAddress(value['hwaddr']),
+                                  int(value['channel']),
+                                  int(value['band']))
 
-            match = [block for block in wtp.supports if block == incoming]
-
-            if not match:
+            if block is None:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     @property
     def period(self):
@@ -247,7 +242,7 @@ class BusynessTrigger(ModuleTrigger):
         self.wtps.append(wtp)
 
         msg = ADD_BUSYNESS_TRIGGER.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def remove_busyness_from_wtp(self, wtp):
         """Remove Busyness to WTP."""
@@ -270,7 +265,7 @@ class BusynessTrigger(ModuleTrigger):
         self.wtps.remove(wtp)
 
         msg = DEL_BUSYNESS_TRIGGER.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, message):
         """ Handle an incoming BUSYNESS_TRIGGER message.
@@ -290,15 +285,14 @@ class BusynessTrigger(ModuleTrigger):
         if wtp_addr not in RUNTIME.tenants[self.tenant_id].wtps:
             return
 
-        hwaddr = EtherAddress(message.hwaddr)
-        channel = message.channel
-        band = message.band
-        incoming = ResourceBlock(wtp, hwaddr, channel, band)
+        block = wtp.get_block(EtherAddress(message.hwaddr),
+                              message.channel, message.band)
 
-        match = [block for block in wtp.supports if block == incoming]
+        if block is None:
+            return
 
         self.event = \
-            {'block': matches[0],
+            {'block': block,
              'timestamp': datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
              'current': message.current / 180.0}
 
@@ -19,17 +19,18 @@
 
 from construct import UBInt8
 from construct import Bytes
-from construct import Sequence
 from construct import Container
 from construct import Struct
 from construct import UBInt16
 from construct import UBInt32
-from construct import Array
 
 from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import Module
 from empower.core.app import EmpowerApp
+from empower.core.histogram import Histogram
+from empower.core.histogram import SampleArray
+from empower.core.histogram import SAMPLE
 from empower.core.resourcepool import ResourceBlock
 from empower.lvapp import PT_VERSION
 
@@ -39,8 +40,6 @@ from empower.main import RUNTIME
 PT_TXP_BIN_COUNTER_REQUEST = 0x34
 PT_TXP_BIN_COUNTER_RESPONSE = 0x35
 
-STATS = Sequence("stats", UBInt16("bytes"), UBInt32("count"))
-
 TXP_BIN_COUNTER_REQUEST = \
     Struct("txp_bin_counter_request",
            UBInt8("version"),
@@ -62,7 +61,7 @@ TXP_BIN_COUNTER_RESPONSE = \
            UBInt32("module_id"),
            Bytes("wtp", 6),
            UBInt16("nb_tx"),
-           Array(lambda ctx: ctx.nb_tx, STATS))
+           SampleArray("stats", lambda ctx: ctx.nb_tx, SAMPLE))
 
 
 class TXPBinCounter(Module):
@@ -78,6 +77,7 @@ class TXPBinCounter(Module):
         # parameters
         self._mcast = None
         self._bins = [8192]
+        self.histogram = Histogram(self._bins)
         self._block = None
 
         # data structures
@@ -128,6 +128,7 @@ class TXPBinCounter(Module):
                 raise ValueError("bins values must be positive")
 
         self._bins = bins
+        self.histogram = Histogram(bins)
 
     @property
     def block(self):
@@ -157,19 +158,14 @@ class TXPBinCounter(Module):
                 raise ValueError("Missing field: wtp")
 
             # Check if block is valid
-            incoming = ResourceBlock(wtp, EtherAddress(value['hwaddr']),
-                                     int(value['channel']),
-                                     int(value['band']))
-
-            match = [block for block in wtp.supports if block == incoming]
+            block = wtp.get_block(EtherAddress(value['hwaddr']),
+                                  int(value['channel']),
+                                  int(value['band']))
 
-            if not match:
+            if block is None:
                 raise ValueError("No block specified")
 
-            if len(match) > 1:
-                raise ValueError("More than one block specified")
-
-            self._block = match[0]
+            self._block = block
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
@@ -220,61 +216,7 @@ class TXPBinCounter(Module):
                       self.module_id)
 
         msg = TXP_BIN_COUNTER_REQUEST.build(stats_req)
-        wtp.connection.stream.write(msg)
-
-    def fill_bytes_samples(self, data):
-        """ Compute samples.
-
-        Samples are in the following format (after ordering):
-
-        [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
-
-        Each 2-tuple has format [ size, count ] where count is the number of
-        size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
-
-        """
-
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
-
-        for entry in samples:
-            if len(entry) == 0:
-                continue
-            size = entry[0]
-            count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + size * count
-                    break
-
-        return out
-
-    def fill_packets_samples(self, data):
-        """ Compute samples.
-
-        Samples are in the following format (after ordering):
-
-        [[60, 3], [66, 2], [74, 1], [98, 40], [167, 2], [209, 2], [1466, 1762]]
-
-        Each 2-tuple has format [ size, count ] where count is the number of
-        size-long (bytes, including the Ethernet 2 header) TX/RX by the LVAP.
-
-        """
-
-        samples = sorted(data, key=lambda entry: entry[0])
-        out = [0] * len(self.bins)
-
-        for entry in samples:
-            if len(entry) == 0:
-                continue
-            size = entry[0]
-            count = entry[1]
-            for i in range(0, len(self.bins)):
-                if size <= self.bins[i]:
-                    out[i] = out[i] + count
-                    break
-
-        return out
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
@@ -285,8 +227,8 @@ class TXPBinCounter(Module):
         """
 
         # update this object
-        self.tx_bytes = self.fill_bytes_samples(response.stats)
-        self.tx_packets = self.fill_packets_samples(response.stats)
+        self.tx_bytes, self.tx_packets = \
+            self.histogram.fill(response.stats)
 
         # call callback
         self.handle_callback(self)
@@ -241,6 +241,8 @@ class VBSRRCStats(ModuleTrigger):
                             ue.rrc_meas[m["phys_cell_id"]]["rsrp"] = -139
                             ue.rrc_meas[m["phys_cell_id"]]["rsrq"] = -19
 
+        ue.touch()
+
         self._meas_reply = meas
 
     def __eq__(self, other):
@@ -423,6 +425,8 @@ class VBSRRCStats(ModuleTrigger):
             if m in ue.rrc_meas:
                 del ue.rrc_meas[m]
 
+        ue.touch()
+
         rrc_m_req = main_pb2.emage_msg()
 
         create_header(self.module_id, ue.vbs.enb_id, rrc_m_req.head)
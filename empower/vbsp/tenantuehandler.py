@@ -17,6 +17,7 @@
 
 """Tenant/UE Handler."""
 
+import tornado.gen
 import tornado.web
 import tornado.httpserver
 import uuid
@@ -37,6 +38,7 @@ class TenantUEHandler(EmpowerAPIHandlerUsers):
                 r"/api/v1/tenants/([a-zA-Z0-9-]*)/vbses/([a-zA-Z0-9:]*)/ues/",
                 r"/api/v1/tenants/([a-zA-Z0-9-]*)/vbses/([a-zA-Z0-9:]*)/ues/([a-zA-Z0-9]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Get all UEs of a tenant or just the specified one.
             An UE can be uniquely identified using the VBS ID and RNTI.
@@ -59,7 +61,7 @@ class TenantUEHandler(EmpowerAPIHandlerUsers):
             ues = tenant.ues
 
             if len(args) == 1:
-                self.write_as_json(ues.values())
+                yield self.write_as_json(ues.values())
             else:
                 vbs_id = EtherAddress(args[1])
 
@@ -73,7 +75,7 @@ class TenantUEHandler(EmpowerAPIHandlerUsers):
                         vbs_ues.append(ue)
 
                 if len(args) == 2:
-                    self.write_as_json(vbs_ues)
+                    yield self.write_as_json(vbs_ues)
                 else:
                     if len(vbs_ues) == 0:
                         raise ValueError("Invalid UE RNTI")
@@ -82,7 +84,7 @@ class TenantUEHandler(EmpowerAPIHandlerUsers):
 
                     for ue in vbs_ues:
                         if ue.rnti == rnti:
-                            self.write_as_json(ue)
+                            yield self.write_as_json(ue)
                             break
 
         except KeyError as ex:
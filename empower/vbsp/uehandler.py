@@ -17,6 +17,8 @@
 
 """UEs Handerler."""
 
+import tornado.gen
+
 from empower.datatypes.etheraddress import EtherAddress
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
 from empower.main import RUNTIME
@@ -32,6 +34,7 @@ class UEHandler(EmpowerAPIHandlerAdminUsers):
                 r"/api/v1/vbses/([a-zA-Z0-9:]*)/ues",
                 r"/api/v1/vbses/([a-zA-Z0-9:]*)/ues/([a-zA-Z0-9]*)/?"]
 
+    @tornado.gen.coroutine
     def get(self, *args, **kwargs):
         """ Get all UEs or just the specified one. An UE can be uniquely
             identified using the VBS ID and RNTI.
@@ -50,7 +53,7 @@ class UEHandler(EmpowerAPIHandlerAdminUsers):
                 raise ValueError("Invalid URL")
 
             if len(args) == 0:
-                self.write_as_json(RUNTIME.ues.values())
+                yield self.write_as_json(RUNTIME.ues.values())
             else:
                 vbs_id = EtherAddress(args[0])
 
@@ -64,7 +67,7 @@ class UEHandler(EmpowerAPIHandlerAdminUsers):
                         ues.append(ue)
 
                 if len(args) == 1:
-                    self.write_as_json(ues)
+                    yield self.write_as_json(ues)
                 else:
                     if len(ues) == 0:
                         raise ValueError("Invalid UE RNTI")
@@ -73,7 +76,7 @@ class UEHandler(EmpowerAPIHandlerAdminUsers):
 
                     for ue in ues:
                         if ue.rnti == rnti:
-                            self.write_as_json(ue)
+                            yield self.write_as_json(ue)
                             break
 
         except KeyError as ex:
@@ -39,6 +39,8 @@ from empower.core.utils import hex_to_ether
 from empower.core.utils import ether_to_hex
 from empower.core.utils import rnti_to_ue_id
 from empower.core.ue import UE
+from empower.core.dispatchstats import DispatchStats
+from empower.core.trace import Tracer
 from empower.datatypes.etheraddress import EtherAddress
 
 from empower.main import RUNTIME
@@ -98,6 +100,7 @@ class VBSPConnection(object):
         address: The connection source address, i.e. the ENB IP address.
         server: Pointer to the server object.
         vbs: Pointer to a VBS object.
+        stats: Per message type dispatch statistics.
     """
 
     def __init__(self, stream, addr, server):
@@ -109,6 +112,7 @@ class VBSPConnection(object):
         self.seq = 0
         self.stream.set_close_callback(self._on_disconnect)
         self.__buffer = b''
+        self.stats = DispatchStats.connection("vbsp", "%s:%u" % addr[:2])
         self._hb_interval_ms = 500
         self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
                                                           self._hb_interval_ms)
@@ -121,6 +125,13 @@ class VBSPConnection(object):
 
         return self.addr
 
+    @property
+    def version(self):
+        """Return the change counter, the connection address never
+        changes."""
+
+        return self.addr
+
     def _heartbeat_cb(self):
         """Check if connection is still active."""
 
@@ -165,16 +176,45 @@ class VBSPConnection(object):
                 self.stream.read_bytes(size, self._on_read)
                 return
 
-            deserialized_msg = deserialize_message(line)
+            self._on_message(line)
+            self._wait()
 
-            # Update the sequency number from received message
-            self.seq = deserialized_msg.head.seq
+    def on_frames(self, frames):
+        """ Dispatch a batch of messages forwarded by a sharding worker. """
 
-            self._trigger_message(deserialized_msg)
-            self._wait()
+        for message in frames:
+
+            if self.stream.closed():
+                return
+
+            self._on_message(message)
+
+    def _on_message(self, message):
+        """ Deserialize a message and pass it to the suitable method. """
+
+        started = DispatchStats.now()
+
+        tracer = Tracer.instance()
+
+        if tracer.running:
+            tracer.record("vbsp", self, self.stats.name, message)
+
+        deserialized_msg = deserialize_message(message)
+
+        # Update the sequency number from received message
+        self.seq = deserialized_msg.head.seq
+
+        try:
+            msg_type = self._trigger_message(deserialized_msg)
+        finally:
+            empower.logger.set_context(None)
+
+        self.stats.record(msg_type, len(message), started)
 
     def _trigger_message(self, deserialized_msg):
+        """Dispatch a message to its handlers and return its type."""
 
+        msg_type = None
         event_type = deserialized_msg.WhichOneof("event_types")
 
         if event_type == PRT_VBSP_SINGLE_EVENT:
@@ -188,10 +228,12 @@ class VBSPConnection(object):
 
         if not msg_type or msg_type not in self.server.pt_types:
             LOG.error("Unknown message type %s", msg_type)
-            return
+            return msg_type
 
         if msg_type != PRT_VBSP_HELLO and not self.vbs:
-            return
+            return msg_type
+
+        empower.logger.set_context("vbsp.%s" % msg_type)
 
         handler_name = "_handle_%s" % self.server.pt_types[msg_type]
 
@@ -203,6 +245,8 @@ class VBSPConnection(object):
             for handler in self.server.pt_types_handlers[msg_type]:
                 handler(deserialized_msg)
 
+        return msg_type
+
     def _handle_hello(self, main_msg):
         """Handle an incoming HELLO message.
 
@@ -313,8 +357,8 @@ class VBSPConnection(object):
                 ue.tenant = \
                     RUNTIME.load_tenant_by_plmn_id(new_ue["plmn_id"])
 
-        for addr in list(RUNTIME.ues.keys()):
-            if addr not in active_ues:
+        for addr, ue in list(RUNTIME.ues.items()):
+            if ue.vbs == self.vbs and addr not in active_ues:
                 RUNTIME.remove_ue(addr)
 
     def send_UEs_id_req(self):
@@ -347,6 +391,11 @@ class VBSPConnection(object):
     def _on_disconnect(self):
         """Handle VBSP disconnection."""
 
+        tracer = Tracer.instance()
+
+        if tracer.running:
+            tracer.close("vbsp", self)
+
         if not self.vbs:
             return
 
@@ -24,6 +24,7 @@ from empower.vbsp import PRT_UE_LEAVE
 from empower.core.pnfpserver import BaseTenantPNFDevHandler
 from empower.core.pnfpserver import BasePNFDevHandler
 from empower.core.pnfpserver import PNFPServer
+from empower.core.sharding import ShardMaster
 from empower.core.vbs import VBS
 from empower.core.module import ModuleEventWorker
 from empower.core.module import ModuleWorker
@@ -103,7 +104,7 @@ class VBSPServer(PNFPServer, TCPServer):
     PNFDEV = VBS
     TBL_PNFDEV = TblVBS
 
-    def __init__(self, port, prt_types, prt_types_handlers):
+    def __init__(self, port, prt_types, prt_types_handlers, workers=0):
 
         PNFPServer.__init__(self, prt_types, prt_types_handlers)
         TCPServer.__init__(self)
@@ -111,7 +112,11 @@ class VBSPServer(PNFPServer, TCPServer):
         self.port = int(port)
         self.connection = None
 
-        self.listen(self.port)
+        # connections are accepted either here or by the worker processes
+        if workers:
+            self.shards = ShardMaster(self, "vbsp", self.port, workers)
+        else:
+            self.listen(self.port)
 
     def handle_stream(self, stream, address):
         self.log.info('Incoming connection from %r', address)
@@ -132,10 +137,14 @@ class VBSPServer(PNFPServer, TCPServer):
             handler(ue)
 
 
-def launch(port=DEFAULT_PORT):
-    """Start VBSP Server Module."""
+def launch(port=DEFAULT_PORT, workers=0):
+    """Start VBSP Server Module.
 
-    server = VBSPServer(port, PRT_TYPES, PRT_TYPES_HANDLERS)
+    If workers is not zero, the eNB connections are accepted and served by
+    the given number of worker processes (see empower.core.sharding).
+    """
+
+    server = VBSPServer(port, PRT_TYPES, PRT_TYPES_HANDLERS, int(workers))
 
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantVBSHandler, server)
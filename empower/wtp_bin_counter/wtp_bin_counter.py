@@ -21,12 +21,10 @@ import time
 
 from construct import UBInt8
 from construct import Bytes
-from construct import Sequence
 from construct import Container
 from construct import Struct
 from construct import UBInt16
 from construct import UBInt32
-from construct import Array
 
 from empower.lvapp import PT_VERSION
 from empower.datatypes.etheraddress import EtherAddress
@@ -35,6 +33,9 @@ from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp.lvappserver import ModuleLVAPPWorker
 from empower.core.module import Module
 from empower.core.app import EmpowerApp
+from empower.core.histogram import Histogram
+from empower.core.histogram import SampleArray
+from empower.core.histogram import LVAP_SAMPLE
 
 from empower.main import RUNTIME
 
@@ -42,11 +43,6 @@ from empower.main import RUNTIME
 PT_WTP_STATS_REQUEST = 0x41
 PT_WTP_STATS_RESPONSE = 0x42
 
-WTP_STATS = Sequence("stats",
-                     Bytes("lvap", 6),
-                     UBInt16("bytes"),
-                     UBInt32("count"))
-
 WTP_STATS_REQUEST = Struct("stats_request", UBInt8("version"),
                            UBInt8("type"),
                            UBInt32("length"),
@@ -62,7 +58,8 @@ WTP_STATS_RESPONSE = \
            Bytes("wtp", 6),
            UBInt16("nb_tx"),
            UBInt16("nb_rx"),
-           Array(lambda ctx: ctx.nb_tx + ctx.nb_rx, WTP_STATS))
+           SampleArray("stats", lambda ctx: ctx.nb_tx + ctx.nb_rx,
+                       LVAP_SAMPLE))
 
 
 class WTPBinCounter(Module):
@@ -97,6 +94,7 @@ class WTPBinCounter(Module):
         # parameters
         self._wtp = None
         self._bins = [8192]
+        self.histogram = Histogram(self._bins)
 
         # data structures
         self.tx_packets = {}
@@ -153,6 +151,7 @@ class WTPBinCounter(Module):
                 raise ValueError("bins values must be positive")
 
         self._bins = bins
+        self.histogram = Histogram(bins)
 
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
@@ -208,7 +207,7 @@ class WTPBinCounter(Module):
                               module_id=self.module_id)
 
         msg = WTP_STATS_REQUEST.build(stats_req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def update_stats(self, delta, last, current):
         """Update stats."""
@@ -220,76 +219,10 @@ class WTPBinCounter(Module):
             if lvap not in last:
                 continue
 
-            stats[lvap] = []
-
-            for i in range(0, len(last[lvap])):
-                diff = current[lvap][i] - last[lvap][i]
-                stats[lvap].append(diff / delta)
+            stats[lvap] = Histogram.rates(delta, last[lvap], current[lvap])
 
         return stats
 
-    def fill_packets_sample(self, values):
-
-        out = {}
-
-        for value in values:
-            lvap = EtherAddress(value[0])
-            if lvap not in out:
-                out[lvap] = []
-            out[lvap].append([value[1], value[2]])
-
-        for lvap in out.keys():
-
-            data = out[lvap]
-
-            samples = sorted(data, key=lambda entry: entry[0])
-            new_out = [0] * len(self.bins)
-
-            for entry in samples:
-                if len(entry) == 0:
-                    continue
-                size = entry[0]
-                count = entry[1]
-                for i in range(0, len(self.bins)):
-                    if size <= self.bins[i]:
-                        new_out[i] = new_out[i] + count
-                        break
-
-            out[lvap] = new_out
-
-        return out
-
-    def fill_bytes_sample(self, values):
-
-        out = {}
-
-        for value in values:
-            lvap = EtherAddress(value[0])
-            if lvap not in out:
-                out[lvap] = []
-            out[lvap].append([value[1], value[2]])
-
-        for lvap in out.keys():
-
-            data = out[lvap]
-
-            samples = sorted(data, key=lambda entry: entry[0])
-            new_out = [0] * len(self.bins)
-
-            for entry in samples:
-                if len(entry) == 0:
-                    continue
-                size = entry[0]
-                count = entry[1]
-                for i in range(0, len(self.bins)):
-                    if size <= self.bins[i]:
-                        new_out[i] = new_out[i] + size * count
-                        break
-
-            out[lvap] = new_out
-
-        return out
-
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
         Args:
@@ -299,7 +232,7 @@ class WTPBinCounter(Module):
         """
 
         tx_samples = response.stats[0:response.nb_tx]
-        rx_samples = response.stats[response.nb_tx:-1]
+        rx_samples = response.stats[response.nb_tx:]
 
         old_tx_bytes = self.tx_bytes
         old_rx_bytes = self.rx_bytes
@@ -307,11 +240,10 @@ class WTPBinCounter(Module):
         old_tx_packets = self.tx_packets
         old_rx_packets = self.rx_packets
 
-        self.tx_bytes = self.fill_bytes_sample(tx_samples)
-        self.rx_bytes = self.fill_bytes_sample(rx_samples)
-
-        self.tx_packets = self.fill_packets_sample(tx_samples)
-        self.rx_packets = self.fill_packets_sample(rx_samples)
+        self.tx_bytes, self.tx_packets = \
+            self.histogram.fill_by_lvap(tx_samples)
+        self.rx_bytes, self.rx_packets = \
+            self.histogram.fill_by_lvap(rx_samples)
 
         if self.last:
             delta = time.time() - self.last
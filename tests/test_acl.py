@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""ACL tests."""
+
+import unittest
+
+from empower.core.acl import ACL
+from empower.core.acl import ACLTable
+from empower.core.acl import EXACT_MASK
+from empower.core.acl import parse_rule
+from empower.datatypes.etheraddress import EtherAddress
+
+
+def rule(text, label=""):
+    """Return the ACL parsed from text."""
+
+    addr, mask = parse_rule(text)
+
+    return ACL(addr, label, mask)
+
+
+class TestParseRule(unittest.TestCase):
+    """parse_rule tests."""
+
+    def test_exact(self):
+        """A rule without mask is exact."""
+
+        addr, mask = parse_rule("00:11:22:33:44:55")
+
+        self.assertEqual(addr, EtherAddress("00:11:22:33:44:55"))
+        self.assertIsNone(mask)
+
+    def test_prefix(self):
+        """Prefix lengths and masks are equivalent."""
+
+        self.assertEqual(parse_rule("00:11:22:33:44:55/24"),
+                         parse_rule("00:11:22:33:44:55/ff:ff:ff:00:00:00"))
+        self.assertEqual(parse_rule("00:11:22:33:44:55", 24),
+                         parse_rule("00:11:22:33:44:55/24"))
+        self.assertEqual(parse_rule("00:11:22:33:44:55", "24"),
+                         parse_rule("00:11:22:33:44:55/24"))
+        self.assertEqual(parse_rule("00:11:22:33:44:55/48")[1], EXACT_MASK)
+
+    def test_invalid(self):
+        """Rules matching every station and bad prefixes are rejected."""
+
+        for text in ["00:11:22:33:44:55/0", "00:11:22:33:44:55/49",
+                     "00:11:22:33:44:55/00:00:00:00:00:00",
+                     "00:11:22:33:44/24"]:
+            with self.assertRaises(ValueError, msg=text):
+                parse_rule(text)
+
+
+class TestACLTable(unittest.TestCase):
+    """ACLTable tests."""
+
+    def setUp(self):
+
+        self.table = ACLTable()
+
+        for text in ["00:11:22:00:00:00", "00:11:22:00:00:00/24",
+                     "00:11:22:00:00:00/16", "00:aa:00:00:00:00/16"]:
+            acl = rule(text, text)
+            self.table[acl.key] = acl
+
+    def test_keys(self):
+        """Rules with the same address and different masks coexist."""
+
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(rule("00:11:22:00:00:00/48").key,
+                         rule("00:11:22:00:00:00").key)
+        self.assertNotEqual(rule("00:11:22:00:00:00/24"),
+                            rule("00:11:22:00:00:00/16"))
+
+    def test_lookup(self):
+        """The most specific rule is returned."""
+
+        cases = [("00:11:22:00:00:00", "00:11:22:00:00:00"),
+                 ("00:11:22:33:44:55", "00:11:22:00:00:00/24"),
+                 ("00:11:23:00:00:00", "00:11:22:00:00:00/16"),
+                 ("00:aa:bb:cc:dd:ee", "00:aa:00:00:00:00/16"),
+                 ("00:12:00:00:00:00", None)]
+
+        for addr, label in cases:
+            acl = self.table.lookup(EtherAddress(addr))
+            self.assertEqual(acl.label if acl else None, label, msg=addr)
+            self.assertEqual(self.table.match(EtherAddress(addr)),
+                             label is not None, msg=addr)
+
+    def test_remove(self):
+        """Removing a rule leaves the rules sharing its address."""
+
+        del self.table[rule("00:11:22:00:00:00/24").key]
+
+        acl = self.table.lookup(EtherAddress("00:11:22:33:44:55"))
+        self.assertEqual(acl.label, "00:11:22:00:00:00/16")
+
+        del self.table[rule("00:11:22:00:00:00/16").key]
+
+        self.assertFalse(self.table.match(EtherAddress("00:11:22:33:44:55")))
+        self.assertTrue(self.table.match(EtherAddress("00:11:22:00:00:00")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Dispatch statistics tests."""
+
+import gc
+import math
+import random
+import unittest
+
+from empower.core.dispatchstats import DispatchStats
+from empower.core.dispatchstats import Histogram
+from empower.core.dispatchstats import MAX_VALUE
+from empower.core.dispatchstats import NB_BUCKETS
+from empower.core.dispatchstats import SUB_BUCKETS
+from empower.core.dispatchstats import bucket_index
+from empower.core.dispatchstats import bucket_value
+
+
+class TestBuckets(unittest.TestCase):
+    """Log-linear bucket tests."""
+
+    def test_error(self):
+        """Values map to ordered buckets with a bounded relative error."""
+
+        rand = random.Random(1)
+        values = list(range(4096)) + \
+            [rand.randint(0, MAX_VALUE) for _ in range(10000)] + \
+            [MAX_VALUE]
+
+        for value in values:
+            index = bucket_index(value)
+            self.assertLess(index, NB_BUCKETS)
+            self.assertGreaterEqual(bucket_value(index), value)
+            self.assertLess(bucket_value(index) - value,
+                            max(1, value / SUB_BUCKETS))
+            if index:
+                self.assertLess(bucket_value(index - 1), value)
+
+
+class TestHistogram(unittest.TestCase):
+    """Histogram tests."""
+
+    def test_percentiles(self):
+        """Percentiles are within the bucket error of the exact ones."""
+
+        rand = random.Random(1)
+        values = [int(rand.expovariate(1 / 500.0)) for _ in range(5000)]
+        histogram = Histogram()
+
+        for value in values:
+            histogram.record(value)
+
+        values.sort()
+
+        for percentile, value in zip([50, 90, 99, 100],
+                                     histogram.percentiles([50, 90, 99,
+                                                            100])):
+            rank = max(1, math.ceil(len(values) * percentile / 100.0))
+            exact = values[rank - 1]
+            self.assertGreaterEqual(value, exact)
+            self.assertLessEqual(value, exact + max(1, exact / SUB_BUCKETS))
+
+        out = histogram.to_dict()
+
+        self.assertEqual(out['count'], len(values))
+        self.assertEqual(out['max'], values[-1])
+        self.assertAlmostEqual(out['mean'], sum(values) / len(values))
+
+    def test_empty(self):
+        """An empty histogram reports zeros."""
+
+        out = Histogram().to_dict()
+
+        self.assertEqual(out['count'], 0)
+        self.assertEqual(out['p99'], 0)
+
+    def test_clamp_merge(self):
+        """Large values are clamped, merged histograms add up."""
+
+        first = Histogram()
+        first.record(MAX_VALUE * 2)
+
+        second = Histogram()
+        second.record(10)
+        second.merge(first)
+
+        self.assertEqual(second.count, 2)
+        self.assertEqual(second.max, MAX_VALUE)
+        self.assertEqual(second.percentiles([50, 100]), [10, MAX_VALUE])
+
+
+class TestDispatchStats(unittest.TestCase):
+    """DispatchStats tests."""
+
+    def test_connections(self):
+        """Connection statistics are accounted in their protocol."""
+
+        protocol = DispatchStats.protocol("test")
+        protocol.reset()
+
+        first = DispatchStats.connection("test", "first")
+        second = DispatchStats.connection("test", "second")
+
+        first.record_elapsed("hello", 10, 100)
+        first.record("hello", 20, DispatchStats.now())
+        second.record("status", 30, DispatchStats.now())
+
+        self.assertIs(DispatchStats.protocols()["test"], protocol)
+        self.assertEqual(first.to_dict()['count'], 2)
+
+        out = protocol.to_dict(connections=True)
+
+        # record_elapsed does not propagate to the protocol
+        self.assertEqual(out['count'], 2)
+        self.assertEqual(out['bytes'], 50)
+        self.assertEqual(out['types']['status']['count'], 1)
+        self.assertEqual(out['nb_connections'], 2)
+        self.assertEqual(sorted(x['name'] for x in out['connections']),
+                         ["first", "second"])
+
+        protocol.reset()
+
+        self.assertEqual(protocol.to_dict()['count'], 0)
+        self.assertEqual(first.to_dict()['count'], 0)
+
+        del first, second
+        gc.collect()
+
+        self.assertEqual(protocol.to_dict()['nb_connections'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""JSON serializer tests."""
+
+import json
+import unittest
+
+from empower.core.jsonserializer import Versioned
+from empower.core.jsonserializer import dumps
+from empower.core.jsonserializer import etag
+from empower.core.jsonserializer import iterdumps
+
+
+class Block(Versioned):
+    """A Versioned object encoded on its own."""
+
+    def __init__(self, x):
+        self.x = x
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'x': self.x}
+
+
+class Inline(Versioned):
+    """A Versioned object inlining the representation of its block."""
+
+    def __init__(self, block):
+        self.block = block
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'block': self.block.to_dict()}
+
+    def version_deps(self):
+        """Return the objects embedded in the representation."""
+
+        return [self.block]
+
+
+class Nested(Inline):
+    """A Versioned object embedding its block."""
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'block': self.block}
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Fragment cache tests."""
+
+    def check(self, cls):
+        """Changing the block changes the cached representation."""
+
+        block = Block(1)
+        obj = cls(block)
+
+        self.assertEqual(json.loads(dumps(obj)), {'block': {'x': 1}})
+
+        before = etag(obj)
+        block.x = 2
+
+        self.assertNotEqual(etag(obj), before)
+        self.assertEqual(json.loads(dumps(obj)), {'block': {'x': 2}})
+        self.assertEqual(json.loads(dumps([obj, obj])),
+                         [{'block': {'x': 2}}] * 2)
+
+    def test_nested(self):
+        """Blocks encoded through the encoder are tracked."""
+
+        self.check(Nested)
+
+    def test_inline(self):
+        """Blocks inlined by to_dict are tracked through version_deps."""
+
+        self.check(Inline)
+
+
+class TestIterDumps(unittest.TestCase):
+    """iterdumps tests."""
+
+    def test_chunks(self):
+        """Chunks concatenate to the output of dumps."""
+
+        values = [Block(x) for x in range(100)]
+
+        for value in [values, [], Block(1), {'a': 1}]:
+            chunks = list(iterdumps(value, chunk_size=50))
+            self.assertEqual(''.join(chunks), dumps(value))
+
+        self.assertGreater(len(list(iterdumps(values, chunk_size=50))), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
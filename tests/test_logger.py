@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Log rate limiting tests."""
+
+import logging
+import unittest
+import unittest.mock
+
+import empower.logger
+
+from empower.logger import DEFAULT_KEY
+from empower.logger import Limit
+from empower.logger import RateLimitFilter
+from empower.logger import parse_limits
+from empower.logger import set_context
+
+
+class Clock(object):
+    """A fake monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        """Return the current time."""
+
+        return self.now
+
+
+def record(name, level=logging.INFO):
+    """Return a log record."""
+
+    return logging.LogRecord(name, level, __file__, 0, "message", (), None)
+
+
+class LimitTestCase(unittest.TestCase):
+    """Run the tests with a fake clock."""
+
+    def setUp(self):
+
+        self.clock = Clock()
+        patcher = unittest.mock.patch.object(empower.logger, 'time',
+                                             self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestLimit(LimitTestCase):
+    """Limit tests."""
+
+    def test_rate(self):
+        """Bursts are allowed, then records pass at the given rate."""
+
+        limit = Limit(4, 3)
+
+        self.assertEqual(sum(limit.allow() for _ in range(10)), 3)
+
+        self.clock.now += 0.25
+        self.assertTrue(limit.allow())
+        self.assertFalse(limit.allow())
+
+        self.clock.now += 10
+        self.assertEqual(sum(limit.allow() for _ in range(10)), 3)
+
+        self.assertEqual((limit.passed, limit.dropped), (7, 15))
+
+    def test_default_burst(self):
+        """The burst defaults to one second worth of records."""
+
+        self.assertEqual(Limit(20).burst, 20)
+        self.assertEqual(Limit(0.5).burst, 1)
+
+    def test_sample(self):
+        """One record every sample is kept."""
+
+        limit = Limit(sample=3)
+
+        self.assertEqual([limit.allow() for _ in range(6)],
+                         [False, False, True, False, False, True])
+
+    def test_invalid(self):
+        """Negative rates and null samples are rejected."""
+
+        with self.assertRaises(ValueError):
+            Limit(-1)
+
+        with self.assertRaises(ValueError):
+            Limit(sample=0)
+
+
+class TestRateLimitFilter(LimitTestCase):
+    """RateLimitFilter tests."""
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.filter = RateLimitFilter()
+        self.addCleanup(set_context, None)
+
+    def allowed(self, name, count=10, level=logging.INFO):
+        """Return how many of count records are kept."""
+
+        return sum(self.filter.filter(record(name, level))
+                   for _ in range(count))
+
+    def test_keys(self):
+        """Records are limited by logger name or by context key."""
+
+        self.filter.set_limit("lvapp", 1, 2)
+
+        self.assertEqual(self.allowed("lvapp"), 2)
+        self.assertEqual(self.allowed("vbsp"), 10)
+        self.assertEqual(self.allowed("lvapp", level=logging.WARNING), 10)
+
+        set_context("lvapp")
+
+        self.assertEqual(self.allowed("vbsp"), 0)
+
+        set_context(None)
+        self.filter.remove_limit("lvapp")
+
+        self.assertEqual(self.allowed("lvapp"), 10)
+
+    def test_default(self):
+        """The default limit applies separately to each key."""
+
+        self.filter.set_limit(DEFAULT_KEY, 1, 3)
+        self.filter.set_limit("vbsp", sample=2)
+
+        self.assertEqual(self.allowed("lvapp"), 3)
+        self.assertEqual(self.allowed("lvnfp"), 3)
+        self.assertEqual(self.allowed("vbsp"), 5)
+
+        out = self.filter.to_dict()
+
+        self.assertEqual(sorted(out[DEFAULT_KEY]['keys']), ["lvapp", "lvnfp"])
+        self.assertEqual(out["vbsp"]['passed'], 5)
+
+    def test_parse_limits(self):
+        """Limits are parsed from key=rate[:burst][/sample] items."""
+
+        instance = RateLimitFilter.instance()
+        saved = dict(instance.limits)
+
+        def restore():
+            for key in list(instance.limits):
+                instance.remove_limit(key)
+            for key, limit in saved.items():
+                instance.limits[key] = limit
+
+        self.addCleanup(restore)
+
+        parse_limits("lvapp.status_lvap=10:50, *=100,vbsp.mac=/10,")
+
+        limits = {k: (v.rate, v.burst, v.sample)
+                  for k, v in instance.limits.items()}
+
+        self.assertEqual(limits["lvapp.status_lvap"], (10.0, 50, 1))
+        self.assertEqual(limits[DEFAULT_KEY], (100.0, 100, 1))
+        self.assertEqual(limits["vbsp.mac"], (None, None, 10))
+
+        with self.assertRaises(ValueError):
+            parse_limits("lvapp")
+
+
+if __name__ == "__main__":
+    unittest.main()
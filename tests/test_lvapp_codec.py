@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP codec tests.
+
+Checks that the compiled codecs parse and build the LVAPP messages exactly
+as the construct Structs they are generated from. Messages are generated
+randomly from the Struct definitions, count and length fields are set so
+that the variable-size parts are consistent.
+
+The Structs are listed explicitly. The ones defined by the modules are not
+imported here, since importing a module loads the runtime and its database.
+"""
+
+import random
+import unittest
+
+from construct import Container
+from construct import Struct
+from construct import Sequence
+from construct import FormatField
+from construct import StaticField
+from construct import MetaField
+from construct import MetaArray
+from construct import Range
+from construct import Buffered
+
+from empower.lvapp import PT_TYPES
+from empower.lvapp import HEADER
+from empower.lvapp import HELLO
+from empower.lvapp import PROBE_REQUEST
+from empower.lvapp import PROBE_RESPONSE
+from empower.lvapp import AUTH_REQUEST
+from empower.lvapp import AUTH_RESPONSE
+from empower.lvapp import ASSOC_REQUEST
+from empower.lvapp import ASSOC_RESPONSE
+from empower.lvapp import ADD_LVAP
+from empower.lvapp import DEL_LVAP
+from empower.lvapp import STATUS_LVAP
+from empower.lvapp import CAPS
+from empower.lvapp import SET_PORT
+from empower.lvapp import STATUS_PORT
+from empower.lvapp import ADD_VAP
+from empower.lvapp import DEL_VAP
+from empower.lvapp import STATUS_VAP
+from empower.lvapp import ADD_DEL_LVAP_RESPONSE
+from empower.lvapp.codec import CODEC_COMPILED
+from empower.lvapp.codec import CompiledStruct
+from empower.lvapp.codec import select_codec
+
+# Random messages checked for every Struct
+TRIALS = 200
+
+STRUCTS = [HEADER, HELLO, PROBE_REQUEST, PROBE_RESPONSE, AUTH_REQUEST,
+           AUTH_RESPONSE, ASSOC_REQUEST, ASSOC_RESPONSE, ADD_LVAP, DEL_LVAP,
+           STATUS_LVAP, CAPS, SET_PORT, STATUS_PORT, ADD_VAP, DEL_VAP,
+           STATUS_VAP, ADD_DEL_LVAP_RESPONSE]
+
+# Constructs whose size depends on the fields before them
+VARIABLE = (MetaField, MetaArray, Range)
+
+
+class _Names(object):
+    """Context recording the names of the fields read from it."""
+
+    def __init__(self):
+        self.names = []
+
+    def __getattr__(self, name):
+        self.names.append(name)
+        return 0
+
+    __getitem__ = __getattr__
+
+
+def _fields_of(function):
+    """Return the names of the fields function depends on."""
+
+    ctx = _Names()
+    function(ctx)
+
+    return ctx.names
+
+
+def sample(con, rand):
+    """Return a random value that con can build."""
+
+    if isinstance(con, Sequence):
+        return [sample(x, rand) for x in con.subcons if x.name]
+
+    if isinstance(con, Struct):
+        return sample_struct(con, rand)
+
+    if isinstance(con, FormatField):
+        bits = con.packer.size * 8
+        if con.packer.format[-1].islower():
+            return rand.randint(-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+        return rand.getrandbits(bits)
+
+    if isinstance(con, StaticField):
+        return bytes(rand.getrandbits(8) for _ in range(con.length))
+
+    if isinstance(con, Buffered):
+        return Container(**{x.name: rand.getrandbits(x.width)
+                            for x in con.subcon.subcons if x.name})
+
+    raise TypeError("Unsupported construct %s" % con)
+
+
+def sample_struct(con, rand):
+    """Return a random Container that the Struct con can build."""
+
+    obj = Container()
+
+    for sub in con.subcons:
+        if sub.name and not isinstance(sub, VARIABLE):
+            obj[sub.name] = sample(sub, rand)
+
+    for sub in con.subcons:
+
+        if isinstance(sub, MetaField):
+            length = rand.randint(0, 16)
+            field = _fields_of(sub.lengthfunc)[0]
+            obj[field] = 0
+            obj[field] = length - sub.lengthfunc(obj)
+            obj[sub.name] = bytes(rand.getrandbits(8) for _ in range(length))
+
+        elif isinstance(sub, MetaArray):
+            for field in _fields_of(sub.countfunc):
+                obj[field] = rand.randint(0, 4)
+            obj[sub.name] = [sample(sub.subcon, rand)
+                             for _ in range(sub.countfunc(obj))]
+
+        elif isinstance(sub, Range):
+            count = rand.randint(sub.mincount, sub.maxcout)
+            obj[sub.name] = [sample(sub.subcon, rand) for _ in range(count)]
+
+    return obj
+
+
+class TestLVAPPCodec(unittest.TestCase):
+    """Compare the compiled codecs with construct."""
+
+    def test_registered(self):
+        """All the PT_TYPES Structs are checked and can be compiled."""
+
+        for con in PT_TYPES.values():
+            if con:
+                self.assertIn(con, STRUCTS)
+                self.assertIsInstance(select_codec(con, CODEC_COMPILED),
+                                      CompiledStruct, con.name)
+
+    def test_equivalence(self):
+        """Parse and build random messages with both codecs."""
+
+        rand = random.Random(0)
+
+        for con in STRUCTS:
+
+            codec = select_codec(con, CODEC_COMPILED)
+
+            with self.subTest(struct=con.name):
+
+                for _ in range(TRIALS):
+
+                    obj = sample(con, rand)
+                    data = con.build(obj)
+
+                    self.assertEqual(codec.build(obj), data)
+
+                    expected = con.parse(data)
+                    msg = codec.parse(data)
+
+                    for field in expected:
+                        self.assertEqual(getattr(msg, field),
+                                         expected[field], field)
+
+                    self.assertEqual(msg.to_container(), expected)
+                    self.assertEqual(codec.build(msg), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
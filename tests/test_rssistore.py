@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""RSSI store tests."""
+
+import math
+import statistics
+import unittest
+
+from empower.core.rssistore import RSSIStore
+from empower.datatypes.etheraddress import EtherAddress
+
+STA1 = EtherAddress("00:00:00:00:00:01")
+STA2 = EtherAddress("00:00:00:00:00:02")
+STA3 = EtherAddress("00:00:00:00:00:03")
+
+
+class TestRSSIStore(unittest.TestCase):
+    """RSSIStore tests."""
+
+    def setUp(self):
+
+        self.store = RSSIStore(capacity=8, window=4, alpha=0.5, ttl=10.0)
+
+    def test_history(self):
+        """Only the most recent window samples are kept, oldest first."""
+
+        for value in range(-60, -54):
+            self.store.update("b1", [STA1], [value], now=0)
+
+        self.assertEqual(self.store.history("b1", STA1), [-58, -57, -56, -55])
+        self.assertEqual(self.store.history("b1", STA2), [])
+        self.assertEqual(self.store.history("b2", STA1), [])
+
+    def test_metrics(self):
+        """Metrics match their definition over the kept samples."""
+
+        samples = [-70, -65, -80, -45, -52, -61, -58]
+
+        for value in samples:
+            self.store.update("b1", [STA1], [value], now=0)
+
+        kept = samples[-4:]
+        ewma = samples[0]
+
+        for value in samples[1:]:
+            ewma = 0.5 * value + 0.5 * ewma
+
+        cases = [("mean", None, statistics.mean(kept)),
+                 ("median", None, statistics.median(kept)),
+                 ("min", None, min(kept)),
+                 ("max", None, max(kept)),
+                 ("last", None, samples[-1]),
+                 ("ewma", None, ewma),
+                 ("mean", 2, statistics.mean(samples[-2:])),
+                 ("max", 1, samples[-1]),
+                 ("p100", None, max(kept)),
+                 ("p0", None, min(kept))]
+
+        for metric, count, expected in cases:
+            value = self.store.get("b1", STA1, metric, count)
+            self.assertAlmostEqual(value, expected, places=4,
+                                   msg="%s/%s" % (metric, count))
+
+        with self.assertRaises(ValueError):
+            self.store.get("b1", STA1, "average")
+
+    def test_missing(self):
+        """Unknown pairs have no RSSI."""
+
+        self.store.update("b1", [STA1], [-50], now=0)
+
+        self.assertEqual(self.store.get("b1", STA2), -math.inf)
+        self.assertEqual(self.store.get("b2", STA1), -math.inf)
+
+    def test_best_blocks(self):
+        """The block with the highest RSSI is returned for each station."""
+
+        self.store.update("b1", [STA1, STA2], [-50, -70], now=0)
+        self.store.update("b2", [STA1, STA2], [-60, -40], now=0)
+        self.store.update("b3", [STA3], [-80], now=0)
+
+        best = self.store.best_blocks()
+
+        self.assertEqual(best, {STA1: ("b1", -50.0),
+                                STA2: ("b2", -40.0),
+                                STA3: ("b3", -80.0)})
+
+        best = self.store.best_blocks(blocks=["b2", "b3"], addrs=[STA1])
+
+        self.assertEqual(best, {STA1: ("b2", -60.0)})
+        self.assertEqual(self.store.best_blocks(blocks=["b4"]), {})
+
+    def test_evict_stale(self):
+        """Stale pairs are evicted first when the store is full."""
+
+        addrs = [EtherAddress(x) for x in range(1, 9)]
+
+        self.store.update("b1", addrs[:4], [-50] * 4, now=0)
+        self.store.update("b1", addrs[4:], [-50] * 4, now=20)
+        self.store.update("b2", [STA1], [-40], now=21)
+
+        self.assertEqual(self.store.evicted, 4)
+        self.assertEqual(self.store.to_dict()['entries'], 5)
+        self.assertEqual(self.store.get("b1", addrs[0]), -math.inf)
+        self.assertEqual(self.store.get("b1", addrs[4]), -50.0)
+        self.assertEqual(self.store.get("b2", STA1), -40.0)
+
+    def test_evict_lru(self):
+        """The least recently updated pairs are evicted if none is stale."""
+
+        for index in range(1, 9):
+            self.store.update("b1", [EtherAddress(index)], [-50], now=index)
+
+        self.store.update("b2", [STA1], [-40], now=9)
+
+        self.assertEqual(self.store.evicted, 1)
+        self.assertEqual(self.store.get("b1", STA1), -math.inf)
+        self.assertEqual(self.store.get("b1", STA2), -50.0)
+        self.assertEqual(self.store.get("b2", STA1), -40.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Timer wheel tests.
+
+The wheel is driven by a fake clock, the expirations are processed by
+calling the periodic callback of the wheel directly.
+"""
+
+import unittest
+
+from empower.core.timerwheel import Timer
+from empower.core.timerwheel import TimerWheel
+
+
+class FakeWheel(TimerWheel):
+    """A TimerWheel driven by a fake clock (in s)."""
+
+    def __init__(self):
+        super().__init__()
+        self.clock = 1000.0
+
+    def now(self):
+        return self.clock
+
+    def run(self, duration, step=None):
+        """Advance the clock by duration ms, in steps of step ms."""
+
+        step = step if step else self.tick
+        end = self.clock + duration / 1000.0
+
+        while self.clock < end:
+            self.clock = min(end, self.clock + step / 1000.0)
+            self._TimerWheel__run()
+
+
+class TestTimerWheel(unittest.TestCase):
+    """TimerWheel tests."""
+
+    def setUp(self):
+
+        self.wheel = FakeWheel()
+        self.fired = []
+        self.started = []
+
+    def tearDown(self):
+
+        for timer in self.started:
+            timer.stop()
+
+    def timer(self, period, name="timer", jitter=0.0):
+        """Start a timer appending its name to fired."""
+
+        timer = Timer(lambda: self.fired.append(name), period, kind=name,
+                      jitter=jitter, wheel=self.wheel)
+        timer.start()
+
+        self.started.append(timer)
+
+        return timer
+
+    def test_invalid(self):
+        """The period must be positive."""
+
+        with self.assertRaises(ValueError):
+            Timer(lambda: None, 0, wheel=self.wheel)
+
+    def test_period(self):
+        """A timer fires once per period."""
+
+        self.timer(100)
+        self.wheel.run(10000)
+
+        self.assertEqual(len(self.fired), 100)
+
+    def test_cascade(self):
+        """Timers beyond the first level of the wheel fire on time."""
+
+        timer = self.timer(60000, jitter=0.1)
+        self.wheel.run(3600 * 1000, step=1000)
+
+        self.assertEqual(len(self.fired), 60)
+
+        stats = self.wheel.to_dict()['kinds']['timer']
+        self.assertEqual(stats['fired'], 60)
+        self.assertLessEqual(stats['lag_max'], 1000.0)
+        self.assertGreaterEqual(timer.expires, timer.deadline)
+
+    def test_spread(self):
+        """Timers started together expire at different times."""
+
+        timers = [self.timer(1000, "timer%u" % x) for x in range(10)]
+        deadlines = set(round(x.deadline, 6) for x in timers)
+
+        self.assertEqual(len(deadlines), 10)
+
+        self.wheel.run(1000)
+        self.assertEqual(sorted(self.fired),
+                         sorted("timer%u" % x for x in range(10)))
+
+    def test_stop(self):
+        """Stopped timers do not fire, restarted timers fire again."""
+
+        fast = self.timer(100, "fast")
+        self.timer(1000, "slow")
+
+        self.wheel.run(1000)
+        fast.stop()
+        self.assertFalse(fast.is_running())
+        self.wheel.run(1000)
+
+        self.assertEqual(self.fired.count("fast"), 10)
+        self.assertEqual(self.fired.count("slow"), 2)
+
+        fast.start()
+        self.wheel.run(1000)
+
+        self.assertEqual(self.fired.count("fast"), 20)
+        self.assertEqual(self.wheel.to_dict()['timers'], 2)
+
+    def test_stop_in_callback(self):
+        """A timer can stop itself from its callback."""
+
+        timer = Timer(lambda: timer.stop(), 100, wheel=self.wheel)
+        timer.start()
+
+        self.wheel.run(1000)
+
+        self.assertFalse(timer.is_running())
+        self.assertEqual(self.wheel.to_dict()['timers'], 0)
+
+    def test_missed(self):
+        """Missed expirations are skipped."""
+
+        self.timer(100)
+        self.wheel.run(1000, step=1000)
+
+        self.assertEqual(len(self.fired), 1)
+
+        self.wheel.run(1000)
+
+        self.assertEqual(len(self.fired), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()